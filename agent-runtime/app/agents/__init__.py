@@ -23,10 +23,13 @@ def initialize_agents():
     - Multi-agent mode (MULTI_AGENT_MODE=true): Registers Orchestrator + 4 specialists
     - Single-agent mode (MULTI_AGENT_MODE=false): Registers only Orchestrator + Universal
     
+    Tool bundles for every registered agent are precomputed afterwards.
+    
     This function should be called once during application startup.
     """
     # Import here to avoid circular dependency
     from app.domain.services.agent_registry import agent_router
+    from app.core.dependencies_llm import get_tool_filter_service, get_tool_registry
     
     try:
         if AppConfig.MULTI_AGENT_MODE:
@@ -55,6 +58,11 @@ def initialize_agents():
             logger.info("Single-agent system initialized successfully")
             logger.info("Orchestrator will always route to Universal agent")
         
+        # Precompute tool bundles (Universal agent requests all tools)
+        get_tool_filter_service(get_tool_registry()).precompute(
+            [None] + [agent_router.get_agent(t).allowed_tools for t in agent_router.list_agents()]
+        )
+        
     except Exception as e:
         logger.error(f"Failed to initialize agent system: {e}", exc_info=True)
         raise
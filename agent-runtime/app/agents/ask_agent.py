@@ -11,7 +11,6 @@ from app.agents.prompts.ask import ASK_PROMPT
 from app.models.schemas import StreamChunk
 from app.domain.entities.session import Session
 from app.domain.services.session_management import SessionManagementService
-from app.core.config import AppConfig
 
 if TYPE_CHECKING:
     from app.domain.interfaces.stream_handler import IStreamHandler
@@ -76,27 +75,27 @@ class AskAgent(BaseAgent):
         """
         logger.info(f"Ask agent processing message for session {session_id}")
         
+        # Primary model and fallback chain configured for this agent
+        models = self.get_model_chain()
+        
         # Get session history from domain entity
-        history = session.get_history_for_llm()
+        history = await self.build_llm_history(
+            session=session,
+            model=models[0],
+            allowed_tools=self.allowed_tools
+        )
         
         # DEBUG: Log history to see what we're getting
         logger.info(f"Ask agent got history with {len(history)} messages")
         for i, msg in enumerate(history):
             logger.debug(f"  Message {i}: role={msg.get('role')}, content={msg.get('content', '')[:50]}...")
         
-        # Update system prompt
-        if history and history[0].get("role") == "system":
-            history[0]["content"] = self.system_prompt
-        else:
-            history.insert(0, {"role": "system", "content": self.system_prompt})
-        
-        logger.debug(f"After adding system prompt, history has {len(history)} messages")
-        
         # Use new StreamLLMResponseHandler (passed as parameter)
         async for chunk in stream_handler.handle(
             session_id=session_id,
             history=history,
-            model=AppConfig.LLM_MODEL,
+            model=models[0],
+            fallback_models=models[1:],
             allowed_tools=self.allowed_tools,
             correlation_id=context.get("correlation_id")
         ):
@@ -113,6 +112,15 @@ class AskAgent(BaseAgent):
                 # Это предотвращает ошибку "No tool call found" от OpenRouter API
                 # Просто отправляем switch_agent chunk
                 
+                # The other calls of the batch are not executed
+                await self.close_tool_call_batch(
+                    session_id,
+                    chunk,
+                    session_service,
+                    error=f"Skipped: switching to {target_mode} agent",
+                    exclude_call_id=chunk.call_id
+                )
+                
                 # Emit switch_agent chunk
                 yield StreamChunk(
                     type="switch_agent",
@@ -147,6 +155,9 @@ class AskAgent(BaseAgent):
                     else:
                         error_msg = f"Tool '{chunk.tool_name}' is not allowed for Ask agent"
                     
+                    await self.close_tool_call_batch(
+                        session_id, chunk, session_service, error=error_msg
+                    )
                     yield StreamChunk(
                         type="error",
                         error=error_msg,
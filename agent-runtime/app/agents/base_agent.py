@@ -14,6 +14,7 @@ if TYPE_CHECKING:
     from app.domain.entities.session import Session
     from app.domain.services.session_management import SessionManagementService
     from app.domain.interfaces.stream_handler import IStreamHandler
+    from app.models.schemas import StreamChunk
 
 logger = logging.getLogger("agent-runtime.base_agent")
 
@@ -97,6 +98,129 @@ class BaseAgent(ABC):
         """
         pass
     
+    async def build_llm_history(
+        self,
+        session: "Session",
+        model: str,
+        allowed_tools: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Build LLM history with this agent's system prompt.
+        
+        When context budgeting is enabled, older turns are compacted so the
+        prompt fits the model's context window.
+        
+        Args:
+            session: Domain entity Session with message history
+            model: Model name
+            allowed_tools: Tools sent with the request (None = all tools)
+            
+        Returns:
+            History in LLM API format, system prompt first
+        """
+        from app.core.config import AppConfig
+        
+        if AppConfig.CONTEXT_BUDGET_ENABLED:
+            from app.core.dependencies_llm import get_context_budgeter
+            
+            return await get_context_budgeter().build_history(
+                session=session,
+                system_prompt=self.system_prompt,
+                model=model,
+                allowed_tools=allowed_tools
+            )
+        
+        history = session.get_history_for_llm()
+        await self._inline_current_turn_blobs(session, history)
+        if history and history[0].get("role") == "system":
+            history[0]["content"] = self.system_prompt
+        else:
+            history.insert(0, {"role": "system", "content": self.system_prompt})
+        return history
+    
+    async def _inline_current_turn_blobs(
+        self,
+        session: "Session",
+        history: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Replace previews of offloaded tool results of the current turn.
+        
+        Large tool results are stored in the blob store with a preview in
+        the message. The model must see the full output it has just asked
+        for; older results keep their preview.
+        
+        Args:
+            session: Domain entity Session with message history
+            history: session.get_history_for_llm() (same order as messages)
+        """
+        messages = session.messages
+        current_turn_start = next(
+            (i for i in range(len(messages) - 1, -1, -1) if messages[i].role == "user"),
+            0
+        )
+        recent = [
+            index for index in range(current_turn_start, len(messages))
+            if messages[index].get_blob_ref()
+        ]
+        if not recent:
+            return
+        
+        from app.core.dependencies import get_blob_store
+        
+        blob_store = get_blob_store()
+        for index in recent:
+            data = await blob_store.get(messages[index].get_blob_ref()["key"])
+            if data is not None:
+                history[index]["content"] = data.decode("utf-8")
+    
+    async def close_tool_call_batch(
+        self,
+        session_id: str,
+        chunk: "StreamChunk",
+        session_service: "SessionManagementService",
+        error: str,
+        exclude_call_id: Optional[str] = None
+    ) -> None:
+        """
+        Add an error result for every unanswered tool call of the chunk's batch.
+        
+        The assistant message with all tool_calls of the batch is persisted
+        before the calls are streamed, so an agent that stops mid-batch
+        (forbidden tool, restricted file, switch_mode) must answer the rest:
+        the next LLM request fails on a tool_call without a tool result.
+        
+        Args:
+            session_id: Session identifier
+            chunk: tool_call chunk the agent stopped at
+            session_service: Session management service for operations
+            error: Error stored as the result of each closed call
+            exclude_call_id: Call answered elsewhere (switch_mode result)
+        """
+        session = await session_service.get_session(session_id)
+        for call_id in session.get_pending_batch_calls(chunk.call_id):
+            if call_id == exclude_call_id:
+                continue
+            await session_service.add_tool_result(
+                session_id=session_id,
+                call_id=call_id,
+                error=error
+            )
+    
+    def get_model_chain(self) -> List[str]:
+        """
+        Get the models this agent uses, primary first.
+        
+        Configured per agent type in AGENT_RUNTIME__LLM_FALLBACK_CHAINS;
+        agents without a chain use the default model only.
+        
+        Returns:
+            Non-empty list of model names: primary, then fallbacks in order
+        """
+        from app.core.config import AppConfig
+        
+        return AppConfig.LLM_FALLBACK_CHAINS.get(self.agent_type.value) or [AppConfig.LLM_MODEL]
+    
     def can_use_tool(self, tool_name: str) -> bool:
         """
         Check if this agent is allowed to use a specific tool.
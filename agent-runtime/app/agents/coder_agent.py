@@ -10,7 +10,6 @@ from app.agents.prompts.coder import CODER_PROMPT
 from app.models.schemas import StreamChunk
 from app.domain.entities.session import Session
 from app.domain.services.session_management import SessionManagementService
-from app.core.config import AppConfig
 
 if TYPE_CHECKING:
     from app.domain.interfaces.stream_handler import IStreamHandler
@@ -73,20 +72,22 @@ class CoderAgent(BaseAgent):
         """
         logger.info(f"Coder agent processing message for session {session_id}")
         
-        # Get session history from domain entity
-        history = session.get_history_for_llm()
+        # Primary model and fallback chain configured for this agent
+        models = self.get_model_chain()
         
-        # Add system prompt at the beginning
-        if history and history[0].get("role") == "system":
-            history[0]["content"] = self.system_prompt
-        else:
-            history.insert(0, {"role": "system", "content": self.system_prompt})
+        # Get session history from domain entity
+        history = await self.build_llm_history(
+            session=session,
+            model=models[0],
+            allowed_tools=self.allowed_tools
+        )
         
         # Use new StreamLLMResponseHandler (passed as parameter)
         async for chunk in stream_handler.handle(
             session_id=session_id,
             history=history,
-            model=AppConfig.LLM_MODEL,
+            model=models[0],
+            fallback_models=models[1:],
             allowed_tools=self.allowed_tools,
             correlation_id=context.get("correlation_id")
         ):
@@ -96,9 +97,13 @@ class CoderAgent(BaseAgent):
                     logger.warning(
                         f"Coder agent attempted to use forbidden tool: {chunk.tool_name}"
                     )
+                    error_msg = f"Tool '{chunk.tool_name}' is not allowed for Coder agent"
+                    await self.close_tool_call_batch(
+                        session_id, chunk, session_service, error=error_msg
+                    )
                     yield StreamChunk(
                         type="error",
-                        error=f"Tool '{chunk.tool_name}' is not allowed for Coder agent",
+                        error=error_msg,
                         is_final=True
                     )
                     return
@@ -110,9 +115,13 @@ class CoderAgent(BaseAgent):
                         logger.warning(
                             f"Coder agent attempted to edit restricted file: {file_path}"
                         )
+                        error_msg = f"File '{file_path}' editing is restricted for Coder agent"
+                        await self.close_tool_call_batch(
+                            session_id, chunk, session_service, error=error_msg
+                        )
                         yield StreamChunk(
                             type="error",
-                            error=f"File '{file_path}' editing is restricted for Coder agent",
+                            error=error_msg,
                             is_final=True
                         )
                         return
@@ -11,7 +11,6 @@ from app.agents.prompts.debug import DEBUG_PROMPT
 from app.models.schemas import StreamChunk
 from app.domain.entities.session import Session
 from app.domain.services.session_management import SessionManagementService
-from app.core.config import AppConfig
 
 if TYPE_CHECKING:
     from app.domain.interfaces.stream_handler import IStreamHandler
@@ -77,20 +76,22 @@ class DebugAgent(BaseAgent):
         """
         logger.info(f"Debug agent processing message for session {session_id}")
         
-        # Get session history from domain entity
-        history = session.get_history_for_llm()
+        # Primary model and fallback chain configured for this agent
+        models = self.get_model_chain()
         
-        # Update system prompt
-        if history and history[0].get("role") == "system":
-            history[0]["content"] = self.system_prompt
-        else:
-            history.insert(0, {"role": "system", "content": self.system_prompt})
+        # Get session history from domain entity
+        history = await self.build_llm_history(
+            session=session,
+            model=models[0],
+            allowed_tools=self.allowed_tools
+        )
         
         # Use new StreamLLMResponseHandler (passed as parameter)
         async for chunk in stream_handler.handle(
             session_id=session_id,
             history=history,
-            model=AppConfig.LLM_MODEL,
+            model=models[0],
+            fallback_models=models[1:],
             allowed_tools=self.allowed_tools,
             correlation_id=context.get("correlation_id")
         ):
@@ -106,6 +107,15 @@ class DebugAgent(BaseAgent):
                 # ВАЖНО: НЕ добавляем tool_result в историю!
                 # Это предотвращает ошибку "No tool call found" от OpenRouter API
                 
+                # The other calls of the batch are not executed
+                await self.close_tool_call_batch(
+                    session_id,
+                    chunk,
+                    session_service,
+                    error=f"Skipped: switching to {target_mode} agent",
+                    exclude_call_id=chunk.call_id
+                )
+                
                 # Emit switch_agent chunk
                 yield StreamChunk(
                     type="switch_agent",
@@ -135,6 +145,9 @@ class DebugAgent(BaseAgent):
                     else:
                         error_msg = f"Tool '{chunk.tool_name}' is not allowed for Debug agent"
                     
+                    await self.close_tool_call_batch(
+                        session_id, chunk, session_service, error=error_msg
+                    )
                     yield StreamChunk(
                         type="error",
                         error=error_msg,
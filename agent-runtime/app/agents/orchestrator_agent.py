@@ -10,6 +10,7 @@ from app.agents.base_agent import BaseAgent, AgentType
 from app.agents.prompts.orchestrator import ORCHESTRATOR_PROMPT
 from app.models.schemas import StreamChunk
 from app.infrastructure.llm.client import llm_proxy_client
+from app.infrastructure.concurrency import RequestPriority
 from app.core.config import AppConfig
 
 if TYPE_CHECKING:
@@ -176,7 +177,10 @@ class OrchestratorAgent(BaseAgent):
                     {"role": "user", "content": classification_prompt}
                 ],
                 stream=False,
-                extra_params={"temperature": 0.3}  # Lower temperature for more consistent classification
+                # Lower temperature for more consistent classification
+                extra_params={"temperature": 0.3},
+                priority=RequestPriority.CLASSIFICATION,
+                use_response_cache=True  # Same message -> same classification
             )
             
             # Extract response content
@@ -9,7 +9,6 @@ from app.agents.prompts.universal import UNIVERSAL_SYSTEM_PROMPT
 from app.models.schemas import StreamChunk
 from app.domain.entities.session import Session
 from app.domain.services.session_management import SessionManagementService
-from app.core.config import AppConfig
 
 if TYPE_CHECKING:
     from app.domain.interfaces.stream_handler import IStreamHandler
@@ -75,21 +74,23 @@ class UniversalAgent(BaseAgent):
         logger.info(f"Universal agent processing message for session {session_id}")
         logger.debug(f"Single-agent mode: handling all tasks without delegation")
         
-        # Get session history from domain entity
-        history = session.get_history_for_llm()
+        # Primary model and fallback chain configured for this agent
+        models = self.get_model_chain()
         
-        # Update system prompt
-        if history and history[0].get("role") == "system":
-            history[0]["content"] = self.system_prompt
-        else:
-            history.insert(0, {"role": "system", "content": self.system_prompt})
+        # Get session history from domain entity
+        history = await self.build_llm_history(
+            session=session,
+            model=models[0],
+            allowed_tools=None
+        )
         
         # Use new StreamLLMResponseHandler (passed as parameter)
         # Universal agent has access to all tools (None = all tools)
         async for chunk in stream_handler.handle(
             session_id=session_id,
             history=history,
-            model=AppConfig.LLM_MODEL,
+            model=models[0],
+            fallback_models=models[1:],
             allowed_tools=None,  # All tools allowed
             correlation_id=context.get("correlation_id")
         ):
@@ -99,9 +100,13 @@ class UniversalAgent(BaseAgent):
                     logger.warning(
                         f"Universal agent attempted to use unknown tool: {chunk.tool_name}"
                     )
+                    error_msg = f"Tool '{chunk.tool_name}' is not available"
+                    await self.close_tool_call_batch(
+                        session_id, chunk, session_service, error=error_msg
+                    )
                     yield StreamChunk(
                         type="error",
-                        error=f"Tool '{chunk.tool_name}' is not available",
+                        error=error_msg,
                         is_final=True
                     )
                     return
@@ -10,6 +10,7 @@ from .sessions_router import router as sessions_router
 from .messages_router import router as messages_router
 from .agents_router import router as agents_router
 from .events_router import router as events_router
+from .channel_router import router as channel_router
 
 __all__ = [
     "health_router",
@@ -17,4 +18,5 @@ __all__ = [
     "messages_router",
     "agents_router",
     "events_router",
+    "channel_router",
 ]
@@ -19,7 +19,8 @@ from ....domain.services.agent_registry import agent_router
 from ....core.errors import AgentSwitchError
 from ....core.dependencies import (
     get_switch_agent_handler,
-    get_get_agent_context_handler
+    get_get_agent_context_handler,
+    notify_session_changed
 )
 
 logger = logging.getLogger("agent-runtime.api.agents")
@@ -152,6 +153,7 @@ async def get_current_agent(
 async def switch_agent(
     session_id: str,
     request: SwitchAgentRequest,
+    _changed: None = Depends(notify_session_changed),
     handler: SwitchAgentHandler = Depends(get_switch_agent_handler)
 ):
     """
@@ -0,0 +1,222 @@
+"""
+Постоянный канал gateway -> Agent Runtime.
+
+Один WebSocket от gateway мультиплексирует стримы многих сессий вместо
+отдельного HTTP запроса /agent/message/stream на каждое сообщение IDE.
+HTTP/SSE endpoint остается и используется gateway, если канал недоступен.
+
+Протокол (текстовые кадры):
+    gateway -> runtime: {"session_id": "...", "message": {...},
+                         "timeout": 60.0, "coalesce": "window_ms=20"}
+                        {"session_id": "...", "type": "cancel"}
+    runtime -> gateway: "<session_id>\\n<JSON chunk>" ... "<session_id>\\n[DONE]"
+                        "\\n{"type": "session_changed", "session_id": "..."}"
+
+JSON chunk совпадает с payload data: SSE endpoint, поэтому gateway
+пересылает его в IDE без разбора. timeout и coalesce соответствуют
+заголовкам X-Request-Timeout и X-Stream-Coalesce. Кадр с пустым
+префиксом сессии - уведомление об изменении сессии (см.
+SessionChangeNotifier), его получают соединения, открытые с
+заголовком X-Session-Changes: 1.
+
+Backpressure: стрим ждет отправки каждого кадра в сокет, а при
+CHANNEL_MAX_STREAMS активных стримах новые стримы ждут свободного слота.
+Чтение канала при этом не останавливается, поэтому cancel доходит и до
+ожидающих, и до активных стримов.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, status
+from starlette.websockets import WebSocketDisconnect
+
+from ....core.config import AppConfig
+from ....core.dependencies import get_channel_sessions, get_session_change_notifier
+from ....core.serialization import loads
+from ....infrastructure.resilience import request_deadline
+from ....infrastructure.streaming import (
+    ChannelSessions,
+    CoalescePolicy,
+    SessionChangeNotifier,
+    coalesce_tokens,
+)
+from ....models.schemas import StreamChunk
+from .messages_router import chunk_json, message_chunks
+
+logger = logging.getLogger("agent-runtime.api.channel")
+
+router = APIRouter(prefix="/agent", tags=["messages"])
+
+DONE = "[DONE]"
+
+
+class _Channel:
+    """Стримы одного соединения канала"""
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        sessions: ChannelSessions,
+        notifier: SessionChangeNotifier
+    ):
+        self.websocket = websocket
+        self.sessions = sessions
+        self.notifier = notifier
+        self.streams: Dict[str, asyncio.Task] = {}
+        # Отмененные стримы, которые еще сохраняют частичный ответ
+        self.cancelled: Dict[str, asyncio.Task] = {}
+        self.slots = asyncio.Semaphore(AppConfig.CHANNEL_MAX_STREAMS)
+        self._send_lock = asyncio.Lock()
+    
+    async def send(self, session_id: str, payload: str) -> None:
+        """Кадр стрима сессии (кадры разных стримов не перемешиваются)"""
+        async with self._send_lock:
+            await self.websocket.send_text(f"{session_id}\n{payload}")
+    
+    async def send_control(self, frame: str) -> None:
+        """Управляющий кадр канала (не относится к стриму)"""
+        async with self._send_lock:
+            await self.websocket.send_text(frame)
+    
+    async def send_error(self, session_id: str, error: str) -> None:
+        chunk = StreamChunk(type="error", error=error, is_final=True)
+        await self.send(session_id, chunk_json(chunk).decode("utf-8"))
+    
+    async def start(self, request: Dict[str, Any]) -> None:
+        """Запустить стрим по запросу gateway"""
+        session_id = request.get("session_id")
+        if not session_id:
+            logger.warning("Channel request without session_id ignored")
+            return
+        if request.get("type") == "cancel":
+            await self.cancel(session_id)
+            return
+        if session_id in self.streams:
+            await self.send_error(session_id, "Session is already processing a message")
+            await self.send(session_id, DONE)
+            return
+        
+        self.streams[session_id] = asyncio.create_task(self._stream(session_id, request))
+    
+    async def cancel(self, session_id: str) -> None:
+        """
+        Прервать стрим сессии (IDE отменила запрос или отключилась).
+        
+        Не ждет завершения стрима: цикл чтения канала общий для всех
+        сессий. Следующий стрим этой сессии сам дождется, пока
+        отмененный сохранит частичный ответ и освободит сессию.
+        """
+        task = self.streams.pop(session_id, None)
+        if task is None:
+            return
+        logger.info(f"Channel stream cancelled for session {session_id}")
+        self.cancelled[session_id] = task
+        task.cancel()
+    
+    async def _stream(self, session_id: str, request: Dict[str, Any]) -> None:
+        task = asyncio.current_task()
+        previous = self.cancelled.get(session_id)
+        acquired = False
+        try:
+            # Отмененный стрим сессии и слот ожидаются в задаче стрима,
+            # а не в цикле чтения канала
+            if previous is not None:
+                await asyncio.wait({previous})
+            await self.slots.acquire()
+            acquired = True
+            entry = await self.sessions.acquire(session_id)
+            failed = False
+            try:
+                chunks = message_chunks(entry.service, session_id, request.get("message") or {})
+                coalesce = CoalescePolicy.parse(request.get("coalesce"), CoalescePolicy.default())
+                with request_deadline(request.get("timeout")):
+                    async for chunk in coalesce_tokens(chunks, coalesce):
+                        await self.send(session_id, chunk_json(chunk).decode("utf-8"))
+            except HTTPException as e:
+                await self.send_error(session_id, str(e.detail))
+            except Exception as e:
+                failed = True
+                logger.error(f"Channel stream failed for session {session_id}: {e}", exc_info=True)
+                await self.send_error(session_id, str(e))
+            except asyncio.CancelledError:
+                # Отмена (cancel от gateway или закрытие канала): частичный
+                # ответ сохранен обработчиками и фиксируется вместе с запросом
+                raise
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                await self.sessions.release(entry, failed=failed)
+            # Изменения зафиксированы: gateway сбрасывает кэш истории сессии
+            await self.notifier.notify(session_id)
+            await self.send(session_id, DONE)
+        except (WebSocketDisconnect, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            logger.error(
+                f"Channel stream setup failed for session {session_id}: {e}", exc_info=True
+            )
+            try:
+                await self.send_error(session_id, str(e))
+                await self.send(session_id, DONE)
+            except Exception:
+                pass
+        finally:
+            if previous is not None:
+                # Стрим, отмененный до начала, не завершается раньше предыдущего
+                await asyncio.wait({previous})
+            if self.streams.get(session_id) is task:
+                del self.streams[session_id]
+            if self.cancelled.get(session_id) is task:
+                del self.cancelled[session_id]
+            if acquired:
+                self.slots.release()
+    
+    async def close(self) -> None:
+        """Отменить активные стримы и закрыть сессии БД"""
+        tasks = [*self.streams.values(), *self.cancelled.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.sessions.close()
+
+
+@router.websocket("/channel")
+async def agent_channel(
+    websocket: WebSocket,
+    sessions: ChannelSessions = Depends(get_channel_sessions),
+    notifier: SessionChangeNotifier = Depends(get_session_change_notifier)
+):
+    """
+    Постоянный мультиплексированный канал для gateway.
+    
+    Требует заголовок X-Internal-Auth (InternalAuthMiddleware не
+    проверяет WebSocket соединения).
+    """
+    if websocket.headers.get("x-internal-auth") != AppConfig.INTERNAL_API_KEY:
+        logger.warning("Channel connection rejected: invalid X-Internal-Auth")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    logger.info("Gateway channel connected")
+    channel = _Channel(websocket, sessions, notifier)
+    if websocket.headers.get("x-session-changes") == "1":
+        notifier.subscribe(channel.send_control)
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                request = loads(raw)
+            except ValueError as e:
+                logger.warning(f"Invalid channel request: {e}")
+                continue
+            if isinstance(request, dict):
+                await channel.start(request)
+    except WebSocketDisconnect:
+        logger.info("Gateway channel disconnected")
+    finally:
+        notifier.unsubscribe(channel.send_control)
+        await channel.close()
@@ -179,3 +179,78 @@ async def get_all_session_metrics():
         "sessions": sessions,
         "count": len(sessions)
     }
+
+
+@router.get("/llm-cancellations")
+async def get_llm_cancellation_stats():
+    """
+    Get LLM requests cancelled because the client disconnected.
+    
+    Returns:
+        Cancelled request count, time spent and text generated before
+        cancellation, per model
+    """
+    logger.debug("Getting LLM cancellation stats")
+    
+    from ....events.subscribers import session_metrics_collector
+    
+    return {
+        **session_metrics_collector.get_cancellation_stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+@router.get("/llm-admission")
+async def get_llm_admission_stats():
+    """
+    Get outbound LLM admission control stats.
+    
+    Returns:
+        Per-model concurrency limits and queues, queue time per priority
+        and rejected request counts
+    """
+    logger.debug("Getting LLM admission stats")
+    
+    from ....infrastructure.concurrency import llm_admission_controller
+    
+    return {
+        **llm_admission_controller.get_stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+@router.get("/llm-retries")
+async def get_llm_retry_stats():
+    """
+    Get LLM retry stats.
+    
+    Returns:
+        Retries attempted vs suppressed (by budget or request deadline)
+    """
+    logger.debug("Getting LLM retry stats")
+    
+    from ....infrastructure.llm.client import llm_retry_handler
+    
+    return {
+        **llm_retry_handler.get_stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+@router.get("/circuit-breakers")
+async def get_circuit_breaker_stats():
+    """
+    Get LLM circuit breaker states.
+    
+    Returns:
+        State, sliding-window failure rate and rejected calls
+        per (upstream, model)
+    """
+    logger.debug("Getting circuit breaker stats")
+    
+    from ....infrastructure.resilience import llm_circuit_breakers
+    
+    return {
+        **llm_circuit_breakers.get_stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
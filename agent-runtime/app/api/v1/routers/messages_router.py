@@ -6,69 +6,89 @@ Messages роутер.
 """
 
 import logging
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
+from typing import Any, AsyncIterator, Dict, Optional, Union
 
 from ..schemas.message_schemas import MessageStreamRequest
-from ....models.schemas import StreamChunk
+from ....models.schemas import StreamChunk, TokenChunk
 from ....agents.base_agent import AgentType
-from ....core.dependencies import get_message_orchestration_service
+from ....core.dependencies import (
+    get_message_orchestration_service,
+    get_session_change_notifier,
+)
+from ....core.serialization import model_json, sse_frame
+from ....infrastructure.resilience import request_deadline
+from ....infrastructure.streaming import (
+    CancellableStreamingResponse,
+    CoalescePolicy,
+    SessionChangeNotifier,
+    coalesce_tokens,
+)
 
 logger = logging.getLogger("agent-runtime.api.messages")
 
 router = APIRouter(prefix="/agent/message", tags=["messages"])
 
 
-@router.post("/stream")
-async def message_stream_sse(
-    request: MessageStreamRequest,
-    message_orchestration_service=Depends(get_message_orchestration_service)
-):
+async def _sse_stream(
+    chunks: AsyncIterator[Union[StreamChunk, TokenChunk]],
+    timeout: Optional[float],
+    coalesce: CoalescePolicy
+) -> AsyncIterator[bytes]:
     """
-    SSE streaming endpoint для обработки сообщений.
+    Кадры SSE из chunks с дедлайном запроса.
     
-    Использует новый MessageOrchestrationService для обработки сообщений
-    через систему мульти-агентов с поддержкой streaming ответов.
+    Дедлайн (оставшееся время SSE у клиента) ограничивает повторы
+    исходящих запросов (см. RetryHandler). Токены объединяются в кадры
+    по политике клиента (см. coalesce_tokens).
+    """
+    with request_deadline(timeout):
+        async for chunk in coalesce_tokens(chunks, coalesce):
+            yield _sse_frame(chunk)
+
+
+def _sse_frame(chunk: Union[StreamChunk, TokenChunk]) -> bytes:
+    """Кадр SSE для chunk"""
+    return sse_frame(chunk_json(chunk))
+
+
+def chunk_json(chunk: Union[StreamChunk, TokenChunk]) -> bytes:
+    """
+    JSON chunk для IDE.
     
-    Принимает:
-    - user_message: Обычное сообщение пользователя
-    - tool_result: Результат выполнения инструмента от Gateway
-    - switch_agent: Явный запрос переключения агента
-    - hitl_decision: Решение пользователя по HITL
+    Токены кодируются без pydantic (TokenChunk.to_json), управляющие
+    chunks - моделью. В обоих случаях JSON компактный и без null полей,
+    поэтому gateway пересылает его в WebSocket без разбора.
+    """
+    if isinstance(chunk, TokenChunk):
+        return chunk.to_json()
+    return model_json(chunk, exclude_none=True)
+
+
+def message_chunks(
+    message_orchestration_service,
+    session_id: str,
+    message_data: Dict[str, Any]
+) -> AsyncIterator[Union[StreamChunk, TokenChunk]]:
+    """
+    Стрим chunks обработки сообщения.
     
-    Возвращает:
-    - SSE stream с chunks (assistant_message, tool_call, agent_switched, error)
+    Проверяет сообщение и возвращает генератор chunks. Ошибка обработки
+    становится финальным chunk type=error. Используется SSE endpoint и
+    постоянным каналом gateway (см. channel_router).
     
     Args:
-        request: Запрос с сообщением
-        
+        message_orchestration_service: Сервис оркестрации сообщений
+        session_id: ID сессии
+        message_data: Сообщение (user_message, tool_result, switch_agent,
+            hitl_decision)
+    
     Returns:
-        StreamingResponse: SSE stream
-        
-    Пример запроса:
-        POST /agent/message/stream
-        {
-            "session_id": "session-123",
-            "message": {
-                "type": "user_message",
-                "content": "Создай новый файл",
-                "agent_type": "coder"  // опционально
-            }
-        }
-        
-    Пример SSE ответа:
-        data: {"type":"agent_switched","content":"Switched to coder agent",...}
-        
-        data: {"type":"assistant_message","token":"Конечно","is_final":false}
-        
-        data: {"type":"tool_call","call_id":"call-1","tool_name":"write_file",...}
-        
-        data: {"type":"done","is_final":true}
+        Асинхронный итератор chunks
+    
+    Raises:
+        HTTPException: 400 при некорректном сообщении
     """
-    # Использовать MessageOrchestrationService для всех типов сообщений
-    session_id = request.session_id
-    message_data = request.message
     message_type = message_data.get("type")
     
     if message_type == "user_message":
@@ -82,33 +102,12 @@ async def message_stream_sse(
             f"via MessageOrchestrationService"
         )
         
-        async def generate():
-            try:
-                async for chunk in message_orchestration_service.process_message(
-                    session_id=session_id,
-                    message=content,
-                    agent_type=agent_type
-                ):
-                    # Преобразовать в SSE формат
-                    yield f"data: {chunk.model_dump_json()}\n\n"
-            except Exception as e:
-                logger.error(f"Error processing message: {e}", exc_info=True)
-                error_chunk = StreamChunk(
-                    type="error",
-                    error=str(e),
-                    is_final=True
-                )
-                yield f"data: {error_chunk.model_dump_json()}\n\n"
-        
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        chunks = message_orchestration_service.process_message(
+            session_id=session_id,
+            message=content,
+            agent_type=agent_type
         )
+        return _with_error_chunk(chunks, "Error processing message")
     
     elif message_type == "tool_result":
         # Обработка результатов инструментов
@@ -127,33 +126,13 @@ async def message_stream_sse(
             f"call_id={call_id}, has_error={error is not None}"
         )
         
-        async def tool_result_generate():
-            try:
-                async for chunk in message_orchestration_service.process_tool_result(
-                    session_id=session_id,
-                    call_id=call_id,
-                    result=result,
-                    error=error
-                ):
-                    yield f"data: {chunk.model_dump_json()}\n\n"
-            except Exception as e:
-                logger.error(f"Error processing tool_result: {e}", exc_info=True)
-                error_chunk = StreamChunk(
-                    type="error",
-                    error=str(e),
-                    is_final=True
-                )
-                yield f"data: {error_chunk.model_dump_json()}\n\n"
-        
-        return StreamingResponse(
-            tool_result_generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        chunks = message_orchestration_service.process_tool_result(
+            session_id=session_id,
+            call_id=call_id,
+            result=result,
+            error=error
         )
+        return _with_error_chunk(chunks, "Error processing tool_result")
     
     elif message_type == "switch_agent":
         # Обработка явного переключения агента
@@ -178,33 +157,13 @@ async def message_stream_sse(
             f"Processing agent switch for session {session_id} to {agent_type.value}"
         )
         
-        async def switch_agent_generate():
-            try:
-                # Переключаем агента через MessageOrchestrationService
-                async for chunk in message_orchestration_service.switch_agent(
-                    session_id=session_id,
-                    agent_type=agent_type,
-                    reason=reason
-                ):
-                    yield f"data: {chunk.model_dump_json()}\n\n"
-            except Exception as e:
-                logger.error(f"Error switching agent: {e}", exc_info=True)
-                error_chunk = StreamChunk(
-                    type="error",
-                    error=str(e),
-                    is_final=True
-                )
-                yield f"data: {error_chunk.model_dump_json()}\n\n"
-        
-        return StreamingResponse(
-            switch_agent_generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        # Переключаем агента через MessageOrchestrationService
+        chunks = message_orchestration_service.switch_agent(
+            session_id=session_id,
+            agent_type=agent_type,
+            reason=reason
         )
+        return _with_error_chunk(chunks, "Error switching agent")
     
     elif message_type == "hitl_decision":
         # Обработка HITL решения пользователя
@@ -224,38 +183,128 @@ async def message_stream_sse(
             f"call_id={call_id}, decision={decision}"
         )
         
-        async def hitl_decision_generate():
-            try:
-                # Обрабатываем HITL решение через MessageOrchestrationService
-                async for chunk in message_orchestration_service.process_hitl_decision(
-                    session_id=session_id,
-                    call_id=call_id,
-                    decision=decision,
-                    modified_arguments=modified_arguments,
-                    feedback=feedback
-                ):
-                    yield f"data: {chunk.model_dump_json()}\n\n"
-            except Exception as e:
-                logger.error(f"Error processing HITL decision: {e}", exc_info=True)
-                error_chunk = StreamChunk(
-                    type="error",
-                    error=str(e),
-                    is_final=True
-                )
-                yield f"data: {error_chunk.model_dump_json()}\n\n"
-        
-        return StreamingResponse(
-            hitl_decision_generate(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
+        # Обрабатываем HITL решение через MessageOrchestrationService
+        chunks = message_orchestration_service.process_hitl_decision(
+            session_id=session_id,
+            call_id=call_id,
+            decision=decision,
+            modified_arguments=modified_arguments,
+            feedback=feedback
         )
+        return _with_error_chunk(chunks, "Error processing HITL decision")
     
     else:
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported message type: {message_type}"
         )
+
+
+async def _with_error_chunk(
+    chunks: AsyncIterator[Union[StreamChunk, TokenChunk]],
+    error_message: str
+) -> AsyncIterator[Union[StreamChunk, TokenChunk]]:
+    """Исключение обработки превращается в финальный chunk type=error"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        logger.error(f"{error_message}: {e}", exc_info=True)
+        yield StreamChunk(
+            type="error",
+            error=str(e),
+            is_final=True
+        )
+
+
+async def _notify_session_changed(
+    request: MessageStreamRequest,
+    notifier: SessionChangeNotifier = Depends(get_session_change_notifier)
+):
+    """
+    Уведомление gateway после commit сообщения (см. notify_session_changed).
+    
+    Код после yield выполняется после отправки стрима и выхода из get_db
+    только начиная с FastAPI 0.118 (минимальная версия в pyproject).
+    """
+    yield
+    await notifier.notify(request.session_id)
+
+
+@router.post("/stream")
+async def message_stream_sse(
+    request: MessageStreamRequest,
+    _changed: None = Depends(_notify_session_changed),
+    message_orchestration_service=Depends(get_message_orchestration_service),
+    x_request_timeout: Optional[float] = Header(default=None),
+    x_stream_coalesce: Optional[str] = Header(default=None)
+):
+    """
+    SSE streaming endpoint для обработки сообщений.
+    
+    Использует новый MessageOrchestrationService для обработки сообщений
+    через систему мульти-агентов с поддержкой streaming ответов.
+    
+    Принимает:
+    - user_message: Обычное сообщение пользователя
+    - tool_result: Результат выполнения инструмента от Gateway
+    - switch_agent: Явный запрос переключения агента
+    - hitl_decision: Решение пользователя по HITL
+    
+    Возвращает:
+    - SSE stream с chunks (assistant_message, tool_call, agent_switched, error)
+    
+    При отключении клиента обработка отменяется: запрос к LLM прерывается,
+    частичный ответ сохраняется сообщением с metadata interrupted=True
+    (только при стриминге от LLM Proxy, см. LLM_STREAM_TOKENS).
+    
+    После фиксации транзакции подключенные каналы gateway получают
+    session_changed (сброс кэша истории сессии).
+    
+    Args:
+        request: Запрос с сообщением
+        x_request_timeout: Оставшееся время SSE у клиента в секундах
+            (заголовок X-Request-Timeout), ограничивает повторы LLM запросов
+        x_stream_coalesce: Политика объединения токенов клиента
+            (заголовок X-Stream-Coalesce, например "window_ms=20, max_bytes=1024")
+        
+    Returns:
+        CancellableStreamingResponse: SSE stream
+        
+    Пример запроса:
+        POST /agent/message/stream
+        {
+            "session_id": "session-123",
+            "message": {
+                "type": "user_message",
+                "content": "Создай новый файл",
+                "agent_type": "coder"  // опционально
+            }
+        }
+        
+    Пример SSE ответа:
+        data: {"type":"agent_switched","content":"Switched to coder agent",...}
+        
+        data: {"type":"assistant_message","token":"Конечно","is_final":false}
+        
+        data: {"type":"tool_call","call_id":"call-1","tool_name":"write_file",...}
+        
+        data: {"type":"done","is_final":true}
+    """
+    coalesce = CoalescePolicy.parse(x_stream_coalesce, CoalescePolicy.default())
+    chunks = message_chunks(
+        message_orchestration_service,
+        request.session_id,
+        request.message
+    )
+    
+    return CancellableStreamingResponse(
+        _sse_stream(chunks, x_request_timeout, coalesce),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+        
\ No newline at end of file
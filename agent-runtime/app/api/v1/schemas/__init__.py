@@ -24,6 +24,7 @@ from .health_schemas import HealthResponse
 from .common import (
     ToolCall,
     StreamChunk,
+    TokenChunk,
     SessionState,
     AgentInfo
 )
@@ -50,6 +51,7 @@ __all__ = [
     "Message",  # From domain.entities
     "ToolCall",
     "StreamChunk",
+    "TokenChunk",
     "SessionState",
     "AgentInfo",
 ]
@@ -3,6 +3,7 @@ Common API schemas used across multiple endpoints.
 
 Contains:
 - StreamChunk: SSE streaming response chunks
+- TokenChunk: Lightweight chunk for the per-token hot path
 - ToolCall: Tool call representation
 - SessionState: Session state
 - AgentInfo: Agent information
@@ -14,6 +15,8 @@ from typing import Any, Dict, List, Literal, Optional, TYPE_CHECKING
 
 from pydantic import BaseModel, Field
 
+from ....core.serialization import dumpb
+
 if TYPE_CHECKING:
     from ....domain.entities.message import Message
 
@@ -28,9 +31,15 @@ class ToolCall(BaseModel):
 class StreamChunk(BaseModel):
     """SSE event chunk for streaming responses"""
     
-    type: Literal["assistant_message", "tool_call", "error", "done", "switch_agent", "agent_switched"] = Field(
-        description="Type of the stream chunk"
-    )
+    type: Literal[
+        "assistant_message",
+        "tool_call",
+        "tool_call_delta",
+        "error",
+        "done",
+        "switch_agent",
+        "agent_switched",
+    ] = Field(description="Type of the stream chunk")
     content: Optional[str] = Field(default=None, description="Text content for assistant messages")
     token: Optional[str] = Field(default=None, description="Single token for streaming")
     is_final: bool = Field(default=False, description="Whether this is the final chunk")
@@ -61,6 +70,14 @@ class StreamChunk(BaseModel):
                     "arguments": {"path": "/src/main.py"},
                     "is_final": True
                 },
+                {
+                    "type": "tool_call_delta",
+                    "call_id": "call_123",
+                    "tool_name": "write_file",
+                    "token": "def main():",
+                    "metadata": {"index": 0, "argument": "content", "complete": False},
+                    "is_final": False
+                },
                 {
                     "type": "error",
                     "error": "Failed to process request",
@@ -81,6 +98,65 @@ class StreamChunk(BaseModel):
         }
 
 
+class TokenChunk:
+    """
+    Lightweight stream chunk for the per-token hot path.
+    
+    Exposes the same attributes as StreamChunk but skips pydantic
+    construction and validation. to_json() writes only non-None fields
+    from pre-encoded keys in a fixed order. Used for assistant_message tokens and
+    tool_call_delta chunks; control chunks (tool_call, switch_agent, error)
+    stay StreamChunk.
+    """
+    
+    __slots__ = ("type", "token", "is_final", "call_id", "tool_name", "metadata")
+    
+    # StreamChunk fields that token chunks never carry
+    content = None
+    arguments = None
+    requires_approval = False
+    error = None
+    
+    # Pre-encoded '{"type":"..."' prefixes; fields follow in StreamChunk order
+    _TYPE_PREFIXES = {
+        chunk_type: b'{"type":' + dumpb(chunk_type)
+        for chunk_type in ("assistant_message", "tool_call_delta")
+    }
+    
+    def __init__(
+        self,
+        type: Literal["assistant_message", "tool_call_delta"],
+        token: Optional[str] = None,
+        is_final: bool = False,
+        call_id: Optional[str] = None,
+        tool_name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.type = type
+        self.token = token
+        self.is_final = is_final
+        self.call_id = call_id
+        self.tool_name = tool_name
+        self.metadata = metadata
+    
+    def to_json(self) -> bytes:
+        """Compact JSON without None fields"""
+        out = self._TYPE_PREFIXES[self.type]
+        if self.token is not None:
+            out += b',"token":' + dumpb(self.token)
+        out += b',"is_final":true' if self.is_final else b',"is_final":false'
+        if self.call_id is not None:
+            out += b',"call_id":' + dumpb(self.call_id)
+        if self.tool_name is not None:
+            out += b',"tool_name":' + dumpb(self.tool_name)
+        if self.metadata is not None:
+            out += b',"metadata":' + dumpb(self.metadata)
+        return out + b"}"
+    
+    def __repr__(self) -> str:
+        return f"TokenChunk(type={self.type!r}, token={self.token!r}, is_final={self.is_final!r})"
+
+
 class SessionState(BaseModel):
     """
     Maintains state for an active session.
@@ -8,21 +8,32 @@ Application Handler для стриминга LLM ответов.
 - Публикация событий
 - Сохранение результатов
 - Генерация стрима
+- Отмена запроса при отключении клиента
 """
 
+import asyncio
 import time
 import logging
-from typing import AsyncGenerator, List, Dict, Optional, Any
+from contextlib import nullcontext
+from typing import AsyncGenerator, List, Dict, Optional, Any, Union
 
 from ...domain.interfaces.stream_handler import IStreamHandler
 from ...domain.services.llm_response_processor import LLMResponseProcessor
 from ...domain.services.tool_filter_service import ToolFilterService
 from ...domain.services.session_management import SessionManagementService
 from ...domain.services.approval_management import ApprovalManager
-from ...domain.entities.llm_response import ProcessedResponse
+from ...domain.services.prompt_prefix import PromptPrefixCache
+from ...domain.entities.llm_response import LLMResponse, ProcessedResponse
 from ...infrastructure.llm.llm_client import LLMClient
+from ...infrastructure.llm.tool_parser import ToolCallDelta
+from ...infrastructure.concurrency.admission_controller import (
+    AdmissionRejectedError,
+    LLMAdmissionController,
+    RequestPriority,
+)
 from ...infrastructure.events.llm_event_publisher import LLMEventPublisher
-from ...models.schemas import StreamChunk
+from ...infrastructure.resilience import CircuitOpenError
+from ...models.schemas import StreamChunk, TokenChunk
 
 logger = logging.getLogger("agent-runtime.application.stream_llm_response_handler")
 
@@ -51,6 +62,10 @@ class StreamLLMResponseHandler(IStreamHandler):
         _event_publisher: Publisher для событий
         _session_service: Сервис управления сессиями
         _approval_manager: Unified approval manager
+        _prefix_cache: Кэш стабильных префиксов промпта (для prompt caching)
+        _admission_controller: Ограничитель конкурентности запросов к LLM
+        _stream_tool_arguments: Отдавать tool_call_delta во время генерации
+        _stream_tokens: Отдавать текст ответа по токенам во время генерации
     
     Пример:
         >>> handler = StreamLLMResponseHandler(
@@ -76,7 +91,11 @@ class StreamLLMResponseHandler(IStreamHandler):
         response_processor: LLMResponseProcessor,
         event_publisher: LLMEventPublisher,
         session_service: SessionManagementService,
-        approval_manager: ApprovalManager
+        approval_manager: ApprovalManager,
+        prefix_cache: Optional[PromptPrefixCache] = None,
+        admission_controller: Optional[LLMAdmissionController] = None,
+        stream_tool_arguments: bool = False,
+        stream_tokens: bool = False
     ):
         """
         Инициализация handler.
@@ -88,6 +107,15 @@ class StreamLLMResponseHandler(IStreamHandler):
             event_publisher: Publisher для событий
             session_service: Сервис управления сессиями
             approval_manager: Unified approval manager
+            prefix_cache: Кэш префиксов промпта. Если задан, системный промпт
+                и инструменты передаются в канонической форме вместе с
+                подсказками кэширования для провайдера.
+            admission_controller: Ограничитель конкурентности запросов к LLM.
+                Запросы агентов идут с приоритетом INTERACTIVE.
+            stream_tool_arguments: Запрашивать ответ LLM стримингом и отдавать
+                chunks tool_call_delta по мере генерации аргументов
+            stream_tokens: Запрашивать ответ LLM стримингом и отдавать текст
+                chunks assistant_message по токенам
         """
         self._llm_client = llm_client
         self._tool_filter = tool_filter
@@ -95,6 +123,10 @@ class StreamLLMResponseHandler(IStreamHandler):
         self._event_publisher = event_publisher
         self._session_service = session_service
         self._approval_manager = approval_manager
+        self._prefix_cache = prefix_cache
+        self._admission_controller = admission_controller
+        self._stream_tool_arguments = stream_tool_arguments
+        self._stream_tokens = stream_tokens
         
         logger.info("StreamLLMResponseHandler initialized with ApprovalManager")
     
@@ -104,8 +136,9 @@ class StreamLLMResponseHandler(IStreamHandler):
         history: List[Dict[str, Any]],
         model: str,
         allowed_tools: Optional[List[str]] = None,
-        correlation_id: Optional[str] = None
-    ) -> AsyncGenerator[StreamChunk, None]:
+        correlation_id: Optional[str] = None,
+        fallback_models: Optional[List[str]] = None
+    ) -> AsyncGenerator[Union[StreamChunk, TokenChunk], None]:
         """
         Обработать запрос на стриминг ответа LLM.
         
@@ -124,9 +157,11 @@ class StreamLLMResponseHandler(IStreamHandler):
             model: Имя модели
             allowed_tools: Список разрешенных инструментов (None = все)
             correlation_id: ID для трассировки (опционально)
+            fallback_models: Резервные модели на случай сбоя или задержки основной
             
         Yields:
-            StreamChunk: Чанки для SSE стриминга
+            StreamChunk: Чанки для SSE стриминга (TokenChunk для токенов
+                и tool_call_delta)
             
         Пример:
             >>> async for chunk in handler.handle(
@@ -139,7 +174,17 @@ class StreamLLMResponseHandler(IStreamHandler):
             ...         print(f"Tool call: {chunk.tool_name}")
             ...     elif chunk.type == "assistant_message":
             ...         print(f"Message: {chunk.content}")
+        
+        Отмена стрима (клиент отключился) прерывает запрос к LLM: уже
+        сгенерированный текст сохраняется сообщением с metadata
+        interrupted=True, публикуется событие LLM_REQUEST_CANCELLED.
+        Частичный текст есть только при стриминге от LLM Proxy
+        (stream_tokens или stream_tool_arguments): non-streaming запрос
+        не возвращает текст до конца генерации.
         """
+        requested_at = time.time()
+        # Текст, полученный от LLM до отмены; None - ответ получен целиком
+        partial: Optional[List[str]] = []
         try:
             logger.debug(
                 f"StreamLLMResponseHandler.handle() called for session {session_id} "
@@ -150,8 +195,21 @@ class StreamLLMResponseHandler(IStreamHandler):
                 f"with {len(history)} messages"
             )
             
-            # 1. Фильтрация инструментов (Domain)
-            tools = self._tool_filter.filter_tools(allowed_tools)
+            # 1. Фильтрация инструментов (Domain, предвычисленный набор)
+            bundle = self._tool_filter.get_bundle(allowed_tools)
+            tools = list(bundle.tools)
+            
+            # Стабильный префикс промпта и подсказки кэширования
+            cache_hints = None
+            if self._prefix_cache and history and history[0].get("role") == "system":
+                prefix = self._prefix_cache.get(
+                    system_prompt=history[0]["content"],
+                    tools_json=bundle.tools_json
+                )
+                cache_hints = {
+                    "prompt_cache_key": prefix.cache_key,
+                    "cache_control": {"type": "ephemeral"}
+                }
             
             # 2. Публикация события начала (Infrastructure)
             await self._event_publisher.publish_request_started(
@@ -164,12 +222,43 @@ class StreamLLMResponseHandler(IStreamHandler):
             
             # 3. Вызов LLM (Infrastructure)
             start_time = time.time()
-            response = await self._llm_client.chat_completion(
-                model=model,
-                messages=history,
-                tools=tools
+            admission = (
+                self._admission_controller.admit(model, RequestPriority.INTERACTIVE)
+                if self._admission_controller else nullcontext()
             )
+            streamed_text = False
+            async with admission:
+                if self._stream_tool_arguments or self._stream_tokens:
+                    # Токены и частичные tool calls уходят клиенту до конца генерации
+                    response = None
+                    async for event in self._llm_client.stream_chat_completion(
+                        model=model,
+                        messages=history,
+                        tools=tools,
+                        cache_hints=cache_hints,
+                        tools_json=bundle.tools_json,
+                        fallback_models=fallback_models
+                    ):
+                        if isinstance(event, LLMResponse):
+                            response = event
+                        elif isinstance(event, str):
+                            partial.append(event)
+                            if self._stream_tokens:
+                                streamed_text = True
+                                yield TokenChunk(type="assistant_message", token=event)
+                        elif self._stream_tool_arguments:
+                            yield self._tool_call_delta_chunk(event)
+                else:
+                    response = await self._llm_client.chat_completion(
+                        model=model,
+                        messages=history,
+                        tools=tools,
+                        cache_hints=cache_hints,
+                        tools_json=bundle.tools_json,
+                        fallback_models=fallback_models
+                    )
             duration_ms = int((time.time() - start_time) * 1000)
+            partial = None
             
             logger.debug(
                 f"LLM response received: content_length={len(response.content)}, "
@@ -187,7 +276,7 @@ class StreamLLMResponseHandler(IStreamHandler):
             
             # 5. Обработка tool calls или обычного сообщения
             if processed.has_tool_calls():
-                chunk = await self._handle_tool_call(
+                chunks = await self._handle_tool_calls(
                     session_id=session_id,
                     processed=processed,
                     duration_ms=duration_ms,
@@ -195,15 +284,45 @@ class StreamLLMResponseHandler(IStreamHandler):
                     correlation_id=correlation_id
                 )
             else:
-                chunk = await self._handle_assistant_message(
+                chunks = [await self._handle_assistant_message(
                     session_id=session_id,
                     processed=processed,
                     duration_ms=duration_ms,
-                    correlation_id=correlation_id
-                )
+                    correlation_id=correlation_id,
+                    streamed_text=streamed_text
+                )]
             
             # 6. Генерация стрима
-            yield chunk
+            for chunk in chunks:
+                yield chunk
+        
+        except (asyncio.CancelledError, GeneratorExit):
+            await self._handle_cancelled(
+                session_id=session_id,
+                model=model,
+                partial=partial,
+                duration_ms=int((time.time() - requested_at) * 1000),
+                correlation_id=correlation_id
+            )
+            raise
+            
+        except (AdmissionRejectedError, CircuitOpenError) as e:
+            logger.warning(f"LLM request for session {session_id} rejected: {e}")
+            
+            await self._event_publisher.publish_request_failed(
+                session_id=session_id,
+                model=model,
+                error=str(e),
+                correlation_id=correlation_id
+            )
+            
+            # Клиент может повторить запрос через retry_after секунд
+            yield StreamChunk(
+                type="error",
+                error=str(e),
+                metadata={"retry_after": e.retry_after, "reason": e.reason},
+                is_final=True
+            )
             
         except Exception as e:
             logger.error(
@@ -226,25 +345,102 @@ class StreamLLMResponseHandler(IStreamHandler):
                 is_final=True
             )
     
-    async def _handle_tool_call(
+    async def _handle_cancelled(
+        self,
+        session_id: str,
+        model: str,
+        partial: Optional[List[str]],
+        duration_ms: int,
+        correlation_id: Optional[str]
+    ) -> None:
+        """
+        Зафиксировать отмену запроса.
+        
+        Сохраняет частичный ответ (сообщение с metadata interrupted=True)
+        в текущей транзакции, ее фиксирует вызывающий код, и публикует
+        событие отмены. Ошибки только логируются: отмена продолжается.
+        
+        Если ответ LLM уже получен, запрос не отменен: потребитель просто
+        перестал читать стрим (агент остановился на tool call), ответ
+        сохранен обычным путем, и событие не публикуется.
+        
+        Args:
+            session_id: ID сессии
+            model: Имя модели
+            partial: Токены, полученные до отмены (None - ответ LLM
+                получен целиком)
+            duration_ms: Время от начала обработки до отмены в мс
+            correlation_id: ID для трассировки
+        """
+        if partial is None:
+            return
+        
+        content = "".join(partial)
+        logger.info(
+            f"LLM request for session {session_id} cancelled after {duration_ms}ms "
+            f"({len(content)} chars generated)"
+        )
+        
+        try:
+            if content:
+                await self._session_service.add_message(
+                    session_id=session_id,
+                    role="assistant",
+                    content=content,
+                    metadata={"interrupted": True}
+                )
+            await self._event_publisher.publish_request_cancelled(
+                session_id=session_id,
+                model=model,
+                duration_ms=duration_ms,
+                partial_length=len(content),
+                correlation_id=correlation_id
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record cancelled LLM request for session {session_id}: {e}")
+    
+    @staticmethod
+    def _tool_call_delta_chunk(delta: ToolCallDelta) -> TokenChunk:
+        """
+        Создать chunk tool_call_delta.
+        
+        Первый delta вызова без аргумента объявляет call_id и tool_name.
+        Части строкового аргумента передаются в token, значения других
+        типов целиком в metadata.value.
+        """
+        metadata: Dict[str, Any] = {"index": delta.index}
+        if delta.argument is not None:
+            metadata["argument"] = delta.argument
+            metadata["complete"] = delta.complete
+            if delta.text is None:
+                metadata["value"] = delta.value
+        return TokenChunk(
+            type="tool_call_delta",
+            call_id=delta.call_id,
+            tool_name=delta.tool_name,
+            token=delta.text,
+            metadata=metadata
+        )
+    
+    async def _handle_tool_calls(
         self,
         session_id: str,
         processed: ProcessedResponse,
         duration_ms: int,
         history: List[Dict[str, Any]],
         correlation_id: Optional[str]
-    ) -> StreamChunk:
+    ) -> List[StreamChunk]:
         """
-        Обработать tool call.
+        Обработать пакет tool calls.
         
         Координация:
         1. Извлечение текущего агента из истории
-        2. Публикация события tool execution requested
-        3. Сохранение pending approval (если требуется)
+        2. Публикация события tool execution requested для каждого вызова
+        3. Сохранение pending approval (для вызовов, требующих одобрения)
         4. Публикация события tool approval required (если требуется)
-        5. Сохранение сообщения в сессию
+        5. Сохранение одного сообщения ассистента со всеми tool_calls
         6. Публикация события завершения LLM запроса
-        7. Создание chunk для стрима
+        7. Создание chunk для каждого tool call
         
         Args:
             session_id: ID сессии
@@ -254,15 +450,16 @@ class StreamLLMResponseHandler(IStreamHandler):
             correlation_id: ID для трассировки
             
         Returns:
-            StreamChunk для tool call
+            Список StreamChunk (по одному на tool call, is_final у последнего)
         """
-        tool_call = processed.get_first_tool_call()
+        tool_calls = processed.tool_calls
         
-        if not tool_call:
+        if not tool_calls:
             raise ValueError("No tool call found in processed response")
         
         logger.info(
-            f"Tool call detected: {tool_call.tool_name} (call_id={tool_call.id})"
+            f"Tool calls detected: "
+            f"{[f'{tc.tool_name} (call_id={tc.id})' for tc in tool_calls]}"
         )
         
         # 1. Извлечение текущего агента из истории
@@ -272,30 +469,37 @@ class StreamLLMResponseHandler(IStreamHandler):
                 current_agent = msg["name"]
                 break
         
-        # 2. Публикация события tool execution requested
-        await self._event_publisher.publish_tool_execution_requested(
-            session_id=session_id,
-            tool_name=tool_call.tool_name,
-            arguments=tool_call.arguments,
-            call_id=tool_call.id,
-            agent=current_agent,
-            correlation_id=correlation_id
-        )
-        
-        # 3. Approval: Сохранение pending approval (если требуется)
-        if processed.requires_approval:
+        for tool_call in tool_calls:
+            # 2. Публикация события tool execution requested
+            await self._event_publisher.publish_tool_execution_requested(
+                session_id=session_id,
+                tool_name=tool_call.tool_name,
+                arguments=tool_call.arguments,
+                call_id=tool_call.id,
+                agent=current_agent,
+                correlation_id=correlation_id
+            )
+            
+            if not processed.tool_requires_approval(tool_call.id):
+                continue
+            
+            reason = processed.approval_reasons.get(
+                tool_call.id, processed.approval_reason
+            )
+            
+            # 3. Approval: Сохранение pending approval
             await self._approval_manager.add_pending(
                 request_id=tool_call.id,
                 request_type="tool",
                 subject=tool_call.tool_name,
                 session_id=session_id,
                 details={"arguments": tool_call.arguments},
-                reason=processed.approval_reason
+                reason=reason
             )
             
             logger.info(
                 f"Added pending approval for request_id={tool_call.id}, "
-                f"tool={tool_call.tool_name}, reason={processed.approval_reason}"
+                f"tool={tool_call.tool_name}, reason={reason}"
             )
             
             # 4. Публикация события tool approval required
@@ -304,7 +508,7 @@ class StreamLLMResponseHandler(IStreamHandler):
                 tool_name=tool_call.tool_name,
                 arguments=tool_call.arguments,
                 call_id=tool_call.id,
-                reason=processed.approval_reason or "Unknown",
+                reason=reason or "Unknown",
                 correlation_id=correlation_id
             )
         
@@ -313,11 +517,11 @@ class StreamLLMResponseHandler(IStreamHandler):
             session_id=session_id,
             role="assistant",
             content="",
-            tool_calls=[tool_call.to_dict()]
+            tool_calls=[tc.to_dict() for tc in tool_calls]
         )
         
         logger.debug(
-            f"Assistant message with tool_call persisted: {tool_call.tool_name}"
+            f"Assistant message with {len(tool_calls)} tool_call(s) persisted"
         )
         
         # 6. Публикация события завершения LLM запроса
@@ -330,22 +534,36 @@ class StreamLLMResponseHandler(IStreamHandler):
             correlation_id=correlation_id
         )
         
-        # 7. Создание chunk для стрима
-        return StreamChunk(
-            type="tool_call",
-            call_id=tool_call.id,
-            tool_name=tool_call.tool_name,
-            arguments=tool_call.arguments,
-            requires_approval=processed.requires_approval,
-            is_final=True
-        )
+        # 7. Создание chunks для стрима
+        batch_call_ids = [tc.id for tc in tool_calls]
+        chunks = []
+        for index, tool_call in enumerate(tool_calls):
+            metadata = None
+            if len(tool_calls) > 1:
+                metadata = {
+                    "batch_size": len(tool_calls),
+                    "batch_index": index,
+                    "batch_call_ids": batch_call_ids
+                }
+            chunks.append(StreamChunk(
+                type="tool_call",
+                call_id=tool_call.id,
+                tool_name=tool_call.tool_name,
+                arguments=tool_call.arguments,
+                requires_approval=processed.tool_requires_approval(tool_call.id),
+                is_final=index == len(tool_calls) - 1,
+                metadata=metadata
+            ))
+        
+        return chunks
     
     async def _handle_assistant_message(
         self,
         session_id: str,
         processed: ProcessedResponse,
         duration_ms: int,
-        correlation_id: Optional[str]
+        correlation_id: Optional[str],
+        streamed_text: bool = False
     ) -> StreamChunk:
         """
         Обработать обычное сообщение ассистента.
@@ -360,6 +578,8 @@ class StreamLLMResponseHandler(IStreamHandler):
             processed: Обработанный ответ LLM
             duration_ms: Длительность запроса в мс
             correlation_id: ID для трассировки
+            streamed_text: Текст уже отдан токенами, финальный chunk
+                не повторяет его в token
             
         Returns:
             StreamChunk для assistant message
@@ -389,6 +609,6 @@ class StreamLLMResponseHandler(IStreamHandler):
         return StreamChunk(
             type="assistant_message",
             content=processed.content,
-            token=processed.content,
+            token="" if streamed_text else processed.content,
             is_final=True
         )
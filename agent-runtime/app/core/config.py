@@ -3,8 +3,10 @@ Application configuration for agent runtime service.
 
 Loads configuration from environment variables with sensible defaults.
 """
+import json
 import logging
 import os
+from typing import Dict, List
 
 from dotenv import load_dotenv
 
@@ -41,6 +43,18 @@ class AppConfig:
         "sqlite:///data/agent_runtime.db"
     )
     
+    # Хранилище больших результатов инструментов (вне строк БД)
+    BLOB_STORE_DIR: str = os.getenv(
+        "AGENT_RUNTIME__BLOB_STORE_DIR",
+        "data/blobs"
+    )
+    
+    # Результаты инструментов длиннее порога (символы) выносятся в blob store
+    TOOL_RESULT_OFFLOAD_THRESHOLD: int = int(os.getenv(
+        "AGENT_RUNTIME__TOOL_RESULT_OFFLOAD_THRESHOLD",
+        "16384"
+    ))
+    
     # Security
     INTERNAL_API_KEY: str = os.getenv(
         "AGENT_RUNTIME__INTERNAL_API_KEY",
@@ -59,6 +73,143 @@ class AppConfig:
         "true"
     ).lower() in ("true", "1", "yes")
     
+    # Tool call batching: все tool calls одного ответа LLM передаются IDE пакетом
+    PARALLEL_TOOL_CALLS: bool = os.getenv(
+        "AGENT_RUNTIME__PARALLEL_TOOL_CALLS",
+        "true"
+    ).lower() in ("true", "1", "yes")
+    
+    # Доля результатов пакета, после которой агент продолжает работу (0 < q <= 1)
+    TOOL_BATCH_QUORUM: float = float(os.getenv(
+        "AGENT_RUNTIME__TOOL_BATCH_QUORUM",
+        "1.0"
+    ))
+    
+    # Бюджет контекстного окна LLM
+    CONTEXT_BUDGET_ENABLED: bool = os.getenv(
+        "AGENT_RUNTIME__CONTEXT_BUDGET_ENABLED",
+        "true"
+    ).lower() in ("true", "1", "yes")
+    
+    # Размер окна для моделей, отсутствующих в /v1/llm/models
+    DEFAULT_CONTEXT_LENGTH: int = int(os.getenv(
+        "AGENT_RUNTIME__DEFAULT_CONTEXT_LENGTH",
+        "8192"
+    ))
+    
+    # Токены, резервируемые под ответ модели
+    CONTEXT_COMPLETION_RESERVE: int = int(os.getenv(
+        "AGENT_RUNTIME__CONTEXT_COMPLETION_RESERVE",
+        "1024"
+    ))
+    
+    # Порог усечения старых результатов инструментов (токены)
+    CONTEXT_TOOL_RESULT_MAX_TOKENS: int = int(os.getenv(
+        "AGENT_RUNTIME__CONTEXT_TOOL_RESULT_MAX_TOKENS",
+        "512"
+    ))
+    
+    # Канонический префикс промпта и подсказки кэширования для провайдера
+    PROMPT_CACHE_HINTS: bool = os.getenv(
+        "AGENT_RUNTIME__PROMPT_CACHE_HINTS",
+        "true"
+    ).lower() in ("true", "1", "yes")
+    
+    # Admission control исходящих LLM запросов (AIMD лимит на модель)
+    LLM_CONCURRENCY_INITIAL_LIMIT: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_CONCURRENCY_INITIAL_LIMIT",
+        "8"
+    ))
+    LLM_CONCURRENCY_MIN_LIMIT: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_CONCURRENCY_MIN_LIMIT",
+        "1"
+    ))
+    LLM_CONCURRENCY_MAX_LIMIT: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_CONCURRENCY_MAX_LIMIT",
+        "64"
+    ))
+    LLM_LATENCY_TARGET_MS: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_LATENCY_TARGET_MS",
+        "60000"
+    ))
+    LLM_QUEUE_MAX_SIZE: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_QUEUE_MAX_SIZE",
+        "100"
+    ))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv(
+        "AGENT_RUNTIME__LLM_QUEUE_TIMEOUT",
+        "30"
+    ))
+    
+    # Доля повторов LLM запросов от числа запросов (retry budget)
+    LLM_RETRY_BUDGET_RATIO: float = float(os.getenv(
+        "AGENT_RUNTIME__LLM_RETRY_BUDGET_RATIO",
+        "0.2"
+    ))
+    
+    # Circuit breaker на пару (upstream, модель): доля ошибок в скользящем окне
+    LLM_CIRCUIT_WINDOW_SIZE: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_CIRCUIT_WINDOW_SIZE",
+        "20"
+    ))
+    LLM_CIRCUIT_MINIMUM_CALLS: int = int(os.getenv(
+        "AGENT_RUNTIME__LLM_CIRCUIT_MINIMUM_CALLS",
+        "10"
+    ))
+    LLM_CIRCUIT_FAILURE_RATE: float = float(os.getenv(
+        "AGENT_RUNTIME__LLM_CIRCUIT_FAILURE_RATE",
+        "0.5"
+    ))
+    LLM_CIRCUIT_RECOVERY_TIMEOUT: float = float(os.getenv(
+        "AGENT_RUNTIME__LLM_CIRCUIT_RECOVERY_TIMEOUT",
+        "30"
+    ))
+    
+    # Цепочки моделей по типу агента: основная модель, затем резервные
+    # (JSON, например {"coder": ["gpt-4o", "gpt-4o-mini"]})
+    LLM_FALLBACK_CHAINS: Dict[str, List[str]] = json.loads(os.getenv(
+        "AGENT_RUNTIME__LLM_FALLBACK_CHAINS",
+        "{}"
+    ))
+    
+    # Стриминг ответа LLM с инкрементальным разбором аргументов tool calls:
+    # IDE получает chunks tool_call_delta до завершения генерации
+    LLM_STREAM_TOOL_ARGUMENTS: bool = os.getenv(
+        "AGENT_RUNTIME__LLM_STREAM_TOOL_ARGUMENTS",
+        "false"
+    ).lower() == "true"
+    
+    # Стриминг текста ответа LLM: IDE получает chunks assistant_message
+    # по токенам, финальный chunk несет полный content
+    LLM_STREAM_TOKENS: bool = os.getenv(
+        "AGENT_RUNTIME__LLM_STREAM_TOKENS",
+        "false"
+    ).lower() == "true"
+    
+    # Объединение токенов стрима в один кадр SSE: токены, пришедшие в
+    # пределах окна, склеиваются (0 - каждый токен отдельным кадром).
+    # Клиент может задать свою политику заголовком X-Stream-Coalesce
+    STREAM_COALESCE_WINDOW_MS: float = float(os.getenv(
+        "AGENT_RUNTIME__STREAM_COALESCE_WINDOW_MS",
+        "0"
+    ))
+    # Кадр отправляется досрочно, когда текст токенов достигает размера (байт)
+    STREAM_COALESCE_MAX_BYTES: int = int(os.getenv(
+        "AGENT_RUNTIME__STREAM_COALESCE_MAX_BYTES",
+        "1024"
+    ))
+    
+    # Постоянный канал gateway (WebSocket /agent/channel): максимум
+    # одновременных стримов на соединение и сессий с кэшированными сервисами
+    CHANNEL_MAX_STREAMS: int = int(os.getenv(
+        "AGENT_RUNTIME__CHANNEL_MAX_STREAMS",
+        "100"
+    ))
+    CHANNEL_MAX_SESSIONS: int = int(os.getenv(
+        "AGENT_RUNTIME__CHANNEL_MAX_SESSIONS",
+        "1000"
+    ))
+    
     # Event-Driven Architecture (Phase 4 - fully migrated)
     # Context updates are always event-driven
     # Persistence is always event-driven
@@ -14,12 +14,16 @@ from typing import Annotated, AsyncGenerator, Optional
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import AppConfig
 from app.services.database import get_db, get_database_service, DatabaseService
 from app.infrastructure.persistence.repositories import (
     SessionRepositoryImpl,
     AgentContextRepositoryImpl
 )
 from app.infrastructure.adapters import EventPublisherAdapter
+from app.infrastructure.storage import FilesystemBlobStore
+from app.infrastructure.concurrency import llm_admission_controller
+from app.infrastructure.streaming import ChannelSessions, SessionChangeNotifier
 from app.domain.services import (
     SessionManagementService,
     AgentOrchestrationService
@@ -108,6 +112,62 @@ def get_event_publisher() -> EventPublisherAdapter:
     return _event_publisher_adapter
 
 
+# ==================== Storage Dependencies ====================
+
+# Singleton instance of blob store
+_blob_store: Optional[FilesystemBlobStore] = None
+
+
+def get_blob_store() -> FilesystemBlobStore:
+    """
+    Получить хранилище больших результатов инструментов (singleton).
+    
+    Returns:
+        FilesystemBlobStore: Content-addressed хранилище
+    """
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = FilesystemBlobStore(AppConfig.BLOB_STORE_DIR)
+    return _blob_store
+
+
+# ==================== Gateway Notification Dependencies ====================
+
+# Singleton instance of session change notifier
+_session_change_notifier: Optional[SessionChangeNotifier] = None
+
+
+def get_session_change_notifier() -> SessionChangeNotifier:
+    """
+    Получить рассылку уведомлений gateway об изменении сессий (singleton).
+    
+    Returns:
+        SessionChangeNotifier: Уведомления каналам gateway
+    """
+    global _session_change_notifier
+    if _session_change_notifier is None:
+        _session_change_notifier = SessionChangeNotifier()
+    return _session_change_notifier
+
+
+async def notify_session_changed(
+    session_id: str,
+    notifier: SessionChangeNotifier = Depends(get_session_change_notifier)
+) -> AsyncGenerator[None, None]:
+    """
+    Уведомить gateway об изменении сессии после успешного запроса.
+    
+    Объявляется в endpoint раньше зависимостей с сессией БД: код после
+    yield выполняется после commit в get_db (и после отправки стрима).
+    
+    Args:
+        session_id: ID сессии (параметр пути)
+        notifier: Рассылка уведомлений (инжектируется)
+    """
+    yield
+    await notifier.notify(session_id)
+
+
 # ==================== HITL Dependencies ====================
 
 async def get_hitl_policy_service():
@@ -184,7 +244,9 @@ async def get_session_management_service(
     """
     return SessionManagementService(
         repository=repository,
-        event_publisher=event_publisher.publish
+        event_publisher=event_publisher.publish,
+        blob_store=get_blob_store(),
+        tool_result_offload_threshold=AppConfig.TOOL_RESULT_OFFLOAD_THRESHOLD
     )
 
 
@@ -259,7 +321,8 @@ async def get_message_processor(
         get_llm_event_publisher,
         get_tool_registry,
         get_tool_filter_service,
-        get_llm_response_processor
+        get_llm_response_processor,
+        get_prompt_prefix_cache
     )
     from ..application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
     
@@ -270,7 +333,11 @@ async def get_message_processor(
         response_processor=get_llm_response_processor(),
         event_publisher=get_llm_event_publisher(),
         session_service=session_service,
-        approval_manager=approval_manager
+        approval_manager=approval_manager,
+        prefix_cache=get_prompt_prefix_cache(),
+        admission_controller=llm_admission_controller,
+        stream_tool_arguments=AppConfig.LLM_STREAM_TOOL_ARGUMENTS,
+        stream_tokens=AppConfig.LLM_STREAM_TOKENS
     )
     
     return MessageProcessor(
@@ -333,7 +400,8 @@ async def get_tool_result_handler(
         get_llm_event_publisher,
         get_tool_registry,
         get_tool_filter_service,
-        get_llm_response_processor
+        get_llm_response_processor,
+        get_prompt_prefix_cache
     )
     from ..application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
     
@@ -344,7 +412,11 @@ async def get_tool_result_handler(
         response_processor=get_llm_response_processor(),
         event_publisher=get_llm_event_publisher(),
         session_service=session_service,
-        approval_manager=approval_manager
+        approval_manager=approval_manager,
+        prefix_cache=get_prompt_prefix_cache(),
+        admission_controller=llm_admission_controller,
+        stream_tool_arguments=AppConfig.LLM_STREAM_TOOL_ARGUMENTS,
+        stream_tokens=AppConfig.LLM_STREAM_TOKENS
     )
     
     return ToolResultHandler(
@@ -353,7 +425,9 @@ async def get_tool_result_handler(
         agent_router=agent_router,
         stream_handler=stream_handler,
         switch_helper=switch_helper,
-        approval_manager=approval_manager  # Передаем approval_manager для удаления pending approvals
+        # Передаем approval_manager для удаления pending approvals
+        approval_manager=approval_manager,
+        batch_quorum=AppConfig.TOOL_BATCH_QUORUM
     )
 
 
@@ -445,6 +519,69 @@ async def get_message_orchestration_service(
     )
 
 
+async def build_message_orchestration_service(db: AsyncSession):
+    """
+    Собрать сервис оркестрации сообщений на заданной сессии БД.
+    
+    Тот же граф, что строит FastAPI для get_message_orchestration_service
+    (каждая зависимость создается один раз), но без разрешения Depends
+    на каждый запрос. Используется постоянным каналом gateway, который
+    кэширует граф на сессию (см. channel_router).
+    
+    Args:
+        db: Сессия БД
+    
+    Returns:
+        MessageOrchestrationService: Доменный сервис (фасад)
+    """
+    event_publisher = get_event_publisher()
+    session_service = await get_session_management_service(
+        await get_session_repository(db), event_publisher
+    )
+    agent_service = await get_agent_orchestration_service(
+        await get_agent_context_repository(db), event_publisher
+    )
+    approval_manager = await get_approval_manager(
+        await get_approval_repository(db), await get_hitl_policy_service()
+    )
+    switch_helper = await get_agent_switch_helper(session_service, agent_service)
+    message_processor = await get_message_processor(
+        session_service, agent_service, switch_helper, approval_manager
+    )
+    
+    return await get_message_orchestration_service(
+        message_processor=message_processor,
+        agent_switcher=await get_agent_switcher(agent_service, switch_helper),
+        tool_result_handler=await get_tool_result_handler(
+            session_service, agent_service, switch_helper, approval_manager
+        ),
+        hitl_handler=await get_hitl_decision_handler(
+            approval_manager, session_service, message_processor
+        )
+    )
+
+
+def get_channel_sessions() -> ChannelSessions:
+    """
+    Получить кэш сервисов сессий для соединения постоянного канала.
+    
+    Создается на каждое соединение gateway, сессии БД закрываются
+    при его закрытии.
+    
+    Returns:
+        ChannelSessions: Кэш сервисов сессий
+    """
+    from app.infrastructure.persistence import database
+    
+    if database.async_session_maker is None:
+        raise RuntimeError("Database not initialized. Call init_database() first.")
+    return ChannelSessions(
+        session_factory=database.async_session_maker,
+        build_service=build_message_orchestration_service,
+        max_sessions=AppConfig.CHANNEL_MAX_SESSIONS
+    )
+
+
 # ==================== Command Handler Dependencies ====================
 
 async def get_create_session_handler(
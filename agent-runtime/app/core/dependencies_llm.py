@@ -14,10 +14,13 @@ from ..infrastructure.events.llm_event_publisher import LLMEventPublisher
 from ..domain.services.llm_response_processor import LLMResponseProcessor
 from ..domain.services.tool_filter_service import ToolFilterService
 from ..domain.services.tool_registry import ToolRegistry
+from ..domain.services.context_budget import ContextBudgeter
+from ..domain.services.prompt_prefix import PromptPrefixCache
 from ..domain.services.hitl_policy import hitl_policy_service
 from ..domain.services.session_management import SessionManagementService
 from ..application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
-from .dependencies import get_session_management_service
+from .config import AppConfig
+from .dependencies import get_session_management_service, get_blob_store
 
 logger = logging.getLogger("agent-runtime.dependencies_llm")
 
@@ -48,10 +51,12 @@ async def cleanup_llm_client():
     
     Должен вызываться при shutdown приложения.
     """
-    global _llm_client
+    global _llm_client, _context_budgeter
     if _llm_client is not None:
         await _llm_client.close()
         _llm_client = None
+        # Budgeter ссылается на закрытый клиент
+        _context_budgeter = None
         logger.info("LLM client closed and resources released")
 
 
@@ -87,11 +92,17 @@ def get_tool_registry() -> ToolRegistry:
     return tool_registry
 
 
+# Singleton instance of tool filter service
+_tool_filter_service: ToolFilterService | None = None
+
+
 def get_tool_filter_service(
     tool_registry: ToolRegistry = Depends(get_tool_registry)
 ) -> ToolFilterService:
     """
-    Получить сервис фильтрации инструментов.
+    Получить сервис фильтрации инструментов (singleton).
+    
+    Singleton хранит предвычисленные наборы инструментов агентов.
     
     Args:
         tool_registry: Реестр инструментов (инжектируется)
@@ -99,7 +110,11 @@ def get_tool_filter_service(
     Returns:
         ToolFilterService: Сервис фильтрации
     """
-    return ToolFilterService(tool_registry=tool_registry)
+    global _tool_filter_service
+    if _tool_filter_service is None:
+        _tool_filter_service = ToolFilterService(tool_registry=tool_registry)
+        logger.info("Tool filter service initialized")
+    return _tool_filter_service
 
 
 def get_llm_response_processor() -> LLMResponseProcessor:
@@ -109,7 +124,58 @@ def get_llm_response_processor() -> LLMResponseProcessor:
     Returns:
         LLMResponseProcessor: Процессор для обработки ответов
     """
-    return LLMResponseProcessor(hitl_policy=hitl_policy_service)
+    return LLMResponseProcessor(
+        hitl_policy=hitl_policy_service,
+        allow_parallel_tool_calls=AppConfig.PARALLEL_TOOL_CALLS
+    )
+
+
+# Singleton instance of context budgeter
+_context_budgeter: ContextBudgeter | None = None
+
+
+def get_context_budgeter() -> ContextBudgeter:
+    """
+    Получить сервис бюджетирования контекстного окна (singleton).
+    
+    Singleton нужен для кэширования размеров описаний инструментов.
+    Размер окна модели берется из LLM Proxy (/v1/llm/models).
+    
+    Returns:
+        ContextBudgeter: Сервис бюджетирования контекста
+    """
+    global _context_budgeter
+    if _context_budgeter is None:
+        _context_budgeter = ContextBudgeter(
+            tool_filter=get_tool_filter_service(get_tool_registry()),
+            context_length_provider=get_llm_client().get_model_context_length,
+            default_context_length=AppConfig.DEFAULT_CONTEXT_LENGTH,
+            completion_reserve=AppConfig.CONTEXT_COMPLETION_RESERVE,
+            tool_result_max_tokens=AppConfig.CONTEXT_TOOL_RESULT_MAX_TOKENS,
+            blob_store=get_blob_store()
+        )
+        logger.info("Context budgeter initialized")
+    return _context_budgeter
+
+
+# Singleton instance of prompt prefix cache
+_prompt_prefix_cache: PromptPrefixCache | None = None
+
+
+def get_prompt_prefix_cache() -> PromptPrefixCache | None:
+    """
+    Получить кэш стабильных префиксов промпта (singleton).
+    
+    Returns:
+        PromptPrefixCache или None, если подсказки кэширования отключены
+    """
+    global _prompt_prefix_cache
+    if not AppConfig.PROMPT_CACHE_HINTS:
+        return None
+    if _prompt_prefix_cache is None:
+        _prompt_prefix_cache = PromptPrefixCache()
+        logger.info("Prompt prefix cache initialized")
+    return _prompt_prefix_cache
 
 
 # ==================== Annotated Types ====================
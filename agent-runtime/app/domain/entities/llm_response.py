@@ -18,6 +18,7 @@ class TokenUsage(BaseModel):
         prompt_tokens: Количество токенов в промпте
         completion_tokens: Количество токенов в ответе
         total_tokens: Общее количество токенов
+        cached_prompt_tokens: Токены промпта, прочитанные из кэша провайдера
     """
     
     prompt_tokens: int = Field(
@@ -38,6 +39,12 @@ class TokenUsage(BaseModel):
         description="Общее количество токенов"
     )
     
+    cached_prompt_tokens: int = Field(
+        default=0,
+        ge=0,
+        description="Количество токенов промпта, прочитанных из кэша провайдера"
+    )
+    
     @model_validator(mode='after')
     def validate_total_tokens(self):
         """Валидация: total должен быть суммой prompt и completion"""
@@ -198,6 +205,7 @@ class ProcessedResponse(BaseModel):
         model: Имя модели
         requires_approval: Требуется ли одобрение пользователя
         approval_reason: Причина необходимости одобрения
+        approval_reasons: Причины одобрения по call_id (для пакета tool calls)
         validation_warnings: Предупреждения валидации
     
     Пример:
@@ -241,6 +249,11 @@ class ProcessedResponse(BaseModel):
         description="Причина необходимости одобрения"
     )
     
+    approval_reasons: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Причины одобрения для tool calls, требующих HITL (call_id -> reason)"
+    )
+    
     validation_warnings: List[str] = Field(
         default_factory=list,
         description="Предупреждения валидации"
@@ -258,6 +271,25 @@ class ProcessedResponse(BaseModel):
         """Получить первый tool call"""
         return self.tool_calls[0] if self.tool_calls else None
     
+    def is_tool_call_batch(self) -> bool:
+        """Проверить, содержит ли ответ пакет из нескольких tool calls"""
+        return len(self.tool_calls) > 1
+    
+    def tool_requires_approval(self, call_id: str) -> bool:
+        """
+        Проверить, требует ли конкретный tool call одобрения.
+        
+        Args:
+            call_id: ID вызова инструмента
+            
+        Returns:
+            True если вызов требует одобрения пользователя
+        """
+        if self.approval_reasons:
+            return call_id in self.approval_reasons
+        # Ответ с одним tool call без детализации по call_id
+        return self.requires_approval and len(self.tool_calls) == 1
+    
     def __repr__(self) -> str:
         return (
             f"<ProcessedResponse(model='{self.model}', "
@@ -4,7 +4,7 @@
 Представляет сообщение в диалоге между пользователем и AI агентом.
 """
 
-from typing import Optional, Dict, Any, Literal
+from typing import Optional, Dict, Any, Literal, ClassVar
 from datetime import datetime, timezone
 from pydantic import Field, field_validator
 
@@ -25,6 +25,7 @@ class Message(Entity):
         tool_call_id: ID вызова инструмента (для tool сообщений)
         tool_calls: Список вызовов инструментов (для assistant сообщений)
         metadata: Дополнительные метаданные
+        token_count: Количество токенов (кэш оценки для бюджета контекста)
     
     Пример:
         >>> # Сообщение пользователя
@@ -47,6 +48,9 @@ class Message(Entity):
         ... )
     """
     
+    # Ключ metadata со ссылкой на содержимое в blob store
+    BLOB_REF_KEY: ClassVar[str] = "blob_ref"
+    
     role: Literal["user", "assistant", "system", "tool"] = Field(
         ...,
         description="Роль отправителя сообщения"
@@ -77,6 +81,11 @@ class Message(Entity):
         description="Дополнительные метаданные сообщения"
     )
     
+    token_count: Optional[int] = Field(
+        default=None,
+        description="Количество токенов сообщения (кэш оценки для бюджета контекста)"
+    )
+    
     @field_validator('content')
     @classmethod
     def validate_content(cls, v: str, info) -> str:
@@ -151,6 +160,18 @@ class Message(Entity):
         """
         return bool(self.tool_calls)
     
+    def get_blob_ref(self) -> Optional[Dict[str, Any]]:
+        """
+        Получить ссылку на полное содержимое, вынесенное в blob store.
+        
+        Большие результаты инструментов хранятся вне сообщения,
+        а в content остается превью.
+        
+        Returns:
+            Словарь {"key", "size", "tokens"} или None
+        """
+        return self.metadata.get(self.BLOB_REF_KEY)
+    
     def get_content_length(self) -> int:
         """
         Получить длину содержимого сообщения.
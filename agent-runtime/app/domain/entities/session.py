@@ -6,7 +6,7 @@
 """
 
 import uuid
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 from datetime import datetime, timezone
 from pydantic import Field, field_validator
 
@@ -210,6 +210,60 @@ class Session(Entity):
         
         return [msg.to_llm_format() for msg in messages]
     
+    def get_tool_call_batch(self, call_id: str) -> List[str]:
+        """
+        Получить ID всех tool calls из того же ответа ассистента.
+    
+        LLM может запросить несколько инструментов в одном ответе,
+        такие вызовы образуют пакет и сохраняются одним сообщением.
+    
+        Args:
+            call_id: ID любого вызова из пакета
+    
+        Returns:
+            Список ID вызовов пакета (пустой, если вызов не найден)
+    
+        Пример:
+            >>> session.get_tool_call_batch("call-1")
+            ['call-1', 'call-2']
+        """
+        for message in reversed(self.messages):
+            if message.role != "assistant" or not message.tool_calls:
+                continue
+            batch = [tc.get("id") for tc in message.tool_calls]
+            if call_id in batch:
+                return batch
+        return []
+    
+    def get_answered_tool_call_ids(self) -> Set[str]:
+        """
+        Получить ID tool calls, для которых уже есть результат.
+    
+        Returns:
+            Множество tool_call_id из сообщений с ролью tool
+        """
+        return {
+            message.tool_call_id
+            for message in self.messages
+            if message.role == "tool" and message.tool_call_id
+        }
+    
+    def get_pending_batch_calls(self, call_id: str) -> List[str]:
+        """
+        Получить ID вызовов пакета call_id, для которых еще нет результата.
+        
+        LLM продолжает работу, только когда пакет закрыт: в историю
+        передается ответ на каждый tool_call из сообщения ассистента.
+        
+        Args:
+            call_id: ID любого вызова из пакета
+        
+        Returns:
+            Список ID вызовов без результата (пустой, если пакет закрыт)
+        """
+        answered = self.get_answered_tool_call_ids()
+        return [cid for cid in self.get_tool_call_batch(call_id) if cid not in answered]
+    
     def deactivate(self, reason: Optional[str] = None) -> None:
         """
         Деактивировать сессию.
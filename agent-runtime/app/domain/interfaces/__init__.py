@@ -6,5 +6,6 @@
 """
 
 from app.domain.interfaces.stream_handler import IStreamHandler
+from app.domain.interfaces.blob_store import IBlobStore
 
-__all__ = ["IStreamHandler"]
+__all__ = ["IStreamHandler", "IBlobStore"]
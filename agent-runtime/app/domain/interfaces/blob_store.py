@@ -0,0 +1,62 @@
+"""
+Интерфейс хранилища больших бинарных объектов (blob store).
+
+Используется для хранения больших результатов инструментов вне сообщений сессии.
+Domain слой зависит только от интерфейса, а не от конкретной реализации.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class IBlobStore(ABC):
+    """
+    Интерфейс content-addressed хранилища.
+    
+    Ключ объекта - SHA-256 хэш его содержимого, поэтому одинаковые
+    данные хранятся один раз, а повторная запись идемпотентна.
+    
+    Пример использования:
+        >>> store: IBlobStore = get_blob_store()
+        >>> key = await store.put(b"large tool output")
+        >>> data = await store.get(key)
+    """
+    
+    @abstractmethod
+    async def put(self, data: bytes) -> str:
+        """
+        Сохранить объект.
+        
+        Args:
+            data: Содержимое объекта
+            
+        Returns:
+            Ключ объекта (SHA-256 хэш содержимого в hex)
+        """
+        pass
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Получить объект по ключу.
+        
+        Args:
+            key: Ключ объекта
+            
+        Returns:
+            Содержимое объекта или None, если объект не найден
+        """
+        pass
+    
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """
+        Удалить объект.
+        
+        Args:
+            key: Ключ объекта
+            
+        Returns:
+            True если объект был удален
+        """
+        pass
@@ -6,9 +6,9 @@ Domain слой зависит только от интерфейса, а не 
 """
 
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, List, Dict, Any, Optional
+from typing import AsyncGenerator, List, Dict, Any, Optional, Union
 
-from ...models.schemas import StreamChunk
+from ...models.schemas import StreamChunk, TokenChunk
 
 
 class IStreamHandler(ABC):
@@ -43,8 +43,9 @@ class IStreamHandler(ABC):
         history: List[Dict[str, Any]],
         model: str,
         allowed_tools: Optional[List[str]] = None,
-        correlation_id: Optional[str] = None
-    ) -> AsyncGenerator[StreamChunk, None]:
+        correlation_id: Optional[str] = None,
+        fallback_models: Optional[List[str]] = None
+    ) -> AsyncGenerator[Union[StreamChunk, TokenChunk], None]:
         """
         Обработать запрос на стриминг ответа от LLM.
         
@@ -63,6 +64,7 @@ class IStreamHandler(ABC):
             model: Имя модели LLM для использования
             allowed_tools: Список разрешенных инструментов (None = все разрешены)
             correlation_id: Идентификатор для трассировки запроса (опционально)
+            fallback_models: Резервные модели на случай сбоя или задержки основной
             
         Yields:
             StreamChunk: Чанки данных для SSE стриминга к клиенту
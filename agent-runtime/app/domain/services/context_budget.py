@@ -0,0 +1,386 @@
+"""
+Доменный сервис бюджетирования контекстного окна LLM.
+
+Ограничивает историю, отправляемую в LLM, контекстным окном модели:
+- Подсчет токенов сообщений (приближенный, без внешних токенизаторов)
+- Сохранение системного промпта и последних сообщений в пределах бюджета
+- Усечение старых результатов инструментов
+- Замена вытесненных сообщений кратким сводным описанием
+"""
+
+import json
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..entities.message import Message
+from ..entities.session import Session
+from ..interfaces.blob_store import IBlobStore
+from .tool_filter_service import ToolFilterService
+
+logger = logging.getLogger("agent-runtime.domain.context_budget")
+
+# Служебные токены на каждое сообщение (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Приближенно подсчитать количество токенов в тексте.
+    
+    Эвристика в духе BPE токенизаторов: знак пунктуации - отдельный токен,
+    слово латиницей - примерно 4 символа на токен, слово в другой
+    письменности (кириллица и т.д.) - примерно 2 символа на токен.
+    
+    Args:
+        text: Текст для подсчета
+    
+    Returns:
+        Оценка количества токенов
+    
+    Пример:
+        >>> estimate_tokens("Hello, world!")
+        6
+    """
+    if not text:
+        return 0
+    
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if len(piece) == 1:
+            tokens += 1
+        elif piece.isascii():
+            tokens += math.ceil(len(piece) / 4)
+        else:
+            tokens += math.ceil(len(piece) / 2)
+    return tokens
+
+
+def estimate_llm_message_tokens(message: Dict[str, Any]) -> int:
+    """
+    Подсчитать токены сообщения в формате LLM API.
+    
+    Args:
+        message: Сообщение в формате OpenAI
+    
+    Returns:
+        Оценка количества токенов с учетом служебных
+    """
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content"))
+    if message.get("name"):
+        tokens += estimate_tokens(message["name"])
+    if message.get("tool_calls"):
+        tokens += estimate_tokens(json.dumps(message["tool_calls"], ensure_ascii=False))
+    return tokens
+
+
+@lru_cache(maxsize=64)
+def _estimate_prompt_tokens(prompt: str) -> int:
+    """Подсчет токенов системного промпта (промптов мало, результат кэшируется)"""
+    return estimate_tokens(prompt)
+
+
+class ContextBudgeter:
+    """
+    Доменный сервис бюджетирования контекстного окна.
+    
+    Формирует историю для LLM так, чтобы системный промпт, описания
+    инструментов и история помещались в контекстное окно модели:
+    1. Результаты инструментов вне последних сообщений усекаются
+    2. Последние сообщения сохраняются целиком, пока хватает бюджета
+    3. Вытесненные сообщения заменяются сводкой в системном промпте
+    4. Результаты инструментов текущего хода, вынесенные в blob store,
+       подставляются целиком, если помещаются в бюджет (иначе - превью)
+    
+    Количество токенов сообщения считается один раз и сохраняется
+    в Message.token_count (и далее в БД вместе с сообщением).
+    
+    Атрибуты:
+        _tool_filter: Сервис фильтрации инструментов (для учета их размера)
+        _context_length_provider: Источник размера контекстного окна модели
+        _default_context_length: Размер окна, если модель неизвестна
+        _completion_reserve: Токены, резервируемые под ответ модели
+        _tool_result_max_tokens: Максимальный размер старого tool result
+        _summary_max_tokens: Максимальный размер сводки вытесненных сообщений
+        _blob_store: Хранилище вынесенных результатов инструментов (опционально)
+    
+    Пример:
+        >>> budgeter = ContextBudgeter(tool_filter, context_length_provider)
+        >>> history = await budgeter.build_history(
+        ...     session=session,
+        ...     system_prompt="You are a coder",
+        ...     model="gpt-4",
+        ...     allowed_tools=["read_file"]
+        ... )
+    """
+    
+    TRUNCATION_MARKER = "\n...[truncated {omitted} tokens of tool output]"
+    SUMMARY_HEADER = "## Summary of earlier conversation ({count} messages omitted)"
+    
+    def __init__(
+        self,
+        tool_filter: ToolFilterService,
+        context_length_provider: Optional[Callable[[str], Awaitable[Optional[int]]]] = None,
+        default_context_length: int = 8192,
+        completion_reserve: int = 1024,
+        tool_result_max_tokens: int = 512,
+        summary_max_tokens: int = 512,
+        blob_store: Optional[IBlobStore] = None
+    ):
+        """
+        Инициализация сервиса.
+        
+        Args:
+            tool_filter: Сервис фильтрации инструментов
+            context_length_provider: Async функция model -> context_length (или None)
+            default_context_length: Размер окна для неизвестных моделей
+            completion_reserve: Токены, резервируемые под ответ модели
+            tool_result_max_tokens: Порог усечения старых результатов инструментов
+            summary_max_tokens: Максимальный размер сводки вытесненных сообщений
+            blob_store: Хранилище вынесенных результатов инструментов
+        """
+        self._tool_filter = tool_filter
+        self._context_length_provider = context_length_provider
+        self._default_context_length = default_context_length
+        self._completion_reserve = completion_reserve
+        self._tool_result_max_tokens = tool_result_max_tokens
+        self._summary_max_tokens = summary_max_tokens
+        self._blob_store = blob_store
+        self._tools_tokens_cache: Dict[bytes, int] = {}
+    
+    def count_message_tokens(self, message: Message) -> int:
+        """
+        Подсчитать токены сообщения с кэшированием в сущности.
+        
+        Args:
+            message: Доменное сообщение
+        
+        Returns:
+            Количество токенов сообщения
+        """
+        if message.token_count is None:
+            message.token_count = estimate_llm_message_tokens(message.to_llm_format())
+        return message.token_count
+    
+    async def get_context_length(self, model: str) -> int:
+        """
+        Получить размер контекстного окна модели.
+        
+        Args:
+            model: Имя модели
+        
+        Returns:
+            Размер окна в токенах
+        """
+        if self._context_length_provider:
+            try:
+                context_length = await self._context_length_provider(model)
+                if context_length:
+                    return context_length
+            except Exception as e:
+                logger.warning(f"Failed to get context length for model {model}: {e}")
+        return self._default_context_length
+    
+    def _count_tools_tokens(self, allowed_tools: Optional[List[str]]) -> int:
+        """Подсчитать токены описаний инструментов (с кэшированием)"""
+        tools_json = self._tool_filter.get_bundle(allowed_tools).tools_json
+        if tools_json not in self._tools_tokens_cache:
+            self._tools_tokens_cache[tools_json] = estimate_tokens(tools_json.decode("utf-8"))
+        return self._tools_tokens_cache[tools_json]
+    
+    async def build_history(
+        self,
+        session: Session,
+        system_prompt: str,
+        model: str,
+        allowed_tools: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Сформировать историю для LLM в пределах контекстного окна модели.
+        
+        Args:
+            session: Сессия с историей сообщений
+            system_prompt: Системный промпт агента
+            model: Имя модели
+            allowed_tools: Разрешенные инструменты (None = все)
+        
+        Returns:
+            История в формате LLM API: системный промпт, сводка (если есть),
+            последние сообщения
+        """
+        messages = list(session.messages)
+        # Системный промпт агента заменяет первое системное сообщение сессии
+        if messages and messages[0].role == "system":
+            messages = messages[1:]
+        
+        context_length = await self.get_context_length(model)
+        reserve = min(self._completion_reserve, context_length // 4)
+        budget = (
+            context_length
+            - reserve
+            - self._count_tools_tokens(allowed_tools)
+            - _estimate_prompt_tokens(system_prompt)
+            - MESSAGE_OVERHEAD_TOKENS
+        )
+        
+        # Сообщения текущего хода (после последнего user message) не усекаются
+        current_turn_start = next(
+            (i for i in range(len(messages) - 1, -1, -1) if messages[i].role == "user"),
+            0
+        )
+        
+        # Последние сообщения, которые помещаются в бюджет
+        kept: List[Dict[str, Any]] = []
+        used = 0
+        start = len(messages)
+        for index in range(len(messages) - 1, -1, -1):
+            message = messages[index]
+            is_recent = index >= current_turn_start
+            llm_message, tokens = self._prepare_message(message, is_recent)
+            if is_recent and message.get_blob_ref():
+                llm_message, tokens = await self._inline_blob(
+                    message,
+                    llm_message,
+                    tokens,
+                    available=budget - self._summary_max_tokens - used
+                )
+            if kept and used + tokens > budget - self._summary_max_tokens:
+                break
+            kept.append(llm_message)
+            used += tokens
+            start = index
+        
+        # Результат инструмента не может идти без своего tool call
+        while start < len(messages) - 1 and messages[start].role == "tool":
+            kept.pop()
+            start += 1
+        kept.reverse()
+        
+        # Системный промпт остается побайтно стабильным (кэшируемый префикс),
+        # сводка идет отдельным системным сообщением после него
+        history: List[Dict[str, Any]] = [{"role": "system", "content": system_prompt}]
+        if start > 0:
+            summary = self._summarize(messages[:start])
+            history.append({"role": "system", "content": summary})
+            logger.info(
+                f"Context budget for session {session.id}: {start} older messages "
+                f"summarized, {len(kept)} kept (~{used} tokens of {budget} budget, "
+                f"model={model})"
+            )
+        
+        return history + kept
+    
+    def _prepare_message(
+        self,
+        message: Message,
+        is_recent: bool
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Подготовить сообщение для истории, усекая старые результаты инструментов.
+        
+        Args:
+            message: Доменное сообщение
+            is_recent: Сообщение текущего хода (не усекается)
+        
+        Returns:
+            Сообщение в формате LLM API и количество его токенов
+        """
+        llm_message = message.to_llm_format()
+        tokens = self.count_message_tokens(message)
+        
+        if is_recent or message.role != "tool" or tokens <= self._tool_result_max_tokens:
+            return llm_message, tokens
+        
+        content = llm_message.get("content") or ""
+        ratio = self._tool_result_max_tokens / tokens
+        marker = self.TRUNCATION_MARKER.format(
+            omitted=tokens - self._tool_result_max_tokens
+        )
+        llm_message["content"] = content[:int(len(content) * ratio)] + marker
+        # Усеченное содержимое пропорционально исходному, повторный подсчет не нужен
+        return llm_message, self._tool_result_max_tokens + estimate_tokens(marker)
+    
+    async def _inline_blob(
+        self,
+        message: Message,
+        llm_message: Dict[str, Any],
+        tokens: int,
+        available: int
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Подставить полный результат инструмента из blob store.
+        
+        Args:
+            message: Сообщение с превью и ссылкой на blob
+            llm_message: Сообщение в формате LLM API (с превью)
+            tokens: Токены сообщения с превью
+            available: Свободный бюджет токенов
+            
+        Returns:
+            Сообщение с полным результатом, если он помещается, иначе исходное
+        """
+        blob_ref = message.get_blob_ref()
+        full_tokens = blob_ref.get("tokens", 0) + MESSAGE_OVERHEAD_TOKENS
+        if not self._blob_store or full_tokens > available:
+            return llm_message, tokens
+        
+        data = await self._blob_store.get(blob_ref["key"])
+        if data is None:
+            return llm_message, tokens
+        
+        return {**llm_message, "content": data.decode("utf-8")}, full_tokens
+    
+    def _summarize(self, messages: List[Message]) -> str:
+        """
+        Построить сводку вытесненных сообщений.
+        
+        Сводка извлекающая (без вызова LLM): по строке на сообщение,
+        при превышении лимита сохраняются самые свежие строки.
+        
+        Args:
+            messages: Вытесненные сообщения в хронологическом порядке
+        
+        Returns:
+            Текст сводки
+        """
+        header = self.SUMMARY_HEADER.format(count=len(messages))
+        lines: List[str] = []
+        used = estimate_tokens(header) + MESSAGE_OVERHEAD_TOKENS
+        for message in reversed(messages):
+            line = self._summary_line(message)
+            if not line:
+                continue
+            tokens = estimate_tokens(line)
+            if used + tokens > self._summary_max_tokens:
+                break
+            lines.append(line)
+            used += tokens
+        lines.reverse()
+        
+        return "\n".join([header] + lines)
+    
+    @staticmethod
+    def _summary_line(message: Message, max_chars: int = 200) -> Optional[str]:
+        """Одна строка сводки для сообщения"""
+        content = " ".join((message.content or "").split())
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        
+        if message.role == "tool":
+            status = "error" if content.startswith("Error:") else "ok"
+            return f"- tool result ({status})"
+        
+        if message.tool_calls:
+            names = [
+                tc.get("function", {}).get("name", "unknown")
+                for tc in message.tool_calls
+            ]
+            return f"- assistant called tools: {', '.join(names)}"
+        
+        if not content:
+            return None
+        return f"- {message.role}: {content}"
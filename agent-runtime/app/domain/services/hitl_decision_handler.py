@@ -84,7 +84,7 @@ class HITLDecisionHandler:
         Raises:
             ValueError: Если решение невалидно или pending state не найден
         """
-        from ...models.hitl_models import HITLDecision
+        from ..entities.hitl import HITLDecision
         
         logger.info(
             f"Обработка HITL решения для сессии {session_id}: "
@@ -153,6 +153,16 @@ class HITLDecisionHandler:
             tool_call_id=call_id
         )
         
+        # Пакет tool calls: LLM продолжает, только когда у всех вызовов есть результат
+        session = await self._session_service.get_session(session_id)
+        pending = session.get_pending_batch_calls(call_id)
+        if pending:
+            logger.info(
+                f"HITL результат добавлен в сессию {session_id}, "
+                f"ожидаем результаты вызовов пакета {pending}"
+            )
+            return
+        
         logger.info(
             f"HITL результат добавлен в сессию {session_id}, "
             f"продолжаем обработку с текущим агентом"
@@ -187,7 +197,7 @@ class HITLDecisionHandler:
         Returns:
             Словарь с результатом решения
         """
-        from ...models.hitl_models import HITLDecision
+        from ..entities.hitl import HITLDecision
         
         if decision_enum == HITLDecision.APPROVE:
             # Выполнить инструмент с оригинальными аргументами
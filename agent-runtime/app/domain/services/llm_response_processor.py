@@ -21,12 +21,13 @@ class LLMResponseProcessor:
     Доменный сервис обработки ответов LLM.
     
     Инкапсулирует бизнес-правила обработки ответов от LLM:
-    1. Валидация количества tool calls (только один за раз)
-    2. Проверка HITL политики для инструментов
+    1. Пакетная обработка tool calls (все вызовы ответа или только первый)
+    2. Проверка HITL политики для каждого инструмента
     3. Валидация содержимого ответа
     
     Атрибуты:
         _hitl_policy: Сервис HITL политики
+        _allow_parallel_tool_calls: Разрешены ли несколько tool calls за один ответ
     
     Пример:
         >>> processor = LLMResponseProcessor(hitl_policy_service)
@@ -36,22 +37,31 @@ class LLMResponseProcessor:
         ...     print(f"Approval required: {processed.approval_reason}")
     """
     
-    def __init__(self, hitl_policy: HITLPolicyService):
+    def __init__(
+        self,
+        hitl_policy: HITLPolicyService,
+        allow_parallel_tool_calls: bool = True
+    ):
         """
         Инициализация процессора.
         
         Args:
             hitl_policy: Сервис HITL политики для проверки необходимости одобрения
+            allow_parallel_tool_calls: Передавать IDE все tool calls ответа пакетом.
+                Если False, выполняется только первый tool call.
         """
         self._hitl_policy = hitl_policy
+        self._allow_parallel_tool_calls = allow_parallel_tool_calls
     
     def process_response(self, response: LLMResponse) -> ProcessedResponse:
         """
         Обработать ответ LLM согласно бизнес-правилам.
         
         Применяет следующие бизнес-правила:
-        1. Агент может вызвать только ОДИН инструмент за раз
-        2. Некоторые инструменты требуют одобрения пользователя (HITL)
+        1. Все tool calls ответа передаются пакетом (если параллельные вызовы
+           отключены - только первый)
+        2. Некоторые инструменты требуют одобрения пользователя (HITL),
+           политика проверяется для каждого вызова отдельно
         3. Пустой content допустим только при наличии tool_calls
         
         Args:
@@ -68,41 +78,53 @@ class LLMResponseProcessor:
             ...     model="gpt-4"
             ... )
             >>> processed = processor.process_response(response)
-            >>> len(processed.tool_calls)  # Только первый tool call
-            1
-            >>> len(processed.validation_warnings)  # Есть предупреждение
-            1
+            >>> len(processed.tool_calls)  # Пакет из двух tool calls
+            2
         """
         validation_warnings = []
         tool_calls = response.tool_calls
         
-        # Бизнес-правило 1: Только один tool call за раз
+        # Бизнес-правило 1: Пакет tool calls или только первый
         if len(response.tool_calls) > 1:
-            warning = (
-                f"LLM attempted to call {len(response.tool_calls)} tools simultaneously. "
-                f"Only the first tool will be executed. "
-                f"Tools: {[tc.tool_name for tc in response.tool_calls]}"
-            )
-            logger.warning(warning)
-            validation_warnings.append(warning)
-            
-            # Берем только первый tool call
-            tool_calls = [response.tool_calls[0]]
+            if self._allow_parallel_tool_calls:
+                logger.info(
+                    f"LLM requested a batch of {len(response.tool_calls)} tool calls: "
+                    f"{[tc.tool_name for tc in response.tool_calls]}"
+                )
+            else:
+                warning = (
+                    f"LLM attempted to call {len(response.tool_calls)} tools simultaneously. "
+                    f"Only the first tool will be executed. "
+                    f"Tools: {[tc.tool_name for tc in response.tool_calls]}"
+                )
+                logger.warning(warning)
+                validation_warnings.append(warning)
+                
+                # Берем только первый tool call
+                tool_calls = [response.tool_calls[0]]
         
-        # Бизнес-правило 2: Проверка HITL политики
-        requires_approval = False
-        approval_reason = None
+        # Бизнес-правило 2: Проверка HITL политики для каждого вызова
+        approval_reasons = {}
         
-        if tool_calls:
-            tool_call = tool_calls[0]
-            requires_approval, approval_reason = self._hitl_policy.requires_approval(
+        for tool_call in tool_calls:
+            tool_requires_approval, reason = self._hitl_policy.requires_approval(
                 tool_call.tool_name
             )
             
             logger.debug(
-                f"Tool '{tool_call.tool_name}' requires_approval={requires_approval}"
-                f"{f', reason={approval_reason}' if approval_reason else ''}"
+                f"Tool '{tool_call.tool_name}' requires_approval={tool_requires_approval}"
+                f"{f', reason={reason}' if reason else ''}"
             )
+            
+            if tool_requires_approval:
+                approval_reasons[tool_call.id] = reason or "Unknown"
+        
+        requires_approval = bool(approval_reasons)
+        approval_reason = None
+        if requires_approval:
+            # Причина первого вызова, требующего одобрения
+            first_call_id = next(tc.id for tc in tool_calls if tc.id in approval_reasons)
+            approval_reason = approval_reasons[first_call_id]
         
         # Бизнес-правило 3: Валидация содержимого
         content = response.content
@@ -119,6 +141,7 @@ class LLMResponseProcessor:
             model=response.model,
             requires_approval=requires_approval,
             approval_reason=approval_reason,
+            approval_reasons=approval_reasons,
             validation_warnings=validation_warnings
         )
     
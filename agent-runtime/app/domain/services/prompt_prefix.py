@@ -0,0 +1,122 @@
+"""
+Доменный сервис стабильного префикса промпта.
+
+Системный промпт и описания инструментов агента одинаковы на каждом ходе.
+Провайдеры LLM кэшируют такой префикс, только если он совпадает побайтно,
+поэтому префикс сериализуется канонически и идентифицируется хэшем.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger("agent-runtime.domain.prompt_prefix")
+
+
+def canonical_json(value: Any) -> str:
+    """
+    Каноническая JSON сериализация (сортированные ключи, без пробелов).
+    
+    Args:
+        value: JSON-совместимое значение
+    
+    Returns:
+        Строка, побайтно одинаковая для равных значений
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """
+    Value Object стабильного префикса промпта.
+    
+    Атрибуты:
+        system_prompt: Системный промпт агента
+        tools_json: Каноническая JSON сериализация инструментов (UTF-8)
+        hash: SHA-256 хэш системного промпта и инструментов
+    """
+    
+    system_prompt: str
+    tools_json: bytes
+    hash: str
+    
+    @property
+    def cache_key(self) -> str:
+        """Ключ кэша префикса для провайдера (prompt_cache_key)"""
+        return f"prefix-{self.hash[:32]}"
+    
+    @classmethod
+    def build(cls, system_prompt: str, tools_json: bytes) -> "PromptPrefix":
+        """
+        Построить префикс из системного промпта и инструментов.
+        
+        Args:
+            system_prompt: Системный промпт
+            tools_json: Каноническая сериализация инструментов
+                (ToolBundle.tools_json)
+        
+        Returns:
+            PromptPrefix с хэшем
+        """
+        digest = hashlib.sha256()
+        digest.update(system_prompt.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(tools_json)
+        return cls(
+            system_prompt=system_prompt,
+            tools_json=tools_json,
+            hash=digest.hexdigest()
+        )
+
+
+class PromptPrefixCache:
+    """
+    Кэш префиксов промпта.
+    
+    Префикс вычисляется один раз для пары (системный промпт, набор
+    инструментов), т.е. фактически один раз на агента. Ключом служит
+    сериализация набора, поэтому изменение реестра инструментов дает
+    новый префикс.
+    
+    Атрибуты:
+        _prefixes: Префиксы по ключу (system_prompt, tools_json)
+    
+    Пример:
+        >>> cache = PromptPrefixCache()
+        >>> prefix = cache.get(system_prompt, tool_filter.get_bundle(["read_file"]).tools_json)
+        >>> prefix.hash
+        '3f2a...'
+    """
+    
+    def __init__(self):
+        """Инициализация кэша."""
+        self._prefixes: Dict[Tuple[str, bytes], PromptPrefix] = {}
+    
+    def get(self, system_prompt: str, tools_json: bytes) -> PromptPrefix:
+        """
+        Получить префикс (вычисляется при первом обращении).
+        
+        Args:
+            system_prompt: Системный промпт агента
+            tools_json: Каноническая сериализация инструментов агента
+        
+        Returns:
+            PromptPrefix
+        """
+        key = (system_prompt, tools_json)
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = PromptPrefix.build(system_prompt, tools_json)
+            self._prefixes[key] = prefix
+            logger.info(
+                f"Prompt prefix computed: hash={prefix.hash[:12]}, "
+                f"tools={len(tools_json)} bytes, system_prompt={len(system_prompt)} chars"
+            )
+        return prefix
+    
+    def clear(self) -> None:
+        """Сбросить кэш."""
+        self._prefixes.clear()
@@ -7,12 +7,14 @@
 
 import uuid
 import logging
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 
 from ..entities.session import Session
 from ..entities.message import Message
 from ..repositories.session_repository import SessionRepository
+from ..interfaces.blob_store import IBlobStore
+from .context_budget import estimate_tokens
 from ..events.session_events import (
     SessionCreated,
     MessageReceived,
@@ -34,16 +36,24 @@ class SessionManagementService:
     Атрибуты:
         _repository: Репозиторий сессий
         _event_publisher: Функция для публикации событий (опционально)
+        _blob_store: Хранилище больших результатов инструментов (опционально)
+        _offload_threshold: Размер результата (символы), выше которого он выносится в blob store
     
     Пример:
         >>> service = SessionManagementService(repository)
         >>> session = await service.create_session("session-1")
     """
     
+    # Размер превью вынесенного результата: начало и конец вывода (символы)
+    TOOL_RESULT_PREVIEW_HEAD = 2000
+    TOOL_RESULT_PREVIEW_TAIL = 1000
+    
     def __init__(
         self,
         repository: SessionRepository,
-        event_publisher=None
+        event_publisher=None,
+        blob_store: Optional[IBlobStore] = None,
+        tool_result_offload_threshold: int = 16384
     ):
         """
         Инициализация сервиса.
@@ -51,9 +61,16 @@ class SessionManagementService:
         Args:
             repository: Репозиторий для работы с сессиями
             event_publisher: Функция для публикации событий (опционально)
+            blob_store: Хранилище для больших результатов инструментов (опционально)
+            tool_result_offload_threshold: Порог выноса результата в blob store (символы)
         """
         self._repository = repository
         self._event_publisher = event_publisher
+        self._blob_store = blob_store
+        self._offload_threshold = max(
+            tool_result_offload_threshold,
+            self.TOOL_RESULT_PREVIEW_HEAD + self.TOOL_RESULT_PREVIEW_TAIL
+        )
     
     async def create_session(
         self,
@@ -159,7 +176,8 @@ class SessionManagementService:
         content: str,
         name: Optional[str] = None,
         tool_call_id: Optional[str] = None,
-        tool_calls: Optional[list] = None
+        tool_calls: Optional[list] = None,
+        metadata: Optional[Dict[str, Any]] = None
     ) -> Message:
         """
         Добавить сообщение в сессию.
@@ -171,6 +189,7 @@ class SessionManagementService:
             name: Имя отправителя (опционально)
             tool_call_id: ID вызова инструмента (опционально)
             tool_calls: Вызовы инструментов (опционально)
+            metadata: Метаданные сообщения (опционально)
             
         Returns:
             Созданное сообщение
@@ -195,7 +214,8 @@ class SessionManagementService:
             content=content,
             name=name,
             tool_call_id=tool_call_id,
-            tool_calls=tool_calls
+            tool_calls=tool_calls,
+            metadata=metadata or {}
         )
         
         # Добавить в сессию (валидация внутри)
@@ -266,14 +286,53 @@ class SessionManagementService:
         else:
             content = "Tool executed successfully"
         
+        # Большой результат выносится в blob store, в сообщении остается превью
+        metadata = None
+        if self._blob_store and len(content) > self._offload_threshold:
+            content, metadata = await self._offload_tool_result(content)
+        
         # Добавить как сообщение с ролью "tool"
         return await self.add_message(
             session_id=session_id,
             role="tool",
             content=content,
-            tool_call_id=call_id
+            tool_call_id=call_id,
+            metadata=metadata
         )
     
+    async def _offload_tool_result(self, content: str) -> tuple[str, Dict[str, Any]]:
+        """
+        Вынести большой результат инструмента в blob store.
+        
+        Args:
+            content: Полный результат инструмента
+            
+        Returns:
+            Превью (начало и конец вывода) и метаданные сообщения со ссылкой на blob
+        """
+        key = await self._blob_store.put(content.encode("utf-8"))
+        
+        head = content[:self.TOOL_RESULT_PREVIEW_HEAD]
+        tail = content[-self.TOOL_RESULT_PREVIEW_TAIL:]
+        omitted = len(content) - len(head) - len(tail)
+        preview = (
+            f"{head}\n... [{omitted} characters omitted, "
+            f"full output stored as blob {key[:12]}] ...\n{tail}"
+        )
+        
+        logger.debug(
+            f"Tool result offloaded to blob {key} "
+            f"({len(content)} chars, preview {len(preview)} chars)"
+        )
+        
+        return preview, {
+            Message.BLOB_REF_KEY: {
+                "key": key,
+                "size": len(content),
+                "tokens": estimate_tokens(content)
+            }
+        }
+    
     async def deactivate_session(
         self,
         session_id: str,
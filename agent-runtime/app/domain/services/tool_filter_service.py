@@ -2,16 +2,39 @@
 Доменный сервис фильтрации инструментов.
 
 Применяет бизнес-правила доступа к инструментам для разных агентов.
+Наборы инструментов агентов вычисляются один раз (ToolBundle) и
+сбрасываются только при изменении реестра.
 """
 
 import logging
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, FrozenSet, Iterable, Tuple
 
+from .prompt_prefix import canonical_json
 from .tool_registry import ToolRegistry
 
 logger = logging.getLogger("agent-runtime.domain.tool_filter_service")
 
 
+@dataclass(frozen=True)
+class ToolBundle:
+    """
+    Неизменяемый набор инструментов агента.
+    
+    Атрибуты:
+        tools: Спецификации инструментов в формате OpenAI (порядок реестра)
+        names: Имена инструментов набора
+        tools_json: Каноническая JSON сериализация tools (UTF-8), готовая
+            для вставки в тело запроса
+        registry_version: Версия реестра, по которой построен набор
+    """
+    
+    tools: Tuple[Dict[str, Any], ...]
+    names: FrozenSet[str]
+    tools_json: bytes
+    registry_version: int
+
+
 class ToolFilterService:
     """
     Доменный сервис фильтрации инструментов.
@@ -23,6 +46,10 @@ class ToolFilterService:
     
     Атрибуты:
         _tool_registry: Реестр всех доступных инструментов
+        _bundles: Предвычисленные наборы по множеству разрешенных инструментов
+        _all_tools: Снимок инструментов реестра
+        _all_tool_names: Имена всех инструментов реестра
+        _registry_version: Версия реестра, для которой действительны наборы
     
     Пример:
         >>> filter_service = ToolFilterService(tool_registry)
@@ -40,6 +67,99 @@ class ToolFilterService:
             tool_registry: Реестр инструментов
         """
         self._tool_registry = tool_registry
+        self._bundles: Dict[Optional[FrozenSet[str]], ToolBundle] = {}
+        self._all_tools: Tuple[Dict[str, Any], ...] = ()
+        self._all_tool_names: FrozenSet[str] = frozenset()
+        self._registry_version: Optional[int] = None
+    
+    def precompute(self, allowed_tools_sets: Iterable[Optional[List[str]]]) -> None:
+        """
+        Предвычислить наборы инструментов (при инициализации агентов).
+        
+        Args:
+            allowed_tools_sets: Списки разрешенных инструментов агентов
+        """
+        for allowed_tools in allowed_tools_sets:
+            self.get_bundle(allowed_tools)
+        logger.info(f"Precomputed {len(self._bundles)} tool bundles")
+    
+    def get_bundle(self, allowed_tools: Optional[List[str]] = None) -> ToolBundle:
+        """
+        Получить набор инструментов для списка разрешенных.
+        
+        Набор строится при первом обращении и переиспользуется,
+        пока не изменится версия реестра.
+        
+        Args:
+            allowed_tools: Список имен разрешенных инструментов (None = все)
+            
+        Returns:
+            ToolBundle
+        """
+        self._sync_with_registry()
+        key = frozenset(allowed_tools) if allowed_tools is not None else None
+        bundle = self._bundles.get(key)
+        if bundle is None:
+            bundle = self._build_bundle(allowed_tools)
+            self._bundles[key] = bundle
+        return bundle
+    
+    def _sync_with_registry(self) -> None:
+        """Сбросить наборы, если реестр изменился"""
+        version = self._tool_registry.version
+        if version == self._registry_version:
+            return
+        if self._registry_version is not None:
+            logger.info(
+                f"Tool registry changed (version {version}), "
+                f"dropping {len(self._bundles)} tool bundles"
+            )
+        self._bundles.clear()
+        self._all_tools = tuple(self._tool_registry.get_all_tools())
+        self._all_tool_names = frozenset(
+            tool["function"]["name"] for tool in self._all_tools
+        )
+        self._registry_version = version
+    
+    def _build_bundle(self, allowed_tools: Optional[List[str]]) -> ToolBundle:
+        """
+        Построить набор инструментов.
+        
+        Бизнес-правило:
+        - Если allowed_tools = None, набор включает все инструменты
+        - Если allowed_tools указан, только разрешенные
+        - Неизвестные инструменты игнорируются с предупреждением
+        """
+        all_tools = self._all_tools
+        
+        if allowed_tools is None:
+            tools = all_tools
+        else:
+            tools = [
+                tool for tool in all_tools
+                if tool["function"]["name"] in allowed_tools
+            ]
+            unknown_tools = [
+                name for name in allowed_tools
+                if name not in self._all_tool_names
+            ]
+            if unknown_tools:
+                logger.warning(
+                    f"Requested unknown tools: {unknown_tools}. "
+                    f"Available tools: {sorted(self._all_tool_names)}"
+                )
+        
+        logger.debug(
+            f"Built tool bundle: {len(tools)}/{len(all_tools)} tools "
+            f"(allowed: {allowed_tools})"
+        )
+        
+        return ToolBundle(
+            tools=tuple(tools),
+            names=frozenset(tool["function"]["name"] for tool in tools),
+            tools_json=canonical_json(tools).encode("utf-8"),
+            registry_version=self._registry_version
+        )
     
     def filter_tools(
         self,
@@ -70,41 +190,7 @@ class ToolFilterService:
             >>> len(read_only)
             2
         """
-        # Получить все инструменты из реестра
-        all_tools = self._tool_registry.get_all_tools()
-        
-        # Если фильтр не указан, вернуть все
-        if allowed_tools is None:
-            logger.debug(f"No filter specified, returning all {len(all_tools)} tools")
-            return all_tools
-        
-        # Фильтрация по разрешенным
-        filtered_tools = []
-        unknown_tools = []
-        
-        for tool in all_tools:
-            tool_name = tool["function"]["name"]
-            if tool_name in allowed_tools:
-                filtered_tools.append(tool)
-        
-        # Проверка на неизвестные инструменты
-        known_tool_names = {tool["function"]["name"] for tool in all_tools}
-        for requested_tool in allowed_tools:
-            if requested_tool not in known_tool_names:
-                unknown_tools.append(requested_tool)
-        
-        if unknown_tools:
-            logger.warning(
-                f"Requested unknown tools: {unknown_tools}. "
-                f"Available tools: {sorted(known_tool_names)}"
-            )
-        
-        logger.debug(
-            f"Filtered tools: {len(filtered_tools)}/{len(all_tools)} "
-            f"(allowed: {allowed_tools})"
-        )
-        
-        return filtered_tools
+        return list(self.get_bundle(allowed_tools).tools)
     
     def get_tool_names(self, allowed_tools: Optional[List[str]] = None) -> List[str]:
         """
@@ -121,8 +207,7 @@ class ToolFilterService:
             >>> names
             ['read_file', 'write_file']
         """
-        tools = self.filter_tools(allowed_tools)
-        return [tool["function"]["name"] for tool in tools]
+        return [tool["function"]["name"] for tool in self.get_bundle(allowed_tools).tools]
     
     def is_tool_allowed(
         self,
@@ -183,12 +268,8 @@ class ToolFilterService:
             "Tool 'unknown_tool' does not exist in registry"
         """
         # Проверка существования в реестре
-        all_tool_names = {
-            tool["function"]["name"]
-            for tool in self._tool_registry.get_all_tools()
-        }
-        
-        if tool_name not in all_tool_names:
+        self._sync_with_registry()
+        if tool_name not in self._all_tool_names:
             return False, f"Tool '{tool_name}' does not exist in registry"
         
         # Проверка разрешения
@@ -392,10 +392,67 @@ class ToolRegistry:
     
     def __init__(self):
         """Инициализация реестра"""
-        self._tools_spec = TOOLS_SPEC
-        self._local_tools = LOCAL_TOOLS
+        self._tools_spec = list(TOOLS_SPEC)
+        self._local_tools = dict(LOCAL_TOOLS)
+        self._version = 0
         logger.info(f"ToolRegistry initialized with {len(self._tools_spec)} tools")
     
+    @property
+    def version(self) -> int:
+        """
+        Версия реестра.
+        
+        Увеличивается при каждом изменении набора инструментов и позволяет
+        потребителям сбрасывать предвычисленные данные (см. ToolFilterService).
+        """
+        return self._version
+    
+    def register_tool(
+        self,
+        spec: Dict[str, Any],
+        local_function: Optional[Callable] = None
+    ) -> None:
+        """
+        Зарегистрировать (или заменить) инструмент.
+        
+        Args:
+            spec: Спецификация инструмента в формате OpenAI
+            local_function: Функция для локального выполнения (None = инструмент IDE)
+        """
+        tool_name = spec["function"]["name"]
+        self._tools_spec = [
+            tool for tool in self._tools_spec
+            if tool["function"]["name"] != tool_name
+        ] + [spec]
+        if local_function is not None:
+            self._local_tools[tool_name] = local_function
+        else:
+            self._local_tools.pop(tool_name, None)
+        self._version += 1
+        logger.info(f"Tool '{tool_name}' registered (registry version {self._version})")
+    
+    def unregister_tool(self, tool_name: str) -> bool:
+        """
+        Удалить инструмент из реестра.
+        
+        Args:
+            tool_name: Имя инструмента
+            
+        Returns:
+            True если инструмент был удален
+        """
+        tools_spec = [
+            tool for tool in self._tools_spec
+            if tool["function"]["name"] != tool_name
+        ]
+        if len(tools_spec) == len(self._tools_spec):
+            return False
+        self._tools_spec = tools_spec
+        self._local_tools.pop(tool_name, None)
+        self._version += 1
+        logger.info(f"Tool '{tool_name}' unregistered (registry version {self._version})")
+        return True
+    
     def get_all_tools(self) -> List[Dict[str, Any]]:
         """
         Получить все доступные инструменты.
@@ -6,7 +6,8 @@
 """
 
 import logging
-from typing import AsyncGenerator, Optional, TYPE_CHECKING
+import math
+from typing import AsyncGenerator, List, Optional, TYPE_CHECKING
 
 from ...models.schemas import StreamChunk
 
@@ -29,6 +30,7 @@ class ToolResultHandler:
     - Продолжение обработки с текущим агентом
     - Обработка переключений агента при tool_result
     - Извлечение последнего user message для нового агента
+    - Ожидание результатов пакета tool calls (кворум) перед продолжением
     
     Атрибуты:
         _session_service: Сервис управления сессиями
@@ -37,6 +39,7 @@ class ToolResultHandler:
         _stream_handler: Handler для стриминга LLM ответов
         _switch_helper: Helper для переключения агентов
         _approval_manager: Unified approval manager
+        _batch_quorum: Доля результатов пакета, достаточная для продолжения
     """
     
     def __init__(
@@ -46,7 +49,8 @@ class ToolResultHandler:
         agent_router,  # AgentRouter
         stream_handler: Optional["IStreamHandler"],
         switch_helper: "AgentSwitchHelper",
-        approval_manager: Optional["ApprovalManager"] = None
+        approval_manager: Optional["ApprovalManager"] = None,
+        batch_quorum: float = 1.0
     ):
         """
         Инициализация handler.
@@ -58,13 +62,20 @@ class ToolResultHandler:
             stream_handler: Handler для стриминга LLM ответов
             switch_helper: Helper для переключения агентов
             approval_manager: Unified approval manager для удаления pending approvals
+            batch_quorum: Доля результатов пакета tool calls (0 < q <= 1), после
+                получения которой агент продолжает работу. Оставшиеся вызовы
+                пакета закрываются результатом с ошибкой.
         """
+        if not 0 < batch_quorum <= 1:
+            raise ValueError(f"batch_quorum must be in (0, 1], got {batch_quorum}")
+        
         self._session_service = session_service
         self._agent_service = agent_service
         self._agent_router = agent_router
         self._stream_handler = stream_handler
         self._switch_helper = switch_helper
         self._approval_manager = approval_manager
+        self._batch_quorum = batch_quorum
         
         logger.debug(
             f"ToolResultHandler инициализирован с stream_handler={stream_handler is not None}, "
@@ -100,42 +111,7 @@ class ToolResultHandler:
         )
         
         # BUGFIX: Обновляем статус pending approval при получении tool_result
-        # Если tool_result получен (успех или ошибка), значит решение пользователя
-        # уже принято (approve/reject) и нужно обновить статус pending approval.
-        # Это предотвращает повторное появление диалога после перезапуска IDE.
-        if self._approval_manager:
-            try:
-                # Проверяем, есть ли pending approval для этого call_id
-                pending = await self._approval_manager.get_pending(call_id)
-                if pending:
-                    # Если есть error, значит пользователь reject'нул
-                    # Если нет error, значит пользователь approve'нул
-                    if error:
-                        await self._approval_manager.reject(call_id, reason=f"Tool execution failed: {error}")
-                        logger.info(
-                            f"✅ Marked pending approval as rejected for request_id={call_id} "
-                            f"after receiving tool_result with error"
-                        )
-                    else:
-                        await self._approval_manager.approve(call_id)
-                        logger.info(
-                            f"✅ Marked pending approval as approved for request_id={call_id} "
-                            f"after receiving successful tool_result"
-                        )
-                else:
-                    logger.debug(
-                        f"No pending approval found for request_id={call_id} "
-                        f"(tool was executed without approval requirement)"
-                    )
-            except Exception as e:
-                logger.warning(
-                    f"Failed to update pending approval status for request_id={call_id}: {e}"
-                )
-                # Не блокируем обработку из-за ошибки обновления статуса
-        else:
-            logger.debug(
-                "ApprovalManager not available, skipping pending approval status update"
-            )
+        await self._update_pending_approval(call_id, error)
         
         # Получить сессию
         session = await self._session_service.get_or_create_session(session_id)
@@ -152,6 +128,15 @@ class ToolResultHandler:
             f"switch_count={context.switch_count}"
         )
         
+        # Результат для уже закрытого вызова пакета (дубликат или опоздавший)
+        batch = session.get_tool_call_batch(call_id)
+        if call_id in session.get_answered_tool_call_ids():
+            logger.warning(
+                f"Результат для call_id={call_id} уже есть в сессии {session_id}, "
+                f"повторный tool_result проигнорирован"
+            )
+            return
+        
         # Добавить результат инструмента в сессию
         await self._session_service.add_tool_result(
             session_id=session_id,
@@ -160,6 +145,28 @@ class ToolResultHandler:
             error=error
         )
         
+        # Пакет tool calls: ждем результаты остальных вызовов
+        if len(batch) > 1:
+            session = await self._session_service.get_session(session_id)
+            pending = session.get_pending_batch_calls(call_id)
+            
+            if pending:
+                required = math.ceil(self._batch_quorum * len(batch))
+                received = len(batch) - len(pending)
+                
+                if received < required:
+                    logger.info(
+                        f"Пакет tool calls в сессии {session_id}: получено "
+                        f"{received}/{len(batch)} результатов, ожидаем {required}"
+                    )
+                    return
+                
+                logger.info(
+                    f"Кворум пакета tool calls достигнут в сессии {session_id} "
+                    f"({received}/{len(batch)}), закрываем вызовы {pending}"
+                )
+                await self._close_pending_batch_calls(session_id, pending)
+        
         logger.info(
             f"Результат инструмента добавлен в сессию {session_id}, "
             f"продолжаем обработку с агентом {context.current_agent.value}"
@@ -225,6 +232,82 @@ class ToolResultHandler:
         
         logger.info(f"Обработка tool_result завершена, отправлено {chunk_count} chunks")
     
+    async def _update_pending_approval(
+        self,
+        call_id: str,
+        error: Optional[str]
+    ) -> None:
+        """
+        Обновить статус pending approval при получении tool_result.
+        
+        Если tool_result получен (успех или ошибка), значит решение пользователя
+        уже принято (approve/reject) и нужно обновить статус pending approval.
+        Это предотвращает повторное появление диалога после перезапуска IDE.
+        
+        Args:
+            call_id: ID вызова инструмента
+            error: Сообщение об ошибке (если неуспешно)
+        """
+        if self._approval_manager:
+            try:
+                # Проверяем, есть ли pending approval для этого call_id
+                pending = await self._approval_manager.get_pending(call_id)
+                if pending:
+                    # Если есть error, значит пользователь reject'нул
+                    # Если нет error, значит пользователь approve'нул
+                    if error:
+                        await self._approval_manager.reject(
+                            call_id, reason=f"Tool execution failed: {error}"
+                        )
+                        logger.info(
+                            f"✅ Marked pending approval as rejected for request_id={call_id} "
+                            f"after receiving tool_result with error"
+                        )
+                    else:
+                        await self._approval_manager.approve(call_id)
+                        logger.info(
+                            f"✅ Marked pending approval as approved for request_id={call_id} "
+                            f"after receiving successful tool_result"
+                        )
+                else:
+                    logger.debug(
+                        f"No pending approval found for request_id={call_id} "
+                        f"(tool was executed without approval requirement)"
+                    )
+            except Exception as e:
+                logger.warning(
+                    f"Failed to update pending approval status for request_id={call_id}: {e}"
+                )
+                # Не блокируем обработку из-за ошибки обновления статуса
+        else:
+            logger.debug(
+                "ApprovalManager not available, skipping pending approval status update"
+            )
+    
+    async def _close_pending_batch_calls(
+        self,
+        session_id: str,
+        call_ids: List[str]
+    ) -> None:
+        """
+        Закрыть вызовы пакета, не дождавшиеся результата до кворума.
+        
+        LLM API требует результат для каждого tool call, поэтому
+        для оставшихся вызовов добавляется результат с ошибкой.
+        
+        Args:
+            session_id: ID сессии
+            call_ids: ID вызовов без результата
+        """
+        error = "Tool result was not received before the batch quorum was reached"
+        for call_id in call_ids:
+            await self._update_pending_approval(call_id, error)
+            await self._session_service.add_tool_result(
+                session_id=session_id,
+                call_id=call_id,
+                error=error
+            )
+    
     def _extract_last_user_message(self, session) -> str:
         """
         Извлечь последнее user message из сессии.
@@ -63,3 +63,5 @@ class EventType(str, Enum):
     LLM_REQUEST_STARTED = "llm.request.started"
     LLM_REQUEST_COMPLETED = "llm.request.completed"
     LLM_REQUEST_FAILED = "llm.request.failed"
+    LLM_REQUEST_CANCELLED = "llm.request.cancelled"
+    LLM_CIRCUIT_STATE_CHANGED = "llm.circuit.state_changed"
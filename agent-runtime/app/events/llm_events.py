@@ -45,7 +45,8 @@ class LLMRequestCompletedEvent(BaseEvent):
         completion_tokens: int,
         total_tokens: int,
         has_tool_calls: bool,
-        correlation_id: Optional[str] = None
+        correlation_id: Optional[str] = None,
+        cached_prompt_tokens: int = 0
     ):
         super().__init__(
             event_type=EventType.LLM_REQUEST_COMPLETED,
@@ -58,6 +59,7 @@ class LLMRequestCompletedEvent(BaseEvent):
                 "prompt_tokens": prompt_tokens,
                 "completion_tokens": completion_tokens,
                 "total_tokens": total_tokens,
+                "cached_prompt_tokens": cached_prompt_tokens,
                 "has_tool_calls": has_tool_calls
             },
             source="llm_stream_service"
@@ -85,3 +87,55 @@ class LLMRequestFailedEvent(BaseEvent):
             },
             source="llm_stream_service"
         )
+
+
+class LLMRequestCancelledEvent(BaseEvent):
+    """Event published when an LLM request is cancelled because the client went away."""
+    
+    def __init__(
+        self,
+        session_id: str,
+        model: str,
+        duration_ms: int,
+        partial_length: int,
+        correlation_id: Optional[str] = None
+    ):
+        super().__init__(
+            event_type=EventType.LLM_REQUEST_CANCELLED,
+            event_category=EventCategory.METRICS,
+            session_id=session_id,
+            correlation_id=correlation_id,
+            data={
+                "model": model,
+                "duration_ms": duration_ms,
+                "partial_length": partial_length
+            },
+            source="llm_stream_service"
+        )
+
+
+class LLMCircuitStateChangedEvent(BaseEvent):
+    """Event published when a per-(upstream, model) circuit breaker changes state."""
+    
+    def __init__(
+        self,
+        upstream: str,
+        model: str,
+        from_state: str,
+        to_state: str,
+        failure_rate: float,
+        window_calls: int
+    ):
+        super().__init__(
+            event_type=EventType.LLM_CIRCUIT_STATE_CHANGED,
+            event_category=EventCategory.SYSTEM,
+            data={
+                "upstream": upstream,
+                "model": model,
+                "from_state": from_state,
+                "to_state": to_state,
+                "failure_rate": failure_rate,
+                "window_calls": window_calls
+            },
+            source="llm_circuit_breaker"
+        )
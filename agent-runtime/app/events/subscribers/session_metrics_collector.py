@@ -14,7 +14,8 @@ from app.events.event_types import EventType
 from app.events.llm_events import (
     LLMRequestStartedEvent,
     LLMRequestCompletedEvent,
-    LLMRequestFailedEvent
+    LLMRequestFailedEvent,
+    LLMRequestCancelledEvent
 )
 
 logger = logging.getLogger("agent-runtime.session_metrics")
@@ -32,6 +33,8 @@ class LLMRequestMetrics:
     has_tool_calls: bool
     success: bool
     error: Optional[str] = None
+    cached_prompt_tokens: int = 0
+    cancelled: bool = False
 
 
 @dataclass
@@ -44,8 +47,10 @@ class SessionMetrics:
     total_requests: int = 0
     successful_requests: int = 0
     failed_requests: int = 0
+    cancelled_requests: int = 0
     total_duration_ms: int = 0
     total_prompt_tokens: int = 0
+    total_cached_prompt_tokens: int = 0
     total_completion_tokens: int = 0
     total_tokens: int = 0
     requests_with_tools: int = 0
@@ -59,10 +64,13 @@ class SessionMetrics:
             self.successful_requests += 1
             self.total_duration_ms += metrics.duration_ms
             self.total_prompt_tokens += metrics.prompt_tokens
+            self.total_cached_prompt_tokens += metrics.cached_prompt_tokens
             self.total_completion_tokens += metrics.completion_tokens
             self.total_tokens += metrics.total_tokens
             if metrics.has_tool_calls:
                 self.requests_with_tools += 1
+        elif metrics.cancelled:
+            self.cancelled_requests += 1
         else:
             self.failed_requests += 1
     
@@ -78,6 +86,12 @@ class SessionMetrics:
             return 0.0
         return self.total_tokens / self.successful_requests
     
+    def get_prompt_cache_hit_rate(self) -> float:
+        """Calculate share of prompt tokens served from provider cache."""
+        if self.total_prompt_tokens == 0:
+            return 0.0
+        return self.total_cached_prompt_tokens / self.total_prompt_tokens
+    
     def to_dict(self) -> dict:
         """Convert to dictionary for API response."""
         return {
@@ -85,9 +99,15 @@ class SessionMetrics:
             "total_requests": self.total_requests,
             "successful_requests": self.successful_requests,
             "failed_requests": self.failed_requests,
+            "cancelled_requests": self.cancelled_requests,
             "total_duration_ms": self.total_duration_ms,
             "average_duration_ms": round(self.get_average_duration_ms(), 2),
             "total_prompt_tokens": self.total_prompt_tokens,
+            "total_cached_prompt_tokens": self.total_cached_prompt_tokens,
+            "total_uncached_prompt_tokens": (
+                self.total_prompt_tokens - self.total_cached_prompt_tokens
+            ),
+            "prompt_cache_hit_rate": round(self.get_prompt_cache_hit_rate(), 4),
             "total_completion_tokens": self.total_completion_tokens,
             "total_tokens": self.total_tokens,
             "average_tokens_per_request": round(self.get_average_tokens_per_request(), 2),
@@ -98,10 +118,12 @@ class SessionMetrics:
                     "model": req.model,
                     "duration_ms": req.duration_ms,
                     "prompt_tokens": req.prompt_tokens,
+                    "cached_prompt_tokens": req.cached_prompt_tokens,
                     "completion_tokens": req.completion_tokens,
                     "total_tokens": req.total_tokens,
                     "has_tool_calls": req.has_tool_calls,
                     "success": req.success,
+                    "cancelled": req.cancelled,
                     "error": req.error
                 }
                 for req in self.requests
@@ -119,6 +141,10 @@ class SessionMetricsCollector:
     def __init__(self):
         self._session_metrics: Dict[str, SessionMetrics] = {}
         self._pending_requests: Dict[str, Dict] = {}  # session_id -> request data
+        # model -> {"count", "duration_ms", "partial_chars"} по всем сессиям
+        self._cancellations: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"count": 0, "duration_ms": 0, "partial_chars": 0}
+        )
         logger.info("SessionMetricsCollector initialized")
     
     async def start(self):
@@ -135,6 +161,10 @@ class SessionMetricsCollector:
             event_type=EventType.LLM_REQUEST_FAILED,
             handler=self._on_request_failed
         )
+        event_bus.subscribe(
+            event_type=EventType.LLM_REQUEST_CANCELLED,
+            handler=self._on_request_cancelled
+        )
         logger.info("SessionMetricsCollector subscribed to LLM events")
     
     async def _on_request_started(self, event: LLMRequestStartedEvent):
@@ -156,6 +186,7 @@ class SessionMetricsCollector:
         duration_ms = event.data.get("duration_ms", 0)
         total_tokens = event.data.get("total_tokens", 0)
         prompt_tokens = event.data.get("prompt_tokens", 0)
+        cached_prompt_tokens = event.data.get("cached_prompt_tokens", 0)
         completion_tokens = event.data.get("completion_tokens", 0)
         has_tool_calls = event.data.get("has_tool_calls", False)
         model = event.data.get("model", "unknown")
@@ -178,7 +209,8 @@ class SessionMetricsCollector:
             completion_tokens=completion_tokens,
             total_tokens=total_tokens,
             has_tool_calls=has_tool_calls,
-            success=True
+            success=True,
+            cached_prompt_tokens=cached_prompt_tokens
         )
         
         # Get or create session metrics
@@ -234,6 +266,51 @@ class SessionMetricsCollector:
             f"Session {event.session_id} failed request recorded: {error}"
         )
     
+    async def _on_request_cancelled(self, event: LLMRequestCancelledEvent):
+        """Handle LLM request cancelled event (client disconnected)."""
+        model = event.data.get("model", "unknown")
+        duration_ms = event.data.get("duration_ms", 0)
+        partial_length = event.data.get("partial_length", 0)
+        
+        pending = self._pending_requests.pop(event.session_id, {})
+        timestamp = pending.get("timestamp", event.timestamp)
+        
+        metrics = LLMRequestMetrics(
+            timestamp=timestamp,
+            model=model,
+            duration_ms=duration_ms,
+            prompt_tokens=0,
+            completion_tokens=0,
+            total_tokens=0,
+            has_tool_calls=False,
+            success=False,
+            cancelled=True
+        )
+        
+        if event.session_id not in self._session_metrics:
+            self._session_metrics[event.session_id] = SessionMetrics(
+                session_id=event.session_id
+            )
+        self._session_metrics[event.session_id].add_request(metrics)
+        
+        totals = self._cancellations[model]
+        totals["count"] += 1
+        totals["duration_ms"] += duration_ms
+        totals["partial_chars"] += partial_length
+        
+        logger.info(
+            f"Session {event.session_id} cancelled request recorded: "
+            f"{duration_ms}ms, {partial_length} chars generated"
+        )
+    
+    def get_cancellation_stats(self) -> dict:
+        """Get cancelled LLM requests across all sessions, per model."""
+        return {
+            "cancelled_requests": sum(m["count"] for m in self._cancellations.values()),
+            "partial_chars": sum(m["partial_chars"] for m in self._cancellations.values()),
+            "by_model": {model: dict(m) for model, m in self._cancellations.items()}
+        }
+    
     def get_session_metrics(self, session_id: str) -> Optional[SessionMetrics]:
         """Get metrics for a specific session."""
         return self._session_metrics.get(session_id)
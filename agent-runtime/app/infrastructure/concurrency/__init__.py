@@ -6,8 +6,18 @@
 """
 
 from .session_lock import SessionLockManager, session_lock_manager
+from .admission_controller import (
+    AdmissionRejectedError,
+    LLMAdmissionController,
+    RequestPriority,
+    llm_admission_controller,
+)
 
 __all__ = [
     "SessionLockManager",
     "session_lock_manager",
+    "AdmissionRejectedError",
+    "LLMAdmissionController",
+    "RequestPriority",
+    "llm_admission_controller",
 ]
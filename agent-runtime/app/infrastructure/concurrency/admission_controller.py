@@ -0,0 +1,372 @@
+"""
+Admission control для исходящих запросов к LLM.
+
+Ограничивает число одновременных запросов к LLM Proxy по каждой модели.
+Лимит подстраивается по AIMD (additive increase / multiplicative decrease)
+по наблюдаемой латентности и ответам 429/503. Ожидающие запросы
+обслуживаются по приоритету, при переполнении очереди запрос сразу
+отклоняется с рекомендуемым временем повтора (Retry-After).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core.config import AppConfig
+
+logger = logging.getLogger("agent-runtime.infrastructure.admission_controller")
+
+
+class RequestPriority(IntEnum):
+    """Приоритет запроса к LLM (меньше = важнее)"""
+    
+    INTERACTIVE = 0      # Ход агента, который ждет пользователь
+    CLASSIFICATION = 1   # Классификация задачи оркестратором
+    BACKGROUND = 2       # Фоновые задачи (суммаризация и т.п.)
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Запрос отклонен: очередь к модели переполнена или ожидание истекло.
+    
+    Атрибуты:
+        model: Имя модели
+        retry_after: Рекомендуемая задержка перед повтором (секунды)
+        reason: Причина отказа (queue_full, queue_timeout)
+    """
+    
+    def __init__(self, model: str, retry_after: int, reason: str):
+        self.model = model
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(
+            f"LLM requests for model '{model}' are overloaded ({reason}), "
+            f"retry after {retry_after}s"
+        )
+
+
+def is_overload_error(exception: BaseException) -> bool:
+    """
+    Проверить, сигнализирует ли ошибка о перегрузке upstream (429/503).
+    
+    Проверяется вся цепочка причин, т.к. клиенты оборачивают
+    httpx ошибки в собственные исключения.
+    
+    Args:
+        exception: Исключение
+    
+    Returns:
+        True если upstream перегружен
+    """
+    current: Optional[BaseException] = exception
+    while current is not None:
+        if isinstance(current, httpx.HTTPStatusError):
+            return current.response.status_code in (429, 503)
+        current = current.__cause__
+    return False
+
+
+class AIMDLimiter:
+    """
+    Адаптивный лимит конкурентности для одной модели.
+    
+    - Успешный быстрый ответ: limit += 1 / limit (≈ +1 за окно запросов)
+    - 429/503 или латентность выше цели: limit *= backoff_ratio
+      (не чаще одного раза за время ответа, чтобы не обвалить лимит
+      пачкой одновременных медленных ответов)
+    
+    Атрибуты:
+        limit: Текущий лимит (дробный, используется целая часть)
+        in_flight: Число выполняющихся запросов
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target_ms: float,
+        backoff_ratio: float = 0.5
+    ):
+        """
+        Инициализация лимитера.
+        
+        Args:
+            initial_limit: Начальный лимит
+            min_limit: Минимальный лимит
+            max_limit: Максимальный лимит
+            latency_target_ms: Целевая латентность запроса
+            backoff_ratio: Множитель уменьшения лимита
+        """
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._latency_target_ms = latency_target_ms
+        self._backoff_ratio = backoff_ratio
+        self._waiters: List[list] = []  # heap of [priority, seq, future]
+        self._queued = 0
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self.latency_ewma_ms: Optional[float] = None
+    
+    @property
+    def queue_size(self) -> int:
+        """Число ожидающих запросов"""
+        return self._queued
+    
+    def has_free_slot(self) -> bool:
+        """Есть ли свободный слот без ожидания"""
+        return self.in_flight < int(self.limit) and self._queued == 0
+    
+    async def acquire(self, priority: RequestPriority, timeout: Optional[float]) -> None:
+        """
+        Занять слот, при необходимости дождавшись своей очереди.
+        
+        Raises:
+            asyncio.TimeoutError: Если слот не получен за timeout
+        """
+        if self.has_free_slot():
+            self.in_flight += 1
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [int(priority), next(self._seq), future])
+        self._queued += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан, но ожидающий ушел - вернуть слот
+                self._release_slot()
+            else:
+                future.cancel()
+                self._queued -= 1
+            raise
+    
+    def release(self, latency_ms: float, overloaded: bool) -> None:
+        """
+        Освободить слот и скорректировать лимит.
+        
+        Args:
+            latency_ms: Длительность запроса
+            overloaded: Upstream ответил 429/503
+        """
+        now = time.monotonic()
+        if overloaded or latency_ms > self._latency_target_ms:
+            if now - self._last_decrease >= latency_ms / 1000:
+                self.limit = max(self._min_limit, self.limit * self._backoff_ratio)
+                self._last_decrease = now
+                logger.info(
+                    f"Concurrency limit decreased to {int(self.limit)} "
+                    f"(overloaded={overloaded}, latency={latency_ms:.0f}ms)"
+                )
+        else:
+            self.limit = min(self._max_limit, self.limit + 1 / self.limit)
+        
+        if not overloaded:
+            self.latency_ewma_ms = (
+                latency_ms if self.latency_ewma_ms is None
+                else 0.8 * self.latency_ewma_ms + 0.2 * latency_ms
+            )
+        
+        self._release_slot()
+    
+    def _release_slot(self) -> None:
+        """Вернуть слот и разбудить ожидающих по приоритету"""
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            future.set_result(None)
+            self._queued -= 1
+            self.in_flight += 1
+
+
+class LLMAdmissionController:
+    """
+    Admission controller исходящих LLM запросов.
+    
+    Держит AIMD лимитер на каждую модель, отклоняет запросы при
+    переполнении очереди и собирает метрики времени ожидания.
+    
+    Атрибуты:
+        _limiters: Лимитеры по имени модели
+        _queue_stats: Статистика ожидания по приоритетам
+        _rejected: Число отказов по причинам
+    
+    Пример:
+        >>> controller = LLMAdmissionController(initial_limit=8)
+        >>> async with controller.admit("gpt-4", RequestPriority.INTERACTIVE):
+        ...     response = await llm_client.chat_completion(...)
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target_ms: float = 60000,
+        max_queue_size: int = 100,
+        queue_timeout: Optional[float] = 30.0,
+        backoff_ratio: float = 0.5
+    ):
+        """
+        Инициализация контроллера.
+        
+        Args:
+            initial_limit: Начальный лимит конкурентности на модель
+            min_limit: Минимальный лимит
+            max_limit: Максимальный лимит
+            latency_target_ms: Латентность, выше которой лимит уменьшается
+            max_queue_size: Максимум ожидающих запросов на модель
+            queue_timeout: Максимальное время ожидания слота (секунды)
+            backoff_ratio: Множитель уменьшения лимита
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit")
+        self._initial_limit = initial_limit
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._latency_target_ms = latency_target_ms
+        self._max_queue_size = max_queue_size
+        self._queue_timeout = queue_timeout
+        self._backoff_ratio = backoff_ratio
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        self._queue_stats: Dict[str, Dict[str, float]] = {
+            priority.name.lower(): {"admitted": 0, "total_queue_ms": 0.0, "max_queue_ms": 0.0}
+            for priority in RequestPriority
+        }
+        self._rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        
+        logger.info(
+            f"LLMAdmissionController initialized (limit={initial_limit} "
+            f"[{min_limit}..{max_limit}], queue={max_queue_size})"
+        )
+    
+    def _get_limiter(self, model: str) -> AIMDLimiter:
+        """Получить или создать лимитер модели"""
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = AIMDLimiter(
+                initial_limit=self._initial_limit,
+                min_limit=self._min_limit,
+                max_limit=self._max_limit,
+                latency_target_ms=self._latency_target_ms,
+                backoff_ratio=self._backoff_ratio
+            )
+            self._limiters[model] = limiter
+        return limiter
+    
+    @asynccontextmanager
+    async def admit(
+        self,
+        model: str,
+        priority: RequestPriority = RequestPriority.INTERACTIVE
+    ):
+        """
+        Выполнить запрос к модели в пределах лимита.
+        
+        Args:
+            model: Имя модели
+            priority: Приоритет запроса
+        
+        Raises:
+            AdmissionRejectedError: Очередь переполнена или ожидание истекло
+        """
+        limiter = self._get_limiter(model)
+        if not limiter.has_free_slot() and limiter.queue_size >= self._max_queue_size:
+            raise self._reject(model, limiter, "queue_full")
+        
+        queued_at = time.monotonic()
+        try:
+            await limiter.acquire(priority, self._queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(model, limiter, "queue_timeout") from None
+        
+        started_at = time.monotonic()
+        self._record_queue_time(priority, (started_at - queued_at) * 1000)
+        
+        overloaded = False
+        try:
+            yield
+        except BaseException as e:
+            overloaded = is_overload_error(e)
+            raise
+        finally:
+            limiter.release((time.monotonic() - started_at) * 1000, overloaded)
+    
+    def _reject(
+        self,
+        model: str,
+        limiter: AIMDLimiter,
+        reason: str
+    ) -> AdmissionRejectedError:
+        """Зафиксировать отказ и оценить Retry-After по очереди и латентности"""
+        self._rejected[reason] += 1
+        latency_s = (limiter.latency_ewma_ms or 1000) / 1000
+        retry_after = math.ceil(latency_s * (limiter.queue_size + 1) / max(1, int(limiter.limit)))
+        retry_after = min(max(retry_after, 1), 60)
+        logger.warning(
+            f"LLM request for model {model} rejected ({reason}): "
+            f"in_flight={limiter.in_flight}, queued={limiter.queue_size}, "
+            f"retry_after={retry_after}s"
+        )
+        return AdmissionRejectedError(model, retry_after, reason)
+    
+    def _record_queue_time(self, priority: RequestPriority, queue_ms: float) -> None:
+        """Обновить метрики времени ожидания"""
+        stats = self._queue_stats[priority.name.lower()]
+        stats["admitted"] += 1
+        stats["total_queue_ms"] += queue_ms
+        stats["max_queue_ms"] = max(stats["max_queue_ms"], queue_ms)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Получить метрики admission control.
+        
+        Returns:
+            Лимиты и очереди по моделям, время ожидания по приоритетам, отказы
+        """
+        return {
+            "models": {
+                model: {
+                    "limit": int(limiter.limit),
+                    "in_flight": limiter.in_flight,
+                    "queued": limiter.queue_size,
+                    "latency_ewma_ms": round(limiter.latency_ewma_ms or 0, 2)
+                }
+                for model, limiter in self._limiters.items()
+            },
+            "queue_time": {
+                priority: {
+                    "admitted": int(stats["admitted"]),
+                    "avg_queue_ms": round(
+                        stats["total_queue_ms"] / stats["admitted"], 2
+                    ) if stats["admitted"] else 0.0,
+                    "max_queue_ms": round(stats["max_queue_ms"], 2)
+                }
+                for priority, stats in self._queue_stats.items()
+            },
+            "rejected": dict(self._rejected)
+        }
+
+
+# Singleton instance
+llm_admission_controller = LLMAdmissionController(
+    initial_limit=AppConfig.LLM_CONCURRENCY_INITIAL_LIMIT,
+    min_limit=AppConfig.LLM_CONCURRENCY_MIN_LIMIT,
+    max_limit=AppConfig.LLM_CONCURRENCY_MAX_LIMIT,
+    latency_target_ms=AppConfig.LLM_LATENCY_TARGET_MS,
+    max_queue_size=AppConfig.LLM_QUEUE_MAX_SIZE,
+    queue_timeout=AppConfig.LLM_QUEUE_TIMEOUT
+)
@@ -12,7 +12,8 @@ from ...events.event_bus import event_bus
 from ...events.llm_events import (
     LLMRequestStartedEvent,
     LLMRequestCompletedEvent,
-    LLMRequestFailedEvent
+    LLMRequestFailedEvent,
+    LLMRequestCancelledEvent
 )
 from ...events.tool_events import (
     ToolExecutionRequestedEvent,
@@ -117,7 +118,8 @@ class LLMEventPublisher:
             completion_tokens=usage.completion_tokens,
             total_tokens=usage.total_tokens,
             has_tool_calls=has_tool_calls,
-            correlation_id=correlation_id
+            correlation_id=correlation_id,
+            cached_prompt_tokens=usage.cached_prompt_tokens
         )
         
         await self._event_bus.publish(event)
@@ -153,6 +155,40 @@ class LLMEventPublisher:
         await self._event_bus.publish(event)
         logger.debug("✓ LLM_REQUEST_FAILED event published")
     
+    async def publish_request_cancelled(
+        self,
+        session_id: str,
+        model: str,
+        duration_ms: int,
+        partial_length: int,
+        correlation_id: Optional[str] = None
+    ) -> None:
+        """
+        Опубликовать событие отмены LLM запроса (клиент отключился).
+        
+        Args:
+            session_id: ID сессии
+            model: Имя модели
+            duration_ms: Время от начала запроса до отмены в миллисекундах
+            partial_length: Длина сгенерированного до отмены текста
+            correlation_id: ID для трассировки (опционально)
+        """
+        logger.info(
+            f"📊 Publishing LLM_REQUEST_CANCELLED event for session {session_id} "
+            f"after {duration_ms}ms"
+        )
+        
+        event = LLMRequestCancelledEvent(
+            session_id=session_id,
+            model=model,
+            duration_ms=duration_ms,
+            partial_length=partial_length,
+            correlation_id=correlation_id
+        )
+        
+        await self._event_bus.publish(event)
+        logger.debug("✓ LLM_REQUEST_CANCELLED event published")
+    
     async def publish_tool_execution_requested(
         self,
         session_id: str,
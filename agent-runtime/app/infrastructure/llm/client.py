@@ -3,7 +3,7 @@ LLM Proxy Client for agent runtime.
 
 Handles communication with LLM Proxy service via REST API.
 
-UPDATED: Uses RetryHandler and CircuitBreaker for resilience.
+UPDATED: Uses RetryHandler and a per-(upstream, model) circuit breaker for resilience.
 """
 import logging
 from typing import Any, Dict, List, Optional
@@ -11,27 +11,31 @@ from typing import Any, Dict, List, Optional
 import httpx
 
 from app.core.config import AppConfig
-from app.infrastructure.resilience import CircuitBreaker, RetryHandler, is_retryable_http_error
+from app.infrastructure.concurrency import RequestPriority, llm_admission_controller
+from app.infrastructure.resilience import (
+    RetryBudget,
+    RetryHandler,
+    is_retryable_http_error,
+    llm_circuit_breakers,
+)
 
 logger = logging.getLogger("agent-runtime.infrastructure.llm.client")
 
-# Circuit breaker для защиты от каскадных сбоев LLM Proxy
-llm_circuit_breaker = CircuitBreaker(
-    failure_threshold=5,      # Открыть после 5 ошибок подряд
-    recovery_timeout=60,      # Попытка восстановления через 60 секунд
-    expected_exception=Exception
-)
-
-# Retry handler для LLM запросов
+# Retry handler для LLM запросов (full jitter, общий бюджет повторов,
+# повторяются только timeout/429/503/504, дедлайн запроса соблюдается)
 llm_retry_handler = RetryHandler(
     max_retries=3,
     base_delay=2.0,
     max_delay=10.0,
-    exponential_base=2.0
+    exponential_base=2.0,
+    budget=RetryBudget(retry_ratio=AppConfig.LLM_RETRY_BUDGET_RATIO),
+    retry_on=is_retryable_http_error
 )
 
-logger.info("LLM Circuit Breaker initialized (threshold=5, timeout=60s)")
-logger.info("LLM Retry Handler initialized (max_retries=3, base_delay=2.0s)")
+logger.info(
+    f"LLM Retry Handler initialized (max_retries=3, base_delay=2.0s, "
+    f"budget={AppConfig.LLM_RETRY_BUDGET_RATIO:.0%} of requests)"
+)
 
 
 class LLMProxyClient:
@@ -39,7 +43,8 @@ class LLMProxyClient:
     Client for communicating with LLM Proxy service.
     
     Encapsulates REST API calls to LLM Proxy for chat completions.
-    Uses RetryHandler for automatic retries and CircuitBreaker for protection.
+    Uses RetryHandler for automatic retries and a circuit breaker per
+    (LLM Proxy URL, model) from llm_circuit_breakers for protection.
     """
 
     def __init__(
@@ -67,12 +72,15 @@ class LLMProxyClient:
         tools: Optional[List[Dict[str, Any]]] = None,
         stream: bool = False,
         extra_params: Optional[Dict[str, Any]] = None,
+        priority: RequestPriority = RequestPriority.BACKGROUND,
+        use_response_cache: bool = False,
     ) -> Dict[str, Any]:
         """
         Send chat completion request to LLM Proxy with automatic retry.
         
         Automatically retries on transient errors (timeouts, rate limits, 503/504).
-        Uses exponential backoff: 2s, 4s, 8s (max 10s).
+        Uses exponential backoff with full jitter: up to 2s, 4s, 8s (max 10s).
+        Retries are limited by the shared retry budget and the request deadline.
         
         Args:
             model: Model identifier
@@ -80,11 +88,16 @@ class LLMProxyClient:
             tools: Optional list of tool specifications
             stream: Whether to stream the response
             extra_params: Additional parameters for the request
+            priority: Admission priority (the whole retry sequence holds one slot)
+            use_response_cache: Allow LLM Proxy to answer from its response cache.
+                Only for deterministic calls (e.g. task classification)
             
         Returns:
             LLM response as dictionary
             
         Raises:
+            AdmissionRejectedError: If the outbound queue for the model is saturated
+            CircuitOpenError: If the circuit for the model is open
             Exception: If all retry attempts fail or non-retryable error occurs
         """
         # Build request payload
@@ -106,6 +119,12 @@ class LLMProxyClient:
         )
         logger.debug(f"Request payload keys: {list(payload.keys())}")
 
+        headers = {"X-Internal-Auth": self.api_key}
+        if use_response_cache:
+            headers["X-LLM-Cache"] = "use"
+
+        circuit_breaker = llm_circuit_breakers.get(self.api_url, model)
+
         # Wrap the actual request in retry handler
         @llm_retry_handler
         async def _make_request_with_retry():
@@ -116,13 +135,13 @@ class LLMProxyClient:
                         response = await client.post(
                             f"{self.api_url}/v1/chat/completions",
                             json=payload,
-                            headers={"X-Internal-Auth": self.api_key},
+                            headers=headers,
                             timeout=self.timeout,
                         )
                         response.raise_for_status()
                         return response
                 
-                response = await llm_circuit_breaker.call(make_request)
+                response = await circuit_breaker.call(make_request)
                 
                 result = response.json()
                 
@@ -158,7 +177,8 @@ class LLMProxyClient:
                 )
                 raise
         
-        return await _make_request_with_retry()
+        async with llm_admission_controller.admit(model, priority):
+            return await _make_request_with_retry()
 
 
 # Singleton instance for global use
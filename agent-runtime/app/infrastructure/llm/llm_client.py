@@ -8,10 +8,17 @@ LLM Client для взаимодействия с LLM провайдерами.
 import json
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 
 from ...domain.entities.llm_response import LLMResponse, ToolCall, TokenUsage
 from ...core.config import AppConfig
+from ..concurrency.admission_controller import is_overload_error
+from .tool_parser import StreamingToolCallParser, ToolCallDelta
+from ..resilience.circuit_breaker_registry import (
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    llm_circuit_breakers,
+)
 
 logger = logging.getLogger("agent-runtime.infrastructure.llm_client")
 
@@ -41,7 +48,10 @@ class LLMClient(ABC):
         tools: List[Dict[str, Any]],
         stream: bool = False,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        cache_hints: Optional[Dict[str, Any]] = None,
+        tools_json: Optional[bytes] = None,
+        fallback_models: Optional[List[str]] = None
     ) -> LLMResponse:
         """
         Выполнить chat completion запрос к LLM.
@@ -53,6 +63,12 @@ class LLMClient(ABC):
             stream: Использовать ли стриминг (пока не поддерживается)
             temperature: Температура генерации (0.0-2.0)
             max_tokens: Максимальное количество токенов в ответе
+            cache_hints: Подсказки кэширования префикса для провайдера
+                (prompt_cache_key, cache_control)
+            tools_json: Предварительно сериализованный tools (JSON, UTF-8).
+                Если задан, вставляется в тело запроса вместо tools
+            fallback_models: Резервные модели по порядку (используются при
+                сбое или задержке основной модели)
             
         Returns:
             LLMResponse: Доменный объект ответа LLM
@@ -61,6 +77,56 @@ class LLMClient(ABC):
             LLMClientError: При ошибке вызова LLM API
         """
         pass
+    
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        cache_hints: Optional[Dict[str, Any]] = None,
+        tools_json: Optional[bytes] = None,
+        fallback_models: Optional[List[str]] = None
+    ) -> AsyncIterator[Union[str, ToolCallDelta, LLMResponse]]:
+        """
+        Выполнить chat completion со стримингом.
+        
+        Пока модель генерирует ответ, выдаются токены текста (str) и
+        ToolCallDelta (аргументы разбираются по мере поступления).
+        Последним элементом всегда выдается итоговый LLMResponse.
+        
+        Реализация по умолчанию не стримит: выдает только LLMResponse
+        от chat_completion.
+        
+        Args:
+            Те же, что у chat_completion
+        
+        Yields:
+            Токены и ToolCallDelta во время генерации, затем LLMResponse
+        """
+        yield await self.chat_completion(
+            model=model,
+            messages=messages,
+            tools=tools,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cache_hints=cache_hints,
+            tools_json=tools_json,
+            fallback_models=fallback_models
+        )
+    
+    async def get_model_context_length(self, model: str) -> Optional[int]:
+        """
+        Получить размер контекстного окна модели.
+        
+        Args:
+            model: Имя модели
+            
+        Returns:
+            Размер окна в токенах или None, если неизвестен
+        """
+        return None
 
 
 class LLMProxyClient(LLMClient):
@@ -74,6 +140,7 @@ class LLMProxyClient(LLMClient):
         _base_url: URL LiteLLM Proxy сервера
         _api_key: API ключ для аутентификации (опционально)
         _timeout: Таймаут запросов в секундах
+        _circuit_breakers: Реестр circuit breaker по (upstream, модель)
     
     Пример:
         >>> client = LLMProxyClient(
@@ -88,7 +155,8 @@ class LLMProxyClient(LLMClient):
         self,
         base_url: Optional[str] = None,
         api_key: Optional[str] = None,
-        timeout: int = 360
+        timeout: int = 360,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None
     ):
         """
         Инициализация LLM Proxy клиента.
@@ -97,11 +165,15 @@ class LLMProxyClient(LLMClient):
             base_url: URL LiteLLM Proxy (по умолчанию из конфига)
             api_key: Internal API key для аутентификации (по умолчанию из конфига)
             timeout: Таймаут запросов в секундах
+            circuit_breakers: Реестр circuit breaker (по умолчанию общий)
         """
         self._base_url = base_url or AppConfig.LLM_PROXY_URL
         # Используем INTERNAL_API_KEY как в старом клиенте
         self._api_key = api_key or AppConfig.INTERNAL_API_KEY
         self._timeout = timeout
+        self._circuit_breakers = circuit_breakers or llm_circuit_breakers
+        # Кэш размеров контекстных окон моделей (model -> context_length)
+        self._context_lengths: Optional[Dict[str, int]] = None
         
         # Импортируем httpx здесь, чтобы не создавать зависимость на уровне модуля
         import httpx
@@ -130,11 +202,19 @@ class LLMProxyClient(LLMClient):
         tools: List[Dict[str, Any]],
         stream: bool = False,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        cache_hints: Optional[Dict[str, Any]] = None,
+        tools_json: Optional[bytes] = None,
+        fallback_models: Optional[List[str]] = None
     ) -> LLMResponse:
         """
         Выполнить chat completion через LiteLLM Proxy.
         
+        Резервные модели передаются в LLM Proxy, который сам переключается
+        на них при ошибке и дублирует (hedging) медленный запрос. Если
+        circuit основной модели открыт или LLM Proxy ответил 429/503,
+        клиент сам переходит к следующей модели цепочки.
+        
         Args:
             model: Имя модели
             messages: История сообщений
@@ -142,43 +222,94 @@ class LLMProxyClient(LLMClient):
             stream: Стриминг (пока не поддерживается)
             temperature: Температура генерации
             max_tokens: Максимум токенов
+            cache_hints: Подсказки кэширования префикса (передаются в LLM Proxy)
+            tools_json: Предварительно сериализованный tools (ToolBundle.tools_json)
+            fallback_models: Резервные модели по порядку
             
         Returns:
             LLMResponse: Доменный объект ответа
             
         Raises:
+            CircuitOpenError: Если circuit открыт для всех моделей цепочки
+            LLMClientError: При ошибке API
+        """
+        models = [model] + [m for m in fallback_models or [] if m != model]
+        
+        for index, current_model in enumerate(models):
+            try:
+                return await self._complete(
+                    model=current_model,
+                    fallback_models=models[index + 1:],
+                    messages=messages,
+                    tools=tools,
+                    stream=stream,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    cache_hints=cache_hints,
+                    tools_json=tools_json
+                )
+            except (CircuitOpenError, LLMClientError) as e:
+                if index == len(models) - 1 or not self._should_fall_back(e):
+                    raise
+                logger.warning(
+                    f"Model {current_model} unavailable ({e}), "
+                    f"falling back to {models[index + 1]}"
+                )
+    
+    @staticmethod
+    def _should_fall_back(error: Exception) -> bool:
+        """
+        Переходить ли к следующей модели цепочки.
+        
+        Таймауты и сетевые ошибки не приводят к переходу: LLM Proxy
+        уже перебрал цепочку сам, повтор только удвоил бы ожидание.
+        """
+        return isinstance(error, CircuitOpenError) or is_overload_error(error)
+    
+    async def _complete(
+        self,
+        model: str,
+        fallback_models: List[str],
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        stream: bool,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        cache_hints: Optional[Dict[str, Any]],
+        tools_json: Optional[bytes]
+    ) -> LLMResponse:
+        """
+        Выполнить один запрос к LLM Proxy для модели.
+        
+        Raises:
+            CircuitOpenError: Если circuit для модели открыт
             LLMClientError: При ошибке API
         """
         try:
-            # Подготовка запроса
-            request_data = {
-                "model": model,
-                "messages": messages,
-                "stream": stream
-            }
-            
-            if tools:
-                request_data["tools"] = tools
-            
-            if temperature is not None:
-                request_data["temperature"] = temperature
-            
-            if max_tokens is not None:
-                request_data["max_tokens"] = max_tokens
-            
-            logger.debug(
-                f"Calling LLM: model={model}, messages={len(messages)}, "
-                f"tools={len(tools)}"
+            payload = self._build_payload(
+                model=model,
+                fallback_models=fallback_models,
+                messages=messages,
+                tools=tools,
+                stream=stream,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                cache_hints=cache_hints,
+                tools_json=tools_json
             )
             
-            # Вызов API (с префиксом /v1 как в старом клиенте)
-            response = await self._http_client.post(
-                f"{self._base_url}/v1/chat/completions",
-                json=request_data,
-                headers=self._get_headers()
-            )
+            async def make_request():
+                # Вызов API (с префиксом /v1 как в старом клиенте)
+                response = await self._http_client.post(
+                    f"{self._base_url}/v1/chat/completions",
+                    headers=self._get_headers(),
+                    **payload
+                )
+                response.raise_for_status()
+                return response
             
-            response.raise_for_status()
+            circuit_breaker = self._circuit_breakers.get(self._base_url, model)
+            response = await circuit_breaker.call(make_request)
             response_data = response.json()
             
             logger.debug(f"LLM response received: {len(str(response_data))} chars")
@@ -186,10 +317,220 @@ class LLMProxyClient(LLMClient):
             # Парсинг ответа
             return self._parse_response(response_data, model)
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error calling LLM API: {e}", exc_info=True)
             raise LLMClientError(f"Failed to call LLM API: {e}") from e
     
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        cache_hints: Optional[Dict[str, Any]] = None,
+        tools_json: Optional[bytes] = None,
+        fallback_models: Optional[List[str]] = None
+    ) -> AsyncIterator[Union[str, ToolCallDelta, LLMResponse]]:
+        """
+        Выполнить chat completion со стримингом через LLM Proxy.
+        
+        Аргументы tool calls разбираются инкрементально по мере прихода
+        SSE чанков, итоговые аргументы валидируются один раз в конце.
+        Переход к резервной модели возможен только до начала стрима.
+        
+        Yields:
+            Токены и ToolCallDelta во время генерации, затем LLMResponse
+        
+        Raises:
+            CircuitOpenError: Если circuit открыт для всех моделей цепочки
+            LLMClientError: При ошибке API
+        """
+        models = [model] + [m for m in fallback_models or [] if m != model]
+        
+        for index, current_model in enumerate(models):
+            try:
+                response = await self._open_stream(
+                    model=current_model,
+                    fallback_models=models[index + 1:],
+                    messages=messages,
+                    tools=tools,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    cache_hints=cache_hints,
+                    tools_json=tools_json
+                )
+                break
+            except (CircuitOpenError, LLMClientError) as e:
+                if index == len(models) - 1 or not self._should_fall_back(e):
+                    raise
+                logger.warning(
+                    f"Model {current_model} unavailable ({e}), "
+                    f"falling back to {models[index + 1]}"
+                )
+        
+        parser = StreamingToolCallParser()
+        content_parts: List[str] = []
+        usage_data: Dict[str, Any] = {}
+        finish_reason = None
+        response_model = current_model
+        
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if not data:
+                    continue
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "choices" not in chunk:
+                    raise LLMClientError(f"LLM stream failed: {chunk.get('error', chunk)}")
+                
+                response_model = chunk.get("model") or response_model
+                usage_data = chunk.get("usage") or usage_data
+                for choice in chunk["choices"]:
+                    delta = choice.get("delta") or {}
+                    if delta.get("content"):
+                        content_parts.append(delta["content"])
+                        yield delta["content"]
+                    for tool_delta in parser.feed(delta.get("tool_calls")):
+                        yield tool_delta
+                    finish_reason = choice.get("finish_reason") or finish_reason
+        except LLMClientError:
+            raise
+        except Exception as e:
+            logger.error(f"Error reading LLM stream: {e}", exc_info=True)
+            raise LLMClientError(f"Failed to read LLM stream: {e}") from e
+        finally:
+            await response.aclose()
+        
+        yield LLMResponse(
+            content="".join(content_parts),
+            tool_calls=[
+                ToolCall(id=tc.id, tool_name=tc.tool_name, arguments=tc.arguments)
+                for tc in parser.finish()
+            ],
+            usage=self._parse_usage(usage_data),
+            model=response_model,
+            finish_reason=finish_reason
+        )
+    
+    async def _open_stream(
+        self,
+        model: str,
+        fallback_models: List[str],
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        cache_hints: Optional[Dict[str, Any]],
+        tools_json: Optional[bytes]
+    ):
+        """
+        Открыть SSE стрим LLM Proxy для модели.
+        
+        Returns:
+            httpx.Response с непрочитанным телом (закрывает вызывающий)
+        
+        Raises:
+            CircuitOpenError: Если circuit для модели открыт
+            LLMClientError: При ошибке API
+        """
+        try:
+            payload = self._build_payload(
+                model=model,
+                fallback_models=fallback_models,
+                messages=messages,
+                tools=tools,
+                stream=True,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                cache_hints=cache_hints,
+                tools_json=tools_json
+            )
+            
+            async def open_request():
+                request = self._http_client.build_request(
+                    "POST",
+                    f"{self._base_url}/v1/chat/completions",
+                    headers=self._get_headers(),
+                    **payload
+                )
+                response = await self._http_client.send(request, stream=True)
+                try:
+                    response.raise_for_status()
+                except Exception:
+                    await response.aclose()
+                    raise
+                return response
+            
+            circuit_breaker = self._circuit_breakers.get(self._base_url, model)
+            return await circuit_breaker.call(open_request)
+        
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"Error opening LLM stream: {e}", exc_info=True)
+            raise LLMClientError(f"Failed to call LLM API: {e}") from e
+    
+    def _build_payload(
+        self,
+        model: str,
+        fallback_models: List[str],
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        stream: bool,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        cache_hints: Optional[Dict[str, Any]],
+        tools_json: Optional[bytes]
+    ) -> Dict[str, Any]:
+        """
+        Подготовить тело запроса к LLM Proxy.
+        
+        Returns:
+            Аргументы для httpx (json=... или готовый content=...)
+        """
+        # Подготовка запроса
+        request_data = {
+            "model": model,
+            "messages": messages,
+            "stream": stream
+        }
+        
+        if tools and tools_json is None:
+            request_data["tools"] = tools
+        
+        if temperature is not None:
+            request_data["temperature"] = temperature
+        
+        if max_tokens is not None:
+            request_data["max_tokens"] = max_tokens
+        
+        if cache_hints:
+            request_data.update(cache_hints)
+        
+        if fallback_models:
+            request_data["fallback_models"] = fallback_models
+        
+        logger.debug(
+            f"Calling LLM: model={model}, messages={len(messages)}, "
+            f"tools={len(tools)}"
+        )
+        
+        if tools and tools_json is not None:
+            # Готовый JSON инструментов вставляется без повторной сериализации
+            body = json.dumps(request_data, ensure_ascii=False).encode("utf-8")
+            payload = {"content": body[:-1] + b',"tools":' + tools_json + b"}"}
+        else:
+            payload = {"json": request_data}
+        
+        return payload
+    
     def _parse_response(
         self,
         data: Dict[str, Any],
@@ -237,12 +578,7 @@ class LLMProxyClient(LLMClient):
                     tool_calls.append(tool_call)
             
             # Парсинг usage (может быть None для некоторых провайдеров)
-            usage_data = data.get("usage") or {}
-            usage = TokenUsage(
-                prompt_tokens=usage_data.get("prompt_tokens", 0) if isinstance(usage_data, dict) else 0,
-                completion_tokens=usage_data.get("completion_tokens", 0) if isinstance(usage_data, dict) else 0,
-                total_tokens=usage_data.get("total_tokens", 0) if isinstance(usage_data, dict) else 0
-            )
+            usage = self._parse_usage(data.get("usage") or {})
             
             # Извлечение finish_reason
             finish_reason = data["choices"][0].get("finish_reason")
@@ -262,6 +598,65 @@ class LLMProxyClient(LLMClient):
             logger.error(f"Error parsing LLM response: {e}", exc_info=True)
             raise LLMClientError(f"Failed to parse LLM response: {e}") from e
     
+    def _parse_usage(self, usage_data: Any) -> TokenUsage:
+        """Парсинг usage (может быть None или не dict у некоторых провайдеров)"""
+        usage = usage_data if isinstance(usage_data, dict) else {}
+        return TokenUsage(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+            cached_prompt_tokens=self._parse_cached_tokens(usage_data)
+        )
+    
+    @staticmethod
+    def _parse_cached_tokens(usage_data: Any) -> int:
+        """
+        Извлечь количество prompt токенов, прочитанных из кэша провайдера.
+        
+        OpenAI возвращает usage.prompt_tokens_details.cached_tokens,
+        Anthropic (через LiteLLM) - usage.cache_read_input_tokens.
+        """
+        if not isinstance(usage_data, dict):
+            return 0
+        details = usage_data.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") if isinstance(details, dict) else None
+        if not cached:
+            cached = usage_data.get("cache_read_input_tokens")
+        return cached or 0
+    
+    async def get_model_context_length(self, model: str) -> Optional[int]:
+        """
+        Получить размер контекстного окна модели из LLM Proxy.
+        
+        Список моделей запрашивается через /v1/llm/models один раз
+        и кэшируется. При ошибке запроса возвращается None, кэш не заполняется.
+        
+        Args:
+            model: Имя модели
+            
+        Returns:
+            Размер окна в токенах или None, если модель неизвестна
+        """
+        if self._context_lengths is None:
+            try:
+                response = await self._http_client.get(
+                    f"{self._base_url}/v1/llm/models",
+                    headers=self._get_headers()
+                )
+                response.raise_for_status()
+                context_lengths = {}
+                for item in response.json():
+                    for key in (item.get("id"), item.get("name")):
+                        if key and item.get("context_length"):
+                            context_lengths[key] = int(item["context_length"])
+                self._context_lengths = context_lengths
+                logger.info(f"Loaded context lengths for {len(context_lengths)} models")
+            except Exception as e:
+                logger.warning(f"Failed to load models from LLM Proxy: {e}")
+                return None
+        
+        return self._context_lengths.get(model)
+    
     async def close(self):
         """Закрыть HTTP клиент"""
         await self._http_client.aclose()
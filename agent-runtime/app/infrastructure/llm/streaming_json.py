@@ -0,0 +1,310 @@
+"""
+Incremental JSON parser for streamed tool call arguments.
+
+OpenAI-compatible streams deliver tool call arguments as arbitrary
+fragments of one JSON object. The parser consumes those fragments as
+they arrive and reports top-level fields early: string values are
+reported piece by piece (e.g. the content of write_file), other values
+once they are complete. The full document is validated once, at the end.
+"""
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("agent-runtime.streaming_json")
+
+_STRING_STOP = re.compile(r'["\\]')
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_WHITESPACE = " \t\r\n"
+
+# Parser states
+_EXPECT_OBJECT = 0
+_EXPECT_KEY = 1
+_IN_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_IN_STRING_VALUE = 5
+_IN_RAW_VALUE = 6
+_EXPECT_SEPARATOR = 7
+_DONE = 8
+_FAILED = 9
+
+
+@dataclass
+class ArgumentDelta:
+    """
+    Progress of one top-level argument.
+    
+    For string values `text` holds the newly decoded piece and
+    `complete` becomes True when the closing quote arrives. For other
+    values `value` holds the parsed value and `complete` is always True.
+    """
+    name: str
+    text: Optional[str] = None
+    value: Any = None
+    complete: bool = False
+
+
+class _StringDecoder:
+    """Decodes a JSON string body that may be split at any character"""
+    
+    def __init__(self):
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+    
+    def feed(self, data: str, start: int, out: List[str]) -> int:
+        """
+        Decode data[start:] into out until the closing quote.
+        
+        Returns:
+            Index right after the closing quote, or -1 if the string
+            continues in the next fragment
+        """
+        i = start
+        n = len(data)
+        while i < n:
+            if self._unicode is not None:
+                take = min(4 - len(self._unicode), n - i)
+                self._unicode += data[i:i + take]
+                i += take
+                if len(self._unicode) == 4:
+                    self._emit_code_point(int(self._unicode, 16), out)
+                    self._unicode = None
+                continue
+            if self._escape:
+                self._escape = False
+                char = data[i]
+                i += 1
+                if char == "u":
+                    self._unicode = ""
+                    continue
+                self._flush_surrogate(out)
+                out.append(_SIMPLE_ESCAPES.get(char, char))
+                continue
+            match = _STRING_STOP.search(data, i)
+            end = match.start() if match else n
+            if end > i:
+                self._flush_surrogate(out)
+                out.append(data[i:end])
+            if match is None:
+                return -1
+            i = end + 1
+            if match.group() == '"':
+                self._flush_surrogate(out)
+                return i
+            self._escape = True
+        return -1
+    
+    def _emit_code_point(self, code: int, out: List[str]) -> None:
+        if self._high_surrogate is not None and 0xDC00 <= code <= 0xDFFF:
+            combined = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            out.append(chr(combined))
+            return
+        self._flush_surrogate(out)
+        if 0xD800 <= code <= 0xDBFF:
+            # The low half may arrive in the next escape sequence
+            self._high_surrogate = code
+        else:
+            out.append(chr(code))
+    
+    def _flush_surrogate(self, out: List[str]) -> None:
+        if self._high_surrogate is not None:
+            out.append(chr(self._high_surrogate))
+            self._high_surrogate = None
+
+
+class IncrementalJSONObjectParser:
+    """
+    Streaming parser for a single JSON object (tool call arguments).
+    
+    feed() never raises: malformed input stops delta reporting and is
+    reported by finish(), which validates the whole document with
+    json.loads exactly once.
+    
+    Example:
+        >>> parser = IncrementalJSONObjectParser()
+        >>> parser.feed('{"path": "src/ma')
+        [ArgumentDelta(name='path', text='src/ma', value=None, complete=False)]
+        >>> parser.feed('in.py", "content": "print(1)"}')
+        [ArgumentDelta(name='path', text='in.py', value=None, complete=True),
+         ArgumentDelta(name='content', text='print(1)', value=None, complete=True)]
+        >>> parser.finish()
+        {'path': 'src/main.py', 'content': 'print(1)'}
+    """
+    
+    def __init__(self):
+        self._parts: List[str] = []
+        self._state = _EXPECT_OBJECT
+        self._decoder: Optional[_StringDecoder] = None
+        self._key_parts: List[str] = []
+        self._key: Optional[str] = None
+        self._raw: List[str] = []
+        self._raw_depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+    
+    @property
+    def failed(self) -> bool:
+        """True if the streamed text is already known to be invalid JSON"""
+        return self._state == _FAILED
+    
+    def feed(self, fragment: str) -> List[ArgumentDelta]:
+        """
+        Consume the next fragment of the arguments string.
+        
+        Args:
+            fragment: Next piece of the JSON text (any split point)
+        
+        Returns:
+            Argument deltas completed or extended by this fragment
+        """
+        if not fragment:
+            return []
+        self._parts.append(fragment)
+        deltas: List[ArgumentDelta] = []
+        try:
+            self._consume(fragment, deltas)
+        except ValueError as e:
+            logger.debug(f"Streamed tool arguments are not valid JSON: {e}")
+            self._state = _FAILED
+        return deltas
+    
+    def finish(self) -> Dict[str, Any]:
+        """
+        Validate the complete arguments text.
+        
+        Returns:
+            Parsed arguments ({} for empty input)
+        
+        Raises:
+            ValueError: If the text is not a JSON object
+        """
+        text = "".join(self._parts)
+        if not text.strip():
+            return {}
+        arguments = json.loads(text)
+        if not isinstance(arguments, dict):
+            raise ValueError(
+                f"Tool arguments must be a JSON object, got {type(arguments).__name__}"
+            )
+        return arguments
+    
+    def _consume(self, data: str, deltas: List[ArgumentDelta]) -> None:
+        i = 0
+        n = len(data)
+        while i < n:
+            state = self._state
+            if state in (_DONE, _FAILED):
+                if state == _DONE and data[i:].strip():
+                    raise ValueError("Extra data after the arguments object")
+                return
+            
+            if state == _IN_STRING_VALUE:
+                out: List[str] = []
+                end = self._decoder.feed(data, i, out)
+                text = "".join(out)
+                if end == -1:
+                    if text:
+                        deltas.append(ArgumentDelta(name=self._key, text=text))
+                    return
+                deltas.append(ArgumentDelta(name=self._key, text=text, complete=True))
+                self._state = _EXPECT_SEPARATOR
+                i = end
+                continue
+            
+            if state == _IN_KEY:
+                end = self._decoder.feed(data, i, self._key_parts)
+                if end == -1:
+                    return
+                self._key = "".join(self._key_parts)
+                self._key_parts = []
+                self._state = _EXPECT_COLON
+                i = end
+                continue
+            
+            if state == _IN_RAW_VALUE:
+                i = self._consume_raw(data, i, deltas)
+                continue
+            
+            char = data[i]
+            i += 1
+            if char in _WHITESPACE:
+                continue
+            
+            if state == _EXPECT_OBJECT:
+                if char != "{":
+                    raise ValueError("Arguments must start with '{'")
+                self._state = _EXPECT_KEY
+            elif state == _EXPECT_KEY:
+                if char == '"':
+                    self._decoder = _StringDecoder()
+                    self._state = _IN_KEY
+                elif char == "}" and self._key is None:
+                    # Only an empty object may close here, not a trailing comma
+                    self._state = _DONE
+                else:
+                    raise ValueError(f"Unexpected {char!r} while expecting a key")
+            elif state == _EXPECT_COLON:
+                if char != ":":
+                    raise ValueError(f"Unexpected {char!r} while expecting ':'")
+                self._state = _EXPECT_VALUE
+            elif state == _EXPECT_VALUE:
+                if char == '"':
+                    self._decoder = _StringDecoder()
+                    self._state = _IN_STRING_VALUE
+                else:
+                    self._raw = []
+                    self._raw_depth = 0
+                    self._raw_in_string = False
+                    self._raw_escape = False
+                    self._state = _IN_RAW_VALUE
+                    i -= 1
+            elif state == _EXPECT_SEPARATOR:
+                if char == ",":
+                    self._state = _EXPECT_KEY
+                elif char == "}":
+                    self._state = _DONE
+                else:
+                    raise ValueError(f"Unexpected {char!r} after a value")
+    
+    def _consume_raw(self, data: str, start: int, deltas: List[ArgumentDelta]) -> int:
+        """Collect a non-string value (number, literal, object, array)"""
+        i = start
+        n = len(data)
+        while i < n:
+            char = data[i]
+            if self._raw_in_string:
+                if self._raw_escape:
+                    self._raw_escape = False
+                elif char == "\\":
+                    self._raw_escape = True
+                elif char == '"':
+                    self._raw_in_string = False
+            elif char == '"':
+                self._raw_in_string = True
+            elif char in "[{":
+                self._raw_depth += 1
+            elif char in "]}" and self._raw_depth > 0:
+                self._raw_depth -= 1
+            elif self._raw_depth == 0 and (char in ",}" or char in _WHITESPACE):
+                self._raw.append(data[start:i])
+                value = json.loads("".join(self._raw))
+                deltas.append(ArgumentDelta(name=self._key, value=value, complete=True))
+                self._state = _EXPECT_SEPARATOR
+                return i
+            i += 1
+        self._raw.append(data[start:])
+        return n
@@ -1,12 +1,15 @@
 """
 Tool call parser for extracting tool calls from LLM responses.
 
-Supports OpenAI native tool calls format (modern and legacy function_call).
+Supports OpenAI native tool calls format (modern and legacy function_call)
+and incremental parsing of tool calls streamed as deltas.
 """
 import json
 import logging
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
+from app.infrastructure.llm.streaming_json import IncrementalJSONObjectParser
 from app.models.schemas import ToolCall
 
 logger = logging.getLogger("agent-runtime.tool_parser")
@@ -142,6 +145,129 @@ class OpenAIToolCallParser:
             return None
 
 
+@dataclass
+class ToolCallDelta:
+    """
+    Partial tool call reported while the LLM is still generating it.
+    
+    The first delta of a call has no argument; it announces call_id and
+    tool_name. Later deltas carry one top-level argument: `text` is the
+    next piece of a string value, `value` a complete non-string value.
+    """
+    index: int
+    call_id: str
+    tool_name: str
+    argument: Optional[str] = None
+    text: Optional[str] = None
+    value: Any = None
+    complete: bool = False
+
+
+class _StreamedToolCall:
+    """Accumulated state of one streamed tool call"""
+    
+    def __init__(self, index: int):
+        self.index = index
+        self.call_id: Optional[str] = None
+        self.tool_name = ""
+        self.arguments = IncrementalJSONObjectParser()
+        self.announced = False
+        # Argument text received before the call could be announced
+        self.pending: List[str] = []
+
+
+class StreamingToolCallParser:
+    """
+    Parser for OpenAI tool calls streamed as `delta.tool_calls` items.
+    
+    Arguments are parsed incrementally as fragments arrive, so callers
+    can react to e.g. the file path of write_file before its content is
+    generated. finish() validates the accumulated arguments once.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[int, _StreamedToolCall] = {}
+    
+    def feed(self, tool_call_deltas: List[Dict[str, Any]]) -> List[ToolCallDelta]:
+        """
+        Consume the tool_calls list of one stream chunk.
+        
+        Args:
+            tool_call_deltas: Items with index, and optionally id,
+                function.name and a function.arguments fragment
+        
+        Returns:
+            Deltas for calls whose id and name are already known
+        """
+        deltas = []
+        for item in tool_call_deltas or []:
+            index = item.get("index", 0)
+            call = self._calls.get(index)
+            if call is None:
+                call = self._calls[index] = _StreamedToolCall(index)
+            if item.get("id"):
+                call.call_id = item["id"]
+            func = item.get("function") or {}
+            if func.get("name") and not call.tool_name:
+                call.tool_name = func["name"]
+            fragment = func.get("arguments") or ""
+            
+            if not call.announced:
+                if fragment:
+                    call.pending.append(fragment)
+                if not (call.call_id and call.tool_name):
+                    continue
+                call.announced = True
+                deltas.append(ToolCallDelta(
+                    index=index, call_id=call.call_id, tool_name=call.tool_name
+                ))
+                fragment = "".join(call.pending)
+                call.pending = []
+            
+            for argument in call.arguments.feed(fragment):
+                deltas.append(ToolCallDelta(
+                    index=index,
+                    call_id=call.call_id,
+                    tool_name=call.tool_name,
+                    argument=argument.name,
+                    text=argument.text,
+                    value=argument.value,
+                    complete=argument.complete,
+                ))
+        return deltas
+    
+    def finish(self) -> List[ToolCall]:
+        """
+        Validate streamed tool calls.
+        
+        Returns:
+            Complete tool calls in index order (invalid arguments become {},
+            as in the non-streaming parser)
+        """
+        tool_calls = []
+        for index in sorted(self._calls):
+            call = self._calls[index]
+            if not call.tool_name:
+                logger.warning("Skipping streamed tool_call with empty tool_name")
+                continue
+            if call.pending:
+                call.arguments.feed("".join(call.pending))
+                call.pending = []
+            try:
+                arguments = call.arguments.finish()
+            except ValueError as e:
+                logger.warning(f"Failed to parse streamed tool arguments: {e}")
+                arguments = {}
+            call_id = call.call_id or f"tc_fallback_{id(call)}"
+            logger.info(f"Parsed streamed tool_call: id={call_id}, tool={call.tool_name}")
+            tool_calls.append(ToolCall.model_construct(
+                id=call_id,
+                tool_name=call.tool_name,
+                arguments=arguments,
+            ))
+        return tool_calls
+
+
 # Global parser instance
 _parser = OpenAIToolCallParser()
 
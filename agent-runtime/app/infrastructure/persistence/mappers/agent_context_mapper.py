@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 
 from ....domain.entities.agent_context import AgentContext, AgentType, AgentSwitch
+from ....core.serialization import dumps, loads
 from ..models import AgentContextModel, AgentSwitchModel, SessionModel
 
 logger = logging.getLogger("agent-runtime.infrastructure.agent_context_mapper")
@@ -69,7 +70,7 @@ class AgentContextMapper:
                 switch_metadata = {}
                 if switch_model.metadata_json:
                     try:
-                        switch_metadata = json.loads(switch_model.metadata_json)
+                        switch_metadata = loads(switch_model.metadata_json)
                     except json.JSONDecodeError:
                         logger.warning(
                             f"Failed to parse metadata for switch {switch_model.id}"
@@ -108,7 +109,7 @@ class AgentContextMapper:
         context_metadata = {}
         if model.metadata_json:
             try:
-                context_metadata = json.loads(model.metadata_json)
+                context_metadata = loads(model.metadata_json)
             except json.JSONDecodeError:
                 logger.warning(f"Failed to parse metadata for context {model.id}")
         
@@ -186,7 +187,7 @@ class AgentContextMapper:
         model = result.scalar_one_or_none()
         
         # Сериализация metadata в JSON
-        metadata_json = json.dumps(entity.metadata) if entity.metadata else None
+        metadata_json = dumps(entity.metadata) if entity.metadata else None
         
         if not model:
             # Создать новую модель
@@ -219,7 +220,7 @@ class AgentContextMapper:
         
         # Добавить новые записи переключений
         for switch in entity.switch_history:
-            switch_metadata_json = json.dumps(switch.metadata) if switch.metadata else None
+            switch_metadata_json = dumps(switch.metadata) if switch.metadata else None
             
             switch_model = AgentSwitchModel(
                 id=switch.id,
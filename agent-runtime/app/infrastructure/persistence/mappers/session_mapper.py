@@ -12,6 +12,7 @@ from sqlalchemy import select
 
 from ....domain.entities.session import Session
 from ....domain.entities.message import Message
+from ....core.serialization import dumps, loads
 from ..models import SessionModel, MessageModel
 
 logger = logging.getLogger("agent-runtime.infrastructure.session_mapper")
@@ -68,7 +69,7 @@ class SessionMapper:
                 tool_calls = None
                 if msg_model.tool_calls:
                     try:
-                        tool_calls = json.loads(msg_model.tool_calls)
+                        tool_calls = loads(msg_model.tool_calls)
                     except json.JSONDecodeError:
                         logger.warning(
                             f"Failed to parse tool_calls for message {msg_model.id}"
@@ -78,7 +79,7 @@ class SessionMapper:
                 metadata = {}
                 if msg_model.metadata_json:
                     try:
-                        metadata = json.loads(msg_model.metadata_json)
+                        metadata = loads(msg_model.metadata_json)
                     except json.JSONDecodeError:
                         logger.warning(
                             f"Failed to parse metadata for message {msg_model.id}"
@@ -92,6 +93,7 @@ class SessionMapper:
                     tool_call_id=msg_model.tool_call_id,
                     tool_calls=tool_calls,
                     metadata=metadata,
+                    token_count=msg_model.token_count,
                     created_at=msg_model.timestamp
                 )
                 messages.append(message)
@@ -180,8 +182,9 @@ class SessionMapper:
                 timestamp=message.created_at,
                 name=message.name,
                 tool_call_id=message.tool_call_id,
-                tool_calls=json.dumps(message.tool_calls) if message.tool_calls else None,
-                metadata_json=json.dumps(message.metadata) if message.metadata else None
+                tool_calls=dumps(message.tool_calls) if message.tool_calls else None,
+                token_count=message.token_count,
+                metadata_json=dumps(message.metadata) if message.metadata else None
             )
             db.add(msg_model)
         
@@ -6,12 +6,34 @@
 """
 
 from .circuit_breaker import CircuitBreaker, CircuitState
-from .retry_handler import RetryHandler, with_retry, is_retryable_http_error
+from .circuit_breaker_registry import (
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    SlidingWindowCircuitBreaker,
+    is_upstream_failure,
+    llm_circuit_breakers,
+)
+from .retry_handler import (
+    RetryBudget,
+    RetryHandler,
+    with_retry,
+    is_retryable_http_error,
+    request_deadline,
+    get_remaining_time,
+)
 
 __all__ = [
     "CircuitBreaker",
     "CircuitState",
+    "CircuitBreakerRegistry",
+    "CircuitOpenError",
+    "SlidingWindowCircuitBreaker",
+    "is_upstream_failure",
+    "llm_circuit_breakers",
+    "RetryBudget",
     "RetryHandler",
     "with_retry",
     "is_retryable_http_error",
+    "request_deadline",
+    "get_remaining_time",
 ]
@@ -0,0 +1,437 @@
+"""
+Реестр Circuit Breaker для исходящих LLM запросов.
+
+Отдельный breaker на каждую пару (upstream, модель), поэтому сбой одной
+модели не блокирует агентов, работающих с другими моделями. Решение об
+открытии принимается по доле ошибок в скользящем окне последних вызовов,
+а в HALF_OPEN состоянии upstream проверяет ровно один пробный запрос
+(single-flight), остальные сразу получают отказ.
+"""
+
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import AppConfig
+from app.events.event_bus import event_bus
+from app.events.llm_events import LLMCircuitStateChangedEvent
+
+from .circuit_breaker import CircuitState
+
+logger = logging.getLogger("agent-runtime.infrastructure.circuit_breaker_registry")
+
+StateChangeListener = Callable[
+    [str, str, CircuitState, CircuitState, Dict[str, Any]], Awaitable[None]
+]
+
+
+class CircuitOpenError(Exception):
+    """
+    Запрос отклонен: circuit для (upstream, модель) открыт.
+    
+    Атрибуты:
+        upstream: Адрес upstream
+        model: Имя модели
+        retry_after: Рекомендуемая задержка перед повтором (секунды)
+        reason: Причина отказа (circuit_open, half_open_probe_in_flight)
+    """
+    
+    def __init__(self, upstream: str, model: str, retry_after: int, reason: str):
+        self.upstream = upstream
+        self.model = model
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(
+            f"Circuit for model '{model}' at {upstream} is open ({reason}), "
+            f"retry after {retry_after}s"
+        )
+
+
+def is_upstream_failure(exception: BaseException) -> bool:
+    """
+    Проверить, свидетельствует ли ошибка о неисправности upstream.
+    
+    Ошибки клиента (4xx) не считаются сбоем: upstream ответил, проблема
+    в запросе. 429 обрабатывается admission control (уменьшением лимита)
+    и тоже не открывает circuit. Проверяется вся цепочка причин.
+    
+    Args:
+        exception: Исключение
+    
+    Returns:
+        True если ошибка должна учитываться как сбой
+    """
+    current: Optional[BaseException] = exception
+    while current is not None:
+        if isinstance(current, httpx.HTTPStatusError):
+            status_code = current.response.status_code
+            return status_code >= 500 or status_code == 408
+        current = current.__cause__
+    return True
+
+
+class SlidingWindowCircuitBreaker:
+    """
+    Circuit Breaker с порогом по доле ошибок в скользящем окне.
+    
+    - CLOSED: результаты последних window_size вызовов хранятся в окне.
+      Circuit открывается, когда в окне не меньше minimum_calls вызовов
+      и доля ошибок достигает failure_rate_threshold
+    - OPEN: вызовы отклоняются до истечения recovery_timeout
+    - HALF_OPEN: пропускается один пробный вызов. Успех закрывает circuit,
+      ошибка снова открывает его. Пока проба выполняется, остальные
+      вызовы отклоняются
+    
+    Атрибуты:
+        upstream: Адрес upstream
+        model: Имя модели
+        state: Текущее состояние
+    
+    Пример:
+        >>> breaker = SlidingWindowCircuitBreaker("http://llm-proxy", "gpt-4")
+        >>> response = await breaker.call(client.post, url, json=payload)
+    """
+    
+    def __init__(
+        self,
+        upstream: str,
+        model: str,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        recovery_timeout: float = 30.0,
+        is_failure: Callable[[BaseException], bool] = is_upstream_failure,
+        on_state_change: Optional[StateChangeListener] = None
+    ):
+        """
+        Инициализация breaker.
+        
+        Args:
+            upstream: Адрес upstream
+            model: Имя модели
+            window_size: Размер скользящего окна (число последних вызовов)
+            minimum_calls: Минимум вызовов в окне для оценки доли ошибок
+            failure_rate_threshold: Доля ошибок, открывающая circuit (0.0-1.0)
+            recovery_timeout: Время в OPEN до пробного вызова (секунды)
+            is_failure: Предикат, отличающий сбой upstream от ошибки запроса
+            on_state_change: Async callback смены состояния
+        """
+        self.upstream = upstream
+        self.model = model
+        self.window_size = window_size
+        self.minimum_calls = min(minimum_calls, window_size)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.recovery_timeout = recovery_timeout
+        self._is_failure = is_failure
+        self._on_state_change = on_state_change
+        
+        self.state = CircuitState.CLOSED
+        self._window: Deque[bool] = deque(maxlen=window_size)  # True = сбой
+        self._window_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0
+        }
+    
+    @property
+    def failure_rate(self) -> float:
+        """Доля ошибок в текущем окне"""
+        if not self._window:
+            return 0.0
+        return self._window_failures / len(self._window)
+    
+    def get_retry_after(self) -> float:
+        """Оставшееся время до пробного вызова (секунды)"""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+    
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Вызвать функцию через breaker.
+        
+        Args:
+            func: Async функция
+            *args: Позиционные аргументы
+            **kwargs: Именованные аргументы
+        
+        Returns:
+            Результат вызова
+        
+        Raises:
+            CircuitOpenError: Если circuit открыт или идет пробный вызов
+            Exception: Ошибка самой функции
+        """
+        is_probe, transition = self._acquire()
+        outcome: Optional[bool] = None
+        try:
+            await self._notify(transition)
+            result = await func(*args, **kwargs)
+            outcome = False
+            return result
+        except Exception as e:
+            outcome = self._is_failure(e)
+            raise
+        finally:
+            # outcome is None on cancellation: the probe slot is released
+            # without a verdict so another request can probe
+            await self._notify(self._record(outcome, is_probe))
+    
+    def _acquire(self) -> Tuple[bool, Optional[tuple]]:
+        """
+        Получить разрешение на вызов.
+        
+        Состояние меняется синхронно (без await), поэтому конкурентные
+        корутины не могут одновременно стать пробным вызовом.
+        
+        Returns:
+            (True если вызов пробный, смена состояния для уведомления)
+        
+        Raises:
+            CircuitOpenError: Если вызов не разрешен
+        """
+        transition = None
+        if self.state == CircuitState.OPEN:
+            retry_after = self.get_retry_after()
+            if retry_after > 0:
+                self._reject(retry_after, "circuit_open")
+            transition = self._transition(CircuitState.HALF_OPEN)
+        
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probe_in_flight:
+                self._reject(1.0, "half_open_probe_in_flight")
+            self._probe_in_flight = True
+            return True, transition
+        
+        return False, transition
+    
+    def _reject(self, retry_after: float, reason: str) -> None:
+        """Отклонить вызов с CircuitOpenError"""
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(
+            self.upstream, self.model, max(1, math.ceil(retry_after)), reason
+        )
+    
+    def _record(self, failed: Optional[bool], is_probe: bool) -> Optional[tuple]:
+        """
+        Учесть результат вызова.
+        
+        Args:
+            failed: True - сбой, False - успех, None - вызов отменен
+            is_probe: Был ли вызов пробным
+        
+        Returns:
+            Смена состояния для уведомления или None
+        """
+        if is_probe:
+            self._probe_in_flight = False
+        if failed is None:
+            return None
+        
+        self.stats["calls"] += 1
+        if failed:
+            self.stats["failures"] += 1
+        
+        if is_probe:
+            return self._transition(CircuitState.OPEN if failed else CircuitState.CLOSED)
+        
+        if self.state != CircuitState.CLOSED:
+            # Запрос, начатый до открытия circuit, не влияет на решение
+            return None
+        
+        if len(self._window) == self._window.maxlen and self._window[0]:
+            self._window_failures -= 1
+        self._window.append(failed)
+        if failed:
+            self._window_failures += 1
+        
+        if (
+            failed
+            and len(self._window) >= self.minimum_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            return self._transition(CircuitState.OPEN)
+        return None
+    
+    def _transition(self, new_state: CircuitState) -> tuple:
+        """
+        Сменить состояние.
+        
+        Returns:
+            Аргументы уведомления о смене состояния
+        """
+        old_state = self.state
+        failure_rate = round(self.failure_rate, 3)
+        window_calls = len(self._window)
+        self.state = new_state
+        if new_state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+            self.stats["opened"] += 1
+        elif new_state == CircuitState.CLOSED:
+            self._window.clear()
+            self._window_failures = 0
+        
+        log = logger.warning if new_state == CircuitState.OPEN else logger.info
+        log(
+            f"Circuit for model '{self.model}' at {self.upstream}: "
+            f"{old_state.value} -> {new_state.value} "
+            f"(failure_rate={failure_rate:.0%}, window={window_calls})"
+        )
+        return (
+            self.upstream,
+            self.model,
+            old_state,
+            new_state,
+            {"failure_rate": failure_rate, "window_calls": window_calls}
+        )
+    
+    async def _notify(self, transition: Optional[tuple]) -> None:
+        """Уведомить подписчика о смене состояния"""
+        if transition is None or self._on_state_change is None:
+            return
+        try:
+            await self._on_state_change(*transition)
+        except Exception as e:
+            logger.error(f"Circuit state change listener failed: {e}", exc_info=True)
+    
+    def reset(self) -> None:
+        """Принудительно закрыть circuit"""
+        self.state = CircuitState.CLOSED
+        self._window.clear()
+        self._window_failures = 0
+        self._probe_in_flight = False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Получить статистику breaker.
+        
+        Returns:
+            Словарь со статистикой
+        """
+        return {
+            "upstream": self.upstream,
+            "model": self.model,
+            "state": self.state.value,
+            "failure_rate": round(self.failure_rate, 3),
+            "window_calls": len(self._window),
+            "window_size": self.window_size,
+            "retry_after": round(self.get_retry_after(), 2),
+            **self.stats
+        }
+
+
+async def publish_circuit_state_change(
+    upstream: str,
+    model: str,
+    from_state: CircuitState,
+    to_state: CircuitState,
+    details: Dict[str, Any]
+) -> None:
+    """Опубликовать смену состояния circuit в шину событий"""
+    await event_bus.publish(LLMCircuitStateChangedEvent(
+        upstream=upstream,
+        model=model,
+        from_state=from_state.value,
+        to_state=to_state.value,
+        failure_rate=details["failure_rate"],
+        window_calls=details["window_calls"]
+    ))
+
+
+class CircuitBreakerRegistry:
+    """
+    Реестр breaker'ов по ключу (upstream, модель).
+    
+    Breaker создается при первом обращении с общими настройками реестра.
+    
+    Пример:
+        >>> registry = CircuitBreakerRegistry(failure_rate_threshold=0.5)
+        >>> breaker = registry.get("http://llm-proxy:8002", "gpt-4")
+        >>> result = await breaker.call(make_request)
+    """
+    
+    def __init__(
+        self,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        recovery_timeout: float = 30.0,
+        on_state_change: Optional[StateChangeListener] = None
+    ):
+        """
+        Инициализация реестра.
+        
+        Args:
+            window_size: Размер скользящего окна
+            minimum_calls: Минимум вызовов в окне для оценки доли ошибок
+            failure_rate_threshold: Доля ошибок, открывающая circuit
+            recovery_timeout: Время в OPEN до пробного вызова (секунды)
+            on_state_change: Async callback смены состояния
+        """
+        self._settings = {
+            "window_size": window_size,
+            "minimum_calls": minimum_calls,
+            "failure_rate_threshold": failure_rate_threshold,
+            "recovery_timeout": recovery_timeout,
+            "on_state_change": on_state_change
+        }
+        self._breakers: Dict[Tuple[str, str], SlidingWindowCircuitBreaker] = {}
+        
+        logger.info(
+            f"CircuitBreakerRegistry initialized (window={window_size}, "
+            f"min_calls={minimum_calls}, failure_rate={failure_rate_threshold:.0%}, "
+            f"recovery_timeout={recovery_timeout}s)"
+        )
+    
+    def get(self, upstream: str, model: str) -> SlidingWindowCircuitBreaker:
+        """
+        Получить breaker для (upstream, модель).
+        
+        Args:
+            upstream: Адрес upstream
+            model: Имя модели
+        
+        Returns:
+            SlidingWindowCircuitBreaker
+        """
+        key = (upstream, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = SlidingWindowCircuitBreaker(upstream, model, **self._settings)
+            self._breakers[key] = breaker
+        return breaker
+    
+    def reset(self) -> None:
+        """Удалить все breaker'ы"""
+        self._breakers.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Получить статистику всех breaker'ов.
+        
+        Returns:
+            Словарь со списком breaker'ов и числом открытых
+        """
+        breakers = [breaker.get_stats() for breaker in self._breakers.values()]
+        return {
+            "breakers": breakers,
+            "open": sum(1 for b in breakers if b["state"] != CircuitState.CLOSED.value)
+        }
+
+
+# Singleton instance
+llm_circuit_breakers = CircuitBreakerRegistry(
+    window_size=AppConfig.LLM_CIRCUIT_WINDOW_SIZE,
+    minimum_calls=AppConfig.LLM_CIRCUIT_MINIMUM_CALLS,
+    failure_rate_threshold=AppConfig.LLM_CIRCUIT_FAILURE_RATE,
+    recovery_timeout=AppConfig.LLM_CIRCUIT_RECOVERY_TIMEOUT,
+    on_state_change=publish_circuit_state_change
+)
@@ -3,11 +3,20 @@ Retry механизм для Event Handlers и HTTP calls.
 
 Автоматически повторяет failed event handlers с экспоненциальной задержкой.
 Поддерживает определение retryable HTTP ошибок.
+
+Защита от retry storm:
+- Full jitter: задержка выбирается случайно в [0, exp_delay]
+- Retry budget: повторы ограничены долей недавних запросов
+- Дедлайн запроса: повтор не начинается, если не успеет до дедлайна
 """
 
 import asyncio
 import logging
-from typing import Callable, Any
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Any, Dict, Optional
 from functools import wraps
 
 import httpx
@@ -15,6 +24,112 @@ import httpx
 logger = logging.getLogger("agent-runtime.infrastructure.retry_handler")
 
 
+# ==================== Request Deadline ====================
+
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(timeout: Optional[float]):
+    """
+    Установить дедлайн текущего запроса (распространяется через contextvars).
+    
+    Вложенный дедлайн не может быть позже внешнего.
+    
+    Args:
+        timeout: Оставшееся время запроса в секундах (None = без дедлайна)
+        
+    Пример:
+        >>> with request_deadline(60.0):
+        ...     await llm_proxy_client.chat_completion(...)
+    """
+    if timeout is None:
+        yield
+        return
+    
+    deadline = time.monotonic() + timeout
+    current = _request_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    
+    token = _request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def get_remaining_time() -> Optional[float]:
+    """
+    Получить оставшееся время до дедлайна текущего запроса.
+    
+    Returns:
+        Секунды до дедлайна или None, если дедлайн не установлен
+    """
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# ==================== Retry Budget ====================
+
+class RetryBudget:
+    """
+    Бюджет повторов (token bucket).
+    
+    Каждый запрос добавляет retry_ratio токенов, каждый повтор тратит
+    один токен. В установившемся режиме повторов не больше retry_ratio
+    от числа запросов, поэтому при перегрузке upstream повторы не
+    умножают нагрузку.
+    
+    Атрибуты:
+        retry_ratio: Доля повторов от числа запросов
+        max_tokens: Максимальный запас токенов
+        tokens: Текущий запас токенов
+    
+    Пример:
+        >>> budget = RetryBudget(retry_ratio=0.2)
+        >>> handler = RetryHandler(max_retries=3, budget=budget)
+    """
+    
+    def __init__(
+        self,
+        retry_ratio: float = 0.2,
+        initial_tokens: float = 10.0,
+        max_tokens: float = 100.0
+    ):
+        """
+        Инициализация бюджета.
+        
+        Args:
+            retry_ratio: Доля повторов от числа запросов
+            initial_tokens: Начальный запас (повторы при малом трафике)
+            max_tokens: Максимальный запас токенов
+        """
+        if retry_ratio < 0:
+            raise ValueError("retry_ratio must be >= 0")
+        self.retry_ratio = retry_ratio
+        self.max_tokens = max_tokens
+        self.tokens = min(initial_tokens, max_tokens)
+    
+    def record_request(self) -> None:
+        """Учесть новый запрос (пополняет бюджет)"""
+        self.tokens = min(self.max_tokens, self.tokens + self.retry_ratio)
+    
+    def try_acquire_retry(self) -> bool:
+        """
+        Попытаться потратить токен на повтор.
+        
+        Returns:
+            True если повтор разрешен
+        """
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
 # ==================== HTTP Error Detection ====================
 
 def is_retryable_http_error(exception: Exception) -> bool:
@@ -56,6 +171,10 @@ class RetryHandler:
         base_delay: Базовая задержка между повторами (секунды)
         max_delay: Максимальная задержка (секунды)
         exponential_base: База для экспоненциального роста задержки
+        jitter: Использовать full jitter
+        budget: Бюджет повторов (None = без ограничения)
+        retry_on: Предикат retryable ошибок (None = повторять любые)
+        stats: Счетчики попыток и подавленных повторов
     
     Пример:
         >>> @RetryHandler(max_retries=3)
@@ -69,7 +188,10 @@ class RetryHandler:
         max_retries: int = 3,
         base_delay: float = 1.0,
         max_delay: float = 60.0,
-        exponential_base: float = 2.0
+        exponential_base: float = 2.0,
+        jitter: bool = True,
+        budget: Optional[RetryBudget] = None,
+        retry_on: Optional[Callable[[Exception], bool]] = None
     ):
         """
         Инициализация retry handler.
@@ -79,11 +201,77 @@ class RetryHandler:
             base_delay: Базовая задержка (секунды)
             max_delay: Максимальная задержка (секунды)
             exponential_base: База для экспоненциального роста
+            jitter: Full jitter - случайная задержка в [0, exp_delay],
+                чтобы одновременные клиенты не повторяли синхронно
+            budget: Общий бюджет повторов для всех вызовов handler
+            retry_on: Предикат retryable ошибок (None = повторять любые)
         """
         self.max_retries = max_retries
         self.base_delay = base_delay
         self.max_delay = max_delay
         self.exponential_base = exponential_base
+        self.jitter = jitter
+        self.budget = budget
+        self.retry_on = retry_on
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "retries_attempted": 0,
+            "retries_suppressed_budget": 0,
+            "retries_suppressed_deadline": 0,
+            "non_retryable": 0,
+        }
+    
+    def get_delay(self, attempt: int) -> float:
+        """
+        Вычислить задержку перед повтором.
+        
+        Args:
+            attempt: Номер неудачной попытки (с 0)
+            
+        Returns:
+            Задержка в секундах
+        """
+        delay = min(
+            self.base_delay * (self.exponential_base ** attempt),
+            self.max_delay
+        )
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Получить метрики повторов.
+        
+        Returns:
+            Счетчики вызовов, выполненных и подавленных повторов
+        """
+        stats: Dict[str, Any] = dict(self.stats)
+        if self.budget is not None:
+            stats["budget_tokens"] = round(self.budget.tokens, 2)
+        return stats
+    
+    def _should_retry(self, exception: Exception, delay: float) -> bool:
+        """Проверить predicate, дедлайн и бюджет перед повтором"""
+        if self.retry_on is not None and not self.retry_on(exception):
+            self.stats["non_retryable"] += 1
+            return False
+        
+        remaining = get_remaining_time()
+        if remaining is not None and remaining <= delay:
+            self.stats["retries_suppressed_deadline"] += 1
+            logger.warning(
+                f"Retry suppressed: {remaining:.1f}s left until request deadline"
+            )
+            return False
+        
+        if self.budget is not None and not self.budget.try_acquire_retry():
+            self.stats["retries_suppressed_budget"] += 1
+            logger.warning("Retry suppressed: retry budget exhausted")
+            return False
+        
+        self.stats["retries_attempted"] += 1
+        return True
     
     def __call__(self, func: Callable) -> Callable:
         """
@@ -99,6 +287,9 @@ class RetryHandler:
         async def wrapper(*args, **kwargs) -> Any:
             """Обертка с retry логикой"""
             last_exception = None
+            self.stats["calls"] += 1
+            if self.budget is not None:
+                self.budget.record_request()
             
             for attempt in range(self.max_retries + 1):
                 try:
@@ -124,11 +315,15 @@ class RetryHandler:
                         # TODO: Отправить в Dead Letter Queue
                         raise
                     
-                    # Вычислить задержку с экспоненциальным ростом
-                    delay = min(
-                        self.base_delay * (self.exponential_base ** attempt),
-                        self.max_delay
-                    )
+                    # Вычислить задержку (экспоненциальный рост + jitter)
+                    delay = self.get_delay(attempt)
+                    
+                    if not self._should_retry(e, delay):
+                        logger.error(
+                            f"Handler {func.__name__} failed on attempt "
+                            f"{attempt + 1}, not retrying: {e}"
+                        )
+                        raise
                     
                     logger.warning(
                         f"Handler {func.__name__} failed (attempt {attempt + 1}/"
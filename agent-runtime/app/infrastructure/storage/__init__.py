@@ -0,0 +1,12 @@
+"""
+Хранилища данных вне основной БД.
+
+Этот модуль содержит реализации хранилищ больших объектов,
+которые не должны храниться в строках таблиц сессий.
+"""
+
+from .filesystem_blob_store import FilesystemBlobStore
+
+__all__ = [
+    "FilesystemBlobStore",
+]
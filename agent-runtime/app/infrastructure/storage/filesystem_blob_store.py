@@ -0,0 +1,97 @@
+"""
+Content-addressed хранилище объектов в файловой системе.
+
+Объекты раскладываются по подкаталогам по первым символам хэша
+(<root>/ab/cd/abcd...), запись атомарна (временный файл + rename).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from ...domain.interfaces.blob_store import IBlobStore
+
+logger = logging.getLogger("agent-runtime.infrastructure.blob_store")
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class FilesystemBlobStore(IBlobStore):
+    """
+    Реализация IBlobStore поверх локальной файловой системы.
+    
+    Файловые операции выполняются в пуле потоков, чтобы не блокировать
+    event loop на больших объектах.
+    
+    Атрибуты:
+        _root: Корневой каталог хранилища
+    
+    Пример:
+        >>> store = FilesystemBlobStore("data/blobs")
+        >>> key = await store.put(b"content")
+        >>> await store.get(key)
+        b'content'
+    """
+    
+    def __init__(self, root_dir: str):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            root_dir: Корневой каталог (создается при первой записи)
+        """
+        self._root = Path(root_dir)
+        logger.info(f"FilesystemBlobStore initialized at {self._root}")
+    
+    def _path_for(self, key: str) -> Path:
+        """Путь к файлу объекта по ключу"""
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return self._root / key[:2] / key[2:4] / key
+    
+    async def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write, key, data)
+        return key
+    
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path_for(key)
+        if path.exists():
+            # Content-addressed: объект с таким ключом уже сохранен
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        logger.debug(f"Stored blob {key} ({len(data)} bytes)")
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+    
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path_for(key).read_bytes()
+        except FileNotFoundError:
+            logger.warning(f"Blob {key} not found")
+            return None
+    
+    async def delete(self, key: str) -> bool:
+        return await asyncio.to_thread(self._delete, key)
+    
+    def _delete(self, key: str) -> bool:
+        try:
+            self._path_for(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,22 @@
+"""
+Обработка исходящих стримов.
+
+Этот модуль содержит преобразования стрима chunks перед
+отправкой клиенту по SSE, SSE ответ с отменой при отключении клиента,
+кэш сервисов постоянного канала gateway и уведомления gateway об
+изменении сессий.
+"""
+
+from .cancellable_response import CancellableStreamingResponse
+from .channel_sessions import ChannelSession, ChannelSessions
+from .session_changes import SessionChangeNotifier
+from .token_coalescer import CoalescePolicy, coalesce_tokens
+
+__all__ = [
+    "CancellableStreamingResponse",
+    "ChannelSession",
+    "ChannelSessions",
+    "CoalescePolicy",
+    "SessionChangeNotifier",
+    "coalesce_tokens",
+]
@@ -0,0 +1,47 @@
+"""
+SSE ответ с кооперативной отменой при отключении клиента.
+
+Starlette StreamingResponse за BaseHTTPMiddleware (InternalAuthMiddleware,
+RateLimitMiddleware) не прерывает генератор при отключении клиента, и
+запрос к LLM продолжается до конца генерации. Без middleware стрим
+отменяется через cancel scope anyio: отмена повторяется на каждом
+await, поэтому обработчики не могут сохранить частичный ответ, а get_db
+не фиксирует транзакцию (в том числе сообщение пользователя).
+
+CancellableStreamingResponse отменяет задачу стрима один раз: запрос к
+LLM прерывается (закрытие HTTP стрима к LLM Proxy), обработчики
+завершают очистку, ответ завершается штатно и транзакция фиксируется.
+"""
+
+import asyncio
+import logging
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger("agent-runtime.infrastructure.cancellable_response")
+
+
+class CancellableStreamingResponse(StreamingResponse):
+    """StreamingResponse, отменяющий стрим один раз при отключении клиента"""
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stream = asyncio.create_task(self.stream_response(send))
+        disconnect = asyncio.create_task(self.listen_for_disconnect(receive))
+        try:
+            await asyncio.wait({stream, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if not stream.done():
+                logger.info("Client disconnected, cancelling stream")
+                stream.cancel()
+                await asyncio.wait({stream})
+        except BaseException:
+            stream.cancel()
+            raise
+        finally:
+            disconnect.cancel()
+        
+        if stream.cancelled():
+            return
+        stream.result()
+        if self.background is not None:
+            await self.background()
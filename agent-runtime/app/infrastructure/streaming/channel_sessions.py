@@ -0,0 +1,130 @@
+"""
+Кэш сервисов сессий постоянного канала gateway.
+
+SSE endpoint на каждое сообщение заново разрешает граф зависимостей
+get_message_orchestration_service (около 15 Depends) и открывает сессию
+БД. В постоянном канале граф и сессия БД создаются один раз на сессию
+IDE и переиспользуются для следующих сообщений этой сессии.
+
+После каждого сообщения транзакция фиксируется (как в get_db), а
+identity map сессии БД очищается, поэтому следующее сообщение читает
+актуальное состояние, а не объекты предыдущего запроса.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger("agent-runtime.infrastructure.channel_sessions")
+
+
+class ChannelSession:
+    """Сервис оркестрации и сессия БД одной сессии IDE"""
+    
+    __slots__ = ("session_id", "db", "service", "in_use")
+    
+    def __init__(self, session_id: str, db: AsyncSession, service: Any):
+        self.session_id = session_id
+        self.db = db
+        self.service = service
+        self.in_use = False
+
+
+class ChannelSessions:
+    """
+    LRU кэш ChannelSession в пределах одного соединения канала.
+    
+    Сессия IDE обрабатывает одно сообщение за раз, поэтому сессия БД
+    не используется конкурентно. При превышении max_sessions
+    закрываются самые давно использованные свободные записи.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        build_service: Callable[[AsyncSession], Awaitable[Any]],
+        max_sessions: int = 1000
+    ):
+        """
+        Args:
+            session_factory: Фабрика сессий БД (async_sessionmaker)
+            build_service: Сборка сервиса оркестрации на сессии БД
+            max_sessions: Максимум кэшированных сессий
+        """
+        self._session_factory = session_factory
+        self._build_service = build_service
+        self._max_sessions = max_sessions
+        self._entries: "OrderedDict[str, ChannelSession]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    async def acquire(self, session_id: str) -> ChannelSession:
+        """
+        Получить сервисы сессии, создав их при первом сообщении.
+        
+        Raises:
+            RuntimeError: Сессия уже обрабатывает сообщение
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            db = self._session_factory()
+            try:
+                service = await self._build_service(db)
+            except BaseException:
+                await db.close()
+                raise
+            entry = ChannelSession(session_id, db, service)
+            entry.in_use = True
+            self._entries[session_id] = entry
+            await self._evict()
+            return entry
+        if entry.in_use:
+            raise RuntimeError(f"Session {session_id} is already processing a message")
+        self._entries.move_to_end(session_id)
+        entry.in_use = True
+        return entry
+    
+    async def release(self, entry: ChannelSession, failed: bool = False) -> None:
+        """
+        Завершить обработку сообщения: commit (rollback при ошибке)
+        и очистка identity map сессии БД.
+        """
+        try:
+            if failed:
+                await entry.db.rollback()
+            else:
+                await entry.db.commit()
+            entry.db.expunge_all()
+        except Exception as e:
+            # Сессия БД в неизвестном состоянии: при следующем сообщении
+            # сервисы будут созданы заново
+            logger.error(f"Failed to finish transaction for session {entry.session_id}: {e}")
+            self._entries.pop(entry.session_id, None)
+            await self._close(entry)
+        finally:
+            entry.in_use = False
+    
+    async def close(self) -> None:
+        """Закрыть все сессии БД (соединение канала закрыто)"""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            await self._close(entry)
+    
+    async def _evict(self) -> None:
+        excess = len(self._entries) - self._max_sessions
+        if excess <= 0:
+            return
+        for session_id in [s for s, e in self._entries.items() if not e.in_use][:excess]:
+            await self._close(self._entries.pop(session_id))
+    
+    async def _close(self, entry: Optional[ChannelSession]) -> None:
+        if entry is None:
+            return
+        try:
+            await entry.db.close()
+        except Exception as e:
+            logger.warning(f"Failed to close DB session of {entry.session_id}: {e}")
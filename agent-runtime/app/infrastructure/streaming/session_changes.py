@@ -0,0 +1,50 @@
+"""
+Уведомления gateway об изменении сессий.
+
+Gateway кэширует GET /sessions/{id}/history. После фиксации изменений
+сессии (обработано сообщение, переключен агент) всем подключенным
+каналам gateway (открытым с заголовком X-Session-Changes: 1)
+отправляется управляющий кадр с пустым префиксом сессии:
+
+    "\\n{"type":"session_changed","session_id":"..."}"
+
+и каждая реплика gateway сбрасывает кэш истории этой сессии.
+"""
+
+import logging
+from typing import Awaitable, Callable, Set
+
+from ...core.serialization import dumps
+
+logger = logging.getLogger("agent-runtime.infrastructure.session_changes")
+
+FrameSender = Callable[[str], Awaitable[None]]
+
+
+class SessionChangeNotifier:
+    """Рассылка session_changed по соединениям постоянного канала gateway"""
+    
+    def __init__(self):
+        self._senders: Set[FrameSender] = set()
+    
+    def __len__(self) -> int:
+        return len(self._senders)
+    
+    def subscribe(self, send: FrameSender) -> None:
+        """Подключить соединение канала (send отправляет текстовый кадр)"""
+        self._senders.add(send)
+    
+    def unsubscribe(self, send: FrameSender) -> None:
+        self._senders.discard(send)
+    
+    async def notify(self, session_id: str) -> None:
+        """Сообщить gateway, что сессия изменилась (вызывается после commit)"""
+        if not self._senders:
+            return
+        frame = "\n" + dumps({"type": "session_changed", "session_id": session_id})
+        for send in list(self._senders):
+            try:
+                await send(frame)
+            except Exception as e:
+                # Соединение закрывается, кэш gateway ограничен TTL
+                logger.debug(f"Failed to notify gateway about session {session_id}: {e}")
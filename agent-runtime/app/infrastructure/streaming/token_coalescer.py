@@ -0,0 +1,217 @@
+"""
+Объединение токенов стрима в кадры SSE.
+
+При стриминге по токенам каждый токен становится отдельным кадром SSE,
+отдельной отправкой в WebSocket gateway и отдельным кадром в IDE.
+Коалесцер склеивает подряд идущие токены в один chunk, если они
+приходят в пределах окна window_ms или пока не набрано max_bytes.
+Первый токен (и токен после паузы длиннее окна) отдается сразу,
+поэтому время до первого токена не увеличивается.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
+from ...core.config import AppConfig
+from ...models.schemas import StreamChunk, TokenChunk
+
+logger = logging.getLogger("agent-runtime.infrastructure.token_coalescer")
+
+Chunk = Union[StreamChunk, TokenChunk]
+
+_END = object()
+
+
+class _Failure:
+    """Исключение источника, переданное через очередь"""
+    
+    __slots__ = ("error",)
+    
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+@dataclass(frozen=True)
+class CoalescePolicy:
+    """
+    Политика объединения токенов.
+    
+    Атрибуты:
+        window_ms: Максимальная задержка токена в буфере, 0 - без объединения
+        max_bytes: Кадр отправляется досрочно, когда текст токенов
+            достигает этого размера в UTF-8 (0 - без ограничения)
+    """
+    window_ms: float = 0
+    max_bytes: int = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+    
+    @classmethod
+    def default(cls) -> "CoalescePolicy":
+        """Политика из конфигурации сервиса"""
+        return cls(
+            window_ms=AppConfig.STREAM_COALESCE_WINDOW_MS,
+            max_bytes=AppConfig.STREAM_COALESCE_MAX_BYTES
+        )
+    
+    @classmethod
+    def parse(cls, value: Optional[str], default: "CoalescePolicy") -> "CoalescePolicy":
+        """
+        Разобрать политику клиента из заголовка X-Stream-Coalesce.
+        
+        Формат: "window_ms=20, max_bytes=1024" (любое поле можно опустить,
+        тогда берется значение по умолчанию) или "off".
+        
+        Args:
+            value: Значение заголовка (None - политика по умолчанию)
+            default: Политика по умолчанию
+        
+        Returns:
+            Политика клиента; при ошибке формата - политика по умолчанию
+        """
+        if value is None:
+            return default
+        value = value.strip().lower()
+        if value in ("off", "0", "false"):
+            return cls()
+        fields = {"window_ms": default.window_ms, "max_bytes": default.max_bytes}
+        try:
+            for item in value.split(","):
+                name, _, raw = item.partition("=")
+                name = name.strip()
+                if name not in fields:
+                    raise ValueError(f"unknown field {name!r}")
+                fields[name] = float(raw) if name == "window_ms" else int(raw)
+                if fields[name] < 0:
+                    raise ValueError(f"{name} must not be negative")
+        except ValueError as e:
+            logger.warning(f"Invalid X-Stream-Coalesce {value!r}: {e}")
+            return default
+        return cls(**fields)
+
+
+def _can_merge(pending: TokenChunk, chunk: Chunk) -> bool:
+    """Можно ли дописать token chunk к буферу"""
+    if not isinstance(chunk, TokenChunk) or chunk.type != pending.type or chunk.token is None:
+        return False
+    if pending.type == "assistant_message":
+        return True
+    # Части одного строкового аргумента одного tool call
+    previous = pending.metadata or {}
+    current = chunk.metadata or {}
+    return (
+        chunk.call_id == pending.call_id
+        and not previous.get("complete")
+        and previous.get("index") == current.get("index")
+        and previous.get("argument") == current.get("argument")
+    )
+
+
+def _merge(pending: TokenChunk, chunk: TokenChunk) -> TokenChunk:
+    return TokenChunk(
+        type=pending.type,
+        token=pending.token + chunk.token,
+        call_id=chunk.call_id,
+        tool_name=chunk.tool_name,
+        metadata=chunk.metadata
+    )
+
+
+async def coalesce_tokens(
+    chunks: AsyncIterator[Chunk],
+    policy: CoalescePolicy
+) -> AsyncIterator[Chunk]:
+    """
+    Объединить подряд идущие токены стрима.
+    
+    Склеиваются только TokenChunk: токены assistant_message и части
+    одного строкового аргумента tool_call_delta. Управляющий chunk
+    сначала выталкивает буфер, затем отдается без изменений, поэтому
+    порядок событий сохраняется.
+    
+    Источник читается отдельной задачей, чтобы буфер отправлялся по
+    истечении окна, даже если следующий токен еще не пришел.
+    
+    Args:
+        chunks: Исходный стрим chunks
+        policy: Политика объединения
+    
+    Yields:
+        Chunks, токены - объединенными
+    """
+    if not policy.enabled:
+        async for chunk in chunks:
+            yield chunk
+        return
+    
+    loop = asyncio.get_running_loop()
+    window = policy.window_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(_Failure(e))
+    
+    reader = asyncio.create_task(pump())
+    pending: Optional[TokenChunk] = None
+    pending_bytes = 0
+    last_flush = float("-inf")
+    try:
+        while True:
+            if pending is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(
+                        queue.get(), max(0.0, last_flush + window - loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    yield pending
+                    pending = None
+                    last_flush = loop.time()
+                    continue
+            
+            if pending is not None and _can_merge(pending, item):
+                pending = _merge(pending, item)
+                pending_bytes += len(item.token.encode("utf-8"))
+                if policy.max_bytes and pending_bytes >= policy.max_bytes:
+                    yield pending
+                    pending = None
+                    last_flush = loop.time()
+                continue
+            
+            if pending is not None:
+                yield pending
+                pending = None
+                last_flush = loop.time()
+            
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            
+            if isinstance(item, TokenChunk) and item.token is not None:
+                now = loop.time()
+                if now - last_flush >= window:
+                    # Первый токен или токен после паузы: без задержки
+                    last_flush = now
+                    yield item
+                else:
+                    pending = item
+                    pending_bytes = len(item.token.encode("utf-8"))
+            else:
+                yield item
+    finally:
+        reader.cancel()
+        try:
+            await reader
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -14,11 +14,13 @@ from app.api.v1.routers import (
     sessions_router,
     agents_router,
     messages_router,
-    events_router
+    events_router,
+    channel_router
 )
 from app.api.middleware.internal_auth import InternalAuthMiddleware
 from app.api.middleware import RateLimitMiddleware
 from app.core.config import AppConfig, logger
+from app.core.serialization import FastJSONResponse
 
 # Глобальные экземпляры адаптеров (инициализируются в lifespan)
 session_manager_adapter = None
@@ -206,6 +208,7 @@ app = FastAPI(
     version=AppConfig.VERSION,
     description="AI Agent Runtime with LLM integration and tool execution support",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -260,6 +263,7 @@ app.include_router(sessions_router)
 app.include_router(agents_router)
 app.include_router(messages_router)
 app.include_router(events_router)
+app.include_router(channel_router)
 
 logger.info("✓ API routers registered")
 
@@ -19,6 +19,7 @@ from ..domain.entities.message import Message
 from ..api.v1.schemas.common import (
     ToolCall,
     StreamChunk,
+    TokenChunk,
     SessionState,
     AgentInfo
 )
@@ -46,6 +47,7 @@ __all__ = [
     "SessionState",
     "AgentStreamRequest",
     "StreamChunk",
+    "TokenChunk",
     "AgentInfo",
 ]
 
@@ -0,0 +1,162 @@
+"""
+Тесты для admission control исходящих LLM запросов.
+
+Проверяет AIMD лимит, приоритетную очередь, быстрый отказ
+и Retry-After chunk в StreamLLMResponseHandler.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+
+from app.application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
+from app.domain.services.tool_filter_service import ToolBundle
+from app.infrastructure.concurrency.admission_controller import (
+    AdmissionRejectedError,
+    LLMAdmissionController,
+    RequestPriority,
+    is_overload_error,
+)
+
+
+def _rate_limited() -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://llm-proxy/v1/chat/completions")
+    return httpx.HTTPStatusError(
+        "Too Many Requests", request=request, response=httpx.Response(429, request=request)
+    )
+
+
+class TestLLMAdmissionController:
+    """Тесты LLMAdmissionController"""
+    
+    @pytest.mark.asyncio
+    async def test_limit_and_priority_order(self):
+        """Тест: при занятом лимите interactive обслуживается раньше background"""
+        controller = LLMAdmissionController(initial_limit=1, max_limit=1)
+        release = asyncio.Event()
+        order = []
+        
+        async def request(name, priority):
+            async with controller.admit("model", priority):
+                order.append(name)
+                await release.wait()
+        
+        first = asyncio.create_task(request("first", RequestPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(request("background", RequestPriority.BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request("interactive", RequestPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+        
+        assert order == ["first"]
+        assert controller.get_stats()["models"]["model"]["queued"] == 2
+        
+        release.set()
+        await asyncio.gather(first, background, interactive)
+        
+        assert order == ["first", "interactive", "background"]
+        assert controller.get_stats()["queue_time"]["background"]["admitted"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_queue_full_rejected_with_retry_after(self):
+        """Тест: при переполненной очереди запрос отклоняется сразу"""
+        controller = LLMAdmissionController(initial_limit=1, max_limit=1, max_queue_size=1)
+        release = asyncio.Event()
+        
+        async def hold():
+            async with controller.admit("model"):
+                await release.wait()
+        
+        tasks = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            async with controller.admit("model"):
+                pass
+        
+        assert exc_info.value.reason == "queue_full"
+        assert exc_info.value.retry_after >= 1
+        assert controller.get_stats()["rejected"]["queue_full"] == 1
+        
+        release.set()
+        await asyncio.gather(*tasks)
+    
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """Тест: ожидание слота ограничено queue_timeout"""
+        controller = LLMAdmissionController(initial_limit=1, max_limit=1, queue_timeout=0.01)
+        release = asyncio.Event()
+        
+        async def hold():
+            async with controller.admit("model"):
+                await release.wait()
+        
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            async with controller.admit("model"):
+                pass
+        
+        assert exc_info.value.reason == "queue_timeout"
+        assert controller.get_stats()["models"]["model"]["queued"] == 0
+        
+        release.set()
+        await task
+        assert controller.get_stats()["models"]["model"]["in_flight"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_aimd_limit_adapts(self):
+        """Тест: 429 уменьшает лимит вдвое, успешные ответы увеличивают"""
+        controller = LLMAdmissionController(initial_limit=8, max_limit=16)
+        
+        with pytest.raises(RuntimeError):
+            async with controller.admit("model"):
+                raise RuntimeError("LLM call failed") from _rate_limited()
+        
+        assert controller.get_stats()["models"]["model"]["limit"] == 4
+        
+        for _ in range(10):
+            async with controller.admit("model"):
+                pass
+        
+        assert controller.get_stats()["models"]["model"]["limit"] == 6
+    
+    def test_is_overload_error(self):
+        assert is_overload_error(_rate_limited())
+        assert not is_overload_error(ValueError("bad request"))
+
+
+class TestHandlerAdmission:
+    """Тесты отказа в StreamLLMResponseHandler"""
+    
+    @pytest.mark.asyncio
+    async def test_rejected_request_yields_retry_after_chunk(self):
+        controller = Mock()
+        controller.admit.side_effect = AdmissionRejectedError("model", 5, "queue_full")
+        tool_filter = Mock()
+        tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+        llm_client = Mock()
+        llm_client.chat_completion = AsyncMock()
+        handler = StreamLLMResponseHandler(
+            llm_client=llm_client,
+            tool_filter=tool_filter,
+            response_processor=Mock(),
+            event_publisher=AsyncMock(),
+            session_service=AsyncMock(),
+            approval_manager=Mock(),
+            admission_controller=controller
+        )
+        
+        chunks = [
+            chunk async for chunk in handler.handle(
+                "session-1", [{"role": "user", "content": "Hello"}], "model"
+            )
+        ]
+        
+        assert len(chunks) == 1
+        assert chunks[0].type == "error"
+        assert chunks[0].metadata == {"retry_after": 5, "reason": "queue_full"}
+        llm_client.chat_completion.assert_not_called()
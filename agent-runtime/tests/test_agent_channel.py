@@ -0,0 +1,261 @@
+"""
+Тесты постоянного канала gateway -> Agent Runtime.
+
+Проверяет кадры стрима с префиксом session_id и маркером [DONE],
+мультиплексирование сессий в одном соединении, переиспользование
+сервисов сессии между сообщениями, уведомления session_changed и
+авторизацию канала.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1.routers.channel_router import router
+from app.api.v1.routers.messages_router import chunk_json
+from app.core.config import AppConfig
+from app.core.dependencies import get_channel_sessions, get_session_change_notifier
+from app.infrastructure.streaming import ChannelSessions, SessionChangeNotifier
+from app.models.schemas import StreamChunk, TokenChunk
+
+API_KEY = "channel-test-key"
+
+
+class FakeOrchestrationService:
+    """Сервис оркестрации: ответ из токенов и финального chunk"""
+    
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+    
+    async def process_message(self, session_id, message, agent_type=None):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        yield TokenChunk(type="assistant_message", token=f"{session_id}:{message}")
+        yield StreamChunk(type="assistant_message", content=message, token="", is_final=True)
+
+
+def _db():
+    db = Mock()
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    db.close = AsyncMock()
+    return db
+
+
+@pytest.fixture
+def channel(monkeypatch):
+    monkeypatch.setattr(AppConfig, "INTERNAL_API_KEY", API_KEY)
+    monkeypatch.setattr(AppConfig, "STREAM_COALESCE_WINDOW_MS", 0)
+    state = {"dbs": [], "services": {}}
+    
+    def session_factory():
+        db = _db()
+        state["dbs"].append(db)
+        return db
+    
+    async def build_service(db):
+        service = FakeOrchestrationService(delay=0.2 if len(state["dbs"]) == 1 else 0)
+        state["services"][id(db)] = service
+        return service
+    
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_channel_sessions] = lambda: ChannelSessions(
+        session_factory, build_service, max_sessions=10
+    )
+    notifier = SessionChangeNotifier()
+    app.dependency_overrides[get_session_change_notifier] = lambda: notifier
+    return TestClient(app), state
+
+
+def _user_message(session_id, content):
+    return {"session_id": session_id, "message": {"type": "user_message", "content": content}}
+
+
+def _read_stream(ws, frames):
+    """Читает кадры до [DONE] всех сессий: {session_id: [payload, ...]}"""
+    pending = set(frames)
+    while pending:
+        session_id, _, payload = ws.receive_text().partition("\n")
+        if payload == "[DONE]":
+            pending.discard(session_id)
+        else:
+            frames[session_id].append(payload)
+    return frames
+
+
+class TestAgentChannel:
+    """Тесты WebSocket /agent/channel"""
+    
+    def test_stream_frames_and_done_marker(self, channel):
+        client, _ = channel
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            ws.send_json(_user_message("s1", "Hi"))
+            frames = _read_stream(ws, {"s1": []})
+        
+        assert frames["s1"] == [
+            chunk_json(TokenChunk(type="assistant_message", token="s1:Hi")).decode(),
+            chunk_json(
+                StreamChunk(type="assistant_message", content="Hi", token="", is_final=True)
+            ).decode(),
+        ]
+    
+    def test_sessions_are_multiplexed(self, channel):
+        client, _ = channel
+        order = []
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            # Первая сессия отвечает с задержкой, вторая - сразу
+            ws.send_json(_user_message("slow", "a"))
+            ws.send_json(_user_message("fast", "b"))
+            for _ in range(6):
+                session_id, _, payload = ws.receive_text().partition("\n")
+                if payload == "[DONE]":
+                    order.append(session_id)
+        
+        assert order == ["fast", "slow"]
+    
+    def test_session_services_are_reused(self, channel):
+        client, state = channel
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            for content in ("one", "two"):
+                ws.send_json(_user_message("s1", content))
+                _read_stream(ws, {"s1": []})
+        
+        assert len(state["dbs"]) == 1
+        db = state["dbs"][0]
+        assert db.commit.await_count == 2
+        assert db.expunge_all.call_count == 2
+        db.close.assert_awaited_once()
+    
+    def test_cancel_stops_stream_and_commits(self, channel):
+        client, state = channel
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            ws.send_json(_user_message("s1", "a"))
+            ws.send_json({"session_id": "s1", "type": "cancel"})
+            ws.send_json(_user_message("s1", "b"))
+            frames = _read_stream(ws, {"s1": []})
+        
+        # Отмененный стрим не отправляет ни chunks, ни [DONE]
+        assert frames["s1"][0] == chunk_json(
+            TokenChunk(type="assistant_message", token="s1:b")
+        ).decode()
+        # Частичный ответ отмененного стрима фиксируется вместе с запросом
+        db = state["dbs"][0]
+        db.rollback.assert_not_awaited()
+        assert db.commit.await_count == 2
+    
+    def test_cancelled_stream_cleanup_does_not_block_other_sessions(self, channel):
+        client, state = channel
+        committed = []
+        
+        async def slow_commit():
+            await asyncio.sleep(1)
+            committed.append("s1")
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            ws.send_json(_user_message("s1", "a"))
+            time.sleep(0.05)
+            # Отмененный стрим долго фиксирует частичный ответ
+            state["dbs"][0].commit.side_effect = slow_commit
+            ws.send_json({"session_id": "s1", "type": "cancel"})
+            ws.send_json(_user_message("s2", "b"))
+            _read_stream(ws, {"s2": []})
+            assert committed == []
+    
+    def test_cancel_is_read_when_all_slots_are_busy(self, channel, monkeypatch):
+        client, _ = channel
+        monkeypatch.setattr(AppConfig, "CHANNEL_MAX_STREAMS", 1)
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            # slow занимает единственный слот, queued ждет его; slow не отвечает
+            ws.send_json(_user_message("slow", "a"))
+            ws.send_json(_user_message("queued", "b"))
+            ws.send_json({"session_id": "slow", "type": "cancel"})
+            frames = _read_stream(ws, {"queued": []})
+        
+        assert frames["queued"][0] == chunk_json(
+            TokenChunk(type="assistant_message", token="queued:b")
+        ).decode()
+    
+    def test_invalid_message_returns_error_chunk(self, channel):
+        client, _ = channel
+        
+        with client.websocket_connect("/agent/channel", headers={"X-Internal-Auth": API_KEY}) as ws:
+            ws.send_json({"session_id": "s1", "message": {"type": "unknown"}})
+            frames = _read_stream(ws, {"s1": []})
+        
+        assert frames["s1"] == [
+            '{"type":"error","is_final":true,"requires_approval":false,'
+            '"error":"Unsupported message type: unknown"}'
+        ]
+    
+    def test_session_changed_is_sent_after_commit_to_subscribed_gateways(self, channel):
+        client, state = channel
+        headers = {"X-Internal-Auth": API_KEY}
+        
+        with client.websocket_connect("/agent/channel", headers=headers) as other:
+            with client.websocket_connect(
+                "/agent/channel", headers={**headers, "X-Session-Changes": "1"}
+            ) as ws:
+                other.send_json(_user_message("s1", "Hi"))
+                assert _read_stream(other, {"s1": []})["s1"]
+                
+                # Уведомление получает только gateway, подписанный на изменения
+                assert ws.receive_text() == '\n{"type":"session_changed","session_id":"s1"}'
+        
+        state["dbs"][0].commit.assert_awaited_once()
+    
+    def test_rejects_invalid_internal_auth(self, channel):
+        client, _ = channel
+        
+        headers = {"X-Internal-Auth": "wrong"}
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/agent/channel", headers=headers) as ws:
+                ws.receive_text()
+
+
+class TestChannelSessions:
+    """Тесты кэша сервисов сессий"""
+    
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used_idle_session(self):
+        dbs = []
+        
+        def session_factory():
+            dbs.append(_db())
+            return dbs[-1]
+        
+        sessions = ChannelSessions(
+            session_factory, AsyncMock(return_value=object()), max_sessions=2
+        )
+        
+        for session_id in ("a", "b"):
+            await sessions.release(await sessions.acquire(session_id))
+        await sessions.release(await sessions.acquire("a"))
+        await sessions.acquire("c")
+        
+        assert len(sessions) == 2
+        dbs[1].close.assert_awaited_once()
+        dbs[0].close.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_busy_session_is_rejected_and_failure_rolls_back(self):
+        db = _db()
+        sessions = ChannelSessions(lambda: db, AsyncMock(return_value=object()))
+        
+        entry = await sessions.acquire("a")
+        with pytest.raises(RuntimeError):
+            await sessions.acquire("a")
+        await sessions.release(entry, failed=True)
+        
+        db.rollback.assert_awaited_once()
+        db.commit.assert_not_awaited()
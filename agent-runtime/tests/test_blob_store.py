@@ -0,0 +1,142 @@
+"""
+Тесты для вынесения больших результатов инструментов в blob store.
+
+Проверяет FilesystemBlobStore, SessionManagementService.add_tool_result
+и подстановку полного результата в историю для LLM (ContextBudgeter
+и агент без бюджета контекста).
+"""
+
+import hashlib
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.domain.entities import Message, Session
+from app.domain.services import SessionManagementService
+from app.domain.services.context_budget import ContextBudgeter
+from app.domain.services.tool_filter_service import ToolBundle, ToolFilterService
+from app.infrastructure.storage import FilesystemBlobStore
+
+
+@pytest.fixture
+def blob_store(tmp_path):
+    return FilesystemBlobStore(str(tmp_path / "blobs"))
+
+
+@pytest.fixture
+def session():
+    session = Session(id="session-1")
+    session.add_message(Message(id="u1", role="user", content="Прочитай лог"))
+    session.add_message(Message(
+        id="a1",
+        role="assistant",
+        content="",
+        tool_calls=[{
+            "id": "call-1",
+            "type": "function",
+            "function": {"name": "read_file", "arguments": "{}"}
+        }]
+    ))
+    return session
+
+
+@pytest.fixture
+def session_service(session, blob_store):
+    repository = AsyncMock()
+    repository.find_by_id = AsyncMock(return_value=session)
+    repository.save = AsyncMock()
+    return SessionManagementService(
+        repository=repository,
+        blob_store=blob_store,
+        tool_result_offload_threshold=4096
+    )
+
+
+class TestFilesystemBlobStore:
+    """Тесты content-addressed хранилища"""
+    
+    @pytest.mark.asyncio
+    async def test_put_get_roundtrip(self, blob_store):
+        key = await blob_store.put(b"large output")
+        
+        assert key == hashlib.sha256(b"large output").hexdigest()
+        assert await blob_store.get(key) == b"large output"
+    
+    @pytest.mark.asyncio
+    async def test_put_is_idempotent(self, blob_store):
+        assert await blob_store.put(b"same") == await blob_store.put(b"same")
+    
+    @pytest.mark.asyncio
+    async def test_missing_and_delete(self, blob_store):
+        key = await blob_store.put(b"to delete")
+        
+        assert await blob_store.delete(key) is True
+        assert await blob_store.get(key) is None
+        assert await blob_store.delete(key) is False
+    
+    @pytest.mark.asyncio
+    async def test_invalid_key_rejected(self, blob_store):
+        with pytest.raises(ValueError):
+            await blob_store.get("../../etc/passwd")
+
+
+class TestToolResultOffloading:
+    """Тесты вынесения результатов инструментов"""
+    
+    @pytest.mark.asyncio
+    async def test_small_result_is_inline(self, session_service):
+        message = await session_service.add_tool_result("session-1", "call-1", result="ok")
+        
+        assert message.content == "ok"
+        assert message.get_blob_ref() is None
+    
+    @pytest.mark.asyncio
+    async def test_large_result_is_offloaded(self, session_service, blob_store):
+        output = "\n".join(f"line {i}" for i in range(5000))
+        
+        message = await session_service.add_tool_result("session-1", "call-1", result=output)
+        
+        blob_ref = message.get_blob_ref()
+        assert blob_ref["size"] == len(output)
+        assert len(message.content) < len(output)
+        assert message.content.startswith("line 0")
+        assert message.content.endswith("line 4999")
+        assert await blob_store.get(blob_ref["key"]) == output.encode("utf-8")
+    
+    @pytest.mark.asyncio
+    async def test_budgeter_inlines_current_turn_blob(self, session_service, session, blob_store):
+        output = "\n".join(f"line {i}" for i in range(5000))
+        await session_service.add_tool_result("session-1", "call-1", result=output)
+        
+        tool_filter = Mock(spec=ToolFilterService)
+        tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+        
+        large = ContextBudgeter(tool_filter, default_context_length=100000, blob_store=blob_store)
+        history = await large.build_history(session, "System prompt", "model")
+        assert history[-1]["content"] == output
+        
+        small = ContextBudgeter(tool_filter, default_context_length=8192, blob_store=blob_store)
+        history = await small.build_history(session, "System prompt", "model")
+        assert history[-1]["content"] == session.messages[-1].content
+    
+    @pytest.mark.asyncio
+    async def test_agent_history_inlines_current_turn_blob_without_budgeter(
+        self, session_service, session, blob_store, monkeypatch
+    ):
+        from app.agents.coder_agent import CoderAgent
+        from app.core import dependencies
+        from app.core.config import AppConfig
+        
+        monkeypatch.setattr(AppConfig, "CONTEXT_BUDGET_ENABLED", False)
+        monkeypatch.setattr(dependencies, "get_blob_store", lambda: blob_store)
+        output = "\n".join(f"line {i}" for i in range(5000))
+        await session_service.add_tool_result("session-1", "call-1", result=output)
+        agent = CoderAgent()
+        
+        history = await agent.build_llm_history(session, "model", None)
+        assert history[-1]["content"] == output
+        
+        # В следующем ходе старый результат остается превью
+        session.add_message(Message(id="u2", role="user", content="Спасибо"))
+        history = await agent.build_llm_history(session, "model", None)
+        assert history[-2]["content"] == session.messages[-2].content
@@ -0,0 +1,267 @@
+"""
+Тесты реестра circuit breaker для LLM запросов.
+
+Проверяет порог по доле ошибок в скользящем окне, изоляцию моделей,
+single-flight пробу в HALF_OPEN и события смены состояния.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+
+from app.application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
+from app.domain.services.tool_filter_service import ToolBundle
+from app.events.event_types import EventType
+from app.infrastructure.resilience import CircuitState
+from app.infrastructure.resilience.circuit_breaker_registry import (
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    SlidingWindowCircuitBreaker,
+    is_upstream_failure,
+    publish_circuit_state_change,
+)
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://llm-proxy/v1/chat/completions")
+    return httpx.HTTPStatusError(
+        "error", request=request, response=httpx.Response(status, request=request)
+    )
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise _status_error(502)
+
+
+async def _run(breaker, func, times: int = 1):
+    for _ in range(times):
+        try:
+            await breaker.call(func)
+        except (httpx.HTTPStatusError, CircuitOpenError):
+            pass
+
+
+class TestSlidingWindowCircuitBreaker:
+    """Тесты SlidingWindowCircuitBreaker"""
+    
+    @pytest.mark.asyncio
+    async def test_opens_on_failure_rate(self):
+        """Тест: circuit открывается по доле ошибок, а не по серии подряд"""
+        breaker = SlidingWindowCircuitBreaker(
+            "http://llm-proxy", "model", window_size=10, minimum_calls=10,
+            failure_rate_threshold=0.5
+        )
+        
+        for _ in range(4):
+            await _run(breaker, _fail)
+            await _run(breaker, _ok)
+        await _run(breaker, _fail)
+        assert breaker.state == CircuitState.CLOSED  # 9 вызовов < minimum_calls
+        
+        await _run(breaker, _fail)
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.failure_rate == 0.6
+        
+        with pytest.raises(CircuitOpenError) as exc_info:
+            await breaker.call(_ok)
+        assert exc_info.value.reason == "circuit_open"
+        assert exc_info.value.retry_after >= 1
+    
+    @pytest.mark.asyncio
+    async def test_window_slides(self):
+        """Тест: старые ошибки вытесняются из окна успешными вызовами"""
+        breaker = SlidingWindowCircuitBreaker(
+            "http://llm-proxy", "model", window_size=4, minimum_calls=4,
+            failure_rate_threshold=0.75
+        )
+        
+        await _run(breaker, _fail, 2)
+        await _run(breaker, _ok, 4)
+        assert breaker.failure_rate == 0.0
+        
+        await _run(breaker, _fail, 2)
+        assert breaker.state == CircuitState.CLOSED
+    
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_count(self):
+        async def bad_request():
+            raise _status_error(400)
+        
+        breaker = SlidingWindowCircuitBreaker(
+            "http://llm-proxy", "model", window_size=2, minimum_calls=2
+        )
+        
+        await _run(breaker, bad_request, 5)
+        
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.stats["failures"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_half_open_single_flight(self):
+        """Тест: в HALF_OPEN проходит только один пробный запрос"""
+        breaker = SlidingWindowCircuitBreaker(
+            "http://llm-proxy", "model", window_size=2, minimum_calls=2,
+            recovery_timeout=0.01
+        )
+        await _run(breaker, _fail, 2)
+        assert breaker.state == CircuitState.OPEN
+        await asyncio.sleep(0.02)
+        
+        release = asyncio.Event()
+        probes = 0
+        
+        async def probe():
+            nonlocal probes
+            probes += 1
+            await release.wait()
+            return "ok"
+        
+        tasks = [asyncio.create_task(breaker.call(probe)) for _ in range(10)]
+        await asyncio.sleep(0)
+        
+        assert probes == 1
+        assert breaker.state == CircuitState.HALF_OPEN
+        
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        assert results.count("ok") == 1
+        rejected = [r for r in results if isinstance(r, CircuitOpenError)]
+        assert len(rejected) == 9
+        assert all(r.reason == "half_open_probe_in_flight" for r in rejected)
+        assert breaker.state == CircuitState.CLOSED
+    
+    @pytest.mark.asyncio
+    async def test_failed_probe_reopens(self):
+        breaker = SlidingWindowCircuitBreaker(
+            "http://llm-proxy", "model", window_size=2, minimum_calls=2,
+            recovery_timeout=0.01
+        )
+        await _run(breaker, _fail, 2)
+        await asyncio.sleep(0.02)
+        
+        await _run(breaker, _fail)
+        
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.stats["opened"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_releases_slot(self):
+        breaker = SlidingWindowCircuitBreaker(
+            "http://llm-proxy", "model", window_size=2, minimum_calls=2,
+            recovery_timeout=0.01
+        )
+        await _run(breaker, _fail, 2)
+        await asyncio.sleep(0.02)
+        
+        task = asyncio.create_task(breaker.call(asyncio.sleep, 10))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert await breaker.call(_ok) == "ok"
+        assert breaker.state == CircuitState.CLOSED
+    
+    def test_is_upstream_failure(self):
+        assert is_upstream_failure(_status_error(503))
+        assert is_upstream_failure(httpx.ConnectError("refused"))
+        assert not is_upstream_failure(_status_error(400))
+        assert not is_upstream_failure(_status_error(429))
+        
+        wrapped = RuntimeError("LLM call failed")
+        wrapped.__cause__ = _status_error(422)
+        assert not is_upstream_failure(wrapped)
+
+
+class TestCircuitBreakerRegistry:
+    """Тесты CircuitBreakerRegistry"""
+    
+    @pytest.mark.asyncio
+    async def test_models_are_isolated(self):
+        """Тест: сбой одной модели не открывает circuit другой"""
+        registry = CircuitBreakerRegistry(window_size=2, minimum_calls=2)
+        
+        await _run(registry.get("http://llm-proxy", "bad-model"), _fail, 2)
+        
+        assert registry.get("http://llm-proxy", "bad-model").state == CircuitState.OPEN
+        assert await registry.get("http://llm-proxy", "good-model").call(_ok) == "ok"
+        assert registry.get("http://other-proxy", "bad-model").state == CircuitState.CLOSED
+        
+        stats = registry.get_stats()
+        assert stats["open"] == 1
+        assert len(stats["breakers"]) == 3
+    
+    @pytest.mark.asyncio
+    async def test_state_changes_are_published(self):
+        listener = AsyncMock()
+        registry = CircuitBreakerRegistry(
+            window_size=2, minimum_calls=2, recovery_timeout=0.01, on_state_change=listener
+        )
+        breaker = registry.get("http://llm-proxy", "model")
+        
+        await _run(breaker, _fail, 2)
+        await asyncio.sleep(0.02)
+        await _run(breaker, _ok)
+        
+        transitions = [(c.args[2], c.args[3]) for c in listener.call_args_list]
+        assert transitions == [
+            (CircuitState.CLOSED, CircuitState.OPEN),
+            (CircuitState.OPEN, CircuitState.HALF_OPEN),
+            (CircuitState.HALF_OPEN, CircuitState.CLOSED),
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_publish_event(self, monkeypatch):
+        from app.infrastructure.resilience import circuit_breaker_registry
+        
+        publish = AsyncMock()
+        monkeypatch.setattr(circuit_breaker_registry.event_bus, "publish", publish)
+        
+        await publish_circuit_state_change(
+            "http://llm-proxy", "model", CircuitState.CLOSED, CircuitState.OPEN,
+            {"failure_rate": 0.6, "window_calls": 10}
+        )
+        
+        event = publish.call_args.args[0]
+        assert event.event_type == EventType.LLM_CIRCUIT_STATE_CHANGED
+        assert event.data["to_state"] == "open"
+        assert event.data["model"] == "model"
+
+
+class TestHandlerCircuitOpen:
+    """Тесты отказа по открытому circuit в StreamLLMResponseHandler"""
+    
+    @pytest.mark.asyncio
+    async def test_open_circuit_yields_retry_after_chunk(self):
+        tool_filter = Mock()
+        tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+        llm_client = Mock()
+        llm_client.chat_completion = AsyncMock(
+            side_effect=CircuitOpenError("http://llm-proxy", "model", 12, "circuit_open")
+        )
+        handler = StreamLLMResponseHandler(
+            llm_client=llm_client,
+            tool_filter=tool_filter,
+            response_processor=Mock(),
+            event_publisher=AsyncMock(),
+            session_service=AsyncMock(),
+            approval_manager=Mock()
+        )
+        
+        chunks = [
+            chunk async for chunk in handler.handle(
+                "session-1", [{"role": "user", "content": "Hello"}], "model"
+            )
+        ]
+        
+        assert len(chunks) == 1
+        assert chunks[0].type == "error"
+        assert chunks[0].metadata == {"retry_after": 12, "reason": "circuit_open"}
@@ -0,0 +1,143 @@
+"""
+Unit тесты для ContextBudgeter.
+
+Тестирует подсчет токенов и уплотнение истории под контекстное окно.
+"""
+
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.domain.entities import Message, Session
+from app.domain.services.context_budget import (
+    ContextBudgeter,
+    estimate_llm_message_tokens,
+    estimate_tokens,
+)
+from app.domain.services.tool_filter_service import ToolBundle, ToolFilterService
+
+
+def _tool_call(call_id: str, name: str = "read_file") -> dict:
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": name, "arguments": "{}"}
+    }
+
+
+def _long_session(turns: int, tool_output_words: int = 50) -> Session:
+    """Сессия из N ходов: user -> assistant(tool_call) -> tool -> assistant"""
+    session = Session(id="session-1", max_messages=10000)
+    for turn in range(turns):
+        session.add_message(Message(
+            id=f"u{turn}", role="user", content=f"Question number {turn} about the code"
+        ))
+        session.add_message(Message(
+            id=f"a{turn}", role="assistant", content="", tool_calls=[_tool_call(f"c{turn}")]
+        ))
+        session.add_message(Message(
+            id=f"t{turn}", role="tool", tool_call_id=f"c{turn}",
+            content=" ".join(["line"] * tool_output_words)
+        ))
+        session.add_message(Message(
+            id=f"r{turn}", role="assistant", content=f"Answer number {turn}"
+        ))
+    return session
+
+
+@pytest.fixture
+def tool_filter():
+    tool_filter = Mock(spec=ToolFilterService)
+    tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+    return tool_filter
+
+
+class TestTokenEstimation:
+    """Тесты приближенного подсчета токенов"""
+    
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens(None) == 0
+        assert estimate_tokens("Hello, world!") == 6
+        # Кириллица тяжелее латиницы
+        assert estimate_tokens("привет мир") > estimate_tokens("hello world")
+    
+    def test_message_tokens_include_tool_calls(self):
+        plain = estimate_llm_message_tokens({"role": "assistant", "content": ""})
+        with_calls = estimate_llm_message_tokens({
+            "role": "assistant", "tool_calls": [_tool_call("c1")]
+        })
+        assert with_calls > plain
+    
+    def test_token_count_is_cached_on_message(self, tool_filter):
+        budgeter = ContextBudgeter(tool_filter)
+        message = Message(id="m1", role="user", content="Hello there")
+        
+        count = budgeter.count_message_tokens(message)
+        
+        assert message.token_count == count
+        message.content = "A much longer content that would change the estimate"
+        assert budgeter.count_message_tokens(message) == count
+
+
+class TestContextBudgeter:
+    """Тесты формирования истории в пределах бюджета"""
+    
+    @pytest.mark.asyncio
+    async def test_short_history_is_kept(self, tool_filter):
+        budgeter = ContextBudgeter(tool_filter, default_context_length=8192)
+        session = _long_session(turns=2)
+        
+        history = await budgeter.build_history(session, "System prompt", "model")
+        
+        assert history[0] == {"role": "system", "content": "System prompt"}
+        assert len(history) == 1 + len(session.messages)
+    
+    @pytest.mark.asyncio
+    async def test_long_history_is_compacted(self, tool_filter):
+        provider = AsyncMock(return_value=2048)
+        budgeter = ContextBudgeter(
+            tool_filter,
+            context_length_provider=provider,
+            summary_max_tokens=128
+        )
+        session = _long_session(turns=100)
+        
+        history = await budgeter.build_history(session, "System prompt", "model")
+        
+        provider.assert_awaited_once_with("model")
+        total = sum(estimate_llm_message_tokens(m) for m in history)
+        assert total <= 2048 - 512
+        assert history[0] == {"role": "system", "content": "System prompt"}
+        assert "Summary of earlier conversation" in history[1]["content"]
+        # Последний ход сохраняется
+        assert history[-1]["content"] == "Answer number 99"
+        # Результат инструмента не остается без tool call
+        assert history[2]["role"] != "tool"
+    
+    @pytest.mark.asyncio
+    async def test_old_tool_results_are_truncated(self, tool_filter):
+        budgeter = ContextBudgeter(
+            tool_filter,
+            default_context_length=100000,
+            tool_result_max_tokens=20
+        )
+        session = _long_session(turns=2, tool_output_words=200)
+        
+        history = await budgeter.build_history(session, "System prompt", "model")
+        tool_messages = [m for m in history if m["role"] == "tool"]
+        
+        # Результат прошлого хода усечен, текущего - нет
+        assert "truncated" in tool_messages[0]["content"]
+        assert "truncated" not in tool_messages[1]["content"]
+    
+    @pytest.mark.asyncio
+    async def test_provider_failure_uses_default(self, tool_filter):
+        provider = AsyncMock(side_effect=RuntimeError("proxy down"))
+        budgeter = ContextBudgeter(
+            tool_filter,
+            context_length_provider=provider,
+            default_context_length=4096
+        )
+        
+        assert await budgeter.get_context_length("model") == 4096
@@ -0,0 +1,149 @@
+"""
+Тесты цепочек резервных моделей.
+
+Проверяет цепочку моделей агента и переход LLMProxyClient
+к резервной модели при открытом circuit или перегрузке.
+"""
+
+from typing import Optional
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from app.agents.base_agent import AgentType
+from app.agents.coder_agent import CoderAgent
+from app.core.config import AppConfig
+from app.infrastructure.llm.llm_client import LLMClientError, LLMProxyClient
+from app.infrastructure.resilience import CircuitBreakerRegistry, CircuitOpenError
+
+
+def _response(status: int, model: str) -> httpx.Response:
+    request = httpx.Request("POST", "http://llm-proxy/v1/chat/completions")
+    return httpx.Response(
+        status,
+        json={"model": model, "choices": [{"message": {"content": f"from {model}"}}]},
+        request=request
+    )
+
+
+def _client(registry: Optional[CircuitBreakerRegistry] = None) -> LLMProxyClient:
+    return LLMProxyClient(
+        base_url="http://llm-proxy", circuit_breakers=registry or CircuitBreakerRegistry()
+    )
+
+
+class TestModelChain:
+    """Тесты цепочки моделей агента"""
+    
+    def test_default_chain(self, monkeypatch):
+        monkeypatch.setattr(AppConfig, "LLM_FALLBACK_CHAINS", {})
+        
+        assert CoderAgent().get_model_chain() == [AppConfig.LLM_MODEL]
+    
+    def test_configured_chain(self, monkeypatch):
+        monkeypatch.setattr(
+            AppConfig, "LLM_FALLBACK_CHAINS", {AgentType.CODER.value: ["primary", "secondary"]}
+        )
+        
+        assert CoderAgent().get_model_chain() == ["primary", "secondary"]
+
+
+class TestClientFallback:
+    """Тесты перехода LLMProxyClient к резервной модели"""
+    
+    @pytest.mark.asyncio
+    async def test_fallback_models_forwarded_to_proxy(self):
+        client = _client()
+        client._http_client.post = AsyncMock(return_value=_response(200, "primary"))
+        
+        response = await client.chat_completion(
+            model="primary",
+            messages=[{"role": "user", "content": "Hi"}],
+            tools=[],
+            fallback_models=["secondary"]
+        )
+        
+        assert response.content == "from primary"
+        body = client._http_client.post.call_args.kwargs["json"]
+        assert body["fallback_models"] == ["secondary"]
+        await client.close()
+    
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_to_next_model(self):
+        registry = CircuitBreakerRegistry(window_size=1, minimum_calls=1, recovery_timeout=60)
+        client = _client(registry)
+        
+        async def failing():
+            _response(502, "primary").raise_for_status()
+        
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry.get("http://llm-proxy", "primary").call(failing)
+        
+        client._http_client.post = AsyncMock(return_value=_response(200, "secondary"))
+        
+        response = await client.chat_completion(
+            model="primary",
+            messages=[{"role": "user", "content": "Hi"}],
+            tools=[],
+            fallback_models=["secondary"]
+        )
+        
+        assert response.content == "from secondary"
+        assert client._http_client.post.call_count == 1
+        body = client._http_client.post.call_args.kwargs["json"]
+        assert body["model"] == "secondary"
+        assert "fallback_models" not in body
+        await client.close()
+    
+    @pytest.mark.asyncio
+    async def test_overload_falls_back(self):
+        client = _client()
+        client._http_client.post = AsyncMock(
+            side_effect=[_response(429, "primary"), _response(200, "secondary")]
+        )
+        
+        response = await client.chat_completion(
+            model="primary",
+            messages=[{"role": "user", "content": "Hi"}],
+            tools=[],
+            fallback_models=["secondary"]
+        )
+        
+        assert response.content == "from secondary"
+        await client.close()
+    
+    @pytest.mark.asyncio
+    async def test_client_error_does_not_fall_back(self):
+        client = _client()
+        client._http_client.post = AsyncMock(return_value=_response(400, "primary"))
+        
+        with pytest.raises(LLMClientError):
+            await client.chat_completion(
+                model="primary",
+                messages=[{"role": "user", "content": "Hi"}],
+                tools=[],
+                fallback_models=["secondary"]
+            )
+        
+        assert client._http_client.post.call_count == 1
+        await client.close()
+    
+    @pytest.mark.asyncio
+    async def test_last_model_error_is_raised(self):
+        registry = CircuitBreakerRegistry(window_size=1, minimum_calls=1, recovery_timeout=60)
+        client = _client(registry)
+        
+        async def failing():
+            _response(502, "primary").raise_for_status()
+        
+        with pytest.raises(httpx.HTTPStatusError):
+            await registry.get("http://llm-proxy", "primary").call(failing)
+        
+        with pytest.raises(CircuitOpenError):
+            await client.chat_completion(
+                model="primary",
+                messages=[{"role": "user", "content": "Hi"}],
+                tools=[]
+            )
+        await client.close()
@@ -48,7 +48,7 @@ class TestLLMResponseProcessor:
         # Assert
         assert processed.content == "Hello, world!"
         assert len(processed.tool_calls) == 0
-        assert processed.requires_approval == False
+        assert processed.requires_approval is False
         assert len(processed.validation_warnings) == 0
     
     def test_process_response_with_single_tool_call(self, processor, mock_hitl_policy):
@@ -74,12 +74,16 @@ class TestLLMResponseProcessor:
         # Assert
         assert len(processed.tool_calls) == 1
         assert processed.tool_calls[0].tool_name == "read_file"
-        assert processed.requires_approval == False
+        assert processed.requires_approval is False
         assert len(processed.validation_warnings) == 0
     
-    def test_process_response_with_multiple_tool_calls(self, processor):
-        """Тест бизнес-правила: только один tool call за раз"""
+    def test_process_response_with_multiple_tool_calls(self, mock_hitl_policy):
+        """Тест бизнес-правила: только один tool call за раз (пакеты отключены)"""
         # Arrange
+        processor = LLMResponseProcessor(
+            hitl_policy=mock_hitl_policy,
+            allow_parallel_tool_calls=False
+        )
         tool_call1 = ToolCall(id="call-1", tool_name="read_file", arguments={})
         tool_call2 = ToolCall(id="call-2", tool_name="write_file", arguments={})
         
@@ -99,6 +103,36 @@ class TestLLMResponseProcessor:
         assert len(processed.validation_warnings) == 1
         assert "simultaneously" in processed.validation_warnings[0].lower()
     
+    def test_process_response_with_tool_call_batch(self, processor, mock_hitl_policy):
+        """Тест пакетной обработки tool calls с HITL проверкой каждого вызова"""
+        # Arrange
+        tool_call1 = ToolCall(id="call-1", tool_name="read_file", arguments={})
+        tool_call2 = ToolCall(id="call-2", tool_name="write_file", arguments={})
+        
+        response = LLMResponse(
+            content="",
+            tool_calls=[tool_call1, tool_call2],
+            usage=TokenUsage(),
+            model="gpt-4"
+        )
+        
+        mock_hitl_policy.requires_approval.side_effect = lambda name: (
+            (True, "File modification requires approval")
+            if name == "write_file" else (False, None)
+        )
+        
+        # Act
+        processed = processor.process_response(response)
+        
+        # Assert
+        assert [tc.id for tc in processed.tool_calls] == ["call-1", "call-2"]
+        assert processed.is_tool_call_batch()
+        assert processed.requires_approval is True
+        assert processed.approval_reason == "File modification requires approval"
+        assert processed.tool_requires_approval("call-1") is False
+        assert processed.tool_requires_approval("call-2") is True
+        assert len(processed.validation_warnings) == 0
+    
     def test_process_response_with_hitl_approval_required(self, processor, mock_hitl_policy):
         """Тест проверки HITL политики"""
         # Arrange
@@ -124,7 +158,7 @@ class TestLLMResponseProcessor:
         processed = processor.process_response(response)
         
         # Assert
-        assert processed.requires_approval == True
+        assert processed.requires_approval is True
         assert processed.approval_reason == "File modification requires approval"
         mock_hitl_policy.requires_approval.assert_called_once_with("write_file")
     
@@ -158,7 +192,7 @@ class TestLLMResponseProcessor:
         is_valid, error = processor.validate_tool_call(tool_call)
         
         # Assert
-        assert is_valid == True
+        assert is_valid is True
         assert error is None
     
     def test_validate_tool_call_missing_id(self, processor):
@@ -174,7 +208,7 @@ class TestLLMResponseProcessor:
         is_valid, error = processor.validate_tool_call(tool_call)
         
         # Assert
-        assert is_valid == False
+        assert is_valid is False
         assert "ID is required" in error
     
     def test_validate_tool_call_missing_name(self, processor):
@@ -190,5 +224,5 @@ class TestLLMResponseProcessor:
         is_valid, error = processor.validate_tool_call(tool_call)
         
         # Assert
-        assert is_valid == False
+        assert is_valid is False
         assert "name is required" in error.lower()
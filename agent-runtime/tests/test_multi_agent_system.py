@@ -350,3 +350,99 @@ class TestToolRestrictions:
         assert agent.can_use_tool("search_in_code")
         assert not agent.can_use_tool("write_file")
         assert not agent.can_use_tool("execute_command")
+
+
+class TestToolCallBatchClosing:
+    """Test agents answer the rest of a batch when they stop mid-batch"""
+    
+    @staticmethod
+    def _session(*calls):
+        from app.domain.entities import Message, Session
+        
+        session = Session(id="session-1")
+        session.add_message(Message(
+            id="msg-1",
+            role="assistant",
+            content="",
+            tool_calls=[
+                {"id": call_id, "type": "function", "function": {"name": name, "arguments": "{}"}}
+                for call_id, name, _ in calls
+            ]
+        ))
+        return session
+    
+    @staticmethod
+    def _session_service(session):
+        from unittest.mock import AsyncMock, MagicMock
+        
+        from app.domain.entities import Message
+        
+        async def add_tool_result(session_id, call_id, result=None, error=None):
+            session.add_message(Message(
+                id=f"tool-{call_id}", role="tool", content=f"Error: {error}", tool_call_id=call_id
+            ))
+        
+        service = MagicMock()
+        service.get_session = AsyncMock(return_value=session)
+        service.add_tool_result = AsyncMock(side_effect=add_tool_result)
+        return service
+    
+    @staticmethod
+    async def _run(agent, session, calls):
+        from unittest.mock import AsyncMock, MagicMock
+        
+        from app.models.schemas import StreamChunk
+        
+        async def handle(**kwargs):
+            for call_id, name, arguments in calls:
+                yield StreamChunk(
+                    type="tool_call",
+                    call_id=call_id,
+                    tool_name=name,
+                    arguments=arguments,
+                    metadata={"batch_call_ids": [c[0] for c in calls]}
+                )
+        
+        stream_handler = MagicMock()
+        stream_handler.handle = handle
+        agent.build_llm_history = AsyncMock(return_value=[])
+        return [
+            chunk async for chunk in agent.process(
+                session_id="session-1",
+                message="",
+                context={},
+                session=session,
+                session_service=TestToolCallBatchClosing._session_service(session),
+                stream_handler=stream_handler
+            )
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_restricted_file_closes_batch(self):
+        """Every call of the batch gets a result after a rejected write"""
+        calls = [
+            ("call-1", "read_file", {"path": "a.md"}),
+            ("call-2", "write_file", {"path": "src/app.py"}),
+            ("call-3", "list_files", {"path": "."}),
+        ]
+        session = self._session(*calls)
+        
+        chunks = await self._run(ArchitectAgent(), session, calls)
+        
+        assert [c.type for c in chunks] == ["tool_call", "error"]
+        assert session.get_pending_batch_calls("call-1") == []
+    
+    @pytest.mark.asyncio
+    async def test_switch_mode_closes_other_calls(self):
+        """switch_mode leaves only its own call for the switch helper"""
+        calls = [
+            ("call-1", "read_file", {"path": "a.py"}),
+            ("call-2", "switch_mode", {"mode": "coder"}),
+            ("call-3", "read_file", {"path": "b.py"}),
+        ]
+        session = self._session(*calls)
+        
+        chunks = await self._run(DebugAgent(), session, calls)
+        
+        assert [c.type for c in chunks] == ["tool_call", "switch_agent"]
+        assert session.get_pending_batch_calls("call-1") == ["call-2"]
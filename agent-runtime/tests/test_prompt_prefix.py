@@ -0,0 +1,165 @@
+"""
+Тесты для стабильного префикса промпта и подсказок кэширования.
+
+Проверяет каноническую сериализацию префикса, передачу подсказок
+кэширования в LLM клиент и учет кэшированных токенов в метриках.
+"""
+
+import json
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
+from app.domain.entities.llm_response import LLMResponse, ProcessedResponse, TokenUsage
+from app.domain.services.prompt_prefix import PromptPrefix, PromptPrefixCache, canonical_json
+from app.domain.services.tool_filter_service import ToolBundle
+from app.events.subscribers.session_metrics_collector import LLMRequestMetrics, SessionMetrics
+from app.infrastructure.llm.llm_client import LLMProxyClient
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "read_file",
+        "description": "Read file",
+        "parameters": {"type": "object", "properties": {"path": {"type": "string"}}}
+    }
+}]
+TOOLS_JSON = canonical_json(TOOLS).encode("utf-8")
+
+
+class TestPromptPrefix:
+    """Тесты канонического префикса"""
+    
+    def test_hash_ignores_key_order(self):
+        reordered = [{
+            "function": {
+                "parameters": {"properties": {"path": {"type": "string"}}, "type": "object"},
+                "description": "Read file",
+                "name": "read_file"
+            },
+            "type": "function"
+        }]
+        
+        first = PromptPrefix.build("System prompt", canonical_json(TOOLS).encode())
+        second = PromptPrefix.build("System prompt", canonical_json(reordered).encode())
+        
+        assert first.hash == second.hash
+        assert first.cache_key.startswith("prefix-")
+    
+    def test_hash_changes_with_prompt(self):
+        assert (
+            PromptPrefix.build("System prompt", TOOLS_JSON).hash
+            != PromptPrefix.build("Other prompt", TOOLS_JSON).hash
+        )
+    
+    def test_cache_computes_prefix_once(self):
+        cache = PromptPrefixCache()
+        
+        first = cache.get("System prompt", TOOLS_JSON)
+        second = cache.get("System prompt", canonical_json(list(TOOLS)).encode())
+        
+        assert first is second
+        assert cache.get("System prompt", b"[]") is not first
+
+
+class TestCacheHints:
+    """Тесты передачи подсказок кэширования"""
+    
+    @pytest.mark.asyncio
+    async def test_handler_passes_cache_hints(self):
+        llm_client = Mock()
+        llm_client.chat_completion = AsyncMock(
+            return_value=LLMResponse(content="Hi", usage=TokenUsage(), model="model")
+        )
+        tool_filter = Mock()
+        tool_filter.get_bundle.return_value = ToolBundle(
+            tuple(TOOLS), frozenset({"read_file"}), TOOLS_JSON, 0
+        )
+        response_processor = Mock()
+        response_processor.process_response.return_value = ProcessedResponse(
+            content="Hi", usage=TokenUsage(), model="model"
+        )
+        cache = PromptPrefixCache()
+        handler = StreamLLMResponseHandler(
+            llm_client=llm_client,
+            tool_filter=tool_filter,
+            response_processor=response_processor,
+            event_publisher=AsyncMock(),
+            session_service=AsyncMock(),
+            approval_manager=Mock(),
+            prefix_cache=cache
+        )
+        history = [
+            {"role": "system", "content": "System prompt"},
+            {"role": "user", "content": "Hello"}
+        ]
+        
+        chunks = [c async for c in handler.handle("session-1", history, "model", ["read_file"])]
+        
+        assert chunks[-1].type == "assistant_message"
+        kwargs = llm_client.chat_completion.call_args.kwargs
+        prefix = cache.get("System prompt", TOOLS_JSON)
+        assert kwargs["cache_hints"]["prompt_cache_key"] == prefix.cache_key
+        assert kwargs["tools_json"] == TOOLS_JSON
+        tool_filter.get_bundle.assert_called_once_with(["read_file"])
+    
+    @pytest.mark.asyncio
+    async def test_client_splices_tools_json(self):
+        client = LLMProxyClient(base_url="http://llm-proxy", api_key="key")
+        response = Mock()
+        response.json.return_value = {"choices": [{"message": {"content": "Hi"}}]}
+        client._http_client.post = AsyncMock(return_value=response)
+        
+        await client.chat_completion(
+            model="model",
+            messages=[{"role": "user", "content": "Привет"}],
+            tools=TOOLS,
+            tools_json=TOOLS_JSON
+        )
+        
+        body = client._http_client.post.call_args.kwargs["content"]
+        assert TOOLS_JSON in body
+        assert json.loads(body) == {
+            "model": "model",
+            "messages": [{"role": "user", "content": "Привет"}],
+            "stream": False,
+            "tools": TOOLS
+        }
+        await client.close()
+    
+    def test_parse_cached_tokens(self):
+        assert LLMProxyClient._parse_cached_tokens(
+            {"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 64}}
+        ) == 64
+        assert LLMProxyClient._parse_cached_tokens(
+            {"prompt_tokens": 100, "cache_read_input_tokens": 32}
+        ) == 32
+        assert LLMProxyClient._parse_cached_tokens({"prompt_tokens": 100}) == 0
+        assert LLMProxyClient._parse_cached_tokens(None) == 0
+
+
+class TestCachedTokenMetrics:
+    """Тесты метрик кэша промпта"""
+    
+    def test_session_metrics_hit_rate(self):
+        metrics = SessionMetrics(session_id="session-1")
+        for cached in (0, 900):
+            metrics.add_request(LLMRequestMetrics(
+                timestamp=datetime.now(timezone.utc),
+                model="model",
+                duration_ms=100,
+                prompt_tokens=1000,
+                completion_tokens=10,
+                total_tokens=1010,
+                has_tool_calls=False,
+                success=True,
+                cached_prompt_tokens=cached
+            ))
+        
+        data = metrics.to_dict()
+        
+        assert data["total_cached_prompt_tokens"] == 900
+        assert data["total_uncached_prompt_tokens"] == 1100
+        assert data["prompt_cache_hit_rate"] == 0.45
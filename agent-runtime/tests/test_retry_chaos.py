@@ -0,0 +1,179 @@
+"""
+Chaos тесты RetryHandler.
+
+Локальный фейковый upstream (httpx.MockTransport) отвечает 503/429
+по расписанию. Проверяется, что бюджет повторов, full jitter и дедлайн
+запроса не дают повторам превратиться в retry storm.
+"""
+
+import asyncio
+import time
+from typing import Callable, List
+
+import httpx
+import pytest
+
+from app.infrastructure.resilience.retry_handler import (
+    RetryBudget,
+    RetryHandler,
+    is_retryable_http_error,
+    request_deadline,
+)
+
+
+class ScheduledUpstream:
+    """
+    Фейковый upstream: статус ответа определяется номером запроса.
+    
+    Атрибуты:
+        requests: Число полученных запросов
+        request_times: Время получения каждого запроса (monotonic)
+    """
+    
+    def __init__(self, schedule: Callable[[int], int]):
+        self._schedule = schedule
+        self.requests = 0
+        self.request_times: List[float] = []
+    
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        status = self._schedule(self.requests)
+        self.requests += 1
+        self.request_times.append(time.monotonic())
+        return httpx.Response(status, json={"status": status})
+    
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self))
+
+
+def _caller(handler: RetryHandler, client: httpx.AsyncClient):
+    @handler
+    async def call():
+        response = await client.post("http://upstream/v1/chat/completions", json={})
+        response.raise_for_status()
+        return response.status_code
+    return call
+
+
+async def _run_clients(call, count: int) -> List[object]:
+    return await asyncio.gather(*(call() for _ in range(count)), return_exceptions=True)
+
+
+class TestRetryStorm:
+    """Сценарии перегрузки upstream"""
+    
+    @pytest.mark.asyncio
+    async def test_outage_without_budget_amplifies_load(self):
+        """Базовая линия: без бюджета каждый клиент делает все повторы"""
+        upstream = ScheduledUpstream(lambda n: 503)
+        handler = RetryHandler(max_retries=3, base_delay=0.001, retry_on=is_retryable_http_error)
+        
+        async with upstream.client() as client:
+            await _run_clients(_caller(handler, client), 50)
+        
+        assert upstream.requests == 200
+        assert handler.stats["retries_attempted"] == 150
+    
+    @pytest.mark.asyncio
+    async def test_outage_with_budget_caps_retries(self):
+        """Бюджет ограничивает повторы долей запросов"""
+        upstream = ScheduledUpstream(lambda n: 503)
+        handler = RetryHandler(
+            max_retries=3,
+            base_delay=0.001,
+            budget=RetryBudget(retry_ratio=0.2, initial_tokens=10),
+            retry_on=is_retryable_http_error
+        )
+        
+        async with upstream.client() as client:
+            results = await _run_clients(_caller(handler, client), 50)
+        
+        assert all(isinstance(r, httpx.HTTPStatusError) for r in results)
+        # 10 начальных токенов + 20% от 50 запросов
+        assert handler.stats["retries_attempted"] <= 20
+        assert handler.stats["retries_suppressed_budget"] >= 30
+        assert upstream.requests <= 70
+    
+    @pytest.mark.asyncio
+    async def test_transient_overload_recovers_within_budget(self):
+        """Короткая перегрузка (429, затем 503) переживается повторами"""
+        schedule = {0: 429, 1: 503}
+        upstream = ScheduledUpstream(lambda n: schedule.get(n, 200))
+        handler = RetryHandler(
+            max_retries=3,
+            base_delay=0.001,
+            budget=RetryBudget(),
+            retry_on=is_retryable_http_error
+        )
+        
+        async with upstream.client() as client:
+            assert await _caller(handler, client)() == 200
+        
+        assert upstream.requests == 3
+        assert handler.get_stats()["retries_attempted"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_jitter_spreads_retries(self):
+        """Full jitter разносит повторы одновременных клиентов во времени"""
+        clients = 50
+        upstream = ScheduledUpstream(lambda n: 503 if n < clients else 200)
+        handler = RetryHandler(max_retries=1, base_delay=0.1, jitter=True)
+        
+        async with upstream.client() as client:
+            await _run_clients(_caller(handler, client), clients)
+        
+        retry_times = upstream.request_times[clients:]
+        assert len(retry_times) == clients
+        assert max(retry_times) - min(retry_times) > 0.03
+    
+    @pytest.mark.asyncio
+    async def test_deadline_suppresses_retry(self):
+        """Повтор не начинается, если не успеет до дедлайна клиента"""
+        upstream = ScheduledUpstream(lambda n: 429)
+        handler = RetryHandler(max_retries=3, base_delay=1.0, jitter=False)
+        
+        async with upstream.client() as client:
+            with request_deadline(0.5):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await _caller(handler, client)()
+        
+        assert upstream.requests == 1
+        assert handler.stats["retries_suppressed_deadline"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_non_retryable_error_is_not_retried(self):
+        upstream = ScheduledUpstream(lambda n: 400)
+        handler = RetryHandler(max_retries=3, base_delay=0.001, retry_on=is_retryable_http_error)
+        
+        async with upstream.client() as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await _caller(handler, client)()
+        
+        assert upstream.requests == 1
+        assert handler.stats["non_retryable"] == 1
+
+
+class TestRetryBudget:
+    """Тесты token bucket бюджета"""
+    
+    def test_budget_refills_per_request(self):
+        budget = RetryBudget(retry_ratio=0.5, initial_tokens=1, max_tokens=2)
+        
+        assert budget.try_acquire_retry() is True
+        assert budget.try_acquire_retry() is False
+        
+        budget.record_request()
+        budget.record_request()
+        assert budget.try_acquire_retry() is True
+        
+        for _ in range(10):
+            budget.record_request()
+        assert budget.tokens == 2
+    
+    def test_nested_deadline_cannot_extend_outer(self):
+        from app.infrastructure.resilience.retry_handler import get_remaining_time
+        
+        assert get_remaining_time() is None
+        with request_deadline(1.0):
+            with request_deadline(10.0):
+                assert get_remaining_time() <= 1.0
+        assert get_remaining_time() is None
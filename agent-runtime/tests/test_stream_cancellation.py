@@ -0,0 +1,206 @@
+"""
+Тесты отмены стрима при отключении клиента.
+
+Проверяет однократную отмену стрима CancellableStreamingResponse,
+сохранение частичного ответа StreamLLMResponseHandler и метрики
+отмененных запросов.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
+from app.domain.entities.llm_response import LLMResponse
+from app.domain.services.tool_filter_service import ToolBundle
+from app.events.llm_events import LLMRequestCancelledEvent
+from app.events.subscribers.session_metrics_collector import SessionMetricsCollector
+from app.infrastructure.streaming import CancellableStreamingResponse
+from app.models.schemas import StreamChunk
+
+
+def _handler(llm_client):
+    tool_filter = Mock()
+    tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+    return StreamLLMResponseHandler(
+        llm_client=llm_client,
+        tool_filter=tool_filter,
+        response_processor=Mock(),
+        event_publisher=AsyncMock(),
+        session_service=AsyncMock(),
+        approval_manager=Mock(),
+        stream_tokens=True
+    )
+
+
+def _hanging_llm_client(*tokens):
+    """LLM стрим: отдает tokens и дальше не завершается"""
+    async def stream_chat_completion(**kwargs):
+        for token in tokens:
+            yield token
+        llm_client.waiting.set()
+        await asyncio.Event().wait()
+    
+    llm_client = Mock()
+    llm_client.stream_chat_completion = stream_chat_completion
+    llm_client.waiting = asyncio.Event()
+    return llm_client
+
+
+async def _consume_then_cancel(handler):
+    received = []
+    
+    async def consume():
+        history = [{"role": "user", "content": "Hi"}]
+        async for chunk in handler.handle("session-1", history, "gpt-4"):
+            received.append(chunk)
+    
+    task = asyncio.create_task(consume())
+    await handler._llm_client.waiting.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    return received
+
+
+class TestHandlerCancellation:
+    """Тесты отмены запроса к LLM в StreamLLMResponseHandler"""
+    
+    @pytest.mark.asyncio
+    async def test_partial_answer_is_persisted_as_interrupted(self):
+        handler = _handler(_hanging_llm_client("Hel", "lo"))
+        
+        received = await _consume_then_cancel(handler)
+        
+        assert [chunk.token for chunk in received] == ["Hel", "lo"]
+        handler._session_service.add_message.assert_awaited_once_with(
+            session_id="session-1",
+            role="assistant",
+            content="Hello",
+            metadata={"interrupted": True}
+        )
+        publish = handler._event_publisher.publish_request_cancelled
+        publish.assert_awaited_once()
+        assert publish.await_args.kwargs["partial_length"] == 5
+        handler._event_publisher.publish_request_failed.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_cancel_before_first_token_records_only_metrics(self):
+        handler = _handler(_hanging_llm_client())
+        
+        await _consume_then_cancel(handler)
+        
+        handler._session_service.add_message.assert_not_awaited()
+        handler._event_publisher.publish_request_cancelled.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_stop_after_complete_response_is_not_a_cancellation(self):
+        async def stream_chat_completion(**kwargs):
+            yield LLMResponse(content="", model="gpt-4")
+        
+        llm_client = Mock()
+        llm_client.stream_chat_completion = stream_chat_completion
+        handler = _handler(llm_client)
+        handler._response_processor.process_response.return_value = Mock(
+            validation_warnings=[], has_tool_calls=Mock(return_value=True)
+        )
+        handler._handle_tool_calls = AsyncMock(return_value=[
+            StreamChunk(type="tool_call", call_id="call-1", tool_name="switch_mode"),
+            StreamChunk(type="tool_call", call_id="call-2", tool_name="read_file"),
+        ])
+        
+        # Агент останавливается на первом tool call (switch_mode)
+        stream = handler.handle("session-1", [{"role": "user", "content": "Hi"}], "gpt-4")
+        first = await anext(stream)
+        await stream.aclose()
+        
+        assert first.call_id == "call-1"
+        handler._session_service.add_message.assert_not_awaited()
+        handler._event_publisher.publish_request_cancelled.assert_not_awaited()
+
+
+class _ASGIClient:
+    """Клиент, отключающийся после первого кадра тела ответа"""
+    
+    def __init__(self, disconnect_after_body: bool = True):
+        self.bodies = []
+        self._disconnect_after_body = disconnect_after_body
+        self._disconnected = asyncio.Event()
+    
+    async def receive(self):
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(self, message):
+        if message["type"] == "http.response.body" and message["body"]:
+            self.bodies.append(message["body"])
+            if self._disconnect_after_body:
+                self._disconnected.set()
+
+
+class TestCancellableStreamingResponse:
+    """Тесты отмены SSE ответа при отключении клиента"""
+    
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_stream_once_and_waits_for_cleanup(self):
+        cleanup = []
+        
+        async def frames():
+            yield b"data: 1\n\n"
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                # Очистка с несколькими await не прерывается повторной отменой
+                for _ in range(3):
+                    await asyncio.sleep(0)
+                cleanup.append("done")
+                raise
+        
+        client = _ASGIClient()
+        response = CancellableStreamingResponse(frames(), media_type="text/event-stream")
+        
+        await asyncio.wait_for(response({"type": "http"}, client.receive, client.send), 1)
+        
+        assert client.bodies == [b"data: 1\n\n"]
+        assert cleanup == ["done"]
+    
+    @pytest.mark.asyncio
+    async def test_completed_stream_runs_background(self):
+        async def frames():
+            yield b"data: 1\n\n"
+            yield b"data: 2\n\n"
+        
+        background = AsyncMock()
+        client = _ASGIClient(disconnect_after_body=False)
+        response = CancellableStreamingResponse(frames(), background=background)
+        
+        await asyncio.wait_for(response({"type": "http"}, client.receive, client.send), 1)
+        
+        assert client.bodies == [b"data: 1\n\n", b"data: 2\n\n"]
+        background.assert_awaited_once()
+
+
+class TestCancellationMetrics:
+    """Тесты метрик отмененных запросов"""
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_requests_are_counted_per_session_and_model(self):
+        collector = SessionMetricsCollector()
+        
+        for partial_length in (5, 7):
+            await collector._on_request_cancelled(LLMRequestCancelledEvent(
+                session_id="session-1",
+                model="gpt-4",
+                duration_ms=100,
+                partial_length=partial_length
+            ))
+        
+        session = collector.get_session_metrics("session-1").to_dict()
+        assert session["cancelled_requests"] == 2
+        assert session["failed_requests"] == 0
+        assert collector.get_cancellation_stats() == {
+            "cancelled_requests": 2,
+            "partial_chars": 12,
+            "by_model": {"gpt-4": {"count": 2, "duration_ms": 200, "partial_chars": 12}}
+        }
@@ -0,0 +1,265 @@
+"""
+Тесты стриминга аргументов tool calls.
+
+Проверяет инкрементальный JSON парсер, сборку tool calls из
+delta.tool_calls, чтение SSE стрима LLMProxyClient и chunks
+tool_call_delta в StreamLLMResponseHandler.
+"""
+
+import json
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+
+from app.application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
+from app.domain.entities.llm_response import LLMResponse, TokenUsage
+from app.domain.services.tool_filter_service import ToolBundle
+from app.infrastructure.llm.llm_client import LLMProxyClient
+from app.infrastructure.llm.streaming_json import ArgumentDelta, IncrementalJSONObjectParser
+from app.infrastructure.llm.tool_parser import StreamingToolCallParser, ToolCallDelta
+from app.infrastructure.resilience import CircuitBreakerRegistry
+
+
+def _feed_all(parser, text, size):
+    deltas = []
+    for start in range(0, len(text), size):
+        deltas.extend(parser.feed(text[start:start + size]))
+    return deltas
+
+
+class TestIncrementalJSONObjectParser:
+    """Тесты инкрементального парсера аргументов"""
+    
+    ARGUMENTS = {
+        "path": "src/main.py",
+        "content": 'print("héllo")\n\t\\ done 😀',
+        "line": 42,
+        "options": {"overwrite": True, "tags": ["a", "}"]},
+        "flag": None
+    }
+    
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+    def test_any_split_gives_same_values(self, size):
+        text = json.dumps(self.ARGUMENTS)
+        parser = IncrementalJSONObjectParser()
+        
+        deltas = _feed_all(parser, text, size)
+        
+        strings = {}
+        values = {}
+        for delta in deltas:
+            if delta.text is not None:
+                strings[delta.name] = strings.get(delta.name, "") + delta.text
+            else:
+                values[delta.name] = delta.value
+        assert strings == {"path": "src/main.py", "content": self.ARGUMENTS["content"]}
+        assert values == {"line": 42, "options": self.ARGUMENTS["options"], "flag": None}
+        assert parser.finish() == self.ARGUMENTS
+    
+    def test_path_is_reported_before_content_ends(self):
+        parser = IncrementalJSONObjectParser()
+        
+        deltas = parser.feed('{"path": "a.py", "content": "first line\\nsec')
+        
+        assert deltas == [
+            ArgumentDelta(name="path", text="a.py", complete=True),
+            ArgumentDelta(name="content", text="first line\nsec"),
+        ]
+    
+    def test_invalid_json_fails_on_finish(self):
+        parser = IncrementalJSONObjectParser()
+        
+        deltas = parser.feed('{"path": "a.py",}')
+        
+        assert deltas == [ArgumentDelta(name="path", text="a.py", complete=True)]
+        assert parser.failed
+        with pytest.raises(ValueError):
+            parser.finish()
+    
+    def test_empty_and_non_object(self):
+        assert IncrementalJSONObjectParser().finish() == {}
+        
+        parser = IncrementalJSONObjectParser()
+        parser.feed("[1, 2]")
+        assert parser.failed
+        with pytest.raises(ValueError):
+            parser.finish()
+
+
+def _tool_delta(index, arguments, call_id=None, name=None):
+    """Элемент delta.tool_calls (id и имя приходят в первом delta вызова)"""
+    delta = {"index": index, "function": {"arguments": arguments}}
+    if call_id is not None:
+        delta["id"] = call_id
+        delta["type"] = "function"
+        delta["function"]["name"] = name
+    return delta
+
+
+class TestStreamingToolCallParser:
+    """Тесты сборки tool calls из delta.tool_calls"""
+    
+    def test_deltas_and_final_tool_calls(self):
+        parser = StreamingToolCallParser()
+        
+        deltas = parser.feed([_tool_delta(0, "", "call_1", "write_file")])
+        deltas += parser.feed([_tool_delta(0, '{"path": "a.py", "con')])
+        deltas += parser.feed([_tool_delta(0, 'tent": "x = 1"}')])
+        deltas += parser.feed([_tool_delta(1, '{"path": "b.py"}', "call_2", "read_file")])
+        
+        assert deltas[0] == ToolCallDelta(index=0, call_id="call_1", tool_name="write_file")
+        assert [(d.index, d.argument, d.text, d.complete) for d in deltas[1:]] == [
+            (0, "path", "a.py", True),
+            (0, "content", "x = 1", True),
+            (1, None, None, False),
+            (1, "path", "b.py", True),
+        ]
+        
+        tool_calls = parser.finish()
+        assert [(tc.id, tc.tool_name, tc.arguments) for tc in tool_calls] == [
+            ("call_1", "write_file", {"path": "a.py", "content": "x = 1"}),
+            ("call_2", "read_file", {"path": "b.py"}),
+        ]
+    
+    def test_invalid_arguments_become_empty(self):
+        parser = StreamingToolCallParser()
+        parser.feed([_tool_delta(0, '{"path": ', "call_1", "write_file")])
+        
+        tool_calls = parser.finish()
+        
+        assert tool_calls[0].arguments == {}
+
+
+def _sse(chunks):
+    lines = []
+    for chunk in chunks:
+        lines.append(f"data: {json.dumps(chunk)}\r\ndata: \r\n\r\n")
+    lines.append("data: [DONE]\r\n\r\n")
+    return "".join(lines).encode("utf-8")
+
+
+def _chunk(delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-1",
+        "model": "gpt-4",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+
+STREAM = [
+    _chunk({"role": "assistant"}),
+    _chunk({"tool_calls": [_tool_delta(0, "", "call_1", "write_file")]}),
+    _chunk({"tool_calls": [_tool_delta(0, '{"path": "a.py", ')]}),
+    _chunk({"tool_calls": [_tool_delta(0, '"content": "x = 1"}')]}),
+    _chunk({}, finish_reason="tool_calls"),
+]
+
+
+def _proxy_client(handler) -> LLMProxyClient:
+    client = LLMProxyClient(
+        base_url="http://llm-proxy", circuit_breakers=CircuitBreakerRegistry()
+    )
+    client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+class TestLLMProxyClientStreaming:
+    """Тесты stream_chat_completion LLMProxyClient"""
+    
+    @pytest.mark.asyncio
+    async def test_stream_yields_deltas_then_response(self):
+        requests = []
+        
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, content=_sse(STREAM))
+        
+        client = _proxy_client(handler)
+        
+        events = [
+            event async for event in client.stream_chat_completion(
+                model="gpt-4", messages=[{"role": "user", "content": "Hi"}], tools=[]
+            )
+        ]
+        
+        assert requests[0]["stream"] is True
+        deltas, response = events[:-1], events[-1]
+        assert [d.argument for d in deltas] == [None, "path", "content"]
+        assert isinstance(response, LLMResponse)
+        assert response.finish_reason == "tool_calls"
+        assert response.tool_calls[0].id == "call_1"
+        assert response.tool_calls[0].arguments == {"path": "a.py", "content": "x = 1"}
+        await client.close()
+    
+    @pytest.mark.asyncio
+    async def test_overloaded_model_falls_back_before_stream(self):
+        models = []
+        
+        def handler(request):
+            model = json.loads(request.content)["model"]
+            models.append(model)
+            if model == "primary":
+                return httpx.Response(503)
+            return httpx.Response(200, content=_sse([_chunk({"content": "Hello"})]))
+        
+        client = _proxy_client(handler)
+        
+        events = [
+            event async for event in client.stream_chat_completion(
+                model="primary",
+                messages=[{"role": "user", "content": "Hi"}],
+                tools=[],
+                fallback_models=["secondary"]
+            )
+        ]
+        
+        assert models == ["primary", "secondary"]
+        assert events[-1].content == "Hello"
+        await client.close()
+
+
+class TestHandlerToolCallDeltas:
+    """Тесты chunks tool_call_delta в StreamLLMResponseHandler"""
+    
+    @pytest.mark.asyncio
+    async def test_deltas_are_yielded_before_final_chunk(self):
+        async def stream_chat_completion(**kwargs):
+            yield ToolCallDelta(index=0, call_id="call_1", tool_name="write_file")
+            yield ToolCallDelta(
+                index=0, call_id="call_1", tool_name="write_file",
+                argument="path", text="a.py", complete=True
+            )
+            yield LLMResponse(content="Done", tool_calls=[], usage=TokenUsage(), model="gpt-4")
+        
+        llm_client = Mock()
+        llm_client.stream_chat_completion = stream_chat_completion
+        tool_filter = Mock()
+        tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+        processed = Mock(validation_warnings=[], content="Done", model="gpt-4", usage=TokenUsage())
+        processed.has_tool_calls.return_value = False
+        response_processor = Mock()
+        response_processor.process_response.return_value = processed
+        handler = StreamLLMResponseHandler(
+            llm_client=llm_client,
+            tool_filter=tool_filter,
+            response_processor=response_processor,
+            event_publisher=AsyncMock(),
+            session_service=AsyncMock(),
+            approval_manager=Mock(),
+            stream_tool_arguments=True
+        )
+        
+        chunks = [
+            chunk async for chunk in handler.handle(
+                "session-1", [{"role": "user", "content": "Hello"}], "gpt-4"
+            )
+        ]
+        
+        assert [chunk.type for chunk in chunks] == [
+            "tool_call_delta", "tool_call_delta", "assistant_message"
+        ]
+        assert chunks[0].metadata == {"index": 0}
+        assert chunks[1].token == "a.py"
+        assert chunks[1].metadata == {"index": 0, "argument": "path", "complete": True}
+        assert chunks[2].content == "Done"
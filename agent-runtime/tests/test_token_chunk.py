@@ -0,0 +1,146 @@
+"""
+Тесты облегченного TokenChunk и стриминга токенов.
+
+Проверяет совпадение JSON TokenChunk с StreamChunk без null полей,
+кадры SSE messages_router и chunks assistant_message по токенам
+в StreamLLMResponseHandler.
+"""
+
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.api.v1.routers.messages_router import _sse_frame
+from app.application.handlers.stream_llm_response_handler import StreamLLMResponseHandler
+from app.domain.entities.llm_response import LLMResponse, TokenUsage
+from app.domain.services.tool_filter_service import ToolBundle
+from app.models.schemas import StreamChunk, TokenChunk
+
+
+def _without_none(chunk: StreamChunk) -> dict:
+    data = chunk.model_dump(exclude_none=True)
+    data.pop("requires_approval")
+    return data
+
+
+class TestTokenChunk:
+    """Тесты кодирования TokenChunk"""
+    
+    @pytest.mark.parametrize("kwargs", [
+        {"type": "assistant_message", "token": 'Привет "мир"\n👋'},
+        {"type": "assistant_message", "token": "", "is_final": True},
+        {
+            "type": "tool_call_delta",
+            "call_id": "call_1",
+            "tool_name": "write_file",
+            "token": "def main():",
+            "metadata": {"index": 0, "argument": "content", "complete": False}
+        },
+        {
+            "type": "tool_call_delta",
+            "call_id": "call_1",
+            "tool_name": "write_file",
+            "metadata": {"index": 0}
+        },
+    ])
+    def test_json_matches_stream_chunk_without_nulls(self, kwargs):
+        token_chunk = TokenChunk(**kwargs)
+        
+        encoded = token_chunk.to_json()
+        
+        assert b"null" not in encoded
+        assert json.loads(encoded) == _without_none(StreamChunk(**kwargs))
+    
+    def test_has_stream_chunk_attributes(self):
+        chunk = TokenChunk(type="assistant_message", token="Hi")
+        
+        assert (chunk.type, chunk.token, chunk.is_final) == ("assistant_message", "Hi", False)
+        assert chunk.content is None
+        assert chunk.error is None
+        assert chunk.arguments is None
+        assert chunk.requires_approval is False
+        with pytest.raises(AttributeError):
+            chunk.extra = 1
+    
+    def test_sse_frames(self):
+        token_frame = _sse_frame(TokenChunk(type="assistant_message", token="Hi"))
+        control_frame = _sse_frame(StreamChunk(type="error", error="boom", is_final=True))
+        
+        assert token_frame == (
+            b'data: {"type":"assistant_message","token":"Hi","is_final":false}\n\n'
+        )
+        assert control_frame == (
+            b'data: {"type":"error","is_final":true,"requires_approval":false,'
+            b'"error":"boom"}\n\n'
+        )
+
+
+def _handler(llm_client, stream_tokens):
+    tool_filter = Mock()
+    tool_filter.get_bundle.return_value = ToolBundle((), frozenset(), b"[]", 0)
+    processed = Mock(
+        validation_warnings=[], content="Hello world", model="gpt-4", usage=TokenUsage()
+    )
+    processed.has_tool_calls.return_value = False
+    response_processor = Mock()
+    response_processor.process_response.return_value = processed
+    return StreamLLMResponseHandler(
+        llm_client=llm_client,
+        tool_filter=tool_filter,
+        response_processor=response_processor,
+        event_publisher=AsyncMock(),
+        session_service=AsyncMock(),
+        approval_manager=Mock(),
+        stream_tokens=stream_tokens
+    )
+
+
+class TestHandlerTokenStreaming:
+    """Тесты chunks assistant_message по токенам"""
+    
+    @staticmethod
+    def _llm_client():
+        async def stream_chat_completion(**kwargs):
+            yield "Hello"
+            yield " world"
+            yield LLMResponse(
+                content="Hello world", tool_calls=[], usage=TokenUsage(), model="gpt-4"
+            )
+        
+        llm_client = Mock()
+        llm_client.stream_chat_completion = stream_chat_completion
+        return llm_client
+    
+    @pytest.mark.asyncio
+    async def test_tokens_then_final_chunk(self):
+        handler = _handler(self._llm_client(), stream_tokens=True)
+        
+        chunks = [
+            chunk async for chunk in handler.handle(
+                "session-1", [{"role": "user", "content": "Hi"}], "gpt-4"
+            )
+        ]
+        
+        assert [type(chunk) for chunk in chunks] == [TokenChunk, TokenChunk, StreamChunk]
+        assert [chunk.token for chunk in chunks[:2]] == ["Hello", " world"]
+        assert chunks[2].is_final
+        assert chunks[2].content == "Hello world"
+        assert chunks[2].token == ""
+    
+    @pytest.mark.asyncio
+    async def test_disabled_keeps_single_chunk(self):
+        llm_client = self._llm_client()
+        llm_client.chat_completion = AsyncMock(return_value=LLMResponse(
+            content="Hello world", tool_calls=[], usage=TokenUsage(), model="gpt-4"
+        ))
+        handler = _handler(llm_client, stream_tokens=False)
+        
+        chunks = [
+            chunk async for chunk in handler.handle(
+                "session-1", [{"role": "user", "content": "Hi"}], "gpt-4"
+            )
+        ]
+        
+        assert len(chunks) == 1
+        assert chunks[0].token == "Hello world"
@@ -0,0 +1,149 @@
+"""
+Тесты объединения токенов стрима.
+
+Проверяет склейку токенов в пределах окна, отдачу первого токена без
+задержки, досрочную отправку по размеру, сохранение порядка управляющих
+chunks и разбор политики из заголовка X-Stream-Coalesce.
+"""
+
+import asyncio
+
+import pytest
+
+from app.infrastructure.streaming import CoalescePolicy, coalesce_tokens
+from app.models.schemas import StreamChunk, TokenChunk
+
+
+def _token(text):
+    return TokenChunk(type="assistant_message", token=text)
+
+
+async def _source(items):
+    """Стрим: (задержка в секундах перед элементом, элемент)"""
+    for delay, item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestCoalesceTokens:
+    """Тесты coalesce_tokens"""
+    
+    @pytest.mark.asyncio
+    async def test_disabled_passes_chunks_through(self):
+        items = [(0, _token("a")), (0, _token("b"))]
+        
+        chunks = await _collect(coalesce_tokens(_source(items), CoalescePolicy()))
+        
+        assert [c.token for c in chunks] == ["a", "b"]
+    
+    @pytest.mark.asyncio
+    async def test_first_token_is_not_delayed_and_rest_are_merged(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        received = []
+        items = [(0, _token("Hel")), (0, _token("lo")), (0, _token(" wor")), (0, _token("ld"))]
+        
+        async for chunk in coalesce_tokens(_source(items), CoalescePolicy(window_ms=50)):
+            received.append((chunk.token, loop.time() - start))
+        
+        assert [token for token, _ in received] == ["Hel", "lo world"]
+        assert received[0][1] < 0.04
+    
+    @pytest.mark.asyncio
+    async def test_window_flushes_without_next_token(self):
+        items = [(0, _token("a")), (0, _token("b")), (0.2, _token("c"))]
+        
+        chunks = await _collect(coalesce_tokens(_source(items), CoalescePolicy(window_ms=20)))
+        
+        # "b" уходит по окну, "c" после паузы - сразу
+        assert [c.token for c in chunks] == ["a", "b", "c"]
+    
+    @pytest.mark.asyncio
+    async def test_max_bytes_flushes_early(self):
+        items = [(0, _token("a"))] + [(0, _token("xx")) for _ in range(4)]
+        
+        chunks = await _collect(
+            coalesce_tokens(_source(items), CoalescePolicy(window_ms=1000, max_bytes=4))
+        )
+        
+        assert [c.token for c in chunks] == ["a", "xxxx", "xxxx"]
+    
+    @pytest.mark.asyncio
+    async def test_control_chunk_flushes_buffer_and_keeps_order(self):
+        tool_call = StreamChunk(
+            type="tool_call", call_id="call_1", tool_name="read_file", is_final=True
+        )
+        items = [(0, _token("a")), (0, _token("b")), (0, _token("c")), (0, tool_call)]
+        
+        chunks = await _collect(coalesce_tokens(_source(items), CoalescePolicy(window_ms=1000)))
+        
+        assert [(c.type, c.token) for c in chunks] == [
+            ("assistant_message", "a"),
+            ("assistant_message", "bc"),
+            ("tool_call", None),
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_tool_argument_parts_are_merged_per_argument(self):
+        def delta(text, argument, complete=False):
+            return TokenChunk(
+                type="tool_call_delta", call_id="call_1", tool_name="write_file", token=text,
+                metadata={"index": 0, "argument": argument, "complete": complete}
+            )
+        
+        start = TokenChunk(
+            type="tool_call_delta", call_id="call_1", tool_name="write_file",
+            metadata={"index": 0}
+        )
+        items = [
+            (0, start),
+            (0, delta("a.py", "path", complete=True)),
+            (0, delta("x = ", "content")),
+            (0, delta("1", "content")),
+            (0, delta("\n", "content", complete=True)),
+        ]
+        
+        chunks = await _collect(coalesce_tokens(_source(items), CoalescePolicy(window_ms=1000)))
+        
+        assert [(c.token, (c.metadata or {}).get("complete")) for c in chunks] == [
+            (None, None),
+            ("a.py", True),
+            ("x = 1\n", True),
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_source_error_is_raised_after_buffer(self):
+        async def failing():
+            yield _token("a")
+            yield _token("b")
+            raise RuntimeError("stream failed")
+        
+        received = []
+        with pytest.raises(RuntimeError, match="stream failed"):
+            async for chunk in coalesce_tokens(failing(), CoalescePolicy(window_ms=1000)):
+                received.append(chunk.token)
+        
+        assert received == ["a", "b"]
+
+
+class TestCoalescePolicy:
+    """Тесты разбора X-Stream-Coalesce"""
+    
+    DEFAULT = CoalescePolicy(window_ms=10, max_bytes=512)
+    
+    def test_parse(self):
+        assert CoalescePolicy.parse(None, self.DEFAULT) == self.DEFAULT
+        assert CoalescePolicy.parse("off", self.DEFAULT) == CoalescePolicy()
+        assert CoalescePolicy.parse("window_ms=25", self.DEFAULT) == CoalescePolicy(25, 512)
+        policy = CoalescePolicy.parse("window_ms=5, max_bytes=64", self.DEFAULT)
+        assert policy == CoalescePolicy(5, 64)
+    
+    def test_invalid_value_falls_back_to_default(self):
+        assert CoalescePolicy.parse("window=5", self.DEFAULT) == self.DEFAULT
+        assert CoalescePolicy.parse("window_ms=-1", self.DEFAULT) == self.DEFAULT
+        assert CoalescePolicy.parse("max_bytes=big", self.DEFAULT) == self.DEFAULT
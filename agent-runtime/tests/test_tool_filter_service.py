@@ -4,11 +4,13 @@ Unit тесты для ToolFilterService.
 Тестирует фильтрацию инструментов по разрешенным.
 """
 
+import json
+
 import pytest
 from unittest.mock import Mock
 
 from app.domain.services.tool_filter_service import ToolFilterService
-from app.domain.services.tool_registry import ToolRegistry
+from app.domain.services.tool_registry import LOCAL_TOOLS, ToolRegistry
 
 
 class TestToolFilterService:
@@ -148,3 +150,51 @@ class TestToolFilterService:
         # Assert
         assert is_valid == False
         assert "not allowed" in error
+
+
+class TestToolBundles:
+    """Тесты предвычисленных наборов инструментов"""
+    
+    @pytest.fixture
+    def registry(self):
+        return ToolRegistry()
+    
+    def test_bundle_is_reused(self, registry):
+        """Тест: набор строится один раз и не зависит от порядка имен"""
+        filter_service = ToolFilterService(tool_registry=registry)
+        filter_service.precompute([["read_file", "write_file"]])
+        
+        bundle = filter_service.get_bundle(["write_file", "read_file"])
+        
+        assert bundle is filter_service.get_bundle(["read_file", "write_file"])
+        assert bundle.names == frozenset({"read_file", "write_file"})
+        assert json.loads(bundle.tools_json) == list(bundle.tools)
+    
+    def test_bundle_invalidated_on_registry_change(self, registry):
+        """Тест: изменение реестра сбрасывает наборы"""
+        filter_service = ToolFilterService(tool_registry=registry)
+        before = filter_service.get_bundle(None)
+        
+        registry.register_tool({
+            "type": "function",
+            "function": {"name": "new_tool", "description": "New tool"}
+        })
+        after = filter_service.get_bundle(None)
+        
+        assert after is not before
+        assert "new_tool" in after.names
+        assert filter_service.validate_tool_access("new_tool")[0] is True
+        
+        assert registry.unregister_tool("new_tool") is True
+        assert filter_service.validate_tool_access("new_tool")[0] is False
+    
+    def test_registry_does_not_change_module_local_tools(self, registry):
+        """Тест: регистрация в экземпляре реестра не меняет LOCAL_TOOLS"""
+        registry.register_tool(
+            {"type": "function", "function": {"name": "local_tool", "description": "Local"}},
+            local_function=lambda: "ok",
+        )
+        
+        assert registry.is_local_tool("local_tool")
+        assert "local_tool" not in LOCAL_TOOLS
+        assert ToolRegistry().get_local_tool_function("local_tool") is None
@@ -0,0 +1,187 @@
+"""
+Тесты для ToolResultHandler.
+
+Проверяет ожидание результатов пакета tool calls (в том числе
+решений HITL) и продолжение обработки текущим агентом.
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.domain.entities import AgentContext, AgentType, Message, Session
+from app.domain.services.hitl_decision_handler import HITLDecisionHandler
+from app.domain.services.tool_result_handler import ToolResultHandler
+from app.models.schemas import StreamChunk
+
+
+def _tool_call(call_id: str, name: str) -> dict:
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": name, "arguments": "{}"}
+    }
+
+
+@pytest.fixture
+def session():
+    """Сессия с пакетом из трех tool calls"""
+    session = Session(id="session-1")
+    session.add_message(Message(id="msg-1", role="user", content="Прочитай файлы"))
+    session.add_message(Message(
+        id="msg-2",
+        role="assistant",
+        content="",
+        tool_calls=[
+            _tool_call("call-1", "read_file"),
+            _tool_call("call-2", "read_file"),
+            _tool_call("call-3", "list_files"),
+        ]
+    ))
+    return session
+
+
+@pytest.fixture
+def session_service(session):
+    """Мок сервиса сессий, сохраняющий tool results в сессию"""
+    service = MagicMock()
+    service.get_or_create_session = AsyncMock(return_value=session)
+    service.get_session = AsyncMock(return_value=session)
+
+    async def add_tool_result(session_id, call_id, result=None, error=None):
+        session.add_message(Message(
+            id=f"tool-{call_id}",
+            role="tool",
+            content=f"Error: {error}" if error else (result or ""),
+            tool_call_id=call_id
+        ))
+
+    service.add_tool_result = AsyncMock(side_effect=add_tool_result)
+    return service
+
+
+@pytest.fixture
+def agent():
+    """Мок агента, отвечающего одним сообщением"""
+    agent = MagicMock()
+    agent.calls = 0
+
+    async def process(**kwargs):
+        agent.calls += 1
+        yield StreamChunk(type="assistant_message", content="Готово", is_final=True)
+
+    agent.process = process
+    return agent
+
+
+def _make_handler(session_service, agent, batch_quorum=1.0):
+    agent_service = MagicMock()
+    agent_service.get_or_create_context = AsyncMock(
+        return_value=AgentContext(
+            id="ctx-1", session_id="session-1", current_agent=AgentType.CODER
+        )
+    )
+    agent_router = MagicMock()
+    agent_router.get_agent.return_value = agent
+
+    return ToolResultHandler(
+        session_service=session_service,
+        agent_service=agent_service,
+        agent_router=agent_router,
+        stream_handler=None,
+        switch_helper=MagicMock(),
+        batch_quorum=batch_quorum
+    )
+
+
+async def _collect(handler, call_id, **kwargs):
+    return [chunk async for chunk in handler.handle("session-1", call_id, **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_batch_waits_for_all_results(session_service, agent, session):
+    """Агент продолжает работу только после результатов всего пакета"""
+    handler = _make_handler(session_service, agent)
+
+    assert await _collect(handler, "call-1", result="a") == []
+    assert await _collect(handler, "call-2", result="b") == []
+    assert agent.calls == 0
+
+    chunks = await _collect(handler, "call-3", result="c")
+
+    assert [c.type for c in chunks] == ["assistant_message"]
+    assert agent.calls == 1
+    assert session.get_answered_tool_call_ids() == {"call-1", "call-2", "call-3"}
+
+
+@pytest.mark.asyncio
+async def test_batch_quorum_closes_pending_calls(session_service, agent, session):
+    """При достижении кворума оставшиеся вызовы закрываются ошибкой"""
+    handler = _make_handler(session_service, agent, batch_quorum=0.5)
+
+    assert await _collect(handler, "call-1", result="a") == []
+    chunks = await _collect(handler, "call-2", result="b")
+
+    assert len(chunks) == 1
+    assert agent.calls == 1
+    closed = [m for m in session.messages if m.tool_call_id == "call-3"]
+    assert len(closed) == 1
+    assert closed[0].content.startswith("Error:")
+
+
+@pytest.mark.asyncio
+async def test_late_result_is_ignored(session_service, agent, session):
+    """Опоздавший результат уже закрытого вызова не продолжает агента"""
+    handler = _make_handler(session_service, agent, batch_quorum=0.5)
+
+    await _collect(handler, "call-1", result="a")
+    await _collect(handler, "call-2", result="b")
+
+    chunks = await _collect(handler, "call-3", result="c")
+
+    assert chunks == []
+    assert agent.calls == 1
+    assert len([m for m in session.messages if m.tool_call_id == "call-3"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_hitl_decision_waits_for_rest_of_batch(session_service, agent, session):
+    """Решение HITL по одному вызову пакета не продолжает LLM до остальных результатов"""
+    async def add_message(session_id, role, content, name=None, tool_call_id=None):
+        session.add_message(Message(
+            id=f"tool-{tool_call_id}", role=role, content=content, tool_call_id=tool_call_id
+        ))
+
+    session_service.add_message = AsyncMock(side_effect=add_message)
+    approval_manager = MagicMock()
+    approval_manager.get_pending = AsyncMock(
+        return_value=MagicMock(subject="write_file", details={"arguments": {}})
+    )
+    approval_manager.approve = AsyncMock()
+    message_processor = MagicMock()
+    message_processor.process = MagicMock()
+    hitl_handler = HITLDecisionHandler(
+        approval_manager=approval_manager,
+        session_service=session_service,
+        message_processor=message_processor
+    )
+    handler = _make_handler(session_service, agent)
+
+    await _collect(handler, "call-1", result="a")
+    chunks = [c async for c in hitl_handler.handle("session-1", "call-2", decision="approve")]
+
+    assert chunks == []
+    message_processor.process.assert_not_called()
+    assert session.get_pending_batch_calls("call-2") == ["call-3"]
+
+    chunks = await _collect(handler, "call-3", result="c")
+
+    assert [c.type for c in chunks] == ["assistant_message"]
+    assert agent.calls == 1
+    message_processor.process.assert_not_called()
+
+
+def test_invalid_batch_quorum(session_service, agent):
+    """Кворум вне диапазона (0, 1] отклоняется"""
+    with pytest.raises(ValueError):
+        _make_handler(session_service, agent, batch_quorum=0)
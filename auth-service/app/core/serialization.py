@@ -0,0 +1,113 @@
+"""
+JSON serialization for hot paths (SSE chunks, API responses).
+
+Uses orjson or msgspec when installed (fast-json extra), otherwise the
+standard json module. All backends produce the same output: compact
+UTF-8 JSON without escaping non-ASCII characters.
+"""
+import json
+from typing import Any, Callable, List, Optional, Union
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+_encode: Callable[[Any], bytes]
+_decode: Callable[[Union[str, bytes]], Any]
+backend = "json"
+
+
+def _json_encode(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_encode(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgspec_decoder() -> Callable[[Union[str, bytes]], Any]:
+    decoder = msgspec.json.Decoder()
+
+    def decode(data: Union[str, bytes]) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Same error type for every backend
+            raise json.JSONDecodeError(str(e), data if isinstance(data, str) else "", 0) from e
+
+    return decode
+
+
+def available_backends() -> List[str]:
+    """Installed backends, fastest first"""
+    names = [name for name, module in (("orjson", orjson), ("msgspec", msgspec)) if module]
+    return names + ["json"]
+
+
+def set_backend(name: Optional[str] = None) -> str:
+    """
+    Select the JSON backend: orjson, msgspec or json.
+    None picks the fastest installed one. Returns the selected name.
+    """
+    global _encode, _decode, backend
+    name = name or available_backends()[0]
+    if name not in available_backends():
+        raise ValueError(f"JSON backend {name!r} is not installed")
+    if name == "orjson":
+        _encode, _decode = _orjson_encode, orjson.loads
+    elif name == "msgspec":
+        _encode, _decode = msgspec.json.Encoder().encode, _msgspec_decoder()
+    else:
+        _encode, _decode = _json_encode, json.loads
+    backend = name
+    return name
+
+
+set_backend()
+
+
+def dumpb(obj: Any) -> bytes:
+    """Serialize an object to JSON bytes"""
+    return _encode(obj)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize an object to a JSON string"""
+    return _encode(obj).decode("utf-8")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON from str or bytes; raises json.JSONDecodeError"""
+    return _decode(data)
+
+
+def model_json(model: BaseModel, exclude_none: bool = False) -> bytes:
+    """
+    Pydantic model JSON as bytes. Same as model_dump_json(), without
+    the intermediate str and its re-encoding to UTF-8.
+    """
+    return pydantic_core.to_json(model, exclude_none=exclude_none)
+
+
+def sse_frame(payload: Union[str, bytes]) -> bytes:
+    """SSE frame with a single data line"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return b"data: " + payload + b"\n\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the selected backend"""
+
+    def render(self, content: Any) -> bytes:
+        return dumpb(content)
@@ -7,6 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.core.config import logger, settings
+from app.core.serialization import FastJSONResponse
 
 
 @asynccontextmanager
@@ -53,6 +54,7 @@ app = FastAPI(
     docs_url="/docs" if settings.is_development else None,
     redoc_url="/redoc" if settings.is_development else None,
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # CORS middleware
@@ -0,0 +1,108 @@
+"""
+Benchmark: prompt tokens per turn over a long agent session.
+
+Compares the full history (session.get_history_for_llm) with the history
+produced by ContextBudgeter and reports prompt size and build time.
+
+Usage:
+    cd agent-runtime && python ../benchmark/context_budget.py --turns 300 --context-length 8192
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent-runtime"))
+
+from app.domain.entities import Message, Session  # noqa: E402
+from app.domain.services.context_budget import (  # noqa: E402
+    ContextBudgeter,
+    estimate_llm_message_tokens,
+    estimate_tokens,
+)
+from app.domain.services.tool_filter_service import ToolFilterService  # noqa: E402
+from app.domain.services.tool_registry import tool_registry  # noqa: E402
+
+SYSTEM_PROMPT = "You are a coding assistant working inside the user's IDE. " * 20
+
+
+def add_turn(session: Session, turn: int, tool_output_lines: int) -> None:
+    """Append one agent turn: user -> tool_call -> tool result -> answer"""
+    call_id = f"call-{turn}"
+    session.add_message(Message(
+        id=f"u{turn}", role="user", content=f"Please look at module_{turn}.py and explain the bug"
+    ))
+    session.add_message(Message(
+        id=f"a{turn}", role="assistant", content="",
+        tool_calls=[{
+            "id": call_id,
+            "type": "function",
+            "function": {"name": "read_file", "arguments": json.dumps({"path": f"module_{turn}.py"})}
+        }]
+    ))
+    session.add_message(Message(
+        id=f"t{turn}", role="tool", tool_call_id=call_id,
+        content="\n".join(f"def function_{i}(x): return x * {i}  # line {i}" for i in range(tool_output_lines))
+    ))
+    session.add_message(Message(
+        id=f"r{turn}", role="assistant",
+        content=f"The bug in module_{turn}.py is an off-by-one error in function_{turn % 7}."
+    ))
+
+
+def prompt_tokens(history) -> int:
+    return sum(estimate_llm_message_tokens(m) for m in history)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--context-length", type=int, default=8192)
+    parser.add_argument("--tool-output-lines", type=int, default=60)
+    parser.add_argument("--report-every", type=int, default=25)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    tool_filter = ToolFilterService(tool_registry=tool_registry)
+    tools_tokens = estimate_tokens(json.dumps(tool_filter.filter_tools(None)))
+
+    async def context_length(_model: str) -> int:
+        return args.context_length
+
+    budgeter = ContextBudgeter(tool_filter, context_length_provider=context_length)
+    session = Session(id="bench", max_messages=args.turns * 4 + 1)
+
+    print(f"context_length={args.context_length} tools_tokens={tools_tokens}")
+    print(f"{'turn':>6} {'messages':>9} {'full_tokens':>12} {'budget_tokens':>14} {'sent_msgs':>10} {'build_ms':>9}")
+
+    build_times = []
+    budget_tokens = []
+    for turn in range(1, args.turns + 1):
+        add_turn(session, turn, args.tool_output_lines)
+
+        full = [{"role": "system", "content": SYSTEM_PROMPT}] + session.get_history_for_llm()
+
+        start = time.perf_counter()
+        budgeted = await budgeter.build_history(session, SYSTEM_PROMPT, "bench-model")
+        build_ms = (time.perf_counter() - start) * 1000
+        build_times.append(build_ms)
+        budget_tokens.append(prompt_tokens(budgeted) + tools_tokens)
+
+        if turn == 1 or turn % args.report_every == 0:
+            print(
+                f"{turn:>6} {len(session.messages):>9} "
+                f"{prompt_tokens(full) + tools_tokens:>12} {budget_tokens[-1]:>14} "
+                f"{len(budgeted):>10} {build_ms:>9.2f}"
+            )
+
+    print()
+    print(f"max budgeted prompt tokens: {max(budget_tokens)} (limit {args.context_length})")
+    print(f"mean build time: {sum(build_times) / len(build_times):.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark: gateway SSE -> WebSocket relay throughput (frames/sec per core).
+
+Feeds agent-runtime SSE data lines through the per-line work the gateway
+does in websocket_endpoint and compares:
+
+    parse        loads + drop null fields + dumps (GATEWAY__RELAY_PASSTHROUGH=false)
+    passthrough  forward the data payload as is, peek_type for the log line
+
+The WebSocket send is a no-op collector, so only the relay cost is
+measured. The loop runs on one thread, so the rate is per core.
+
+Usage:
+    cd gateway && python ../benchmark/gateway_relay.py --frames 200000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "gateway"))
+
+from app.core import serialization  # noqa: E402
+from app.core.serialization import dumps, loads  # noqa: E402
+from app.services.sse_relay import peek_type  # noqa: E402
+
+TOKENS = ["Hello", ",", " world", "! ", "Привет", " 👋", "\n", "    def", " main", "():"]
+
+
+def sse_lines(frames: int) -> List[str]:
+    """data: lines as agent-runtime emits them: tokens with a tool call every 50 frames"""
+    tool_call = dumps({
+        "type": "tool_call",
+        "is_final": True,
+        "call_id": "call_1",
+        "tool_name": "write_file",
+        "arguments": {"path": "app/main.py", "content": "def main():\n    pass\n" * 20},
+        "requires_approval": False,
+    })
+    lines = []
+    for i in range(frames):
+        if i % 50 == 49:
+            lines.append("data: " + tool_call)
+        else:
+            token = dumps({"type": "assistant_message", "token": TOKENS[i % 10], "is_final": False})
+            lines.append("data: " + token)
+    return lines
+
+
+class Sink:
+    """WebSocket stand-in"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    async def send_text(self, data: str) -> None:
+        self.bytes += len(data)
+
+
+async def parse(websocket: Sink, data_str: str) -> None:
+    data = loads(data_str)
+    data.get("type")
+    filtered_data = {k: v for k, v in data.items() if v is not None}
+    await websocket.send_text(dumps(filtered_data))
+
+
+async def passthrough(websocket: Sink, data_str: str) -> None:
+    await websocket.send_text(data_str)
+    peek_type(data_str)
+
+
+async def bench(relay: Callable[[Sink, str], Awaitable[None]], lines: List[str]) -> float:
+    websocket = Sink()
+    start = time.perf_counter()
+    for line in lines:
+        if line.startswith("data: "):
+            await relay(websocket, line[6:])
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200000)
+    args = parser.parse_args()
+    lines = sse_lines(args.frames)
+
+    print(f"json backend: {serialization.backend}")
+    print(f"{'relay':<12} {'frames/s':>12} {'speedup':>8}")
+    baseline = None
+    for name, relay in (("parse", parse), ("passthrough", passthrough)):
+        rate = asyncio.run(bench(relay, lines))
+        baseline = baseline or rate
+        print(f"{name:<12} {rate:>12,.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: JSON serialization on the streaming hot paths.
+
+Measures the per-token and per-message stages of the pipeline
+llm-proxy -> agent-runtime -> gateway -> IDE, before (stdlib json and
+model_dump_json) and after (app.core.serialization) for every installed
+backend, and reports throughput in MB/s of produced JSON.
+
+Stages:
+    llm-proxy   chat.completion.chunk SSE frame per token
+    gateway     SSE data -> dict -> WebSocket text (relay to the IDE)
+    mapper      tool_calls/metadata columns (write + read)
+
+agent-runtime token chunks are measured by benchmark/stream_chunks.py.
+
+Usage:
+    pip install orjson msgspec  # optional, to compare backends
+    cd llm-proxy && python ../benchmark/serialization.py --iterations 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "llm-proxy"))
+
+from app.core import serialization  # noqa: E402
+from app.models.schemas import ChatCompletionChunk, ChoiceDelta, DeltaMessage  # noqa: E402
+from app.services.chunk_frames import ChunkFrameEncoder  # noqa: E402
+
+TOKENS = ["Hello", ",", " world", "! ", "Привет", " 👋", "\n", "    def", " main", "():"]
+TOOL_CALLS = [
+    {
+        "id": f"call_{i}",
+        "type": "function",
+        "function": {
+            "name": "write_file",
+            "arguments": json.dumps({"path": f"src/module_{i}.py", "content": "x = 1\n" * 40}),
+        },
+    }
+    for i in range(3)
+]
+
+
+def bench(fn: Callable[[int], bytes], iterations: int) -> Tuple[float, float]:
+    """Returns (ops per second, MB/s of output)"""
+    total = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        total += len(fn(i))
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, total / elapsed / 1e6
+
+
+def llm_proxy_stage(backend: str) -> Callable[[int], bytes]:
+    if backend == "baseline":
+        def frame(i: int) -> bytes:
+            chunk = ChatCompletionChunk(
+                id="chatcmpl-bench",
+                created=1700000000,
+                model="gpt-4",
+                choices=[ChoiceDelta(index=0, delta=DeltaMessage(content=TOKENS[i % 10]))],
+            )
+            return f"data: {chunk.model_dump_json()}\r\n\r\n".encode("utf-8")
+
+        return frame
+    frames = ChunkFrameEncoder("chatcmpl-bench", 1700000000, "gpt-4")
+    return lambda i: frames.content(TOKENS[i % 10])
+
+
+def gateway_stage(backend: str) -> Callable[[int], bytes]:
+    # StreamChunk.model_dump_json() of a token chunk, as sent by agent-runtime
+    fields = dict.fromkeys(["content", "call_id", "tool_name", "arguments", "error", "metadata"])
+    lines = [
+        json.dumps(
+            {"type": "assistant_message", "token": token, "is_final": False,
+             "requires_approval": False, **fields},
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        for token in TOKENS
+    ]
+    if backend == "baseline":
+        def relay(i: int) -> bytes:
+            data = json.loads(lines[i % 10])
+            filtered = {k: v for k, v in data.items() if v is not None}
+            # starlette WebSocket.send_json
+            return json.dumps(filtered, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+        return relay
+
+    def fast_relay(i: int) -> bytes:
+        data = serialization.loads(lines[i % 10])
+        filtered = {k: v for k, v in data.items() if v is not None}
+        return serialization.dumps(filtered).encode("utf-8")
+
+    return fast_relay
+
+
+def mapper_stage(backend: str) -> Callable[[int], bytes]:
+    if backend == "baseline":
+        def roundtrip(i: int) -> bytes:
+            column = json.dumps(TOOL_CALLS)
+            json.loads(column)
+            return column.encode("utf-8")
+
+        return roundtrip
+
+    def fast_roundtrip(i: int) -> bytes:
+        column = serialization.dumps(TOOL_CALLS)
+        serialization.loads(column)
+        return column.encode("utf-8")
+
+    return fast_roundtrip
+
+
+STAGES = {
+    "llm-proxy": llm_proxy_stage,
+    "gateway": gateway_stage,
+    "mapper": mapper_stage,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--stage", choices=sorted(STAGES), action="append")
+    args = parser.parse_args()
+
+    backends: List[str] = ["baseline"] + serialization.available_backends()
+    stages = args.stage or list(STAGES)
+    print(f"backends: {', '.join(serialization.available_backends())}")
+    print(f"{'stage':<10} {'backend':<9} {'ops/s':>12} {'MB/s':>9} {'speedup':>8}")
+    for stage in stages:
+        baseline_ops = None
+        for backend in backends:
+            if backend != "baseline":
+                serialization.set_backend(backend)
+            fn = STAGES[stage](backend)
+            fn(0)  # warm up templates and caches
+            ops, mbps = bench(fn, args.iterations)
+            baseline_ops = baseline_ops or ops
+            print(f"{stage:<10} {backend:<9} {ops:>12,.0f} {mbps:>9.1f} {ops / baseline_ops:>7.2f}x")
+    serialization.set_backend()
+
+
+if __name__ == "__main__":
+    main()
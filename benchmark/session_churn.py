@@ -0,0 +1,134 @@
+"""
+Benchmark: gateway session registries under connection churn.
+
+Simulates N concurrent IDE connections on one event loop. Each
+connection repeatedly connects (SessionManager.add, TokenBufferManager.get),
+looks its session up a few times while streaming and disconnects
+(remove), yielding to the loop between steps like a real socket does.
+Compares:
+
+    locked    dict operations behind one global asyncio.Lock (previous design)
+    lockfree  SessionManager / TokenBufferManager (plain dict operations)
+
+Reports registry operations per second and p50/p99 latency of a lookup.
+
+Usage:
+    cd gateway && python ../benchmark/session_churn.py --connections 10000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "gateway"))
+
+from app.services.session_manager import SessionManager  # noqa: E402
+from app.services.token_buffer_manager import ReplayBuffer, TokenBufferManager  # noqa: E402
+
+LOOKUPS = 8
+
+
+class LockedSessionManager:
+    """SessionManager before: every operation takes the global lock"""
+
+    def __init__(self):
+        self._active_websockets: Dict[str, object] = {}
+        self._lock = asyncio.Lock()
+
+    async def add(self, session_id: str, websocket: object):
+        async with self._lock:
+            self._active_websockets[session_id] = websocket
+
+    async def get(self, session_id: str) -> Optional[object]:
+        async with self._lock:
+            return self._active_websockets.get(session_id)
+
+    async def remove(self, session_id: str, websocket: object = None):
+        async with self._lock:
+            self._active_websockets.pop(session_id, None)
+
+
+class LockedTokenBufferManager(TokenBufferManager):
+    """TokenBufferManager before: get/remove under the global lock"""
+
+    def __init__(self, capacity: int, ttl: float):
+        super().__init__(capacity=capacity, ttl=ttl)
+        self._lock = asyncio.Lock()
+
+    async def get(self, session_id: str) -> ReplayBuffer:
+        async with self._lock:
+            return super().get(session_id)
+
+    async def remove(self, session_id: str):
+        async with self._lock:
+            super().remove(session_id)
+
+
+async def maybe_await(value):
+    return await value if asyncio.iscoroutine(value) else value
+
+
+async def connection(n: int, rounds: int, sessions, buffers, latencies: List[float]) -> int:
+    session_id = f"session-{n}"
+    websocket = object()
+    ops = 0
+    for _ in range(rounds):
+        await maybe_await(sessions.add(session_id, websocket))
+        await maybe_await(buffers.get(session_id))
+        ops += 2
+        for _ in range(LOOKUPS):
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            await maybe_await(sessions.get(session_id))
+            latencies.append(time.perf_counter() - start)
+            ops += 1
+        await maybe_await(buffers.remove(session_id))
+        await maybe_await(sessions.remove(session_id, websocket))
+        ops += 2
+        await asyncio.sleep(0)
+    return ops
+
+
+async def bench(locked: bool, connections: int, rounds: int):
+    if locked:
+        sessions, buffers = LockedSessionManager(), LockedTokenBufferManager(4096, 300.0)
+    else:
+        sessions, buffers = SessionManager(), TokenBufferManager(4096, 300.0)
+    latencies: List[float] = []
+    start = time.perf_counter()
+    ops = await asyncio.gather(
+        *(connection(n, rounds, sessions, buffers, latencies) for n in range(connections))
+    )
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (
+        sum(ops) / elapsed,
+        statistics.median(latencies),
+        latencies[int(len(latencies) * 0.99)],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.connections} connections x {args.rounds} connect/disconnect rounds")
+    print(f"{'registry':<10} {'ops/s':>12} {'p50 get':>10} {'p99 get':>10} {'speedup':>8}")
+    baseline = None
+    for name, locked in (("locked", True), ("lockfree", False)):
+        rate, p50, p99 = asyncio.run(bench(locked, args.connections, args.rounds))
+        baseline = baseline or rate
+        print(
+            f"{name:<10} {rate:>12,.0f} {p50 * 1e6:>8.2f}us {p99 * 1e6:>8.2f}us "
+            f"{rate / baseline:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
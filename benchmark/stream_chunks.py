@@ -0,0 +1,84 @@
+"""
+Benchmark: agent-runtime token chunk throughput (tokens/sec per core).
+
+Builds one SSE frame per token the way messages_router does and compares:
+
+    pydantic        StreamChunk(...) + model_dump_json() + str -> bytes
+    pydantic_core   StreamChunk(...) + pydantic_core.to_json (model_json)
+    token_chunk     TokenChunk(...).to_json(), None fields omitted
+
+for assistant_message tokens and tool_call_delta chunks. The loop runs
+on one thread, so the rate is per core.
+
+Usage:
+    cd agent-runtime && python ../benchmark/stream_chunks.py --tokens 200000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import Callable, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent-runtime"))
+
+from app.api.v1.schemas.common import StreamChunk, TokenChunk  # noqa: E402
+from app.core import serialization  # noqa: E402
+from app.core.serialization import model_json, sse_frame  # noqa: E402
+
+TOKENS = ["Hello", ",", " world", "! ", "Привет", " 👋", "\n", "    def", " main", "():"]
+
+
+def text_builders() -> dict:
+    return {
+        "pydantic": lambda token: f"data: {StreamChunk(type='assistant_message', token=token).model_dump_json()}\n\n".encode("utf-8"),
+        "pydantic_core": lambda token: sse_frame(model_json(StreamChunk(type="assistant_message", token=token))),
+        "token_chunk": lambda token: sse_frame(TokenChunk(type="assistant_message", token=token).to_json()),
+    }
+
+
+def delta_builders() -> dict:
+    def fields(token: str) -> dict:
+        return {
+            "call_id": "call_1",
+            "tool_name": "write_file",
+            "token": token,
+            "metadata": {"index": 0, "argument": "content", "complete": False},
+        }
+
+    return {
+        "pydantic": lambda token: f"data: {StreamChunk(type='tool_call_delta', **fields(token)).model_dump_json()}\n\n".encode("utf-8"),
+        "pydantic_core": lambda token: sse_frame(model_json(StreamChunk(type="tool_call_delta", **fields(token)))),
+        "token_chunk": lambda token: sse_frame(TokenChunk(type="tool_call_delta", **fields(token)).to_json()),
+    }
+
+
+def bench(build: Callable[[str], bytes], tokens: int) -> Tuple[float, float]:
+    """Returns (tokens per second, average frame size in bytes)"""
+    total = 0
+    start = time.perf_counter()
+    for i in range(tokens):
+        total += len(build(TOKENS[i % 10]))
+    elapsed = time.perf_counter() - start
+    return tokens / elapsed, total / tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"json backend: {serialization.backend}")
+    print(f"{'chunk':<18} {'encoder':<14} {'tokens/s':>12} {'bytes/frame':>12} {'speedup':>8}")
+    for chunk_type, builders in (("assistant_message", text_builders()), ("tool_call_delta", delta_builders())):
+        baseline = None
+        for name, build in builders.items():
+            rate, size = bench(build, args.tokens)
+            baseline = baseline or rate
+            print(f"{chunk_type:<18} {name:<14} {rate:>12,.0f} {size:>12.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
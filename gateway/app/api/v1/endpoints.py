@@ -1,12 +1,20 @@
+import asyncio
 import json
+import logging
+from functools import partial
+
 import httpx
+from typing import Optional, Tuple
 from fastapi import APIRouter, WebSocket, status, Depends, Request
-from fastapi.responses import JSONResponse
 from starlette.websockets import WebSocketDisconnect
 
 from app.core.config import AppConfig, logger
+from app.core.serialization import dumps, loads
 from app.models.websocket import (
+    WSCancel,
+    WSCancelled,
     WSErrorResponse,
+    WSResumeFailed,
     WSUserMessage,
     WSToolResult,
     WSAgentSwitched,
@@ -15,11 +23,22 @@ from app.models.websocket import (
 )
 from app.models.rest import HealthResponse
 from app.core.dependencies import (
+    get_agent_channel,
+    get_agent_upstream,
+    get_outbound_budget,
+    get_response_cache,
     get_session_manager,
+    get_session_registry,
     get_token_buffer_manager,
 )
+from app.services.agent_channel import AgentChannel, AgentChannelUnavailable
+from app.services.agent_upstream import AgentUpstream
+from app.services.response_cache import ResponseCache
 from app.services.session_manager import SessionManager
-from app.services.token_buffer_manager import TokenBufferManager
+from app.services.session_registry import SessionHandle, SessionRegistry
+from app.services.sse_relay import peek_type
+from app.services.token_buffer_manager import ReplayBuffer, TokenBufferManager
+from app.services.ws_outbound import FrameSink, OutboundBudget, OutboundQueue, SlowConsumerError
 
 router = APIRouter()
 
@@ -33,123 +52,73 @@ async def health_check():
 # ==================== Agent Runtime Proxy Endpoints ====================
 
 @router.get("/agents")
-async def list_agents():
+async def list_agents(
+    request: Request,
+    upstream: AgentUpstream = Depends(get_agent_upstream),
+    cache: ResponseCache = Depends(get_response_cache),
+):
     """
     Proxy endpoint: Get list of all registered agents from Agent Runtime.
     
+    Cached for GATEWAY__CACHE_TTL_AGENTS seconds, supports If-None-Match.
+    
     Proxies to: GET /agents on Agent Runtime
     """
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/agents",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying to Agent Runtime: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await cache.get(
+        request, "/agents", AppConfig.CACHE_TTL_AGENTS, partial(upstream.fetch, "GET", "/agents")
+    )
 
 
 @router.get("/agents/{session_id}/current")
-async def get_current_agent(session_id: str):
+async def get_current_agent(
+    session_id: str, upstream: AgentUpstream = Depends(get_agent_upstream)
+):
     """
     Proxy endpoint: Get current active agent for a session.
     
     Proxies to: GET /agents/{session_id}/current on Agent Runtime
     """
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/agents/{session_id}/current",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying to Agent Runtime: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy("GET", f"/agents/{session_id}/current")
 
 
 @router.get("/sessions/{session_id}/history")
-async def get_session_history(session_id: str):
+async def get_session_history(
+    session_id: str,
+    request: Request,
+    upstream: AgentUpstream = Depends(get_agent_upstream),
+    cache: ResponseCache = Depends(get_response_cache),
+):
     """
     Proxy endpoint: Get message history for a session.
     
+    Cached for GATEWAY__CACHE_TTL_SESSION_HISTORY seconds, supports
+    If-None-Match. Dropped when the session changes (session_changed
+    notification from Agent Runtime or a message relayed by this gateway).
+    
     Proxies to: GET /sessions/{session_id}/history on Agent Runtime
     """
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/sessions/{session_id}/history",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying to Agent Runtime: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    path = f"/sessions/{session_id}/history"
+    return await cache.get(
+        request,
+        path,
+        AppConfig.CACHE_TTL_SESSION_HISTORY,
+        partial(upstream.fetch, "GET", path),
+        session_id=session_id,
+    )
 
 
 @router.get("/sessions")
-async def list_sessions():
+async def list_sessions(upstream: AgentUpstream = Depends(get_agent_upstream)):
     """
     Proxy endpoint: List all active sessions.
     
     Proxies to: GET /sessions on Agent Runtime
     """
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/sessions",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying to Agent Runtime: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy("GET", "/sessions")
 
 
 @router.post("/sessions")
-async def create_session():
+async def create_session(upstream: AgentUpstream = Depends(get_agent_upstream)):
     """
     Proxy endpoint: Create a new session.
     
@@ -158,30 +127,13 @@ async def create_session():
     Returns:
         Session information with session_id
     """
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(
-                f"{AppConfig.AGENT_URL}/sessions",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying to Agent Runtime: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy("POST", "/sessions")
 
 
 @router.get("/sessions/{session_id}/pending-approvals")
-async def get_pending_approvals(session_id: str):
+async def get_pending_approvals(
+    session_id: str, upstream: AgentUpstream = Depends(get_agent_upstream)
+):
     """
     Proxy endpoint: Get pending approval requests for a session.
     
@@ -197,39 +149,18 @@ async def get_pending_approvals(session_id: str):
         List of pending approval requests
     """
     logger.debug(f"Proxying pending-approvals request for session {session_id}")
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/sessions/{session_id}/pending-approvals",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            
-            if response.status_code == 404:
-                return JSONResponse(
-                    status_code=404,
-                    content={"error": f"Session {session_id} not found"}
-                )
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying pending-approvals request: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy(
+        "GET",
+        f"/sessions/{session_id}/pending-approvals",
+        timeout=AppConfig.EVENTS_REQUEST_TIMEOUT,
+        not_found_error=f"Session {session_id} not found",
+    )
 
 
 @router.get("/events/metrics/session/{session_id}")
-async def get_session_metrics(session_id: str):
+async def get_session_metrics(
+    session_id: str, upstream: AgentUpstream = Depends(get_agent_upstream)
+):
     """
     Proxy endpoint: Get LLM metrics for a specific session.
     
@@ -249,39 +180,16 @@ async def get_session_metrics(session_id: str):
         Session metrics with aggregated stats and request history
     """
     logger.debug(f"Proxying session metrics request for {session_id}")
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/events/metrics/session/{session_id}",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            
-            if response.status_code == 404:
-                return JSONResponse(
-                    status_code=404,
-                    content={"error": f"No metrics found for session {session_id}"}
-                )
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying session metrics request: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy(
+        "GET",
+        f"/events/metrics/session/{session_id}",
+        timeout=AppConfig.EVENTS_REQUEST_TIMEOUT,
+        not_found_error=f"No metrics found for session {session_id}",
+    )
 
 
 @router.get("/events/metrics/sessions")
-async def get_all_session_metrics():
+async def get_all_session_metrics(upstream: AgentUpstream = Depends(get_agent_upstream)):
     """
     Proxy endpoint: Get list of all sessions with LLM metrics.
     
@@ -291,32 +199,17 @@ async def get_all_session_metrics():
         List of session IDs that have metrics data
     """
     logger.debug("Proxying all session metrics request")
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/events/metrics/sessions",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying session metrics list: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy(
+        "GET", "/events/metrics/sessions", timeout=AppConfig.EVENTS_REQUEST_TIMEOUT
+    )
 
 
 @router.get("/events/metrics")
-async def get_event_metrics():
+async def get_event_metrics(
+    request: Request,
+    upstream: AgentUpstream = Depends(get_agent_upstream),
+    cache: ResponseCache = Depends(get_response_cache),
+):
     """
     Proxy endpoint: Get metrics collected from events.
     
@@ -327,41 +220,30 @@ async def get_event_metrics():
     - HITL decisions
     - Errors
     
+    Cached for GATEWAY__CACHE_TTL_EVENT_METRICS seconds, supports If-None-Match.
+    
     Proxies to: GET /events/metrics on Agent Runtime
     
     Returns:
         Dictionary with all collected metrics
     """
     logger.debug("Proxying event metrics request")
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/events/metrics",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying event metrics: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await cache.get(
+        request,
+        "/events/metrics",
+        AppConfig.CACHE_TTL_EVENT_METRICS,
+        partial(
+            upstream.fetch, "GET", "/events/metrics", timeout=AppConfig.EVENTS_REQUEST_TIMEOUT
+        ),
+    )
 
 
 @router.get("/events/audit-log")
 async def get_audit_log(
     session_id: str = None,
     event_type: str = None,
-    limit: int = 100
+    limit: int = 100,
+    upstream: AgentUpstream = Depends(get_agent_upstream),
 ):
     """
     Proxy endpoint: Get audit log of critical events.
@@ -386,66 +268,294 @@ async def get_audit_log(
     if limit:
         params["limit"] = limit
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/events/audit-log",
-                params=params,
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying audit log: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+    return await upstream.proxy(
+        "GET", "/events/audit-log", params=params, timeout=AppConfig.EVENTS_REQUEST_TIMEOUT
+    )
 
 
 @router.get("/events/stats")
-async def get_event_bus_stats():
+async def get_event_bus_stats(
+    request: Request,
+    upstream: AgentUpstream = Depends(get_agent_upstream),
+    cache: ResponseCache = Depends(get_response_cache),
+):
     """
     Proxy endpoint: Get Event Bus statistics.
     
+    Cached for GATEWAY__CACHE_TTL_EVENT_STATS seconds, supports If-None-Match.
+    
     Proxies to: GET /events/stats on Agent Runtime
     
     Returns:
         Statistics about event publishing and handling
     """
     logger.debug("Proxying event bus stats request")
+    return await cache.get(
+        request,
+        "/events/stats",
+        AppConfig.CACHE_TTL_EVENT_STATS,
+        partial(upstream.fetch, "GET", "/events/stats", timeout=AppConfig.EVENTS_REQUEST_TIMEOUT),
+    )
+
+
+@router.get("/cache/stats")
+async def response_cache_stats(cache: ResponseCache = Depends(get_response_cache)):
+    """Статистика кэша ответов: записи, попадания, 304 и сбросы"""
+    return cache.get_stats()
+
+
+# ==================== WebSocket Endpoint ====================
+
+def _coalesce_policy(websocket: WebSocket) -> Optional[str]:
+    """
+    Политика объединения токенов клиента для agent-runtime.
+    
+    IDE задает ее query параметрами при подключении:
+    /ws/{session_id}?coalesce_window_ms=20&coalesce_max_bytes=1024
+    (coalesce_window_ms=0 - каждый токен отдельным кадром).
+    Без параметров используется политика agent-runtime по умолчанию.
+    """
+    fields = []
+    for name in ("window_ms", "max_bytes"):
+        value = websocket.query_params.get(f"coalesce_{name}")
+        if value is not None:
+            fields.append(f"{name}={value}")
+    return ", ".join(fields) or None
+
+
+def _resume_request(websocket: WebSocket) -> Tuple[bool, Optional[int]]:
+    """
+    Запрос переподключения с продолжением стрима.
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    /ws/{session_id}?resume=1 включает номера seq в кадрах,
+    /ws/{session_id}?last_seq=N дополнительно запрашивает кадры после N.
+    
+    Returns:
+        (включен ли буфер переподключения, last_seq или None)
+    """
+    last_seq = websocket.query_params.get("last_seq")
+    if last_seq is not None:
         try:
-            response = await client.get(
-                f"{AppConfig.AGENT_URL}/events/stats",
-                headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-            )
-            response.raise_for_status()
-            return response.json()
+            return True, int(last_seq)
+        except ValueError:
+            logger.warning(f"Ignoring invalid last_seq={last_seq!r}")
+            return True, None
+    return websocket.query_params.get("resume", "").lower() in ("1", "true"), None
+
+
+async def _relay_sse(
+    outbound: FrameSink,
+    upstream: AgentUpstream,
+    session_id: str,
+    ide_msg: dict,
+    agent_headers: dict,
+) -> None:
+    """Отправляет сообщение IDE в Agent по HTTP и пересылает SSE ответ в очередь WebSocket"""
+    logger.debug(f"[{session_id}] Forwarding to Agent via HTTP streaming")
+    async with upstream.client.stream(
+        "POST",
+        "/agent/message/stream",
+        json={"session_id": session_id, "message": ide_msg},
+        headers=agent_headers,
+        timeout=AppConfig.AGENT_STREAM_TIMEOUT,
+    ) as response:
+        response.raise_for_status()
+        logger.debug(f"[{session_id}] Agent streaming started, status={response.status_code}")
+        
+        # Читаем SSE stream от Agent и пересылаем в IDE
+        # SSE формат:
+        # event: message
+        # data: {"type": "assistant_message", ...}
+        #
+        # event: done
+        # data: {"status": "completed"}
+        
+        current_event_type = None
+        
+        async for line in response.aiter_lines():
+            # Пустая строка - разделитель SSE событий
+            if not line:
+                current_event_type = None
+                continue
             
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Agent Runtime error: {e.response.status_code}, {e.response.text}")
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content={"error": f"Agent Runtime error: {e.response.status_code}"}
-            )
-        except Exception as e:
-            logger.error(f"Error proxying event bus stats: {e}", exc_info=True)
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Gateway error: {str(e)}"}
-            )
+            # Обрабатываем строку с типом события
+            if line.startswith("event: "):
+                current_event_type = line[7:].strip()
+                logger.debug(f"[{session_id}] SSE event type: {current_event_type}")
+                
+                # Если получили event: done - завершаем обработку stream
+                if current_event_type == "done":
+                    logger.info(f"[{session_id}] Received 'done' event, completing stream")
+                    break
+                
+                continue
+            
+            # Обрабатываем строку с данными
+            if line.startswith("data: "):
+                data_str = line[6:]
+                
+                # Проверяем на специальный маркер [DONE]
+                if data_str == "[DONE]":
+                    logger.info(f"[{session_id}] Received [DONE] marker, completing stream")
+                    break
+                
+                # Passthrough: payload уже компактный JSON без null полей
+                if AppConfig.RELAY_PASSTHROUGH:
+                    await outbound.put(data_str)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"[{session_id}] Relayed SSE data: type={peek_type(data_str)}")
+                    continue
+                
+                # Парсим JSON данные только для event: message
+                if current_event_type == "message":
+                    try:
+                        data = loads(data_str)
+                        msg_type = data.get('type')
+                        logger.debug(f"[{session_id}] Received SSE data: type={msg_type}")
+                        
+                        # Фильтруем null значения, чтобы не отправлять лишние поля
+                        filtered_data = {k: v for k, v in data.items() if v is not None}
+                        
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(
+                                f"[{session_id}] Sending to IDE: "
+                                f"{json.dumps(filtered_data, indent=2)}"
+                            )
+                        
+                        # Пересылаем событие в IDE через WebSocket
+                        await outbound.put(dumps(filtered_data))
+                        
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"[{session_id}] Failed to parse SSE data: {e}, line={line}")
+                else:
+                    # Для других типов событий (например error) тоже пытаемся парсить
+                    try:
+                        data = loads(data_str)
+                        logger.debug(
+                            f"[{session_id}] Received SSE data for event "
+                            f"'{current_event_type}': {data}"
+                        )
+                        
+                        # Пересылаем событие в IDE
+                        await outbound.put(dumps(data))
+                        
+                    except json.JSONDecodeError as e:
+                        logger.warning(
+                            f"[{session_id}] Failed to parse SSE data for event "
+                            f"'{current_event_type}': {e}"
+                        )
+                
+                continue
+            
+            # SSE комментарий (heartbeat), игнорируем
+            if line.startswith(":"):
+                logger.debug(f"[{session_id}] SSE heartbeat received")
+                continue
+            
+            # Неизвестный формат строки
+            logger.debug(f"[{session_id}] Ignoring unknown SSE line: {line}")
+        
+        logger.info(f"[{session_id}] Agent streaming completed successfully")
 
 
-# ==================== WebSocket Endpoint ====================
+async def _relay_channel(
+    outbound: FrameSink,
+    channel: AgentChannel,
+    session_id: str,
+    ide_msg: dict,
+    coalesce: Optional[str],
+) -> None:
+    """Отправляет сообщение IDE в Agent через постоянный канал, ответ - в очередь WebSocket"""
+    logger.debug(f"[{session_id}] Forwarding to Agent via channel")
+    async for payload in channel.stream(
+        session_id, ide_msg, timeout=AppConfig.AGENT_STREAM_TIMEOUT, coalesce=coalesce
+    ):
+        # Payload уже компактный JSON без null полей
+        await outbound.put(payload)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[{session_id}] Relayed channel data: type={peek_type(payload)}")
+    
+    logger.info(f"[{session_id}] Agent streaming completed successfully")
+
+
+async def _relay_message(
+    outbound: FrameSink,
+    upstream: AgentUpstream,
+    channel: Optional[AgentChannel],
+    cache: ResponseCache,
+    session_id: str,
+    ide_msg: dict,
+    agent_headers: dict,
+    coalesce: Optional[str],
+) -> None:
+    """Отправляет сообщение IDE в Agent и пересылает ответ, ошибки - сообщением error"""
+    try:
+        # Отправляем в Agent через постоянный канал или HTTP streaming
+        if channel is not None:
+            try:
+                await _relay_channel(outbound, channel, session_id, ide_msg, coalesce)
+                return
+            except AgentChannelUnavailable as e:
+                logger.warning(
+                    f"[{session_id}] Agent channel unavailable, using HTTP streaming: {e}"
+                )
+        
+        await _relay_sse(outbound, upstream, session_id, ide_msg, agent_headers)
+        
+    except httpx.HTTPStatusError as e:
+        # Для streaming response нужно прочитать содержимое перед доступом к .text
+        try:
+            error_body = await e.response.aread()
+            error_text = error_body.decode('utf-8')
+            logger.error(f"[{session_id}] Agent HTTP error: {e.response.status_code}, {error_text}")
+        except Exception as read_err:
+            logger.error(
+                f"[{session_id}] Agent HTTP error: {e.response.status_code}, "
+                f"failed to read response: {read_err}"
+            )
+            error_text = "Unable to read error response"
+        
+        err = WSErrorResponse.model_construct(
+            type="error", content=f"Agent error: {e.response.status_code}"
+        )
+        await outbound.put(dumps(err.model_dump()))
+    except SlowConsumerError:
+        raise
+    except Exception as e:
+        logger.error(f"[{session_id}] Error streaming from Agent: {e}", exc_info=True)
+        err = WSErrorResponse.model_construct(
+            type="error", content=f"Streaming error: {str(e)}"
+        )
+        await outbound.put(dumps(err.model_dump()))
+    finally:
+        # История сессии изменилась (в том числе частичным ответом при отмене)
+        cache.invalidate_session(session_id)
+
+
+async def _close_slow_consumer(websocket: WebSocket, session_id: str, sender: asyncio.Task) -> None:
+    """Закрывает соединение IDE, которая не читает ответы"""
+    logger.warning(f"[{session_id}] Closing WebSocket of slow consumer")
+    sender.cancel()
+    await asyncio.gather(sender, return_exceptions=True)
+    try:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Slow consumer")
+    except RuntimeError:
+        # Соединение уже закрыто
+        pass
+
+
+@router.get("/ws/stats")
+async def websocket_outbound_stats(
+    budget: OutboundBudget = Depends(get_outbound_budget),
+    registry: SessionRegistry = Depends(get_session_registry),
+):
+    """
+    Метрики исходящих очередей WebSocket: общий объем буферов, объединенные
+    и отброшенные кадры, отключенные медленные клиенты, глубина очереди
+    каждого соединения. В registry - реестр сессий узла.
+    """
+    return {**budget.get_stats(), "registry": registry.get_stats()}
+
 
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(
@@ -453,6 +563,11 @@ async def websocket_endpoint(
     session_id: str,
     session_manager: SessionManager = Depends(get_session_manager),
     token_buffer_manager: "TokenBufferManager" = Depends(get_token_buffer_manager),
+    upstream: AgentUpstream = Depends(get_agent_upstream),
+    channel: Optional[AgentChannel] = Depends(get_agent_channel),
+    budget: OutboundBudget = Depends(get_outbound_budget),
+    registry: SessionRegistry = Depends(get_session_registry),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """
     WebSocket endpoint для двунаправленной связи между IDE и Agent через HTTP streaming.
@@ -462,167 +577,202 @@ async def websocket_endpoint(
     2. Gateway пересылает в Agent через HTTP streaming (SSE)
     3. Agent отправляет SSE события (assistant_message, tool_call)
     4. Gateway пересылает SSE события в IDE через WebSocket
+    
+    Чтение и отправка разделены: reader принимает сообщения IDE и во
+    время генерации ответа, writer по очереди отправляет их в Agent.
+    Сообщение cancel прерывает текущий стрим (закрытие HTTP стрима или
+    cancel в постоянном канале останавливает генерацию в Agent Runtime).
+    
+    Кадры для IDE проходят через исходящую очередь OutboundQueue: relay
+    не ждет отправки каждого кадра, а IDE, которая не читает ответы,
+    отключается с кодом 1013.
+    
+    С ?resume=1 кадры получают seq и записываются в ReplayBuffer сессии.
+    При отключении IDE ответ Agent дописывается в буфер, а IDE,
+    переподключившаяся с ?last_seq=N, получает пропущенные кадры.
+    
+    Новое подключение сессии (на этом или другом узле gateway) закрывает
+    прежнее с кодом 4409.
     """
     await websocket.accept()
     logger.info(f"[{session_id}] WebSocket connected")
-    await session_manager.add(session_id, websocket)
+    session_manager.add(session_id, websocket)
     
-    try:
-        async with httpx.AsyncClient(timeout=AppConfig.AGENT_STREAM_TIMEOUT) as client:
+    agent_headers = {
+        # Дедлайн для повторов LLM запросов в agent-runtime
+        "X-Request-Timeout": str(AppConfig.AGENT_STREAM_TIMEOUT),
+    }
+    coalesce = _coalesce_policy(websocket)
+    if coalesce:
+        agent_headers["X-Stream-Coalesce"] = coalesce
+    
+    outbound = OutboundQueue(
+        websocket,
+        budget,
+        session_id,
+        max_bytes=AppConfig.WS_OUTBOUND_MAX_BYTES,
+        slow_consumer_timeout=AppConfig.WS_SLOW_CONSUMER_TIMEOUT,
+    )
+    sender_task = asyncio.create_task(outbound.run())
+    
+    # Кадры relay и ответы на сообщения IDE
+    sink: FrameSink = outbound
+    replay: Optional[ReplayBuffer] = None
+    resume, last_seq = _resume_request(websocket)
+    if resume:
+        replay = token_buffer_manager.get(session_id)
+        sink = replay
+        if not replay.attach(outbound, last_seq):
+            logger.warning(f"[{session_id}] Frames after seq {last_seq} expired, resume failed")
+            failed = WSResumeFailed.model_construct(
+                type="resume_failed",
+                last_seq=last_seq,
+                content="Missed frames are no longer buffered, reload session history",
+            )
+            await sink.put(dumps(failed.model_dump()))
+        elif last_seq is not None:
+            logger.info(f"[{session_id}] Resumed after seq {last_seq}")
+    
+    async def evict() -> None:
+        sender_task.cancel()
+        try:
+            await websocket.close(code=4409, reason="Session opened on another connection")
+        except RuntimeError:
+            # Соединение уже закрыто
+            pass
+    
+    handle = SessionHandle(evict=evict)
+    
+    # Сообщения IDE, ожидающие отправки в Agent
+    inbound: asyncio.Queue = asyncio.Queue(maxsize=AppConfig.WS_INBOUND_QUEUE_SIZE)
+    # Текущий стрим ответа Agent (прерывается сообщением cancel)
+    in_flight: Optional[asyncio.Task] = None
+    
+    async def finish_in_flight() -> None:
+        nonlocal in_flight
+        try:
+            await asyncio.wait({in_flight})
+        except asyncio.CancelledError:
+            if replay is not None:
+                # Отключение IDE: ответ дописывается в буфер для переподключения
+                replay.task = in_flight
+            else:
+                # Отключение IDE: стрим Agent тоже прерывается
+                in_flight.cancel()
+                await asyncio.wait({in_flight})
+            raise
+        if in_flight.cancelled():
+            logger.info(f"[{session_id}] Agent stream cancelled by IDE")
+            cancelled = WSCancelled.model_construct(
+                type="cancelled", content="Request cancelled"
+            )
+            await sink.put(dumps(cancelled.model_dump()))
+        elif in_flight.exception() is not None:
+            raise in_flight.exception()
+        in_flight = None
+    
+    async def writer() -> None:
+        nonlocal in_flight
+        try:
+            if replay is not None and replay.task is not None and not replay.task.done():
+                # Ответ, начатый до переподключения, завершается первым
+                in_flight = replay.task
+                await finish_in_flight()
             while True:
-                # Получаем сообщение от IDE
-                raw_msg = await websocket.receive_text()
-                logger.debug(f"[{session_id}] Received WS message: {raw_msg!r}")
+                ide_msg = await inbound.get()
+                in_flight = asyncio.create_task(_relay_message(
+                    sink, upstream, channel, cache, session_id, ide_msg, agent_headers, coalesce
+                ))
+                await finish_in_flight()
+        except SlowConsumerError:
+            # Reader завершит сессию после закрытия соединения
+            await _close_slow_consumer(websocket, session_id, sender_task)
+    
+    writer_task = asyncio.create_task(writer())
+    
+    try:
+        # Внутри try: при ошибке реестра очередь, задачи и буфер освобождаются в finally
+        await registry.register(session_id, handle)
+        
+        while True:
+            # Получаем сообщение от IDE
+            raw_msg = await websocket.receive_text()
+            logger.debug(f"[{session_id}] Received WS message: {raw_msg!r}")
+            
+            try:
+                ide_msg = loads(raw_msg)
+                msg_type = ide_msg.get("type")
                 
-                try:
-                    ide_msg = json.loads(raw_msg)
-                    msg_type = ide_msg.get("type")
-                    
-                    # Валидация сообщения
-                    if msg_type == "user_message":
-                        msg = WSUserMessage.model_validate(ide_msg)
-                        logger.info(f"[{session_id}] Received user_message: role={msg.role}")
-                    elif msg_type == "tool_result":
-                        msg = WSToolResult.model_validate(ide_msg)
-                        logger.info(f"[{session_id}] Received tool_result: call_id={msg.call_id}, has_error={msg.error is not None}")
-                    elif msg_type == "switch_agent":
-                        msg = WSSwitchAgent.model_validate(ide_msg)
-                        logger.info(f"[{session_id}] Received switch_agent: target={msg.agent_type}")
-                    elif msg_type == "hitl_decision":
-                        msg = WSHITLDecision.model_validate(ide_msg)
-                        logger.info(f"[{session_id}] Received hitl_decision: call_id={msg.call_id}, decision={msg.decision}")
-                    else:
-                        logger.warning(f"[{session_id}] Unknown message type: {msg_type}")
-                        err = WSErrorResponse.model_construct(
-                            type="error", content=f"Unknown message type: {msg_type}"
-                        )
-                        await websocket.send_json(err.model_dump())
-                        continue
-                        
-                except Exception as e:
-                    logger.error(f"[{session_id}] Failed to parse message: {e}")
-                    err = WSErrorResponse.model_construct(
-                        type="error", content=f"Invalid JSON message: {str(e)}"
+                # Валидация сообщения
+                if msg_type == "user_message":
+                    msg = WSUserMessage.model_validate(ide_msg)
+                    logger.info(f"[{session_id}] Received user_message: role={msg.role}")
+                elif msg_type == "tool_result":
+                    msg = WSToolResult.model_validate(ide_msg)
+                    logger.info(
+                        f"[{session_id}] Received tool_result: call_id={msg.call_id}, "
+                        f"has_error={msg.error is not None}"
                     )
-                    await websocket.send_json(err.model_dump())
-                    continue
-                
-                # Отправляем в Agent через HTTP streaming
-                try:
-                    logger.debug(f"[{session_id}] Forwarding to Agent via HTTP streaming")
-                    async with client.stream(
-                        "POST",
-                        f"{AppConfig.AGENT_URL}/agent/message/stream",
-                        json={"session_id": session_id, "message": ide_msg},
-                        headers={"X-Internal-Auth": AppConfig.INTERNAL_API_KEY},
-                    ) as response:
-                        response.raise_for_status()
-                        logger.debug(f"[{session_id}] Agent streaming started, status={response.status_code}")
-                        
-                        # Читаем SSE stream от Agent и пересылаем в IDE
-                        # SSE формат:
-                        # event: message
-                        # data: {"type": "assistant_message", ...}
-                        #
-                        # event: done
-                        # data: {"status": "completed"}
-                        
-                        current_event_type = None
-                        
-                        async for line in response.aiter_lines():
-                            # Пустая строка - разделитель SSE событий
-                            if not line:
-                                current_event_type = None
-                                continue
-                            
-                            # Обрабатываем строку с типом события
-                            if line.startswith("event: "):
-                                current_event_type = line[7:].strip()
-                                logger.debug(f"[{session_id}] SSE event type: {current_event_type}")
-                                
-                                # Если получили event: done - завершаем обработку stream
-                                if current_event_type == "done":
-                                    logger.info(f"[{session_id}] Received 'done' event, completing stream")
-                                    break
-                                
-                                continue
-                            
-                            # Обрабатываем строку с данными
-                            if line.startswith("data: "):
-                                data_str = line[6:]
-                                
-                                # Проверяем на специальный маркер [DONE]
-                                if data_str == "[DONE]":
-                                    logger.info(f"[{session_id}] Received [DONE] marker, completing stream")
-                                    break
-                                
-                                # Парсим JSON данные только для event: message
-                                if current_event_type == "message":
-                                    try:
-                                        data = json.loads(data_str)
-                                        msg_type = data.get('type')
-                                        logger.debug(f"[{session_id}] Received SSE data: type={msg_type}")
-                                        
-                                        # Фильтруем null значения, чтобы не отправлять лишние поля
-                                        filtered_data = {k: v for k, v in data.items() if v is not None}
-                                        
-                                        logger.debug(f"[{session_id}] Sending to IDE: {json.dumps(filtered_data, indent=2)}")
-                                        
-                                        # Пересылаем событие в IDE через WebSocket
-                                        await websocket.send_json(filtered_data)
-                                        
-                                    except json.JSONDecodeError as e:
-                                        logger.warning(f"[{session_id}] Failed to parse SSE data: {e}, line={line}")
-                                else:
-                                    # Для других типов событий (например error) тоже пытаемся парсить
-                                    try:
-                                        data = json.loads(data_str)
-                                        logger.debug(f"[{session_id}] Received SSE data for event '{current_event_type}': {data}")
-                                        
-                                        # Пересылаем событие в IDE
-                                        await websocket.send_json(data)
-                                        
-                                    except json.JSONDecodeError as e:
-                                        logger.warning(f"[{session_id}] Failed to parse SSE data for event '{current_event_type}': {e}")
-                                
-                                continue
-                            
-                            # SSE комментарий (heartbeat), игнорируем
-                            if line.startswith(":"):
-                                logger.debug(f"[{session_id}] SSE heartbeat received")
-                                continue
-                            
-                            # Неизвестный формат строки
-                            logger.debug(f"[{session_id}] Ignoring unknown SSE line: {line}")
-                        
-                        logger.info(f"[{session_id}] Agent streaming completed successfully")
-                        
-                except httpx.HTTPStatusError as e:
-                    # Для streaming response нужно прочитать содержимое перед доступом к .text
-                    try:
-                        error_body = await e.response.aread()
-                        error_text = error_body.decode('utf-8')
-                        logger.error(f"[{session_id}] Agent HTTP error: {e.response.status_code}, {error_text}")
-                    except Exception as read_err:
-                        logger.error(f"[{session_id}] Agent HTTP error: {e.response.status_code}, failed to read response: {read_err}")
-                        error_text = "Unable to read error response"
-                    
-                    err = WSErrorResponse.model_construct(
-                        type="error", content=f"Agent error: {e.response.status_code}"
+                elif msg_type == "switch_agent":
+                    msg = WSSwitchAgent.model_validate(ide_msg)
+                    logger.info(f"[{session_id}] Received switch_agent: target={msg.agent_type}")
+                elif msg_type == "hitl_decision":
+                    msg = WSHITLDecision.model_validate(ide_msg)
+                    logger.info(
+                        f"[{session_id}] Received hitl_decision: call_id={msg.call_id}, "
+                        f"decision={msg.decision}"
                     )
-                    await websocket.send_json(err.model_dump())
-                except Exception as e:
-                    logger.error(f"[{session_id}] Error streaming from Agent: {e}", exc_info=True)
+                elif msg_type == "cancel":
+                    WSCancel.model_validate(ide_msg)
+                    if in_flight is not None and not in_flight.done():
+                        logger.info(f"[{session_id}] Received cancel, aborting Agent stream")
+                        in_flight.cancel()
+                    else:
+                        logger.debug(f"[{session_id}] Received cancel without active Agent stream")
+                    continue
+                else:
+                    logger.warning(f"[{session_id}] Unknown message type: {msg_type}")
                     err = WSErrorResponse.model_construct(
-                        type="error", content=f"Streaming error: {str(e)}"
+                        type="error", content=f"Unknown message type: {msg_type}"
                     )
-                    await websocket.send_json(err.model_dump())
+                    await sink.put(dumps(err.model_dump()))
+                    continue
                     
+            except Exception as e:
+                logger.error(f"[{session_id}] Failed to parse message: {e}")
+                err = WSErrorResponse.model_construct(
+                    type="error", content=f"Invalid JSON message: {str(e)}"
+                )
+                await sink.put(dumps(err.model_dump()))
+                continue
+            
+            if writer_task.done():
+                raise RuntimeError("WS writer stopped, closing session")
+            try:
+                inbound.put_nowait(ide_msg)
+            except asyncio.QueueFull:
+                logger.warning(f"[{session_id}] Too many pending messages, rejecting {msg_type}")
+                err = WSErrorResponse.model_construct(
+                    type="error", content="Too many pending messages"
+                )
+                await sink.put(dumps(err.model_dump()))
+                
     except WebSocketDisconnect:
         logger.info(f"[{session_id}] WebSocket disconnected")
-        await token_buffer_manager.remove(session_id)
-        await session_manager.remove(session_id)
+    except SlowConsumerError:
+        await _close_slow_consumer(websocket, session_id, sender_task)
     except Exception as e:
         logger.error(f"[{session_id}] WS fatal error: {e}", exc_info=True)
-        await token_buffer_manager.remove(session_id)
-        await session_manager.remove(session_id)
+    finally:
+        writer_task.cancel()
+        sender_task.cancel()
+        await asyncio.gather(writer_task, sender_task, return_exceptions=True)
+        outbound.close()
+        # До первого await: продолжающийся ответ не пишет в закрытую очередь
+        if replay is not None:
+            # Буфер остается до переподключения IDE или истечения TTL
+            replay.detach(outbound)
+        else:
+            token_buffer_manager.remove(session_id)
+        await registry.unregister(session_id, handle)
+        session_manager.remove(session_id, websocket)
@@ -1,5 +1,6 @@
 import logging
 import os
+import socket
 
 from dotenv import load_dotenv
 
@@ -12,6 +13,55 @@ class AppConfig:
     LOG_LEVEL: str = os.getenv("GATEWAY__LOG_LEVEL", "DEBUG")
     REQUEST_TIMEOUT: float = float(os.getenv("GATEWAY__REQUEST_TIMEOUT", "30.0"))
     AGENT_STREAM_TIMEOUT: float = float(os.getenv("GATEWAY__AGENT_STREAM_TIMEOUT", "60.0"))
+    # Таймаут прокси-запросов /events/* и pending-approvals
+    EVENTS_REQUEST_TIMEOUT: float = float(os.getenv("GATEWAY__EVENTS_REQUEST_TIMEOUT", "10.0"))
+    # Пул соединений к Agent Runtime (общий для REST прокси и WebSocket)
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("GATEWAY__UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("GATEWAY__UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(
+        os.getenv("GATEWAY__UPSTREAM_KEEPALIVE_EXPIRY", "30.0")
+    )
+    # Постоянный мультиплексированный канал к Agent Runtime (WebSocket
+    # /agent/channel) вместо HTTP запроса на каждое сообщение, HTTP/SSE - fallback
+    AGENT_CHANNEL: bool = os.getenv("GATEWAY__AGENT_CHANNEL", "false").lower() == "true"
+    AGENT_CHANNEL_URL: str = os.getenv(
+        "GATEWAY__AGENT_CHANNEL_URL", AGENT_URL.replace("http", "ws", 1) + "/agent/channel"
+    )
+    # Очередь кадров одного стрима канала (backpressure при медленной IDE)
+    AGENT_CHANNEL_QUEUE_SIZE: int = int(os.getenv("GATEWAY__AGENT_CHANNEL_QUEUE_SIZE", "256"))
+    # Пересылка SSE кадров Agent Runtime в WebSocket без разбора JSON
+    RELAY_PASSTHROUGH: bool = os.getenv("GATEWAY__RELAY_PASSTHROUGH", "true").lower() == "true"
+    # Сообщения IDE, ожидающие отправки в Agent, пока генерируется ответ
+    WS_INBOUND_QUEUE_SIZE: int = int(os.getenv("GATEWAY__WS_INBOUND_QUEUE_SIZE", "16"))
+    # Исходящая очередь WebSocket соединения: лимит размера, после которого relay
+    # ждет IDE, и время, после которого не читающая IDE отключается
+    WS_OUTBOUND_MAX_BYTES: int = int(os.getenv("GATEWAY__WS_OUTBOUND_MAX_BYTES", "1048576"))
+    WS_SLOW_CONSUMER_TIMEOUT: float = float(
+        os.getenv("GATEWAY__WS_SLOW_CONSUMER_TIMEOUT", "15.0")
+    )
+    # Общий лимит исходящих очередей всех соединений
+    WS_OUTBOUND_TOTAL_MAX_BYTES: int = int(
+        os.getenv("GATEWAY__WS_OUTBOUND_TOTAL_MAX_BYTES", "268435456")
+    )
+    # Буфер кадров сессии для переподключения IDE (?resume=1, ?last_seq=N)
+    WS_RESUME_BUFFER_BYTES: int = int(os.getenv("GATEWAY__WS_RESUME_BUFFER_BYTES", "262144"))
+    WS_RESUME_TTL: float = float(os.getenv("GATEWAY__WS_RESUME_TTL", "300.0"))
+    # Реестр сессий: memory (один узел) или redis (несколько реплик за nginx)
+    SESSION_REGISTRY: str = os.getenv("GATEWAY__SESSION_REGISTRY", "memory").lower()
+    REDIS_URL: str = os.getenv("GATEWAY__REDIS_URL", "redis://localhost:6379/2")
+    NODE_ID: str = os.getenv("GATEWAY__NODE_ID", f"{socket.gethostname()}-{os.getpid()}")
+    # Аренда сессии узлом в Redis, продлевается пока сокет открыт
+    SESSION_LEASE_TTL: float = float(os.getenv("GATEWAY__SESSION_LEASE_TTL", "30.0"))
+    # Кэш ответов опрашиваемых REST эндпоинтов: время жизни по маршрутам (0 - без кэша)
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("GATEWAY__RESPONSE_CACHE_MAX_ENTRIES", "1024")
+    )
+    CACHE_TTL_AGENTS: float = float(os.getenv("GATEWAY__CACHE_TTL_AGENTS", "300.0"))
+    CACHE_TTL_SESSION_HISTORY: float = float(
+        os.getenv("GATEWAY__CACHE_TTL_SESSION_HISTORY", "30.0")
+    )
+    CACHE_TTL_EVENT_METRICS: float = float(os.getenv("GATEWAY__CACHE_TTL_EVENT_METRICS", "5.0"))
+    CACHE_TTL_EVENT_STATS: float = float(os.getenv("GATEWAY__CACHE_TTL_EVENT_STATS", "5.0"))
     VERSION: str = os.getenv("GATEWAY__VERSION", "0.1.0")
     
     # Auth Service settings
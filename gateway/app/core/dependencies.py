@@ -1,6 +1,14 @@
 from functools import lru_cache
+from typing import Optional
+
+from app.core.config import AppConfig
+from app.services.agent_channel import AgentChannel
+from app.services.agent_upstream import AgentUpstream
 from app.services.session_manager import SessionManager
+from app.services.response_cache import ResponseCache
+from app.services.session_registry import RedisSessionRegistry, SessionRegistry
 from app.services.token_buffer_manager import TokenBufferManager
+from app.services.ws_outbound import OutboundBudget
 
 # Временно Singletons через lru_cache (FastAPI DI-best practice)
 
@@ -10,4 +18,52 @@ def get_session_manager() -> SessionManager:
 
 @lru_cache
 def get_token_buffer_manager() -> TokenBufferManager:
-    return TokenBufferManager()
+    return TokenBufferManager(
+        capacity=AppConfig.WS_RESUME_BUFFER_BYTES, ttl=AppConfig.WS_RESUME_TTL
+    )
+
+@lru_cache
+def get_outbound_budget() -> OutboundBudget:
+    """Общий лимит памяти исходящих очередей WebSocket соединений"""
+    return OutboundBudget(max_bytes=AppConfig.WS_OUTBOUND_TOTAL_MAX_BYTES)
+
+@lru_cache
+def get_session_registry() -> SessionRegistry:
+    """Реестр сессий узла, запускается и останавливается в lifespan приложения"""
+    if AppConfig.SESSION_REGISTRY == "redis":
+        return RedisSessionRegistry(
+            node_id=AppConfig.NODE_ID,
+            url=AppConfig.REDIS_URL,
+            lease_ttl=AppConfig.SESSION_LEASE_TTL,
+        )
+    return SessionRegistry(node_id=AppConfig.NODE_ID)
+
+@lru_cache
+def get_agent_upstream() -> AgentUpstream:
+    """Пул соединений к Agent Runtime, закрывается в lifespan приложения"""
+    return AgentUpstream(
+        base_url=AppConfig.AGENT_URL,
+        api_key=AppConfig.INTERNAL_API_KEY,
+        timeout=AppConfig.REQUEST_TIMEOUT,
+        max_connections=AppConfig.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=AppConfig.UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=AppConfig.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+
+@lru_cache
+def get_agent_channel() -> Optional[AgentChannel]:
+    """Постоянный канал к Agent Runtime (None, если выключен)"""
+    if not AppConfig.AGENT_CHANNEL:
+        return None
+    return AgentChannel(
+        url=AppConfig.AGENT_CHANNEL_URL,
+        api_key=AppConfig.INTERNAL_API_KEY,
+        queue_size=AppConfig.AGENT_CHANNEL_QUEUE_SIZE,
+        # Уведомления session_changed сбрасывают кэш истории
+        on_control=get_response_cache().handle_notification,
+    )
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    """Кэш ответов Agent Runtime для опрашиваемых REST эндпоинтов"""
+    return ResponseCache(max_entries=AppConfig.RESPONSE_CACHE_MAX_ENTRIES)
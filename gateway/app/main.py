@@ -1,13 +1,45 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
 
 from app.api.v1.endpoints import router as v1_router
 from app.core.config import AppConfig
+from app.core.dependencies import (
+    get_agent_channel,
+    get_agent_upstream,
+    get_response_cache,
+    get_session_registry,
+)
+from app.core.serialization import FastJSONResponse
 from app.middleware.internal_auth import InternalAuthMiddleware
 from app.middleware.jwt_auth import HybridAuthMiddleware
 from app.models.rest import HealthResponse
 
-app = FastAPI(title="Gateway Service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Открывает соединения к Agent Runtime и реестр сессий, закрывает их при остановке"""
+    get_agent_upstream()
+    channel = get_agent_channel()
+    if channel is not None:
+        # Уведомления об изменении сессий приходят и до первого стрима
+        await channel.connect()
+    await get_session_registry().start()
+    yield
+    await get_session_registry().close()
+    get_session_registry.cache_clear()
+    await get_agent_upstream().close()
+    get_agent_upstream.cache_clear()
+    if channel is not None:
+        await channel.close()
+    get_agent_channel.cache_clear()
+    get_response_cache.cache_clear()
+
+
+app = FastAPI(
+    title="Gateway Service", default_response_class=FastJSONResponse, lifespan=lifespan
+)
 
 
 @app.get("/health", response_model=HealthResponse)
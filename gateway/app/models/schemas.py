@@ -1,6 +1,7 @@
 from .websocket import (
     WSUserMessage,
     WSToolCall,
+    WSToolCallDelta,
     WSToolResult,
     WSErrorResponse,
     WSAgentSwitched,
@@ -29,6 +29,27 @@ class WSToolCall(BaseModel):
         }
 
 
+class WSToolCallDelta(BaseModel):
+    """WebSocket message with a partially generated tool call from Agent to IDE"""
+
+    type: Literal["tool_call_delta"]
+    call_id: str
+    tool_name: str
+    token: Optional[str] = None
+    metadata: Dict[str, Any]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "tool_call_delta",
+                "call_id": "call_abc123",
+                "tool_name": "write_file",
+                "token": "def main():",
+                "metadata": {"index": 0, "argument": "content", "complete": False},
+            }
+        }
+
+
 class WSToolResult(BaseModel):
     """WebSocket message for tool result from IDE to Agent"""
 
@@ -94,6 +115,27 @@ class WSErrorResponse(BaseModel):
     content: str
 
 
+class WSCancel(BaseModel):
+    """WebSocket message from IDE to abort the Agent response in progress"""
+
+    type: Literal["cancel"]
+
+
+class WSCancelled(BaseModel):
+    """WebSocket message confirming that the Agent response was aborted"""
+
+    type: Literal["cancelled"]
+    content: str
+
+
+class WSResumeFailed(BaseModel):
+    """WebSocket message: frames after last_seq are no longer buffered, reload history"""
+
+    type: Literal["resume_failed"]
+    last_seq: int
+    content: str
+
+
 class WSHITLDecision(BaseModel):
     """WebSocket message for HITL user decision from IDE to Agent"""
     
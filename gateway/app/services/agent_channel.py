@@ -0,0 +1,242 @@
+"""
+Постоянный мультиплексированный канал gateway -> Agent Runtime.
+
+Один WebSocket к /agent/channel вместо отдельного HTTP запроса
+/agent/message/stream на каждое сообщение IDE. Стримы сессий
+различаются префиксом кадра:
+
+    gateway -> runtime: {"session_id": ..., "message": {...}, "timeout": ..., "coalesce": ...}
+                        {"session_id": ..., "type": "cancel"}
+    runtime -> gateway: "<session_id>\\n<JSON chunk>" ... "<session_id>\\n[DONE]"
+                        "\\n{"type": "session_changed", "session_id": ...}"
+
+JSON chunk пересылается в IDE без разбора (как в passthrough режиме SSE).
+Кадры с пустым префиксом (уведомления Agent Runtime, запрашиваются
+заголовком X-Session-Changes: 1) передаются в on_control.
+
+Backpressure: у каждого стрима ограниченная очередь. Чтение канала общее
+для всех сессий и никогда не ждет: если IDE читает медленнее, чем
+отвечает агент, и очередь стрима заполнилась, прерывается только этот
+стрим (AgentChannelError, в Agent Runtime уходит cancel).
+"""
+
+import asyncio
+import inspect
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import websockets
+
+from app.core.serialization import dumps
+
+logger = logging.getLogger("gateway.channel")
+
+DONE = "[DONE]"
+
+# Кадр очереди: стрим не успевал читать кадры и прерван
+_OVERFLOW = object()
+
+# websockets < 14 принимает заголовки как extra_headers, новые версии - additional_headers
+_HEADERS_ARG = (
+    "additional_headers"
+    if "additional_headers" in inspect.signature(websockets.connect).parameters
+    else "extra_headers"
+)
+
+
+class AgentChannelError(Exception):
+    """Стрим через канал прерван (соединение закрыто или отклонено)"""
+
+
+class AgentChannelUnavailable(AgentChannelError):
+    """Канал недоступен, сообщение не отправлено: можно использовать HTTP/SSE"""
+
+
+async def _websocket_connect(url: str, headers: Dict[str, str]) -> Any:
+    return await websockets.connect(url, **{_HEADERS_ARG: headers})
+
+
+class AgentChannel:
+    """
+    Клиент постоянного канала к Agent Runtime.
+
+    Подключается при первом стриме и переподключается после разрыва.
+    После неудачного подключения повторная попытка делается не раньше
+    чем через retry_interval секунд, до этого стримы получают
+    AgentChannelUnavailable и идут через HTTP/SSE.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        queue_size: int = 256,
+        retry_interval: float = 5.0,
+        connect: Optional[Callable[[str, Dict[str, str]], Awaitable[Any]]] = None,
+        on_control: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Args:
+            url: URL канала (ws://agent-runtime:8001/agent/channel)
+            api_key: Ключ X-Internal-Auth
+            queue_size: Размер очереди кадров одного стрима (при заполнении стрим прерывается)
+            retry_interval: Пауза между попытками подключения, секунды
+            connect: Фабрика соединения (по умолчанию websockets.connect)
+            on_control: Обработчик уведомлений Agent Runtime (JSON payload)
+        """
+        self._url = url
+        self._headers = {"X-Internal-Auth": api_key}
+        self._on_control = on_control
+        if on_control is not None:
+            self._headers["X-Session-Changes"] = "1"
+        self._queue_size = queue_size
+        self._retry_interval = retry_interval
+        self._connect = connect or _websocket_connect
+        self._connection: Any = None
+        self._reader: Optional[asyncio.Task] = None
+        self._streams: Dict[str, asyncio.Queue] = {}
+        self._lock = asyncio.Lock()
+        self._retry_at = 0.0
+
+    async def stream(
+        self,
+        session_id: str,
+        message: Dict[str, Any],
+        timeout: Optional[float] = None,
+        coalesce: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Отправить сообщение IDE и получить JSON chunks ответа.
+
+        Raises:
+            AgentChannelUnavailable: Канал недоступен, сообщение не отправлено
+            AgentChannelError: Соединение закрыто во время стрима
+        """
+        connection = await self._connected()
+        if session_id in self._streams:
+            raise AgentChannelError(f"Session {session_id} already has an active stream")
+
+        queue: asyncio.Queue = asyncio.Queue(self._queue_size)
+        self._streams[session_id] = queue
+        sent = finished = False
+        try:
+            request = {"session_id": session_id, "message": message}
+            if timeout is not None:
+                request["timeout"] = timeout
+            if coalesce:
+                request["coalesce"] = coalesce
+            try:
+                await connection.send(dumps(request))
+            except Exception as e:
+                raise AgentChannelUnavailable(f"Failed to send to agent channel: {e}") from e
+            sent = True
+
+            while True:
+                payload = await queue.get()
+                if payload is None:
+                    finished = True
+                    raise AgentChannelError("Agent channel closed")
+                if payload is _OVERFLOW:
+                    # finished = False: finally отменяет генерацию в Agent Runtime
+                    raise AgentChannelError(f"Stream of session {session_id} fell behind")
+                if payload == DONE:
+                    finished = True
+                    return
+                yield payload
+        finally:
+            if self._streams.get(session_id) is queue:
+                del self._streams[session_id]
+            if sent and not finished:
+                # Стрим прерван (cancel от IDE или отключение): останавливаем генерацию
+                await self._cancel(connection, session_id)
+
+    async def connect(self) -> None:
+        """Подключиться заранее (для уведомлений до первого стрима), без ошибки при отказе"""
+        try:
+            await self._connected()
+        except AgentChannelUnavailable:
+            pass
+
+    async def _cancel(self, connection: Any, session_id: str) -> None:
+        try:
+            await connection.send(dumps({"session_id": session_id, "type": "cancel"}))
+        except Exception as e:
+            logger.debug(f"Failed to send cancel for session {session_id}: {e}")
+
+    async def close(self) -> None:
+        """Закрыть соединение (при остановке gateway)"""
+        async with self._lock:
+            connection, self._connection = self._connection, None
+            if self._reader is not None:
+                self._reader.cancel()
+                self._reader = None
+            if connection is not None:
+                await connection.close()
+        self._fail_streams()
+
+    async def _connected(self) -> Any:
+        async with self._lock:
+            if self._connection is not None:
+                return self._connection
+
+            loop = asyncio.get_running_loop()
+            if loop.time() < self._retry_at:
+                raise AgentChannelUnavailable("Agent channel is reconnecting")
+            try:
+                connection = await self._connect(self._url, self._headers)
+            except Exception as e:
+                self._retry_at = loop.time() + self._retry_interval
+                logger.warning(f"Failed to connect agent channel {self._url}: {e}")
+                raise AgentChannelUnavailable(f"Failed to connect agent channel: {e}") from e
+
+            logger.info(f"Agent channel connected: {self._url}")
+            self._connection = connection
+            self._reader = asyncio.create_task(self._read(connection))
+            return connection
+
+    async def _read(self, connection: Any) -> None:
+        """Раскладывает кадры канала по очередям стримов"""
+        try:
+            async for frame in connection:
+                session_id, _, payload = frame.partition("\n")
+                if not session_id:
+                    self._control(payload)
+                    continue
+                queue = self._streams.get(session_id)
+                if queue is None:
+                    continue
+                try:
+                    queue.put_nowait(payload)
+                except asyncio.QueueFull:
+                    # Медленная IDE не задерживает остальные сессии: прерываем только ее стрим
+                    logger.warning(f"[{session_id}] Agent channel stream overflow, cancelling")
+                    self._interrupt(queue, _OVERFLOW)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Agent channel read failed: {e}")
+        if self._connection is connection:
+            logger.info("Agent channel closed")
+            self._connection = None
+            self._reader = None
+            self._fail_streams()
+
+    def _control(self, payload: str) -> None:
+        if self._on_control is None:
+            return
+        try:
+            self._on_control(payload)
+        except Exception as e:
+            logger.warning(f"Failed to handle agent channel notification {payload!r}: {e}")
+
+    def _fail_streams(self) -> None:
+        """Прервать активные стримы: соединение закрыто"""
+        for queue in self._streams.values():
+            self._interrupt(queue, None)
+
+    @staticmethod
+    def _interrupt(queue: asyncio.Queue, reason: Any) -> None:
+        """Заменить непрочитанные кадры стрима кадром прерывания"""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(reason)
@@ -0,0 +1,140 @@
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger("gateway.upstream")
+
+# Заголовки ответа Agent Runtime, которые передаются клиенту вместе с телом
+_PASSTHROUGH_HEADERS = ("content-type", "content-encoding", "content-length")
+
+
+def _passthrough_headers(response: httpx.Response) -> Dict[str, str]:
+    return {
+        name: response.headers[name] for name in _PASSTHROUGH_HEADERS if name in response.headers
+    }
+
+
+class AgentUpstream:
+    """
+    Общий пул соединений gateway -> Agent Runtime.
+
+    Один httpx.AsyncClient с keep-alive на все прокси-эндпоинты и WebSocket
+    сессии вместо нового клиента (и TCP handshake) на каждый запрос.
+    Таймаут задается на каждый запрос, лимиты пула - при создании.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: float = 30.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-Internal-Auth": api_key},
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP клиент пула (base_url и X-Internal-Auth уже заданы)"""
+        return self._client
+
+    async def proxy(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        not_found_error: Optional[str] = None,
+    ) -> Response:
+        """
+        Проксирует запрос в Agent Runtime.
+
+        Успешный ответ передается клиенту потоком байтов как есть, без
+        разбора и повторной сериализации JSON. Ошибки Agent Runtime
+        заменяются на {"error": ...} с тем же статусом, сбои соединения -
+        на 500.
+
+        Args:
+            method: HTTP метод
+            path: Путь на Agent Runtime
+            params: Query параметры
+            timeout: Таймаут запроса (по умолчанию таймаут пула)
+            not_found_error: Текст ошибки для 404 (по умолчанию общий)
+        """
+        request = self._client.build_request(
+            method, path, params=params, timeout=timeout or self.timeout
+        )
+        try:
+            response = await self._client.send(request, stream=True)
+        except Exception as e:
+            logger.error(f"Error proxying {method} {path} to Agent Runtime: {e}", exc_info=True)
+            return JSONResponse(status_code=500, content={"error": f"Gateway error: {str(e)}"})
+
+        if response.is_error:
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+            return self._error_response(response, not_found_error)
+
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers=_passthrough_headers(response),
+            background=BackgroundTask(response.aclose),
+        )
+
+    async def fetch(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[float] = None,
+        not_found_error: Optional[str] = None,
+    ) -> Response:
+        """
+        Запрос в Agent Runtime с чтением тела целиком (для кэша ответов).
+
+        Ошибки обрабатываются так же, как в proxy().
+        """
+        try:
+            response = await self._client.request(method, path, timeout=timeout or self.timeout)
+        except Exception as e:
+            logger.error(f"Error proxying {method} {path} to Agent Runtime: {e}", exc_info=True)
+            return JSONResponse(status_code=500, content={"error": f"Gateway error: {str(e)}"})
+
+        if response.is_error:
+            return self._error_response(response, not_found_error)
+        headers = _passthrough_headers(response)
+        # Тело уже распаковано httpx
+        headers.pop("content-encoding", None)
+        headers.pop("content-length", None)
+        return Response(response.content, status_code=response.status_code, headers=headers)
+
+    @staticmethod
+    def _error_response(response: httpx.Response, not_found_error: Optional[str]) -> Response:
+        if response.status_code == 404 and not_found_error:
+            return JSONResponse(status_code=404, content={"error": not_found_error})
+        logger.error(f"Agent Runtime error: {response.status_code}, {response.text}")
+        return JSONResponse(
+            status_code=response.status_code,
+            content={"error": f"Agent Runtime error: {response.status_code}"},
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,206 @@
+"""
+Кэш ответов Agent Runtime для REST эндпоинтов, которые опрашивает IDE.
+
+Ответ хранится ttl секунд (свой для каждого маршрута) вместе с ETag
+(хэш тела). Пока запись свежая, запрос обслуживается без обращения к
+Agent Runtime, а запрос с совпадающим If-None-Match получает 304 без
+тела. Одновременные промахи по одному ключу выполняют один запрос.
+
+Записи сессии (история) сбрасываются уведомлением session_changed от
+Agent Runtime (постоянный канал, после commit) и после каждого
+сообщения IDE, пересланного этим gateway. TTL ограничивает устаревание,
+если уведомление не дошло.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.core.config import logger
+from app.core.serialization import loads
+
+
+@dataclass
+class CachedResponse:
+    """Тело ответа Agent Runtime и его ETag"""
+
+    body: bytes
+    content_type: Optional[str]
+    etag: str
+    expires: float
+    session_id: Optional[str] = None
+
+
+def _etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match: список ETag через запятую или *, слабые ETag сравниваются как сильные"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    LRU кэш ответов GET запросов к Agent Runtime (ключ - путь).
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        # Загрузки в процессе; сброс удаляет загрузку, и ее результат не сохраняется
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._loading_sessions: Dict[str, str] = {}
+        # Ключи сохраненных записей сессии
+        self._session_keys: Dict[str, Set[str]] = {}
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    async def get(
+        self,
+        request: Request,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Response]],
+        session_id: Optional[str] = None,
+    ) -> Response:
+        """
+        Ответ из кэша или от Agent Runtime.
+
+        Args:
+            request: Запрос клиента (заголовок If-None-Match)
+            key: Ключ записи (путь в Agent Runtime)
+            ttl: Время жизни записи, секунды (0 - без кэша)
+            fetch: Запрос в Agent Runtime с чтением тела (AgentUpstream.fetch)
+            session_id: Сессия, изменение которой сбрасывает запись
+
+        Returns:
+            200 с ETag, 304 без тела или ошибка Agent Runtime (не кэшируется)
+        """
+        if ttl <= 0:
+            return await fetch()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            if entry is not None:
+                self._drop(key)
+            result = await self._load(key, ttl, fetch, session_id)
+            if not isinstance(result, CachedResponse):
+                return result
+            entry = result
+
+        headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self._stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        if entry.content_type:
+            headers["Content-Type"] = entry.content_type
+        return Response(entry.body, headers=headers)
+
+    async def _load(
+        self,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Response]],
+        session_id: Optional[str],
+    ) -> Union[CachedResponse, Response]:
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, ttl, fetch, session_id))
+            self._loading[key] = task
+            if session_id is not None:
+                self._loading_sessions[key] = session_id
+        # Отключение клиента не прерывает загрузку для остальных ожидающих
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Response]],
+        session_id: Optional[str],
+    ) -> Union[CachedResponse, Response]:
+        task = asyncio.current_task()
+        try:
+            response = await fetch()
+        finally:
+            # Запись сбросили во время загрузки: ответ мог устареть
+            current = self._loading.get(key) is task
+            if current:
+                del self._loading[key]
+                self._loading_sessions.pop(key, None)
+
+        if response.status_code != 200:
+            return response
+        entry = CachedResponse(
+            body=bytes(response.body),
+            content_type=response.headers.get("content-type"),
+            etag=_etag(response.body),
+            expires=time.monotonic() + ttl,
+            session_id=session_id,
+        )
+        if current:
+            self._store(key, entry)
+        return entry
+
+    def _store(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if entry.session_id is not None:
+            self._session_keys.setdefault(entry.session_id, set()).add(key)
+        while len(self._entries) > self._max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        """Удаляет запись (вытеснение LRU или истекший TTL)"""
+        entry = self._entries.pop(key)
+        if entry.session_id is not None:
+            keys = self._session_keys.get(entry.session_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._session_keys[entry.session_id]
+
+    def invalidate_session(self, session_id: str) -> None:
+        """Сбрасывает записи сессии (и их загрузки в процессе)"""
+        keys = self._session_keys.pop(session_id, set())
+        loading = [key for key, owner in self._loading_sessions.items() if owner == session_id]
+        if not keys and not loading:
+            return
+        self._stats["invalidations"] += 1
+        for key in keys:
+            self._entries.pop(key, None)
+        for key in loading:
+            del self._loading_sessions[key]
+            self._loading.pop(key, None)
+
+    def handle_notification(self, payload: str) -> None:
+        """Уведомление Agent Runtime из постоянного канала"""
+        message = loads(payload)
+        if message.get("type") == "session_changed":
+            logger.debug(f"[{message['session_id']}] Session changed, dropping cached responses")
+            self.invalidate_session(message["session_id"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "loading": len(self._loading),
+            "sessions": len(self._session_keys),
+            **self._stats,
+        }
@@ -1,24 +1,29 @@
-import asyncio
 from typing import Dict, Optional
 
 from fastapi import WebSocket
 
 
 class SessionManager:
-    """Управляет активными WebSocket-сессиями: хранит, отдаёт, удаляет."""
+    """
+    Управляет активными WebSocket-сессиями: хранит, отдаёт, удаляет.
+
+    Все обращения идут из event loop gateway, а операции со словарем не
+    содержат await, поэтому выполняются атомарно и без блокировки.
+    """
 
     def __init__(self):
         self._active_websockets: Dict[str, WebSocket] = {}
-        self._lock = asyncio.Lock()
 
-    async def add(self, session_id: str, websocket: WebSocket):
-        async with self._lock:
-            self._active_websockets[session_id] = websocket
+    def add(self, session_id: str, websocket: WebSocket):
+        self._active_websockets[session_id] = websocket
 
-    async def get(self, session_id: str) -> Optional[WebSocket]:
-        async with self._lock:
-            return self._active_websockets.get(session_id)
+    def get(self, session_id: str) -> Optional[WebSocket]:
+        return self._active_websockets.get(session_id)
 
-    async def remove(self, session_id: str):
-        async with self._lock:
+    def remove(self, session_id: str, websocket: Optional[WebSocket] = None):
+        """Удаляет сессию; с websocket - только если сессия не перешла к новому соединению"""
+        if websocket is None or self._active_websockets.get(session_id) is websocket:
             self._active_websockets.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._active_websockets)
@@ -0,0 +1,235 @@
+"""
+Реестр WebSocket сессий IDE для нескольких реплик gateway.
+
+SessionRegistry хранит сессии своего узла: повторное подключение той же
+сессии вытесняет прежнее соединение (закрытие с кодом 4409).
+
+RedisSessionRegistry дополнительно хранит в Redis аренду сессии
+(session -> node_id с TTL, продлевается, пока сокет открыт) и
+подписывается на канал своего узла. Подключение к сессии, открытой на
+другом узле, вытесняет ее там. Nginx направляет сессию на один узел
+(consistent hash по session_id), поэтому вытеснение через Redis нужно
+только при изменении состава реплик.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import logger
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None  # ty:ignore[invalid-assignment, unused-ignore-comment]
+
+# Продление аренды: 0 - сессию уже открыли на другом узле
+_RENEW_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if owner == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(eq=False)
+class SessionHandle:
+    """Соединение IDE на этом узле"""
+
+    # Закрывает соединение, когда сессию открыли в другом месте
+    evict: Callable[[], Awaitable[None]]
+
+
+class SessionRegistry:
+    """
+    Реестр сессий одного узла (бэкенд memory).
+    """
+
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+        self._local: Dict[str, SessionHandle] = {}
+        self._stats = {"evicted": 0}
+
+    async def start(self) -> None:
+        """Запуск фоновых задач бэкенда"""
+
+    async def close(self) -> None:
+        """Остановка фоновых задач и освобождение сессий узла"""
+
+    async def register(self, session_id: str, handle: SessionHandle) -> None:
+        """Регистрирует соединение сессии, вытесняя прежнее"""
+        previous = self._local.get(session_id)
+        self._local[session_id] = handle
+        if previous is not None:
+            await self._evict(session_id, previous)
+
+    async def unregister(self, session_id: str, handle: SessionHandle) -> None:
+        """Снимает соединение с учета, если его не вытеснили"""
+        if self._local.get(session_id) is handle:
+            del self._local[session_id]
+
+    async def locate(self, session_id: str) -> Optional[str]:
+        """Узел, на котором открыта сессия"""
+        return self.node_id if session_id in self._local else None
+
+    async def _evict(self, session_id: str, handle: SessionHandle) -> None:
+        self._stats["evicted"] += 1
+        logger.info(f"[{session_id}] Session opened on another connection, closing previous one")
+        try:
+            await handle.evict()
+        except Exception as e:
+            logger.warning(f"[{session_id}] Failed to close previous connection: {e}")
+
+    async def _evict_local(self, session_id: str) -> None:
+        """Вытесняет соединение узла по запросу другого узла"""
+        handle = self._local.pop(session_id, None)
+        if handle is not None:
+            await self._evict(session_id, handle)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "node_id": self.node_id,
+            "local_sessions": len(self._local),
+            **self._stats,
+        }
+
+
+class RedisSessionRegistry(SessionRegistry):
+    """
+    Реестр сессий в Redis (бэкенд redis): аренда сессий узлами и pub/sub
+    вытеснение между узлами.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        url: str = "redis://localhost:6379/2",
+        lease_ttl: float = 30.0,
+        prefix: str = "gateway:",
+        client: Optional[Any] = None,
+    ):
+        super().__init__(node_id)
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError(
+                    "GATEWAY__SESSION_REGISTRY=redis requires the redis package "
+                    "(pip install 'codelab-gateway[redis]')"
+                )
+            client = aioredis.from_url(url, decode_responses=True)
+        self._redis = client
+        self._lease_ms = int(lease_ttl * 1000)
+        self._prefix = prefix
+        self._tasks: list = []
+
+    def _session_key(self, session_id: str) -> str:
+        return f"{self._prefix}session:{session_id}"
+
+    def _node_channel(self, node_id: str) -> str:
+        return f"{self._prefix}node:{node_id}"
+
+    async def start(self) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._node_channel(self.node_id))
+        self._tasks = [
+            asyncio.create_task(self._listen(pubsub)),
+            asyncio.create_task(self._renew_leases()),
+        ]
+        logger.info(f"Session registry: redis, node_id={self.node_id}")
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for session_id in list(self._local):
+            await self._release(session_id)
+        self._local.clear()
+        await self._redis.aclose()
+
+    async def register(self, session_id: str, handle: SessionHandle) -> None:
+        await super().register(session_id, handle)
+        owner = await self._redis.set(
+            self._session_key(session_id), self.node_id, px=self._lease_ms, get=True
+        )
+        if owner is not None and owner != self.node_id:
+            # Сессия была открыта на другом узле (переподключение после смены реплик)
+            await self._publish(owner, {"type": "evict", "session_id": session_id})
+
+    async def unregister(self, session_id: str, handle: SessionHandle) -> None:
+        if self._local.get(session_id) is handle:
+            del self._local[session_id]
+            await self._release(session_id)
+
+    async def _release(self, session_id: str) -> None:
+        try:
+            await self._redis.eval(
+                _RELEASE_SCRIPT, 1, self._session_key(session_id), self.node_id
+            )
+        except Exception as e:
+            # Аренда истечет сама
+            logger.warning(f"[{session_id}] Failed to release session lease: {e}")
+
+    async def locate(self, session_id: str) -> Optional[str]:
+        if session_id in self._local:
+            return self.node_id
+        return await self._redis.get(self._session_key(session_id))
+
+    async def _publish(self, node_id: str, message: Dict[str, Any]) -> int:
+        return await self._redis.publish(self._node_channel(node_id), json.dumps(message))
+
+    async def _listen(self, pubsub) -> None:
+        """Сообщения для сессий этого узла от других узлов"""
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    data = json.loads(message["data"])
+                    session_id = data["session_id"]
+                    if data["type"] == "evict":
+                        await self._evict_local(session_id)
+                except Exception as e:
+                    logger.warning(f"Invalid session registry message {message!r}: {e}")
+        finally:
+            await pubsub.aclose()
+
+    async def _renew_leases(self) -> None:
+        """Продлевает аренду сессий узла, пока их сокеты открыты"""
+        while True:
+            await asyncio.sleep(self._lease_ms / 3000)
+            if not self._local:
+                continue
+            session_ids = list(self._local)
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for session_id in session_ids:
+                    pipe.eval(
+                        _RENEW_SCRIPT,
+                        1,
+                        self._session_key(session_id),
+                        self.node_id,
+                        self._lease_ms,
+                    )
+                renewed = await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to renew session leases: {e}")
+                continue
+            for session_id, ok in zip(session_ids, renewed, strict=True):
+                if not ok:
+                    await self._evict_local(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "backend": "redis"}
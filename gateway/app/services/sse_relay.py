@@ -0,0 +1,46 @@
+"""
+Пересылка кадров SSE Agent Runtime в WebSocket без разбора JSON.
+
+Agent Runtime отдает компактный JSON без null полей, поэтому payload
+строки `data:` уже готов для IDE и пересылается текстовым кадром как
+есть. Тип события нужен gateway только для логов и определяется
+поиском по строке, без json.loads.
+"""
+
+from typing import Optional
+
+# Agent Runtime сериализует поле type первым и без пробелов
+_COMPACT_PREFIX = '{"type":"'
+_TYPE_KEY = '"type"'
+
+
+def peek_type(payload: str) -> Optional[str]:
+    """
+    Тип события из JSON payload без его разбора.
+
+    Args:
+        payload: JSON объект из строки `data:`
+
+    Returns:
+        Значение поля type или None, если поле не найдено
+    """
+    if payload.startswith(_COMPACT_PREFIX):
+        start = len(_COMPACT_PREFIX)
+    else:
+        # Общий случай: ключ type не первым или JSON с пробелами
+        key = payload.find(_TYPE_KEY)
+        if key < 0:
+            return None
+        colon = payload.find(":", key + len(_TYPE_KEY))
+        if colon < 0:
+            return None
+        start = colon + 1
+        while start < len(payload) and payload[start] in " \t":
+            start += 1
+        if not payload.startswith('"', start):
+            return None
+        start += 1
+    end = payload.find('"', start)
+    if end < 0:
+        return None
+    return payload[start:end]
@@ -26,6 +26,7 @@ async def stream_agent_single(
             json=agent_req.model_dump(),
             headers={
                 "X-Internal-Auth": AppConfig.INTERNAL_API_KEY,
+                "X-Request-Timeout": str(AppConfig.REQUEST_TIMEOUT),
             },
             timeout=AppConfig.REQUEST_TIMEOUT,
         )
@@ -1,23 +1,190 @@
+"""
+Буферы кадров для переподключения IDE без повторной генерации ответа.
+
+IDE, подключившаяся с ?resume=1, получает кадры с полем seq. Кадры
+записываются в кольцевой буфер сессии (bytearray ограниченного размера,
+старые кадры вытесняются). После обрыва соединения ответ Agent
+продолжает записываться в буфер, а IDE переподключается с
+?last_seq=N и получает только пропущенные кадры, затем живой стрим.
+Буферы без соединения удаляются через TTL.
+"""
+
 import asyncio
-from typing import Dict, List
+import time
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.services.ws_outbound import OutboundQueue
+
+
+def _with_seq(frame: str, seq: int) -> str:
+    """Добавляет seq последним полем JSON объекта (тип остается первым для peek_type)"""
+    if frame == "{}":
+        return '{"seq":%d}' % seq
+    return '%s,"seq":%d}' % (frame[:-1], seq)
+
+
+class ReplayBuffer:
+    """
+    Кольцевой буфер кадров одной сессии с номерами seq.
+
+    Кадры хранятся в UTF-8 в одном bytearray не больше capacity байт,
+    индекс - (seq, смещение, длина). Буфер также является приемником
+    кадров relay: кадр получает seq, записывается и передается
+    подключенной очереди IDE, если она есть.
+    """
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        # Растет до capacity, дальше запись идет по кругу
+        self._data = bytearray()
+        self._index: Deque[Tuple[int, int, int]] = deque()
+        # Абсолютные смещения: начало самого старого кадра и позиция записи
+        self._start = 0
+        self._write = 0
+        self.last_seq = 0
+        self._outbound: Optional["OutboundQueue"] = None
+        # Стрим ответа, продолжающийся после отключения IDE
+        self.task: Optional[asyncio.Task] = None
+        self.touched = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return self._write - self._start
+
+    def append(self, frame: str) -> str:
+        """Записывает кадр и возвращает его с полем seq"""
+        self.last_seq += 1
+        frame = _with_seq(frame, self.last_seq)
+        data = frame.encode("utf-8")
+        n = len(data)
+        if n > self._capacity:
+            # Кадр не помещается: предыдущие кадры уже нельзя повторить подряд
+            self._index.clear()
+            self._start = self._write
+            return frame
+        while self._write + n - self._start > self._capacity:
+            self._index.popleft()
+            self._start = self._index[0][1] if self._index else self._write
+
+        pos = self._write % self._capacity
+        first = min(n, self._capacity - pos)
+        if pos == len(self._data):
+            self._data += data[:first]
+        else:
+            self._data[pos:pos + first] = data[:first]
+        if first < n:
+            self._data[:n - first] = data[first:]
+        self._index.append((self.last_seq, self._write, n))
+        self._write += n
+        return frame
+
+    def _read(self, start: int, n: int) -> str:
+        pos = start % self._capacity
+        if pos + n <= self._capacity:
+            return self._data[pos:pos + n].decode("utf-8")
+        head = self._data[pos:]
+        return (head + self._data[:n - len(head)]).decode("utf-8")
+
+    def since(self, last_seq: int) -> Optional[List[str]]:
+        """
+        Кадры после last_seq.
+
+        Returns:
+            Список кадров или None, если часть из них уже вытеснена
+            (или буфер создан заново и не знает last_seq)
+        """
+        if last_seq == self.last_seq:
+            return []
+        if last_seq > self.last_seq:
+            return None
+        if not self._index or self._index[0][0] > last_seq + 1:
+            return None
+        skip = last_seq + 1 - self._index[0][0]
+        return [self._read(start, n) for _seq, start, n in islice(self._index, skip, None)]
+
+    def attach(self, outbound: "OutboundQueue", last_seq: Optional[int] = None) -> bool:
+        """
+        Подключает очередь IDE и ставит в нее пропущенные кадры.
+
+        Returns:
+            False, если пропущенные кадры уже вытеснены из буфера
+        """
+        resumed = True
+        if last_seq is not None:
+            missed = self.since(last_seq)
+            if missed is None:
+                resumed = False
+            else:
+                for frame in missed:
+                    outbound.enqueue(frame)
+        self._outbound = outbound
+        self.touched = time.monotonic()
+        return resumed
+
+    def detach(self, outbound: "OutboundQueue") -> None:
+        """Отключает очередь IDE, если она еще подключена"""
+        if self._outbound is outbound:
+            self._outbound = None
+        self.touched = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        """Нет подключенной IDE и продолжающегося ответа"""
+        return self._outbound is None and (self.task is None or self.task.done())
+
+    async def put(self, frame: str) -> None:
+        """Записывает кадр relay и отправляет его подключенной IDE"""
+        frame = self.append(frame)
+        self.touched = time.monotonic()
+        if self._outbound is not None:
+            await self._outbound.put(frame)
+
 
 class TokenBufferManager:
     """
-    Асинхронный менеджер для хранения и управления token_buffers (session_id -> List[str]).
-    Безопасен для многопоточности.
+    Хранит буферы переподключения сессий (session_id -> ReplayBuffer).
+
+    Буфер без соединения и продолжающегося ответа удаляется, если не
+    использовался ttl секунд. Методы вызываются только из event loop и не
+    содержат await, поэтому словарь не требует блокировки.
     """
-    def __init__(self):
-        self._buffers: Dict[str, List[str]] = {}
-        self._lock = asyncio.Lock()
 
-    async def get(self, session_id: str) -> List[str]:
-        async with self._lock:
-            return self._buffers.setdefault(session_id, [])
+    def __init__(self, capacity: int = 262144, ttl: float = 300.0):
+        self._buffers: Dict[str, ReplayBuffer] = {}
+        self._capacity = capacity
+        self._ttl = ttl
+        self._last_sweep = time.monotonic()
+
+    def _expire(self, now: float) -> None:
+        # Проверка не чаще раза в четверть TTL
+        if now - self._last_sweep < self._ttl / 4:
+            return
+        self._last_sweep = now
+        expired = [
+            session_id
+            for session_id, buffer in self._buffers.items()
+            if buffer.idle and now - buffer.touched > self._ttl
+        ]
+        for session_id in expired:
+            del self._buffers[session_id]
+
+    def get(self, session_id: str) -> ReplayBuffer:
+        """Буфер сессии, новый - если его нет или он истек"""
+        now = time.monotonic()
+        self._expire(now)
+        buffer = self._buffers.get(session_id)
+        if buffer is None or (buffer.idle and now - buffer.touched > self._ttl):
+            buffer = self._buffers[session_id] = ReplayBuffer(self._capacity)
+        return buffer
 
-    async def remove(self, session_id: str):
-        async with self._lock:
-            self._buffers.pop(session_id, None)
+    def remove(self, session_id: str):
+        """Удаляет буфер, если к нему не подключена IDE и ответ не продолжается"""
+        buffer = self._buffers.get(session_id)
+        if buffer is not None and buffer.idle:
+            del self._buffers[session_id]
 
-    async def set(self, session_id: str, buffer: List[str]):
-        async with self._lock:
-            self._buffers[session_id] = buffer
+    def __len__(self) -> int:
+        return len(self._buffers)
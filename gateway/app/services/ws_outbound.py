@@ -0,0 +1,253 @@
+"""
+Исходящая очередь WebSocket соединения IDE с учетом backpressure.
+
+Кадры Agent Runtime не отправляются в WebSocket inline: relay кладет их в
+очередь соединения, отдельная задача отправляет их IDE. Медленная IDE не
+останавливает чтение стрима Agent, пока очередь меньше лимита.
+
+Политика при отставании IDE:
+- токены assistant_message объединяются с последним кадром в очереди;
+- heartbeat кадры отбрасываются, если очередь не пуста;
+- сверх лимита байт relay ждет освобождения очереди, а если IDE не
+  разгружает ее SLOW_CONSUMER_TIMEOUT секунд, соединение закрывается.
+
+Общий лимит OutboundBudget ограничивает память очередей всех
+соединений: при его превышении каждое соединение ждет опустошения своей
+очереди.
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Protocol, Set
+
+from fastapi import WebSocket
+
+from app.core.config import logger
+from app.core.serialization import dumps, loads
+from app.services.sse_relay import peek_type
+
+# Кадры, которые можно не отправлять отстающей IDE
+_DROPPABLE_TYPES = frozenset({"heartbeat", "ping"})
+_TOKEN_TYPE = "assistant_message"
+_TOKEN_FIELDS = frozenset({"type", "token", "is_final", "seq"})
+
+
+class SlowConsumerError(Exception):
+    """IDE не разгружает исходящую очередь, соединение закрывается"""
+
+
+class FrameSink(Protocol):
+    """Приемник кадров relay: OutboundQueue или буфер переподключения"""
+
+    async def put(self, frame: str) -> None: ...
+
+
+class OutboundBudget:
+    """
+    Общий лимит памяти исходящих очередей gateway и их метрики.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.buffered_bytes = 0
+        self._queues: Set["OutboundQueue"] = set()
+        self._stats = {
+            "frames_sent": 0,
+            "frames_coalesced": 0,
+            "frames_dropped": 0,
+            "slow_consumers_closed": 0,
+        }
+
+    @property
+    def exhausted(self) -> bool:
+        return self.buffered_bytes > self.max_bytes
+
+    def register(self, queue: "OutboundQueue") -> None:
+        self._queues.add(queue)
+
+    def unregister(self, queue: "OutboundQueue") -> None:
+        self._queues.discard(queue)
+
+    def count(self, name: str) -> None:
+        self._stats[name] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Общие метрики и глубина очереди каждого соединения"""
+        return {
+            "connections": len(self._queues),
+            "buffered_bytes": self.buffered_bytes,
+            "max_bytes": self.max_bytes,
+            **self._stats,
+            "queues": sorted(
+                (queue.get_stats() for queue in self._queues),
+                key=lambda stats: stats["bytes"],
+                reverse=True,
+            ),
+        }
+
+
+class OutboundQueue:
+    """
+    Очередь кадров одного WebSocket соединения с ограничением размера.
+
+    Размер кадра считается в символах JSON payload.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        budget: OutboundBudget,
+        session_id: str,
+        max_bytes: int,
+        slow_consumer_timeout: float,
+    ):
+        self._websocket = websocket
+        self._budget = budget
+        self.session_id = session_id
+        self._max_bytes = max_bytes
+        self._slow_consumer_timeout = slow_consumer_timeout
+        self._frames: Deque[str] = deque()
+        # Разобранный последний кадр очереди, если к нему присоединялись токены
+        self._tail_token: Optional[Dict[str, Any]] = None
+        self._bytes = 0
+        self._peak_bytes = 0
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._closed = False
+        budget.register(self)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "depth": len(self._frames),
+            "bytes": self._bytes,
+            "peak_bytes": self._peak_bytes,
+        }
+
+    def _over_limit(self) -> bool:
+        if self._bytes > self._max_bytes:
+            return True
+        # При общем превышении соединение ждет опустошения своей очереди
+        return self._budget.exhausted and self._bytes > 0
+
+    def _resize(self, delta: int) -> None:
+        self._bytes += delta
+        self._budget.buffered_bytes += delta
+        if self._bytes > self._peak_bytes:
+            self._peak_bytes = self._bytes
+
+    def _coalesce(self, frame: str) -> bool:
+        """
+        Присоединяет токен к последнему кадру очереди, если оба - простые токены.
+
+        Кадры в очереди еще не отправляются (writer забирает кадр до
+        отправки), поэтому последний кадр можно заменить. JSON разбирается
+        только здесь, когда IDE отстает.
+        """
+        token = _parse_token(frame)
+        if token is None:
+            return False
+        tail = self._frames[-1]
+        if self._tail_token is None:
+            self._tail_token = _parse_token(tail)
+            if self._tail_token is None:
+                return False
+        self._tail_token["token"] += token["token"]
+        if "seq" in token:
+            # Объединенный кадр содержит оба токена
+            self._tail_token["seq"] = token["seq"]
+        merged = dumps(self._tail_token)
+        self._frames[-1] = merged
+        self._resize(len(merged) - len(tail))
+        self._budget.count("frames_coalesced")
+        return True
+
+    def enqueue(self, frame: str) -> None:
+        """Ставит кадр в очередь без ожидания места"""
+        if self._closed:
+            raise SlowConsumerError(f"Outbound queue of {self.session_id} is closed")
+        if self._frames:
+            # Очередь не пуста: IDE отстает
+            if peek_type(frame) in _DROPPABLE_TYPES:
+                self._budget.count("frames_dropped")
+                return
+            if self._coalesce(frame):
+                return
+
+        self._frames.append(frame)
+        self._tail_token = None
+        self._resize(len(frame))
+        self._ready.set()
+
+    async def put(self, frame: str) -> None:
+        """
+        Ставит кадр в очередь на отправку IDE.
+
+        Raises:
+            SlowConsumerError: IDE не разгрузила очередь за отведенное время
+        """
+        self.enqueue(frame)
+        await self._wait_for_space()
+
+    async def _wait_for_space(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._slow_consumer_timeout
+        while self._over_limit():
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                pending = self._bytes
+                self._budget.count("slow_consumers_closed")
+                logger.warning(
+                    f"[{self.session_id}] Slow consumer: {pending} bytes not sent "
+                    f"in {self._slow_consumer_timeout}s, closing connection"
+                )
+                self.close()
+                raise SlowConsumerError(f"IDE is not reading, {pending} bytes pending") from None
+
+    async def run(self) -> None:
+        """Отправляет кадры очереди IDE по порядку"""
+        while True:
+            await self._ready.wait()
+            if not self._frames:
+                self._ready.clear()
+                continue
+            frame = self._frames.popleft()
+            if not self._frames:
+                self._tail_token = None
+            await self._websocket.send_text(frame)
+            if self._closed:
+                return
+            self._resize(-len(frame))
+            self._budget.count("frames_sent")
+            self._drained.set()
+
+    def close(self) -> None:
+        """Освобождает кадры очереди и снимает ее с учета"""
+        if self._closed:
+            return
+        self._closed = True
+        self._resize(-self._bytes)
+        self._frames.clear()
+        self._tail_token = None
+        self._drained.set()
+        self._budget.unregister(self)
+
+
+def _parse_token(frame: str) -> Optional[Dict[str, Any]]:
+    """Простой токен {"type":"assistant_message","token":...,"is_final":false} или None"""
+    if peek_type(frame) != _TOKEN_TYPE:
+        return None
+    try:
+        data = loads(frame)
+    except json.JSONDecodeError:
+        return None
+    if (
+        data.keys() - _TOKEN_FIELDS
+        or data.get("is_final")
+        or not isinstance(data.get("token"), str)
+    ):
+        return None
+    return data
@@ -0,0 +1,238 @@
+"""
+Тесты постоянного канала gateway -> Agent Runtime.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import get_agent_channel, get_agent_upstream
+from app.services.agent_channel import AgentChannel, AgentChannelError, AgentChannelUnavailable
+from app.services.agent_upstream import AgentUpstream
+
+
+class FakeConnection:
+    """Соединение канала: отвечает на запрос кадрами из reply(request)"""
+
+    def __init__(self, reply=None):
+        self.sent = []
+        self.closed = False
+        self._reply = reply
+        self._incoming: asyncio.Queue = asyncio.Queue()
+
+    def push(self, frame):
+        self._incoming.put_nowait(frame)
+
+    async def send(self, text):
+        self.sent.append(json.loads(text))
+        if self._reply is not None:
+            for frame in self._reply(self.sent[-1]):
+                self.push(frame)
+
+    async def close(self):
+        self.closed = True
+        self.push(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self._incoming.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+
+def _channel(connection=None, error=None) -> AgentChannel:
+    async def connect(url, headers):
+        assert headers == {"X-Internal-Auth": "secret"}
+        if error is not None:
+            raise error
+        return connection
+
+    return AgentChannel("ws://agent-runtime/agent/channel", "secret", connect=connect)
+
+
+def _echo(request):
+    session_id = request["session_id"]
+    content = request["message"]["content"]
+    return [
+        f'{session_id}\n{{"type":"assistant_message","token":"{content}","is_final":false}}',
+        f"{session_id}\n[DONE]",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_streams_are_demultiplexed_by_session():
+    connection = FakeConnection()
+    channel = _channel(connection)
+
+    async def collect(session_id):
+        return [p async for p in channel.stream(session_id, {"type": "user_message"}, timeout=5)]
+
+    first = asyncio.create_task(collect("s1"))
+    second = asyncio.create_task(collect("s2"))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    for frame in ("s2\n{\"n\":1}", "s1\n{\"n\":2}", "s2\n[DONE]", "s1\n{\"n\":3}", "s1\n[DONE]"):
+        connection.push(frame)
+
+    assert await first == ['{"n":2}', '{"n":3}']
+    assert await second == ['{"n":1}']
+    assert connection.sent[0] == {
+        "session_id": "s1", "message": {"type": "user_message"}, "timeout": 5
+    }
+    await channel.close()
+
+
+@pytest.mark.asyncio
+async def test_connection_loss_fails_active_stream():
+    connection = FakeConnection()
+    channel = _channel(connection)
+
+    async def collect():
+        return [p async for p in channel.stream("s1", {"type": "user_message"})]
+
+    task = asyncio.create_task(collect())
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    connection.push("s1\n{}")
+    connection.push(None)
+
+    with pytest.raises(AgentChannelError):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_sends_cancel():
+    connection = FakeConnection()
+    channel = _channel(connection)
+
+    stream = channel.stream("s1", {"type": "user_message"})
+    connection.push("s1\n{\"n\":1}")
+    assert await stream.__anext__() == '{"n":1}'
+    await stream.aclose()
+
+    assert connection.sent[-1] == {"session_id": "s1", "type": "cancel"}
+    await channel.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_stream_is_cancelled_without_blocking_others():
+    connection = FakeConnection()
+
+    async def connect(url, headers):
+        return connection
+
+    channel = AgentChannel(
+        "ws://agent-runtime/agent/channel", "secret", queue_size=2, connect=connect
+    )
+    slow = channel.stream("s1", {"type": "user_message"})
+    first = asyncio.create_task(slow.__anext__())
+    connection.push("s1\n{\"n\":1}")
+    assert await first == '{"n":1}'
+
+    # s1 не читается: его очередь переполняется, а s2 получает свои кадры
+    fast = asyncio.create_task(_collect(channel, "s2"))
+    await asyncio.sleep(0)
+    for n in range(2, 6):
+        connection.push(f"s1\n{{\"n\":{n}}}")
+    connection.push("s2\n{\"n\":1}")
+    connection.push("s2\n[DONE]")
+
+    assert await fast == ['{"n":1}']
+    with pytest.raises(AgentChannelError):
+        await slow.__anext__()
+    assert {"session_id": "s1", "type": "cancel"} in connection.sent
+    await channel.close()
+
+
+async def _collect(channel, session_id):
+    return [p async for p in channel.stream(session_id, {"type": "user_message"})]
+
+
+@pytest.mark.asyncio
+async def test_unavailable_channel_is_not_retried_immediately():
+    attempts = []
+
+    async def connect(url, headers):
+        attempts.append(url)
+        raise OSError("connection refused")
+
+    channel = AgentChannel("ws://agent-runtime/agent/channel", "secret", connect=connect)
+
+    for _ in range(2):
+        with pytest.raises(AgentChannelUnavailable):
+            async for _payload in channel.stream("s1", {"type": "user_message"}):
+                pass
+
+    assert len(attempts) == 1
+
+
+async def _connect_echo():
+    return FakeConnection(reply=_echo)
+
+
+def _client(channel, sse_body=b"") -> TestClient:
+    upstream = AgentUpstream(
+        base_url="http://agent-runtime",
+        api_key="secret",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, stream=httpx.ByteStream(sse_body))
+        ),
+    )
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_agent_upstream] = lambda: upstream
+    app.dependency_overrides[get_agent_channel] = lambda: channel
+    return TestClient(app)
+
+
+def test_websocket_relays_through_channel():
+    channel = AgentChannel(
+        "ws://agent-runtime/agent/channel", "secret", connect=lambda url, headers: _connect_echo()
+    )
+
+    with _client(channel).websocket_connect("/ws/s1") as ws:
+        ws.send_text('{"type": "user_message", "content": "Hi", "role": "user"}')
+        assert ws.receive_text() == '{"type":"assistant_message","token":"Hi","is_final":false}'
+
+
+def test_websocket_falls_back_to_http_when_channel_unavailable():
+    channel = _channel(error=OSError("connection refused"))
+    sse_body = b'data: {"type":"assistant_message","token":"via http","is_final":false}\n\n'
+
+    with _client(channel, sse_body).websocket_connect("/ws/s1") as ws:
+        ws.send_text('{"type": "user_message", "content": "Hi", "role": "user"}')
+        assert ws.receive_json()["token"] == "via http"
+
+
+@pytest.mark.asyncio
+async def test_notifications_are_passed_to_on_control():
+    connection = FakeConnection(reply=lambda request: [
+        '\n{"type":"session_changed","session_id":"s1"}',
+        "s1\n[DONE]",
+    ])
+    notifications = []
+
+    async def connect(url, headers):
+        assert headers["X-Session-Changes"] == "1"
+        return connection
+
+    channel = AgentChannel(
+        "ws://agent-runtime/agent/channel",
+        "secret",
+        connect=connect,
+        on_control=notifications.append,
+    )
+    await channel.connect()
+    chunks = [chunk async for chunk in channel.stream("s1", {"type": "user_message"})]
+
+    assert chunks == []
+    assert notifications == ['{"type":"session_changed","session_id":"s1"}']
+    await channel.close()
@@ -0,0 +1,128 @@
+"""
+Тесты буфера переподключения: кольцевое хранение кадров, продолжение
+стрима по last_seq и истечение TTL.
+"""
+
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from app.services.token_buffer_manager import ReplayBuffer, TokenBufferManager
+from tests.test_ws_session import USER_MESSAGE, _client, _frame
+
+
+def _token(n: int) -> str:
+    return '{"type":"assistant_message","token":"т%d","is_final":false}' % n
+
+
+def test_frames_get_seq_and_are_replayed_after_last_seq():
+    buffer = ReplayBuffer(capacity=1024)
+    sent = [buffer.append(_token(n)) for n in range(3)]
+
+    assert json.loads(sent[0]) == {
+        "type": "assistant_message", "token": "т0", "is_final": False, "seq": 1
+    }
+    assert buffer.since(1) == sent[1:]
+    assert buffer.since(3) == []
+
+
+def test_ring_evicts_oldest_frames_and_wraps_around():
+    frame_size = len(_token(0).encode()) + len(',"seq":1')
+    buffer = ReplayBuffer(capacity=frame_size * 3 + 5)
+    sent = [buffer.append(_token(n)) for n in range(10)]
+
+    assert buffer.size <= frame_size * 3 + 5
+    # Кадры 8-10 пересекают конец bytearray и читаются целиком
+    assert buffer.since(7) == sent[7:]
+    assert buffer.since(6) is None
+
+
+def test_frame_larger_than_buffer_invalidates_replay():
+    buffer = ReplayBuffer(capacity=64)
+    buffer.append(_token(1))
+    buffer.append('{"type":"tool_call","arguments":"%s"}' % ("x" * 100))
+
+    assert buffer.since(1) is None
+    assert buffer.since(2) == []
+
+
+@pytest.mark.asyncio
+async def test_idle_buffers_expire(monkeypatch):
+    manager = TokenBufferManager(capacity=1024, ttl=10)
+    buffer = manager.get("s1")
+    buffer.append(_token(1))
+    assert manager.get("s1") is buffer
+
+    now = buffer.touched + 11
+    monkeypatch.setattr("app.services.token_buffer_manager.time.monotonic", lambda: now)
+
+    assert manager.get("s1") is not buffer
+    assert len(manager) == 1
+
+
+def test_remove_keeps_buffer_attached_to_new_connection():
+    manager = TokenBufferManager(capacity=1024, ttl=10)
+    buffer = manager.get("s1")
+    buffer.attach(object())
+
+    # Закрытие вытесненного соединения не удаляет буфер нового
+    manager.remove("s1")
+    assert manager.get("s1") is buffer
+
+    buffer.detach(buffer._outbound)
+    manager.remove("s1")
+    assert len(manager) == 0
+
+
+class PausingStream(httpx.AsyncByteStream):
+    """SSE ответ: первый кадр, пауза до release, затем остальные кадры"""
+
+    def __init__(self, release: threading.Event):
+        self.release = release
+
+    async def __aiter__(self):
+        yield _frame("one")
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        yield _frame("two") + _frame("three")
+
+
+def test_reconnect_with_last_seq_receives_rest_of_response():
+    release = threading.Event()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, stream=PausingStream(release))
+
+    with _client(handler) as client:
+        with client.websocket_connect("/ws/s1?resume=1") as ws:
+            ws.send_text(USER_MESSAGE % "long answer")
+            assert ws.receive_json() == {
+                "type": "assistant_message", "token": "one", "is_final": False, "seq": 1
+            }
+
+        # Ответ продолжается без IDE и записывается в буфер
+        release.set()
+        with client.websocket_connect("/ws/s1?last_seq=1") as ws:
+            tokens = []
+            while not tokens or tokens[-1]["seq"] < 3:
+                tokens.append(ws.receive_json())
+
+    assert "".join(frame["token"] for frame in tokens) == "twothree"
+    assert len(requests) == 1
+
+
+def test_reconnect_after_frames_expired_reports_resume_failed():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=httpx.ByteStream(_frame("one")))
+
+    with _client(handler) as client:
+        with client.websocket_connect("/ws/s1?last_seq=5") as ws:
+            failed = ws.receive_json()
+
+    assert failed["type"] == "resume_failed"
+    assert failed["last_seq"] == 5
@@ -0,0 +1,155 @@
+"""
+Тесты кэша ответов REST прокси: ETag и 304 без запроса в Agent Runtime,
+сброс истории сессии уведомлением и сообщением IDE, некэшируемые ошибки.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import get_agent_channel, get_agent_upstream, get_response_cache
+from app.services.agent_upstream import AgentUpstream
+from app.services.response_cache import ResponseCache
+from tests.test_ws_session import USER_MESSAGE, _frame
+
+
+def _client(handler, cache: ResponseCache) -> TestClient:
+    upstream = AgentUpstream(
+        base_url="http://agent-runtime",
+        api_key="secret",
+        transport=httpx.MockTransport(handler),
+    )
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_agent_upstream] = lambda: upstream
+    app.dependency_overrides[get_agent_channel] = lambda: None
+    app.dependency_overrides[get_response_cache] = lambda: cache
+    return TestClient(app)
+
+
+def test_unchanged_response_is_304_without_upstream_call():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"agents": ["coder"]})
+
+    cache = ResponseCache()
+    with _client(handler, cache) as client:
+        first = client.get("/agents")
+        etag = first.headers["etag"]
+        second = client.get("/agents", headers={"If-None-Match": etag})
+        third = client.get("/agents", headers={"If-None-Match": '"other"'})
+
+    assert first.json() == {"agents": ["coder"]}
+    assert first.headers["content-type"] == "application/json"
+    assert second.status_code == 304
+    assert second.content == b""
+    assert third.status_code == 200
+    assert third.headers["etag"] == etag
+    assert len(requests) == 1
+    assert cache.get_stats()["not_modified"] == 1
+
+
+def test_history_is_dropped_on_session_changed_and_after_relayed_message():
+    history = {"messages": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/agent/message/stream":
+            history["messages"].append(json.loads(request.content)["message"]["content"])
+            return httpx.Response(200, content=_frame("ok"))
+        return httpx.Response(200, json=history)
+
+    cache = ResponseCache()
+    with _client(handler, cache) as client:
+        etag = client.get("/sessions/s1/history").headers["etag"]
+        history["messages"].append("changed in agent-runtime")
+        cached = client.get("/sessions/s1/history", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+        cache.handle_notification('{"type":"session_changed","session_id":"s1"}')
+        changed = client.get("/sessions/s1/history", headers={"If-None-Match": etag})
+        assert changed.json()["messages"] == ["changed in agent-runtime"]
+
+        with client.websocket_connect("/ws/s1") as ws:
+            ws.send_text(USER_MESSAGE % "hello")
+            ws.receive_json()
+        # Пересланное сообщение IDE сбрасывает запись после стрима
+        assert client.get("/sessions/s1/history").json()["messages"][-1] == "hello"
+
+    assert cache.get_stats()["invalidations"] == 2
+
+
+def test_upstream_errors_are_not_cached():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(404, json={"detail": "Session s1 not found"})
+
+    cache = ResponseCache()
+    with _client(handler, cache) as client:
+        for _ in range(2):
+            assert client.get("/sessions/s1/history").status_code == 404
+
+    assert len(calls) == 2
+    # Ошибка не оставляет ключей сессии
+    assert cache.get_stats()["sessions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_dropped_with_its_session_key():
+    cache = ResponseCache()
+    status = [200]
+
+    async def fetch():
+        return Response(b"{}", status_code=status[0], media_type="application/json")
+
+    await cache.get(_request(), "/sessions/s1/history", 0.01, fetch, "s1")
+    assert cache.get_stats()["sessions"] == 1
+
+    await asyncio.sleep(0.02)
+    status[0] = 404
+    response = await cache.get(_request(), "/sessions/s1/history", 0.01, fetch, "s1")
+    assert response.status_code == 404
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get_stats()["sessions"] == 0
+
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch_and_invalidation_discards_it():
+    cache = ResponseCache()
+    release = asyncio.Event()
+    fetches = []
+
+    async def fetch():
+        fetches.append(len(fetches))
+        await release.wait()
+        return Response(b'{"n":%d}' % len(fetches), media_type="application/json")
+
+    waiters = [
+        asyncio.create_task(cache.get(_request(), "/sessions/s1/history", 30, fetch, "s1"))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    # Сессия изменилась во время загрузки: ответ отдается, но не сохраняется
+    cache.invalidate_session("s1")
+    release.set()
+    responses = await asyncio.gather(*waiters)
+
+    assert len(fetches) == 1
+    assert {response.body for response in responses} == {b'{"n":1}'}
+    assert cache.get_stats()["entries"] == 0
+    await cache.get(_request(), "/sessions/s1/history", 30, fetch, "s1")
+    assert len(fetches) == 2
@@ -0,0 +1,181 @@
+"""
+Тесты реестра WebSocket сессий: вытеснение повторного подключения.
+Тесты Redis бэкенда выполняются с
+GATEWAY_TEST_REDIS_URL=redis://... и установленным пакетом redis.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import (
+    get_agent_channel,
+    get_agent_upstream,
+    get_session_registry,
+    get_token_buffer_manager,
+)
+from app.services.agent_upstream import AgentUpstream
+from app.services.session_registry import RedisSessionRegistry, SessionHandle, SessionRegistry
+from app.services.token_buffer_manager import TokenBufferManager
+from tests.test_replay_buffer import PausingStream
+from tests.test_ws_session import USER_MESSAGE
+
+REDIS_URL = os.getenv("GATEWAY_TEST_REDIS_URL")
+
+
+def _handle():
+    evicted = asyncio.Event()
+
+    async def evict():
+        evicted.set()
+
+    return SessionHandle(evict=evict), evicted
+
+
+@pytest.mark.asyncio
+async def test_new_connection_evicts_previous_one():
+    registry = SessionRegistry(node_id="node-a")
+    first, first_evicted = _handle()
+    second, _ = _handle()
+
+    await registry.register("s1", first)
+    await registry.register("s1", second)
+    # Вытесненное соединение при закрытии не снимает новое
+    await registry.unregister("s1", first)
+
+    assert first_evicted.is_set()
+    assert await registry.locate("s1") == "node-a"
+
+    await registry.unregister("s1", second)
+    assert await registry.locate("s1") is None
+    assert registry.get_stats()["evicted"] == 1
+
+
+def _app(
+    registry: SessionRegistry,
+    buffers: Optional[TokenBufferManager] = None,
+    handler=lambda request: httpx.Response(200),
+) -> FastAPI:
+    upstream = AgentUpstream(
+        base_url="http://agent-runtime",
+        api_key="secret",
+        transport=httpx.MockTransport(handler),
+    )
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_agent_upstream] = lambda: upstream
+    app.dependency_overrides[get_agent_channel] = lambda: None
+    app.dependency_overrides[get_session_registry] = lambda: registry
+    if buffers is not None:
+        app.dependency_overrides[get_token_buffer_manager] = lambda: buffers
+    return app
+
+
+def test_second_websocket_for_session_closes_first_with_4409():
+    registry = SessionRegistry(node_id="node-a")
+
+    with TestClient(_app(registry)) as client:
+        with client.websocket_connect("/ws/s1") as first:
+            with client.websocket_connect("/ws/s1"):
+                with pytest.raises(WebSocketDisconnect) as closed:
+                    first.receive_text()
+                assert closed.value.code == 4409
+                stats = client.get("/ws/stats").json()["registry"]
+
+    assert stats["local_sessions"] == 1
+    assert stats["evicted"] == 1
+
+
+class FailingRegistry(SessionRegistry):
+    async def register(self, session_id: str, handle: SessionHandle) -> None:
+        raise ConnectionError("registry is unavailable")
+
+
+def test_failed_registration_releases_connection():
+    buffers = TokenBufferManager(capacity=16, ttl=60)
+
+    with TestClient(_app(FailingRegistry(node_id="node-a"), buffers)) as client:
+        with client.websocket_connect("/ws/s1?resume=1"):
+            # Буфер переподключения отсоединяется от соединения и может истечь
+            for _ in range(100):
+                if buffers.get("s1").idle:
+                    break
+                time.sleep(0.01)
+            assert buffers.get("s1").idle
+
+
+class SlowUnregisterRegistry(SessionRegistry):
+    """Снятие сессии с сетевой задержкой (как в Redis); ответ Agent продолжается"""
+
+    def __init__(self, node_id: str, release: threading.Event):
+        super().__init__(node_id=node_id)
+        self.release = release
+
+    async def unregister(self, session_id: str, handle: SessionHandle) -> None:
+        self.release.set()
+        await asyncio.sleep(0.2)
+        await super().unregister(session_id, handle)
+
+
+def test_response_continues_into_replay_buffer_while_unregistering():
+    release = threading.Event()
+    buffers = TokenBufferManager(capacity=4096, ttl=60)
+    registry = SlowUnregisterRegistry("node-a", release)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=PausingStream(release))
+
+    with TestClient(_app(registry, buffers, handler)) as client:
+        with client.websocket_connect("/ws/s1?resume=1") as ws:
+            ws.send_text(USER_MESSAGE % "long answer")
+            ws.receive_json()
+            # Остаток ответа пишется в буфер, пока соединение снимается с реестра
+            ws.close()
+            for _ in range(100):
+                if buffers.get("s1").idle:
+                    break
+                time.sleep(0.01)
+            frames = buffers.get("s1").since(1)
+
+    assert [json.loads(frame)["token"] for frame in frames] == ["two", "three"]
+
+
+@pytest.mark.asyncio
+async def test_redis_session_moves_between_nodes():
+    if REDIS_URL is None:
+        pytest.skip("GATEWAY_TEST_REDIS_URL is not set")
+    pytest.importorskip("redis")
+    prefix = f"gateway-test-{uuid.uuid4().hex}:"
+    node_a, node_b = (
+        RedisSessionRegistry(node_id=node, url=REDIS_URL, lease_ttl=3, prefix=prefix)
+        for node in ("node-a", "node-b")
+    )
+    await node_a.start()
+    await node_b.start()
+    on_a, evicted_a = _handle()
+    on_b, _ = _handle()
+
+    try:
+        await node_a.register("s1", on_a)
+        assert await node_b.locate("s1") == "node-a"
+
+        await node_b.register("s1", on_b)
+        await asyncio.wait_for(evicted_a.wait(), 2)
+        assert await node_a.locate("s1") == "node-b"
+
+        await node_b.unregister("s1", on_b)
+        assert await node_a.locate("s1") is None
+    finally:
+        await node_a.close()
+        await node_b.close()
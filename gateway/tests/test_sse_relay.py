@@ -0,0 +1,79 @@
+"""
+Тесты пересылки SSE кадров Agent Runtime в WebSocket без разбора JSON.
+"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import router
+from app.core.config import AppConfig
+from app.core.dependencies import get_agent_upstream
+from app.services.agent_upstream import AgentUpstream
+from app.services.sse_relay import peek_type
+
+FRAMES = [
+    '{"type":"assistant_message","token":"Привет \\"мир\\"","is_final":false}',
+    '{"type":"tool_call","is_final":true,"call_id":"call_1","tool_name":"read_file",'
+    '"arguments":{"path":"a.py"},"requires_approval":false}',
+]
+
+
+@pytest.mark.parametrize(
+    "payload, expected",
+    [
+        (FRAMES[0], "assistant_message"),
+        (FRAMES[1], "tool_call"),
+        ('{"is_final": true, "type": "error", "error": "boom"}', "error"),
+        ('{"content":"no type"}', None),
+        ('{"type": null}', None),
+    ],
+)
+def test_peek_type(payload, expected):
+    assert peek_type(payload) == expected
+
+
+def _client(handler) -> TestClient:
+    upstream = AgentUpstream(
+        base_url="http://agent-runtime",
+        api_key="secret",
+        transport=httpx.MockTransport(handler),
+    )
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_agent_upstream] = lambda: upstream
+    return TestClient(app)
+
+
+def _sse_handler(request: httpx.Request) -> httpx.Response:
+    body = "".join(f"data: {frame}\n\n" for frame in FRAMES) + ": ping\n\ndata: [DONE]\n\n"
+    return httpx.Response(
+        200,
+        stream=httpx.ByteStream(body.encode("utf-8")),
+        headers={"content-type": "text/event-stream"},
+    )
+
+
+def test_passthrough_forwards_payload_unchanged(monkeypatch):
+    monkeypatch.setattr(AppConfig, "RELAY_PASSTHROUGH", True)
+
+    with _client(_sse_handler).websocket_connect("/ws/session-1") as ws:
+        ws.send_text('{"type": "user_message", "content": "Hi", "role": "user"}')
+        received = [ws.receive_text() for _ in FRAMES]
+
+    assert received == FRAMES
+
+
+def test_parse_mode_filters_null_fields(monkeypatch):
+    monkeypatch.setattr(AppConfig, "RELAY_PASSTHROUGH", False)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = b'event: message\ndata: {"type":"assistant_message","token":"Hi","content":null}\n\n'
+        return httpx.Response(200, stream=httpx.ByteStream(body))
+
+    with _client(handler).websocket_connect("/ws/session-2") as ws:
+        ws.send_text('{"type": "user_message", "content": "Hi", "role": "user"}')
+        message = ws.receive_json()
+
+    assert message == {"type": "assistant_message", "token": "Hi"}
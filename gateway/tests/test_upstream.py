@@ -0,0 +1,87 @@
+"""
+Тесты общего пула соединений к Agent Runtime и прокси-эндпоинтов.
+"""
+
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import get_agent_upstream
+from app.services.agent_upstream import AgentUpstream
+
+
+def _client(handler) -> TestClient:
+    upstream = AgentUpstream(
+        base_url="http://agent-runtime",
+        api_key="secret",
+        transport=httpx.MockTransport(handler),
+    )
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_agent_upstream] = lambda: upstream
+    return TestClient(app)
+
+
+def _streamed(status: int, body: bytes) -> httpx.Response:
+    """Ответ с непрочитанным телом, как от реального транспорта"""
+    return httpx.Response(
+        status, stream=httpx.ByteStream(body), headers={"content-type": "application/json"}
+    )
+
+
+def test_proxy_passes_body_through_unchanged():
+    body = b'{"sessions": [{"id": "s1"}],  "total":1}'
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["url"] = str(request.url)
+        seen["auth"] = request.headers.get("X-Internal-Auth")
+        return _streamed(200, body)
+
+    response = _client(handler).get("/api/v1/sessions")
+
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "application/json"
+    assert seen == {"url": "http://agent-runtime/sessions", "auth": "secret"}
+
+
+def test_proxy_forwards_query_params():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return _streamed(200, json.dumps(dict(request.url.params)).encode())
+
+    response = _client(handler).get("/api/v1/events/audit-log?limit=5&session_id=s1")
+
+    assert response.json() == {"limit": "5", "session_id": "s1"}
+
+
+@pytest.mark.parametrize(
+    "path, status, error",
+    [
+        ("/api/v1/sessions/s1/pending-approvals", 404, "Session s1 not found"),
+        ("/api/v1/sessions/s1/history", 404, "Agent Runtime error: 404"),
+        ("/api/v1/agents", 503, "Agent Runtime error: 503"),
+    ],
+)
+def test_proxy_maps_agent_errors(path, status, error):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return _streamed(status, b'{"detail": "internal"}')
+
+    response = _client(handler).get(path)
+
+    assert response.status_code == status
+    assert response.json() == {"error": error}
+
+
+def test_proxy_connection_error_returns_500():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    response = _client(handler).get("/api/v1/agents")
+
+    assert response.status_code == 500
+    assert response.json()["error"].startswith("Gateway error:")
@@ -0,0 +1,135 @@
+"""
+Тесты исходящей очереди WebSocket: объединение токенов, отбрасывание
+heartbeat, отключение медленной IDE и общий лимит памяти.
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.ws_outbound import OutboundBudget, OutboundQueue, SlowConsumerError
+
+
+def _token(text: str) -> str:
+    return '{"type":"assistant_message","token":"%s","is_final":false}' % text
+
+
+class FakeWebSocket:
+    """WebSocket IDE: отправка ждет open (медленная сеть)"""
+
+    def __init__(self, open: bool = True):
+        self.sent = []
+        self.open = asyncio.Event()
+        if open:
+            self.open.set()
+
+    async def send_text(self, text):
+        await self.open.wait()
+        self.sent.append(text)
+
+
+def _queue(websocket, budget=None, max_bytes=1024, timeout=1.0):
+    return OutboundQueue(
+        websocket,
+        budget or OutboundBudget(max_bytes=1 << 20),
+        "s1",
+        max_bytes=max_bytes,
+        slow_consumer_timeout=timeout,
+    )
+
+
+async def _flush(queue):
+    while queue.get_stats()["bytes"]:
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_coalesced_and_heartbeats_dropped_while_ide_is_behind():
+    websocket = FakeWebSocket(open=False)
+    budget = OutboundBudget(max_bytes=1 << 20)
+    queue = _queue(websocket, budget)
+    sender = asyncio.create_task(queue.run())
+
+    await queue.put(_token("Hel"))
+    await asyncio.sleep(0)  # sender забрал кадр и ждет сеть
+    await queue.put(_token("lo"))
+    await queue.put('{"type":"heartbeat"}')
+    await queue.put(_token(" world"))
+    await queue.put('{"type":"tool_call","call_id":"c1"}')
+
+    assert budget.get_stats()["queues"][0]["depth"] == 2
+    websocket.open.set()
+    await _flush(queue)
+    sender.cancel()
+
+    assert websocket.sent == [
+        _token("Hel"),
+        _token("lo world"),
+        '{"type":"tool_call","call_id":"c1"}',
+    ]
+    stats = budget.get_stats()
+    assert stats["frames_coalesced"] == 1
+    assert stats["frames_dropped"] == 1
+    assert stats["buffered_bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_final_and_tool_frames_are_not_coalesced():
+    websocket = FakeWebSocket(open=False)
+    queue = _queue(websocket)
+    sender = asyncio.create_task(queue.run())
+    final = '{"type":"assistant_message","token":"","content":"Hi","is_final":true}'
+
+    await queue.put(_token("a"))
+    await asyncio.sleep(0)
+    for frame in ('{"type":"tool_call_delta","token":"x"}', _token("b"), final):
+        await queue.put(frame)
+
+    websocket.open.set()
+    await _flush(queue)
+    sender.cancel()
+
+    assert websocket.sent[2:] == [_token("b"), final]
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_disconnected_after_timeout():
+    websocket = FakeWebSocket(open=False)
+    budget = OutboundBudget(max_bytes=1 << 20)
+    queue = _queue(websocket, budget, max_bytes=100, timeout=0.05)
+    sender = asyncio.create_task(queue.run())
+
+    with pytest.raises(SlowConsumerError):
+        for n in range(10):
+            await queue.put('{"type":"tool_call","call_id":"call_%d"}' % n)
+    sender.cancel()
+
+    stats = budget.get_stats()
+    assert stats["slow_consumers_closed"] == 1
+    assert stats["buffered_bytes"] == 0
+    assert stats["connections"] == 0
+    with pytest.raises(SlowConsumerError):
+        await queue.put(_token("late"))
+
+
+@pytest.mark.asyncio
+async def test_global_limit_holds_producers_until_their_own_queue_drains():
+    budget = OutboundBudget(max_bytes=50)
+    stuck = _queue(FakeWebSocket(open=False), budget)
+    stuck_sender = asyncio.create_task(stuck.run())
+    stuck_put = asyncio.create_task(stuck.put('{"type":"tool_call","call_id":"%s"}' % ("x" * 60)))
+    await asyncio.sleep(0)
+    assert budget.exhausted
+
+    # Быстрая IDE продолжает получать кадры, но не копит их в очереди
+    websocket = FakeWebSocket()
+    fast = _queue(websocket, budget)
+    fast_sender = asyncio.create_task(fast.run())
+    for n in range(5):
+        await fast.put(_token(str(n)))
+        assert fast.get_stats()["depth"] == 0
+    assert not stuck_put.done()
+
+    for task in (stuck_put, stuck_sender, fast_sender):
+        task.cancel()
+    assert websocket.sent == [_token(str(n)) for n in range(5)]
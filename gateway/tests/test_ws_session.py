@@ -0,0 +1,106 @@
+"""
+Тесты WebSocket сессии IDE: прием сообщений во время стрима и cancel.
+"""
+
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import get_agent_channel, get_agent_upstream
+from app.services.agent_upstream import AgentUpstream
+
+USER_MESSAGE = '{"type": "user_message", "content": "%s", "role": "user"}'
+
+
+def _frame(token: str) -> bytes:
+    return b'data: {"type":"assistant_message","token":"%s","is_final":false}\n\n' % token.encode()
+
+
+class HangingStream(httpx.AsyncByteStream):
+    """SSE ответ, который отправляет первый кадр и дальше не завершается"""
+
+    def __init__(self, first: bytes):
+        self.first = first
+        self.closed = False
+
+    async def __aiter__(self):
+        yield self.first
+        await asyncio.sleep(60)
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _client(handler) -> TestClient:
+    upstream = AgentUpstream(
+        base_url="http://agent-runtime",
+        api_key="secret",
+        transport=httpx.MockTransport(handler),
+    )
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_agent_upstream] = lambda: upstream
+    app.dependency_overrides[get_agent_channel] = lambda: None
+    return TestClient(app)
+
+
+def test_cancel_aborts_agent_stream_and_next_message_is_processed():
+    streams = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        content = json.loads(request.content)["message"]["content"]
+        if content == "slow":
+            streams.append(HangingStream(_frame("partial")))
+            return httpx.Response(200, stream=streams[-1])
+        return httpx.Response(200, stream=httpx.ByteStream(_frame(content)))
+
+    with _client(handler).websocket_connect("/ws/s1") as ws:
+        ws.send_text(USER_MESSAGE % "slow")
+        assert ws.receive_json()["token"] == "partial"
+
+        ws.send_text('{"type": "cancel"}')
+        assert ws.receive_json() == {"type": "cancelled", "content": "Request cancelled"}
+
+        ws.send_text(USER_MESSAGE % "next")
+        assert ws.receive_json()["token"] == "next"
+
+    assert streams[0].closed
+
+
+def test_messages_received_during_stream_are_queued():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        content = json.loads(request.content)["message"]["content"]
+        requests.append(content)
+        if content == "slow":
+            return httpx.Response(200, stream=HangingStream(_frame("partial")))
+        return httpx.Response(200, stream=httpx.ByteStream(_frame(content)))
+
+    with _client(handler).websocket_connect("/ws/s1") as ws:
+        ws.send_text(USER_MESSAGE % "slow")
+        assert ws.receive_json()["token"] == "partial"
+
+        # Reader принимает сообщение, пока writer занят стримом
+        ws.send_text(USER_MESSAGE % "queued")
+        ws.send_text('{"type": "cancel"}')
+
+        assert ws.receive_json()["type"] == "cancelled"
+        assert ws.receive_json()["token"] == "queued"
+
+    assert requests == ["slow", "queued"]
+
+
+def test_cancel_without_active_stream_is_ignored():
+    def handler(request: httpx.Request) -> httpx.Response:
+        content = json.loads(request.content)["message"]["content"]
+        return httpx.Response(200, stream=httpx.ByteStream(_frame(content)))
+
+    with _client(handler).websocket_connect("/ws/s1") as ws:
+        ws.send_text('{"type": "cancel"}')
+        ws.send_text(USER_MESSAGE % "hello")
+        assert ws.receive_json()["token"] == "hello"
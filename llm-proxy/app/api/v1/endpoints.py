@@ -1,23 +1,30 @@
+import asyncio
 import logging
 import time
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, Request, Response
 from fastapi.responses import JSONResponse
 from sse_starlette.sse import EventSourceResponse
 
-from app.core.dependencies import get_llm_adapter
+from app.core.dependencies import (
+    get_cancellation_stats,
+    get_llm_adapter,
+    get_response_cache,
+    get_single_flight,
+)
 from app.models.schemas import (
-    ChatCompletionChunk,
     ChatCompletionRequest,
     ChatCompletionResponse,
     ChatMessage,
-    ChoiceDelta,
     ChoiceMsg,
-    DeltaMessage,
     LLMModel,
     OpenAIError,
 )
+from app.services.cancellation import CancellationStats, ClientDisconnected, run_until_disconnected
+from app.services.chunk_frames import DONE_FRAME, ERROR_FRAME, ChunkFrameEncoder
+from app.services.response_cache import ResponseCache, cache_key
+from app.services.single_flight import SingleFlight
 
 router = APIRouter()
 logger = logging.getLogger("llm-proxy")
@@ -33,14 +40,46 @@ async def list_models(adapter=Depends(get_llm_adapter)):
 @router.post("/v1/chat/completions", response_model=ChatCompletionResponse)
 async def chat_completions(
     request: ChatCompletionRequest,
+    response: Response,
+    http_request: Request,
     authorization: Optional[str] = Header(None),  # для совместимости с openai sdk
+    x_llm_cache: Optional[str] = Header(None),
     adapter=Depends(get_llm_adapter),
+    cache: Optional[ResponseCache] = Depends(get_response_cache),
+    flight: Optional[SingleFlight] = Depends(get_single_flight),
+    cancellation: CancellationStats = Depends(get_cancellation_stats),
 ):
     logger.info(f"[OpenAI] Completion req, model={request.model}, stream={request.stream}")
     req_id = f"chatcmpl-{int(time.time() * 1000)}"
     created = int(time.time())
+
+    # Кэш ответов по заголовку X-LLM-Cache: use - читать и сохранять,
+    # refresh - только сохранить свежий ответ. Streaming не кэшируется.
+    cache_mode = (x_llm_cache or "").lower()
+    key = None
+    if cache is not None and not request.stream and cache_mode in ("use", "refresh"):
+        key = cache_key(request)
+        if cache_mode == "use":
+            cached = await cache.get(key)
+            if cached is not None:
+                logger.info(f"[OpenAI] Response cache hit, model={request.model}")
+                response.headers["X-LLM-Cache"] = "hit"
+                return ChatCompletionResponse.model_construct(**cached)
+        response.headers["X-LLM-Cache"] = "miss"
+
     try:
-        result = await adapter.chat(request)
+        # Одинаковые одновременные запросы (повтор после переподключения,
+        # один вопрос из нескольких сессий) разделяют один вызов upstream
+        if flight is None:
+            call = adapter.chat(request)
+        elif request.stream:
+            flight_key = f"stream:{key or cache_key(request)}"
+            call = flight.stream(flight_key, lambda: adapter.chat(request))
+        else:
+            flight_key = f"chat:{key or cache_key(request)}"
+            call = flight.run(flight_key, lambda: adapter.chat(request))
+        # Клиент отключился (agent-runtime отменил запрос) - вызов upstream отменяется
+        result = await run_until_disconnected(http_request, call)
         if not request.stream:
             # НЕ-СТРИМОВЫЙ РЕЖИМ
             # result может быть:
@@ -67,6 +106,8 @@ async def chat_completions(
             elif isinstance(result, dict) and "choices" in result:
                 # Новый формат - полный ответ с usage
                 # Просто возвращаем как есть, LiteLLM уже вернул правильный формат
+                if cache is not None and key is not None:
+                    await cache.set(key, result)
                 return ChatCompletionResponse.model_construct(**result)
             else:
                 # Старый формат - список сообщений от адаптера
@@ -92,61 +133,70 @@ async def chat_completions(
             return resp
         else:
             # СТРИМИНГОВЫЙ РЕЖИМ (sse)
+            # Кадры SSE кодируются заранее: EventSourceResponse отдает bytes как есть
+            frames = ChunkFrameEncoder(req_id, created, request.model)
+
             async def event_generator():
-                idx = 0
                 delta_started = False
+                finish_reason = "stop"
+                sent = 0
                 try:
                     async for token in result:
+                        sent += 1
                         if not delta_started:
                             # Сначала отправляем роль assistant
-                            delta = ChoiceDelta.model_construct(
-                                index=idx,
-                                delta=DeltaMessage.model_construct(role="assistant", content=None),
-                                finish_reason=None,
-                            )
-                            chunk = ChatCompletionChunk.model_construct(
-                                id=req_id,
-                                object="chat.completion.chunk",
-                                created=created,
-                                model=request.model,
-                                choices=[delta],
-                            )
-                            yield chunk.model_dump_json() + "\n"
+                            yield frames.role()
                             delta_started = True
-                        # Отправляем токен как delta-content
-                        # Token might contain tool calls in the content
-                        delta = ChoiceDelta.model_construct(
-                            index=idx,
-                            delta=DeltaMessage.model_construct(content=token),
-                            finish_reason=None,
-                        )
-                        chunk = ChatCompletionChunk.model_construct(
-                            id=req_id,
-                            object="chat.completion.chunk",
-                            created=created,
-                            model=request.model,
-                            choices=[delta],
-                        )
-                        yield chunk.model_dump_json() + "\n"
+                        if isinstance(token, dict):
+                            # Фрагменты tool calls передаются как есть
+                            yield frames.tool_calls(token["tool_calls"])
+                            finish_reason = "tool_calls"
+                        else:
+                            # Отправляем токен как delta-content
+                            yield frames.content(token)
                     # Финальный пустой дельта-чанк с finish_reason
-                    delta = ChoiceDelta.model_construct(
-                        index=idx, delta=DeltaMessage.model_construct(), finish_reason="stop"
+                    yield frames.finish(finish_reason)
+                    yield DONE_FRAME
+                except asyncio.CancelledError:
+                    # EventSourceResponse отменяет генератор при отключении клиента
+                    cancellation.stream_cancelled(sent)
+                    logger.info(
+                        f"[OpenAI] Client disconnected, stream cancelled after {sent} chunks"
                     )
-                    chunk = ChatCompletionChunk.model_construct(
-                        id=req_id,
-                        object="chat.completion.chunk",
-                        created=created,
-                        model=request.model,
-                        choices=[delta],
-                    )
-                    yield chunk.model_dump_json() + "\n"
-                    yield "[DONE]\n"
+                    raise
                 except Exception as e:
                     logger.error(f"[OpenAI] Streaming error: {e}")
-                    yield '{"error": "Internal server error"}\n'
+                    yield ERROR_FRAME
+                finally:
+                    # Закрывает стрим LiteLLM или отписывает от общего стрима single-flight
+                    await result.aclose()
 
             return EventSourceResponse(event_generator())
+    except ClientDisconnected:
+        cancellation.request_cancelled()
+        logger.info(f"[OpenAI] Client disconnected, request cancelled, model={request.model}")
+        # 499 Client Closed Request: ответ уже никто не читает
+        return Response(status_code=499)
     except Exception as e:
         logger.error(f"[OpenAI] Error: {e}")
         err = OpenAIError.model_construct(message=str(e), type="internal_error")
         return JSONResponse(content=err.model_dump(), status_code=500)
+
+
+@router.get("/v1/cache/stats")
+async def response_cache_stats(cache: Optional[ResponseCache] = Depends(get_response_cache)):
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await cache.get_stats())}
+
+
+@router.get("/v1/cancellation/stats")
+async def cancellation_stats(cancellation: CancellationStats = Depends(get_cancellation_stats)):
+    return cancellation.get_stats()
+
+
+@router.get("/v1/coalescing/stats")
+async def coalescing_stats(flight: Optional[SingleFlight] = Depends(get_single_flight)):
+    if flight is None:
+        return {"enabled": False}
+    return {"enabled": True, **flight.get_stats()}
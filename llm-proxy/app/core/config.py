@@ -16,6 +16,26 @@ class AppConfig:
     LITELLM_API_KEY: str = os.getenv("LLM_PROXY__LITELLM_API_KEY", "")
     DEFAULT_MODEL: str = os.getenv("LLM_PROXY__DEFAULT_MODEL", "gpt-3.5-turbo")
 
+    # Hedging: дублировать запрос на резервную модель, если первый токен
+    # не пришел за HEDGE_QUANTILE времени до первого токена основной модели
+    HEDGING_ENABLED: bool = os.getenv("LLM_PROXY__HEDGING_ENABLED", "false").lower() == "true"
+    HEDGE_QUANTILE: float = float(os.getenv("LLM_PROXY__HEDGE_QUANTILE", "0.95"))
+    HEDGE_MIN_DELAY: float = float(os.getenv("LLM_PROXY__HEDGE_MIN_DELAY", "1.0"))
+
+    # Кэш ответов (opt-in: включается здесь и запрашивается заголовком X-LLM-Cache)
+    RESPONSE_CACHE_ENABLED: bool = (
+        os.getenv("LLM_PROXY__RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    )
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("LLM_PROXY__RESPONSE_CACHE_MAX_ENTRIES", "1000")
+    )
+    RESPONSE_CACHE_TTL: float = float(os.getenv("LLM_PROXY__RESPONSE_CACHE_TTL", "3600"))
+    # Путь к SQLite файлу для дискового уровня кэша (пусто - только память)
+    RESPONSE_CACHE_PATH: str = os.getenv("LLM_PROXY__RESPONSE_CACHE_PATH", "")
+
+    # Объединение одинаковых одновременных запросов в один вызов upstream
+    COALESCING_ENABLED: bool = os.getenv("LLM_PROXY__COALESCING_ENABLED", "true").lower() == "true"
+
     # Режим работы: mock для тестов, litellm для продакшена
     LLM_MODE: str = os.getenv("LLM_PROXY__LLM_MODE", "litellm")  # mock | litellm
 
@@ -1,6 +1,15 @@
+from typing import Optional
+
 from app.core.config import AppConfig
+from app.services.cancellation import CancellationStats
 from app.services.llm_adapters.fake import FakeLLMAdapter
 from app.services.llm_adapters.litellm_adapter import LiteLLMAdapter
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+
+_response_cache: Optional[ResponseCache] = None
+_single_flight: Optional[SingleFlight] = None
+_cancellation_stats: Optional[CancellationStats] = None
 
 
 def get_llm_adapter():
@@ -13,3 +22,41 @@ def get_llm_adapter():
     if llm_mode == "mock":
         return FakeLLMAdapter()
     return LiteLLMAdapter()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Возвращает общий кэш ответов или None, если кэш выключен.
+    """
+    global _response_cache
+    if not AppConfig.RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            max_entries=AppConfig.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=AppConfig.RESPONSE_CACHE_TTL,
+            disk_path=AppConfig.RESPONSE_CACHE_PATH or None,
+        )
+    return _response_cache
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """
+    Возвращает общий реестр объединения запросов или None, если выключен.
+    """
+    global _single_flight
+    if not AppConfig.COALESCING_ENABLED:
+        return None
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+def get_cancellation_stats() -> CancellationStats:
+    """
+    Возвращает общие счетчики запросов, прерванных отключением клиента.
+    """
+    global _cancellation_stats
+    if _cancellation_stats is None:
+        _cancellation_stats = CancellationStats()
+    return _cancellation_stats
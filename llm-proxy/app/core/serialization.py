@@ -0,0 +1,113 @@
+"""
+Сериализация JSON на горячих путях (SSE чанки, ответы API).
+
+Использует orjson или msgspec, если установлены (extra fast-json),
+иначе стандартный json. Результат во всех реализациях одинаковый:
+компактный JSON в UTF-8 без экранирования не-ASCII символов.
+"""
+import json
+from typing import Any, Callable, List, Optional, Union
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # ty:ignore[invalid-assignment, unused-ignore-comment]
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None  # ty:ignore[invalid-assignment, unused-ignore-comment]
+
+_encode: Callable[[Any], bytes]
+_decode: Callable[[Union[str, bytes]], Any]
+backend = "json"
+
+
+def _json_encode(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_encode(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgspec_decoder() -> Callable[[Union[str, bytes]], Any]:
+    decoder = msgspec.json.Decoder()
+
+    def decode(data: Union[str, bytes]) -> Any:
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # Единый тип ошибки для всех реализаций
+            raise json.JSONDecodeError(str(e), data if isinstance(data, str) else "", 0) from e
+
+    return decode
+
+
+def available_backends() -> List[str]:
+    """Установленные реализации, от самой быстрой"""
+    names = [name for name, module in (("orjson", orjson), ("msgspec", msgspec)) if module]
+    return names + ["json"]
+
+
+def set_backend(name: Optional[str] = None) -> str:
+    """
+    Выбирает реализацию JSON: orjson, msgspec или json.
+    None - самая быстрая из установленных. Возвращает выбранное имя.
+    """
+    global _encode, _decode, backend
+    name = name or available_backends()[0]
+    if name not in available_backends():
+        raise ValueError(f"JSON backend {name!r} is not installed")
+    if name == "orjson":
+        _encode, _decode = _orjson_encode, orjson.loads
+    elif name == "msgspec":
+        _encode, _decode = msgspec.json.Encoder().encode, _msgspec_decoder()
+    else:
+        _encode, _decode = _json_encode, json.loads
+    backend = name
+    return name
+
+
+set_backend()
+
+
+def dumpb(obj: Any) -> bytes:
+    """Сериализует объект в JSON (bytes)"""
+    return _encode(obj)
+
+
+def dumps(obj: Any) -> str:
+    """Сериализует объект в JSON (str)"""
+    return _encode(obj).decode("utf-8")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Разбирает JSON из str или bytes. Ошибка - json.JSONDecodeError"""
+    return _decode(data)
+
+
+def model_json(model: BaseModel, exclude_none: bool = False) -> bytes:
+    """
+    JSON pydantic модели сразу в bytes. Совпадает с model_dump_json(),
+    но без промежуточной str и ее повторного кодирования в UTF-8.
+    """
+    return pydantic_core.to_json(model, exclude_none=exclude_none)
+
+
+def sse_frame(payload: Union[str, bytes]) -> bytes:
+    """Кадр SSE с одной строкой data"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return b"data: " + payload + b"\n\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, сериализующий через выбранную реализацию"""
+
+    def render(self, content: Any) -> bytes:
+        return dumpb(content)
@@ -4,6 +4,7 @@ from fastapi import FastAPI
 from fastapi.openapi.utils import get_openapi
 
 from app.api.v1.endpoints import router as router
+from app.core.serialization import FastJSONResponse
 from app.middleware.internal_auth import InternalAuthMiddleware
 from app.models.schemas import HealthResponse
 
@@ -13,6 +14,7 @@ app = FastAPI(
     title="LLM Proxy Service",
     swagger_ui_init_oauth={},
     openapi_tags=[],  # если есть
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -44,6 +44,11 @@ class ChatCompletionRequest(BaseModel):
     tools: Optional[List[dict]] = None
     function_call: Optional[Union[str, dict]] = None
     tool_choice: Optional[Union[str, dict]] = None
+    # Подсказки кэширования стабильного префикса промпта
+    prompt_cache_key: Optional[str] = None
+    cache_control: Optional[Dict[str, Any]] = None
+    # Резервные модели: используются при ошибке или задержке основной
+    fallback_models: Optional[List[str]] = None
 
     class Config:
         json_schema_extra = {
@@ -60,6 +65,10 @@ class UsageInfo(BaseModel):
     prompt_tokens: int
     completion_tokens: int
     total_tokens: int
+    # Статистика кэша промпта (OpenAI / Anthropic через LiteLLM)
+    prompt_tokens_details: Optional[Dict[str, Any]] = None
+    cache_read_input_tokens: Optional[int] = None
+    cache_creation_input_tokens: Optional[int] = None
 
 
 class ChoiceMsg(BaseModel):
@@ -99,7 +108,8 @@ class DeltaMessage(BaseModel):
     role: Optional[str] = None
     content: Optional[str] = None
     function_call: Optional[dict] = None
-    tool_calls: Optional[List[ToolCall]] = None
+    # Фрагменты tool calls: index, id и name в первом, далее части arguments
+    tool_calls: Optional[List[dict]] = None
     metadata: Optional[Dict[str, Any]] = None  # Raw provider data without interpretation
 
 
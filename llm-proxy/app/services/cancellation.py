@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, TypeVar
+
+from starlette.requests import Request
+
+logger = logging.getLogger("llm-proxy.cancellation")
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """Клиент отключился до получения ответа, вызов upstream отменен"""
+
+
+class CancellationStats:
+    """
+    Счетчики запросов, прерванных отключением клиента.
+
+    Отключение клиента (agent-runtime отменил запрос) освобождает
+    upstream сразу: не-стриминговый вызов отменяется, стрим LiteLLM
+    закрывается.
+    """
+
+    def __init__(self):
+        self._stats = {"requests_cancelled": 0, "streams_cancelled": 0, "stream_chunks_sent": 0}
+
+    def request_cancelled(self) -> None:
+        """Не-стриминговый запрос (или открытие стрима) отменен"""
+        self._stats["requests_cancelled"] += 1
+
+    def stream_cancelled(self, chunks_sent: int) -> None:
+        """Стрим прерван после chunks_sent отправленных чанков"""
+        self._stats["streams_cancelled"] += 1
+        self._stats["stream_chunks_sent"] += chunks_sent
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+
+async def _disconnected(request: Request) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_until_disconnected(request: Request, call: Awaitable[T]) -> T:
+    """
+    Выполняет call, отменяя его, если клиент отключился раньше.
+
+    Обработчик не-стримингового запроса иначе ждет ответа upstream
+    и после отключения клиента.
+
+    Raises:
+        ClientDisconnected: Клиент отключился, call отменен
+    """
+    task = asyncio.ensure_future(call)
+    disconnect = asyncio.ensure_future(_disconnected(request))
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        task.cancel()
+        raise
+    finally:
+        disconnect.cancel()
+
+    if not task.done():
+        task.cancel()
+        # Отмена освобождает upstream (соединение, single-flight), ждем ее
+        await asyncio.gather(task, return_exceptions=True)
+        raise ClientDisconnected()
+    return task.result()
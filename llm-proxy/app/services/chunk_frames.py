@@ -0,0 +1,62 @@
+from typing import List, Optional
+
+import pydantic_core
+
+from app.core.serialization import dumpb, model_json, sse_frame
+from app.models.schemas import ChatCompletionChunk, ChoiceDelta, DeltaMessage
+
+# Постоянные кадры стрима
+DONE_FRAME = sse_frame(b"[DONE]")
+ERROR_FRAME = sse_frame(b'{"error": "Internal server error"}')
+
+_PLACEHOLDER = "\x00"
+
+
+class ChunkFrameEncoder:
+    """
+    Кадры SSE chat.completion.chunk одного ответа.
+
+    id, created и model постоянны в пределах ответа, поэтому JSON чанка с
+    текстовым delta кодируется один раз как шаблон, а на каждый токен
+    сериализуется только сам текст. Результат совпадает с
+    ChatCompletionChunk.model_dump_json().
+    """
+
+    def __init__(self, chunk_id: str, created: int, model: str):
+        self.chunk_id = chunk_id
+        self.created = created
+        self.model = model
+        template = model_json(self._chunk(DeltaMessage.model_construct(content=_PLACEHOLDER)))
+        self._prefix, self._suffix = template.split(pydantic_core.to_json(_PLACEHOLDER), 1)
+        self._prefix = b"data: " + self._prefix
+
+    def _chunk(self, delta: DeltaMessage, finish_reason: Optional[str] = None):
+        return ChatCompletionChunk.model_construct(
+            id=self.chunk_id,
+            object="chat.completion.chunk",
+            created=self.created,
+            model=self.model,
+            choices=[
+                ChoiceDelta.model_construct(index=0, delta=delta, finish_reason=finish_reason)
+            ],
+        )
+
+    def role(self) -> bytes:
+        """Первый чанк: роль assistant"""
+        return sse_frame(
+            model_json(self._chunk(DeltaMessage.model_construct(role="assistant", content=None)))
+        )
+
+    def content(self, token: str) -> bytes:
+        """Чанк с текстом токена"""
+        return self._prefix + dumpb(token) + self._suffix + b"\n\n"
+
+    def tool_calls(self, tool_calls: List[dict]) -> bytes:
+        """Чанк с фрагментами tool calls"""
+        return sse_frame(
+            model_json(self._chunk(DeltaMessage.model_construct(tool_calls=tool_calls)))
+        )
+
+    def finish(self, finish_reason: str) -> bytes:
+        """Финальный пустой чанк с finish_reason"""
+        return sse_frame(model_json(self._chunk(DeltaMessage.model_construct(), finish_reason)))
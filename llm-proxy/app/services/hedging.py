@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import math
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger("llm-proxy.hedging")
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Скользящая выборка латентности по моделям.
+    Используется для порога hedging: запрос дублируется, только если
+    ответ задерживается сильнее обычного (квантиль, по умолчанию p95).
+
+    Время отмененного запроса (проигравшего hedged) записывается как
+    обычный замер: это нижняя граница его латентности, и без нее
+    медленные ответы выпадают из выборки, а порог постепенно снижается.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, model: str, seconds: float) -> None:
+        self._samples[model].append(seconds)
+
+    def quantile(self, model: str, q: float) -> Optional[float]:
+        """Квантиль латентности модели или None, если замеров недостаточно"""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+
+# Общие для всех запросов: адаптер создается на каждый запрос (get_llm_adapter).
+# Время до первого токена (streaming) и до полного ответа (non-streaming)
+# различаются на порядок, поэтому выборки раздельные.
+model_latency = LatencyTracker()
+completion_latency = LatencyTracker()
+
+
+async def race_with_fallback(
+    attempts: List[Callable[[], Awaitable[T]]],
+    hedge_delay: Optional[float] = None,
+    discard: Optional[Callable[[T], Awaitable[None]]] = None,
+) -> T:
+    """
+    Выполняет попытки по цепочке моделей.
+
+    Первая попытка стартует сразу. Следующая стартует, когда все текущие
+    попытки завершились ошибкой (fallback) или, один раз, если за
+    hedge_delay секунд ответа нет (hedging). Возвращается первый успешный
+    результат, остальные попытки отменяются.
+
+    Args:
+        attempts: Фабрики попыток по порядку моделей
+        hedge_delay: Задержка перед дублирующим запросом (None - без hedging)
+        discard: Освобождение успешного, но невостребованного результата
+            (например, закрытие открытого стрима)
+
+    Returns:
+        Результат первой успешной попытки
+
+    Raises:
+        Exception: Ошибка последней попытки, если все завершились ошибкой
+    """
+    pending: set = set()
+    next_index = 0
+    hedged = False
+    last_error: Optional[BaseException] = None
+
+    def launch() -> None:
+        nonlocal next_index
+        pending.add(asyncio.ensure_future(attempts[next_index]()))
+        next_index += 1
+
+    launch()
+    try:
+        while pending:
+            can_hedge = hedge_delay is not None and not hedged and next_index < len(attempts)
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                hedged = True
+                logger.info(
+                    f"[hedging] No response within {hedge_delay:.2f}s, "
+                    f"sending hedged request (attempt {next_index + 1})"
+                )
+                launch()
+                continue
+
+            winner = None
+            for task in done:
+                pending.discard(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    logger.warning(f"[hedging] Attempt failed: {last_error}")
+                elif winner is None:
+                    winner = task
+                elif discard is not None:
+                    await discard(task.result())
+            if winner is not None:
+                return winner.result()
+
+            if not pending and next_index < len(attempts):
+                launch()
+
+        # Цикл завершается без победителя, только если все попытки упали
+        raise last_error  # ty:ignore[invalid-raise, unused-ignore-comment]
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Попытка могла успеть завершиться до отмены
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if discard is not None and not isinstance(result, BaseException):
+                    await discard(result)
@@ -1,9 +1,13 @@
+import asyncio
 import logging
 import pprint
-from typing import Optional
+import time
+from typing import List, Optional
 
 from app.core.config import AppConfig
 from app.models.schemas import ChatCompletionRequest
+from app.services import hedging
+from app.services.hedging import LatencyTracker, race_with_fallback
 
 from .base import BaseLLMAdapter
 
@@ -14,12 +18,24 @@ try:
 except ImportError:
     AsyncOpenAI = None  # ty:ignore[invalid-assignment, unused-ignore-comment]
 
+# Подсказки кэширования префикса понимают не все провайдеры: cache_control -
+# Anthropic (напрямую или через Bedrock), prompt_cache_key - OpenAI.
+# Модели определяются по имени в LiteLLM (provider/model)
+_CACHE_CONTROL_MODELS = ("anthropic/", "bedrock/", "claude")
+_PROMPT_CACHE_KEY_MODELS = ("openai/", "gpt-", "o1", "o3", "o4")
+
 
 class LiteLLMAdapter(BaseLLMAdapter):
     """
     Адаптер для работы с LiteLLM proxy сервером.
     LiteLLM proxy предоставляет OpenAI-совместимый API для множества LLM провайдеров.
     Используем OpenAI клиент для взаимодействия с proxy.
+
+    Если в запросе указаны fallback_models, при ошибке модели запрос
+    повторяется на следующей модели цепочки. С включенным hedging
+    запрос дополнительно дублируется на следующую модель, когда первый
+    токен (или ответ в non-streaming режиме) задерживается дольше
+    p95 обычного времени; проигравший запрос отменяется.
     """
 
     def __init__(
@@ -27,6 +43,8 @@ class LiteLLMAdapter(BaseLLMAdapter):
         proxy_url: Optional[str] = None,
         api_key: Optional[str] = None,
         default_model: Optional[str] = None,
+        latency: Optional[LatencyTracker] = None,
+        completion_latency: Optional[LatencyTracker] = None,
     ):
         if not AsyncOpenAI:
             raise ImportError(
@@ -41,6 +59,10 @@ class LiteLLMAdapter(BaseLLMAdapter):
         # LiteLLM proxy предоставляет OpenAI-совместимый endpoint
         self.client = AsyncOpenAI(api_key=self.api_key, base_url=f"{self.proxy_url}/v1")
 
+        # Порог hedging: время до первого токена (streaming) и до ответа (non-streaming)
+        self.latency = latency or hedging.model_latency
+        self.completion_latency = completion_latency or hedging.completion_latency
+
         logger.info(
             f"[LiteLLMAdapter] Initialized with proxy_url={self.proxy_url}, "
             f"default_model={self.default_model}"
@@ -71,13 +93,112 @@ class LiteLLMAdapter(BaseLLMAdapter):
 
         return models_list
 
+    @staticmethod
+    def _mark_cacheable_prefix(messages: list, cache_control: dict) -> list:
+        """
+        Помечает первое системное сообщение как кэшируемый префикс.
+        Возвращает новый список, исходные сообщения не меняются.
+        """
+        if not messages or messages[0].get("role") != "system":
+            return messages
+        content = messages[0].get("content")
+        if not isinstance(content, str):
+            return messages
+        system = {
+            **messages[0],
+            "content": [{"type": "text", "text": content, "cache_control": cache_control}],
+        }
+        return [system, *messages[1:]]
+
+    def _with_cache_hints(
+        self, create_params: dict, model: str, request: ChatCompletionRequest
+    ) -> dict:
+        """
+        Параметры запроса к модели с подсказками кэширования, которые
+        понимает ее провайдер; другим провайдерам подсказки не передаются.
+        """
+        params = {**create_params, "model": model}
+        name = model.lower()
+        if request.prompt_cache_key and name.startswith(_PROMPT_CACHE_KEY_MODELS):
+            params["extra_body"] = {"prompt_cache_key": request.prompt_cache_key}
+        if request.cache_control and name.startswith(_CACHE_CONTROL_MODELS):
+            params["messages"] = self._mark_cacheable_prefix(
+                params["messages"], request.cache_control
+            )
+        return params
+
+    def _hedge_delay(self, models: List[str], latency: LatencyTracker) -> Optional[float]:
+        """
+        Задержка перед дублирующим запросом на резервную модель.
+        None, если hedging выключен, резервной модели нет или по основной
+        модели еще недостаточно замеров.
+        """
+        if not AppConfig.HEDGING_ENABLED or len(models) < 2:
+            return None
+        threshold = latency.quantile(models[0], AppConfig.HEDGE_QUANTILE)
+        if threshold is None:
+            return None
+        return max(AppConfig.HEDGE_MIN_DELAY, threshold)
+
+    async def _complete(self, create_params: dict, model: str):
+        """Non-streaming запрос к одной модели"""
+        started = time.monotonic()
+        try:
+            response = await self.client.chat.completions.create(
+                **{**create_params, "model": model}
+            )
+        except asyncio.CancelledError:
+            # Проигравший hedged запрос: латентность не меньше прошедшего времени
+            self.completion_latency.record(model, time.monotonic() - started)
+            raise
+        self.completion_latency.record(model, time.monotonic() - started)
+        return response
+
+    async def _open_stream(self, create_params: dict, model: str):
+        """
+        Открывает стрим модели и дожидается первого чанка.
+        Возвращает (stream, first_chunk); first_chunk None для пустого стрима.
+        """
+        started = time.monotonic()
+        try:
+            stream = await self.client.chat.completions.create(
+                **{**create_params, "model": model}
+            )
+            try:
+                first_chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                first_chunk = None
+            except BaseException:
+                # Ошибка или отмена проигравшего hedged запроса
+                await stream.close()
+                raise
+        except asyncio.CancelledError:
+            # Проигравший hedged запрос: латентность не меньше прошедшего времени
+            self.latency.record(model, time.monotonic() - started)
+            raise
+        self.latency.record(model, time.monotonic() - started)
+        return stream, first_chunk
+
+    @staticmethod
+    async def _close_stream(opened) -> None:
+        stream, _ = opened
+        await stream.close()
+
+    @staticmethod
+    async def _iter_stream(stream, first_chunk):
+        """Чанки стрима, начиная с уже полученного первого"""
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+
     async def chat(self, request: ChatCompletionRequest):
         """
         Выполняет chat completion запрос через LiteLLM proxy.
         Поддерживает streaming и non-streaming режимы, а также tool calling.
         """
-        # Используем модель из запроса или по умолчанию
+        # Используем модель из запроса или по умолчанию, затем резервные
         model = request.model or self.default_model
+        models = [model] + [m for m in request.fallback_models or [] if m != model]
 
         # Конвертируем сообщения в dict формат, сохраняя все поля
         messages = request.messages or []
@@ -122,10 +243,17 @@ class LiteLLMAdapter(BaseLLMAdapter):
             + pprint.pformat(create_params, indent=2, width=120)
         )
 
+        # Кэширование стабильного префикса (системный промпт + tools): подсказки
+        # зависят от провайдера, поэтому параметры свои для каждой модели цепочки
+        model_params = {m: self._with_cache_hints(create_params, m, request) for m in models}
+
         # Non-streaming режим
         if not create_params["stream"]:
             try:
-                response = await self.client.chat.completions.create(**create_params)
+                response = await race_with_fallback(
+                    [lambda m=m: self._complete(model_params[m], m) for m in models],
+                    hedge_delay=self._hedge_delay(models, self.completion_latency),
+                )
 
                 logger.debug(
                     "[TRACE][LiteLLMAdapter] Full llm_response:\n"
@@ -145,14 +273,27 @@ class LiteLLMAdapter(BaseLLMAdapter):
 
         # Streaming режим
         async def token_gen():
+            stream = None
             try:
-                stream = await self.client.chat.completions.create(**create_params)
-                async for chunk in stream:
+                stream, first_chunk = await race_with_fallback(
+                    [lambda m=m: self._open_stream(model_params[m], m) for m in models],
+                    hedge_delay=self._hedge_delay(models, self.latency),
+                    discard=self._close_stream,
+                )
+                if first_chunk is None:
+                    return
+                async for chunk in self._iter_stream(stream, first_chunk):
                     token = ""
+                    tool_calls = None
                     try:
-                        # Извлекаем контент из delta
+                        # Извлекаем контент и фрагменты tool calls из delta
                         if chunk.choices and chunk.choices[0].delta.content:
                             token = chunk.choices[0].delta.content
+                        if chunk.choices and getattr(chunk.choices[0].delta, "tool_calls", None):
+                            tool_calls = [
+                                tc.model_dump(exclude_none=True)
+                                for tc in chunk.choices[0].delta.tool_calls
+                            ]
                     except Exception:
                         logger.error(
                             "[LiteLLMAdapter][stream] chunk parse error", exc_info=True
@@ -165,6 +306,9 @@ class LiteLLMAdapter(BaseLLMAdapter):
                     if token:
                         logger.debug(f"[LiteLLMAdapter][stream] yield token: {token}")
                         yield token
+                    if tool_calls:
+                        # Аргументы приходят фрагментами JSON, клиент собирает их сам
+                        yield {"tool_calls": tool_calls}
 
             except Exception as e:
                 logger.error(f"[LiteLLMAdapter][streaming] error: {e}", exc_info=True)
@@ -173,5 +317,9 @@ class LiteLLMAdapter(BaseLLMAdapter):
                     + pprint.pformat(locals(), indent=2, width=120)
                 )
                 yield f"[Error] LiteLLM proxy stream unavailable: {e}"
+            finally:
+                # В том числе при отмене (клиент отключился): LiteLLM прекращает генерацию
+                if stream is not None:
+                    await stream.close()
 
         return token_gen()
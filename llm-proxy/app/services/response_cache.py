@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.models.schemas import ChatCompletionRequest
+
+logger = logging.getLogger("llm-proxy.response_cache")
+
+# Поля запроса, не влияющие на ответ модели
+_NON_SEMANTIC_FIELDS = {"stream", "user", "prompt_cache_key", "cache_control", "fallback_models"}
+
+
+def cache_key(request: ChatCompletionRequest) -> str:
+    """
+    Канонический хэш запроса: модель, сообщения, инструменты и параметры
+    сэмплирования. Порядок ключей и пробелы не влияют на результат.
+    """
+    payload = request.model_dump(exclude=_NON_SEMANTIC_FIELDS, exclude_none=True)
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheStore:
+    """
+    Дисковый уровень кэша в SQLite. Переживает рестарт сервиса и
+    разделяется между воркерами на одном хосте.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        async with self._lock:
+            row = await asyncio.to_thread(
+                lambda: self._conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            )
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            await self.delete(key)
+            return None
+        return json.loads(value), expires_at
+
+    async def set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        async with self._lock:
+            await asyncio.to_thread(
+                self._conn.execute,
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, data, expires_at),
+            )
+
+    async def delete(self, key: str) -> None:
+        async with self._lock:
+            await asyncio.to_thread(
+                self._conn.execute, "DELETE FROM responses WHERE key = ?", (key,)
+            )
+
+    async def prune(self) -> None:
+        """Удаляет записи с истекшим TTL"""
+        async with self._lock:
+            await asyncio.to_thread(
+                self._conn.execute, "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+            )
+
+    async def clear(self) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self._conn.execute, "DELETE FROM responses")
+
+    async def size(self) -> int:
+        async with self._lock:
+            return await asyncio.to_thread(
+                lambda: self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            )
+
+
+class ResponseCache:
+    """
+    Кэш ответов non-streaming chat completion.
+
+    Используется только по запросу клиента (заголовок X-LLM-Cache), т.к.
+    повторный ответ имеет смысл лишь для детерминированных вызовов:
+    классификация, суммаризация, повтор запроса после обрыва соединения.
+    В памяти хранится не более max_entries ответов (LRU), записи живут ttl
+    секунд. Опционально ответы дублируются в SQLite (disk_path).
+    """
+
+    _PRUNE_EVERY = 100
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+        disk_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._disk = SQLiteCacheStore(disk_path) if disk_path else None
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        logger.info(
+            f"[ResponseCache] Initialized: max_entries={max_entries}, ttl={ttl}s, "
+            f"disk={disk_path or 'off'}"
+        )
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            del self._memory[key]
+            self._stats["expired"] += 1
+
+        if self._disk is not None:
+            stored = await self._disk.get(key)
+            if stored is not None:
+                value, expires_at = stored
+                self._remember(key, value, expires_at)
+                self._stats["hits"] += 1
+                self._stats["disk_hits"] += 1
+                return value
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        self._stats["stores"] += 1
+        if self._disk is not None:
+            await self._disk.set(key, value, expires_at)
+            if self._stats["stores"] % self._PRUNE_EVERY == 0:
+                await self._disk.prune()
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def clear(self) -> None:
+        self._memory.clear()
+        if self._disk is not None:
+            await self._disk.clear()
+
+    async def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk_entries": await self._disk.size() if self._disk is not None else None,
+        }
+
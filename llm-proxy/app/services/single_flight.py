@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("llm-proxy.single_flight")
+
+
+class _Call:
+    """Общий вызов upstream и число ожидающих его клиентов"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class StreamBroadcaster:
+    """
+    Раздает один upstream-стрим нескольким подписчикам.
+
+    Токены читаются из источника один раз и накапливаются в буфере:
+    подписчик, подключившийся позже, сначала получает уже выданные
+    токены, затем - новые по мере поступления. Когда уходит последний
+    подписчик, чтение из upstream прекращается.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[AsyncIterator[Any]]],
+        on_finish: Optional[Callable[["StreamBroadcaster"], None]] = None,
+    ):
+        self._factory = factory
+        self._on_finish = on_finish
+        self._chunks: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+        self._opened: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.subscribers = 0
+        self._pump = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        source = None
+        try:
+            source = await self._factory()
+            self._opened.set_result(None)
+            async for chunk in source:
+                self._chunks.append(chunk)
+                self._wake()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not self._opened.done():
+                self._opened.set_exception(e)
+                # Ошибка открытия отдается через wait_open, подписчиков еще нет
+                self._opened.exception()
+            self._error = e
+        finally:
+            self._done = True
+            if not self._opened.done():
+                self._opened.cancel()
+            self._wake()
+            if source is not None and hasattr(source, "aclose"):
+                try:
+                    await source.aclose()
+                except Exception:
+                    pass
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_open(self) -> None:
+        """Ждет открытия upstream-стрима; ошибка открытия пробрасывается"""
+        await asyncio.shield(self._opened)
+
+    def join(self) -> None:
+        """Подписка; токены затем читаются через iterate()"""
+        self.subscribers += 1
+
+    def release(self) -> None:
+        """Отписка; без подписчиков чтение из upstream прекращается"""
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self._done:
+            logger.info("[SingleFlight] All subscribers left, cancelling upstream stream")
+            self._pump.cancel()
+
+    async def iterate(self) -> AsyncIterator[Any]:
+        """Итератор по токенам стрима, начиная с первого; по выходу - отписка"""
+        position = 0
+        try:
+            while True:
+                if position < len(self._chunks):
+                    chunk = self._chunks[position]
+                    position += 1
+                    yield chunk
+                    continue
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                await self._changed.wait()
+        finally:
+            self.release()
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов (single-flight).
+
+    Пока запрос с данным ключом выполняется, повторные запросы с тем же
+    ключом не уходят в upstream, а ждут результата первого. Для
+    стриминга все подписчики получают один и тот же поток токенов.
+    Ключ удаляется сразу после завершения вызова, так что это не кэш:
+    объединяются только запросы, пересекающиеся по времени.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, StreamBroadcaster] = {}
+        self._stats = {"calls": 0, "coalesced": 0, "streams": 0, "stream_joins": 0}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет fn или присоединяется к уже выполняющемуся вызову.
+
+        Отключение одного клиента не отменяет общий вызов; он
+        отменяется, только если результата больше никто не ждет.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget_call(key, call))
+            self._stats["calls"] += 1
+        else:
+            self._stats["coalesced"] += 1
+            logger.info(f"[SingleFlight] Joined in-flight request {key[:12]}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget_call(key, call)
+
+    async def stream(
+        self, key: str, factory: Callable[[], Awaitable[AsyncIterator[Any]]]
+    ) -> AsyncIterator[Any]:
+        """
+        Открывает стрим или подключается к уже идущему с тем же ключом.
+
+        Returns:
+            Итератор по токенам, включая уже выданные до подключения
+
+        Raises:
+            Exception: Ошибка открытия upstream-стрима
+        """
+        broadcaster = self._streams.get(key)
+        if broadcaster is None:
+            broadcaster = StreamBroadcaster(
+                factory, on_finish=lambda b: self._forget_stream(key, b)
+            )
+            self._streams[key] = broadcaster
+            self._stats["streams"] += 1
+        else:
+            self._stats["stream_joins"] += 1
+            logger.info(f"[SingleFlight] Joined in-flight stream {key[:12]}")
+
+        broadcaster.join()
+        try:
+            await broadcaster.wait_open()
+        except BaseException:
+            broadcaster.release()
+            raise
+        return broadcaster.iterate()
+
+    def _forget_call(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _forget_stream(self, key: str, broadcaster: StreamBroadcaster) -> None:
+        if self._streams.get(key) is broadcaster:
+            del self._streams[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "in_flight": len(self._calls),
+            "in_flight_streams": len(self._streams),
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import (
+    get_cancellation_stats,
+    get_llm_adapter,
+    get_response_cache,
+    get_single_flight,
+)
+from app.models.schemas import ChatCompletionRequest
+from app.services.cancellation import CancellationStats, ClientDisconnected, run_until_disconnected
+from app.services.hedging import LatencyTracker
+from app.services.llm_adapters.litellm_adapter import LiteLLMAdapter
+from app.services.single_flight import SingleFlight
+from tests.test_hedging import FakeCompletions, FakeStream, _chunk
+
+
+class DisconnectingClient:
+    """ASGI клиент: отправляет тело запроса и отключается по disconnect()"""
+
+    def __init__(self, body: dict):
+        self._body = json.dumps(body).encode()
+        self._disconnected = asyncio.Event()
+        self.messages = []
+
+    def disconnect(self):
+        self._disconnected.set()
+
+    async def receive(self):
+        if self._body is not None:
+            body, self._body = self._body, None
+            return {"type": "http.request", "body": body, "more_body": False}
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    @property
+    def status(self):
+        return next(m["status"] for m in self.messages if m["type"] == "http.response.start")
+
+
+class HangingAdapter:
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def chat(self, request):
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def _scope():
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/chat/completions",
+        "raw_path": b"/v1/chat/completions",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+
+def _app(adapter, stats, flight=None):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_llm_adapter] = lambda: adapter
+    app.dependency_overrides[get_response_cache] = lambda: None
+    app.dependency_overrides[get_single_flight] = lambda: flight
+    app.dependency_overrides[get_cancellation_stats] = lambda: stats
+    return app
+
+
+BODY = {"model": "gpt-4", "messages": [{"role": "user", "content": "Hi"}]}
+
+
+@pytest.mark.asyncio
+async def test_run_until_disconnected_returns_result():
+    client = DisconnectingClient(BODY)
+
+    async def call():
+        return "answer"
+
+    assert await run_until_disconnected(client, call()) == "answer"
+
+
+@pytest.mark.asyncio
+async def test_run_until_disconnected_cancels_call():
+    client = DisconnectingClient(BODY)
+    adapter = HangingAdapter()
+
+    task = asyncio.create_task(run_until_disconnected(client, adapter.chat(None)))
+    await adapter.started.wait()
+    client.disconnect()
+
+    with pytest.raises(ClientDisconnected):
+        await task
+    assert adapter.cancelled is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("flight", [None, SingleFlight()])
+async def test_endpoint_cancels_upstream_call_on_disconnect(flight):
+    adapter = HangingAdapter()
+    stats = CancellationStats()
+    client = DisconnectingClient(BODY)
+
+    task = asyncio.create_task(_app(adapter, stats, flight)(_scope(), client.receive, client.send))
+    await adapter.started.wait()
+    client.disconnect()
+    await asyncio.wait_for(task, 1)
+
+    assert client.status == 499
+    assert adapter.cancelled is True
+    assert stats.get_stats()["requests_cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_adapter_stream_is_closed_when_consumer_stops():
+    adapter = LiteLLMAdapter(proxy_url="http://litellm", api_key="key", latency=LatencyTracker())
+    stream = FakeStream([_chunk("Hello"), _chunk(" world")])
+    completions = FakeCompletions({"gpt-4": stream})
+    adapter.client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})})
+
+    tokens = await adapter.chat(ChatCompletionRequest(**BODY, stream=True))
+    assert await tokens.__anext__() == "Hello"
+    await tokens.aclose()
+
+    assert stream.closed is True
+
+
+def test_stats_count_cancelled_streams():
+    stats = CancellationStats()
+    stats.stream_cancelled(3)
+    stats.stream_cancelled(2)
+    stats.request_cancelled()
+
+    assert stats.get_stats() == {
+        "requests_cancelled": 1,
+        "streams_cancelled": 2,
+        "stream_chunks_sent": 5,
+    }
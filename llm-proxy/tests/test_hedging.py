@@ -0,0 +1,266 @@
+import asyncio
+
+import pytest
+
+from app.core.config import AppConfig
+from app.models.schemas import ChatCompletionRequest
+from app.services.hedging import LatencyTracker, race_with_fallback
+from app.services.llm_adapters.litellm_adapter import LiteLLMAdapter
+
+
+def _attempt(result=None, delay=0.0, error=None, log=None, name=None):
+    async def run():
+        if log is not None:
+            log.append(("start", name))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(("cancelled", name))
+            raise
+        if error is not None:
+            raise error
+        return result
+
+    return run
+
+
+@pytest.mark.asyncio
+async def test_fallback_on_error():
+    result = await race_with_fallback(
+        [_attempt(error=RuntimeError("primary down")), _attempt(result="secondary")]
+    )
+    assert result == "secondary"
+
+
+@pytest.mark.asyncio
+async def test_all_attempts_fail():
+    with pytest.raises(RuntimeError, match="secondary down"):
+        await race_with_fallback(
+            [
+                _attempt(error=RuntimeError("primary down")),
+                _attempt(error=RuntimeError("secondary down")),
+            ]
+        )
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_primary_is_cancelled():
+    log = []
+    result = await race_with_fallback(
+        [
+            _attempt(result="primary", delay=5, log=log, name="primary"),
+            _attempt(result="secondary", delay=0.01, log=log, name="secondary"),
+        ],
+        hedge_delay=0.02,
+    )
+    assert result == "secondary"
+    assert log == [("start", "primary"), ("start", "secondary"), ("cancelled", "primary")]
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_primary_is_fast():
+    log = []
+    result = await race_with_fallback(
+        [
+            _attempt(result="primary", delay=0.01, log=log, name="primary"),
+            _attempt(result="secondary", log=log, name="secondary"),
+        ],
+        hedge_delay=1.0,
+    )
+    assert result == "primary"
+    assert log == [("start", "primary")]
+
+
+def test_latency_tracker_quantile():
+    tracker = LatencyTracker(min_samples=20)
+    for i in range(19):
+        tracker.record("gpt-4", i / 100)
+    assert tracker.quantile("gpt-4", 0.95) is None
+
+    tracker.record("gpt-4", 10.0)
+    assert tracker.quantile("gpt-4", 0.95) == 0.18
+    assert tracker.quantile("gpt-4", 1.0) == 10.0
+
+
+class FakeStream:
+    def __init__(self, chunks, first_delay=0.0):
+        self._chunks = list(chunks)
+        self._first_delay = first_delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._first_delay:
+            await asyncio.sleep(self._first_delay)
+            self._first_delay = 0.0
+        if not self._chunks:
+            raise StopAsyncIteration
+        return self._chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    def __init__(self, streams):
+        self.streams = streams
+        self.models = []
+
+    async def create(self, **params):
+        self.models.append(params["model"])
+        return self.streams[params["model"]]
+
+
+def _chunk(text):
+    class Delta:
+        content = text
+
+    class Choice:
+        delta = Delta()
+
+    class Chunk:
+        choices = [Choice()]
+
+    return Chunk()
+
+
+@pytest.mark.asyncio
+async def test_adapter_stream_hedges_on_first_token(monkeypatch):
+    monkeypatch.setattr(AppConfig, "HEDGING_ENABLED", True)
+    monkeypatch.setattr(AppConfig, "HEDGE_MIN_DELAY", 0.01)
+    adapter = LiteLLMAdapter(proxy_url="http://litellm", api_key="key", latency=LatencyTracker())
+    slow = FakeStream([_chunk("slow")], first_delay=5)
+    fast = FakeStream([_chunk("Hello"), _chunk(" world")])
+    completions = FakeCompletions({"primary": slow, "secondary": fast})
+    adapter.client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})})
+    for _ in range(20):
+        adapter.latency.record("primary", 0.01)
+
+    request = ChatCompletionRequest(
+        model="primary",
+        messages=[{"role": "user", "content": "Hi"}],
+        stream=True,
+        fallback_models=["secondary"],
+    )
+    tokens = [token async for token in await adapter.chat(request)]
+
+    assert tokens == ["Hello", " world"]
+    assert completions.models == ["primary", "secondary"]
+    assert slow.closed is True
+
+
+@pytest.mark.asyncio
+async def test_adapter_stream_forwards_tool_call_fragments():
+    from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
+
+    class Delta:
+        content = None
+        tool_calls = [
+            ChoiceDeltaToolCall(
+                index=0, id="call_1", function={"name": "write_file", "arguments": '{"pa'}
+            )
+        ]
+
+    class Choice:
+        delta = Delta()
+
+    class Chunk:
+        choices = [Choice()]
+
+    adapter = LiteLLMAdapter(proxy_url="http://litellm", api_key="key", latency=LatencyTracker())
+    completions = FakeCompletions({"gpt-4": FakeStream([Chunk(), _chunk("done")])})
+    adapter.client = type("Client", (), {"chat": type("Chat", (), {"completions": completions})})
+
+    request = ChatCompletionRequest(
+        model="gpt-4", messages=[{"role": "user", "content": "Hi"}], stream=True
+    )
+    items = [item async for item in await adapter.chat(request)]
+
+    assert items == [
+        {
+            "tool_calls": [
+                {
+                    "index": 0,
+                    "id": "call_1",
+                    "function": {"name": "write_file", "arguments": '{"pa'},
+                }
+            ]
+        },
+        "done",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_adapter_records_cancelled_primary_as_completion_sample(monkeypatch):
+    monkeypatch.setattr(AppConfig, "HEDGING_ENABLED", True)
+    monkeypatch.setattr(AppConfig, "HEDGE_MIN_DELAY", 0.01)
+    stream_latency = LatencyTracker(min_samples=1)
+    completion_latency = LatencyTracker(min_samples=1)
+    adapter = LiteLLMAdapter(
+        proxy_url="http://litellm",
+        api_key="key",
+        latency=stream_latency,
+        completion_latency=completion_latency,
+    )
+
+    class Response:
+        def __init__(self, model):
+            self.model = model
+
+        def model_dump(self):
+            return {"model": self.model}
+
+    class Completions:
+        async def create(self, **params):
+            if params["model"] == "primary":
+                await asyncio.sleep(5)
+            return Response(params["model"])
+
+    adapter.client = type("Client", (), {"chat": type("Chat", (), {"completions": Completions()})})
+    for _ in range(20):
+        completion_latency.record("primary", 0.001)
+
+    request = ChatCompletionRequest(
+        model="primary",
+        messages=[{"role": "user", "content": "Hi"}],
+        fallback_models=["secondary"],
+    )
+
+    assert await adapter.chat(request) == {"model": "secondary"}
+    # Отмененный основной запрос учтен нижней границей, порог не снижается
+    assert completion_latency.quantile("primary", 1.0) >= 0.01
+    assert stream_latency.quantile("primary", 1.0) is None
+
+
+@pytest.mark.asyncio
+async def test_adapter_sends_cache_hints_only_to_supporting_providers():
+    adapter = LiteLLMAdapter(proxy_url="http://litellm", api_key="key", latency=LatencyTracker())
+    sent = []
+
+    class Completions:
+        async def create(self, **params):
+            sent.append(params)
+            if params["model"] != "gpt-4o":
+                raise RuntimeError("unavailable")
+            return type("Response", (), {"model_dump": lambda self: {}})()
+
+    adapter.client = type("Client", (), {"chat": type("Chat", (), {"completions": Completions()})})
+    request = ChatCompletionRequest(
+        model="anthropic/claude-sonnet-4",
+        messages=[{"role": "system", "content": "Prompt"}, {"role": "user", "content": "Hi"}],
+        fallback_models=["mistral/large", "gpt-4o"],
+        prompt_cache_key="prefix-1",
+        cache_control={"type": "ephemeral"},
+    )
+
+    assert await adapter.chat(request) == {}
+    anthropic, mistral, openai = sent
+    assert anthropic["messages"][0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "extra_body" not in anthropic
+    assert mistral["messages"][0]["content"] == "Prompt"
+    assert "extra_body" not in mistral
+    assert openai["messages"][0]["content"] == "Prompt"
+    assert openai["extra_body"] == {"prompt_cache_key": "prefix-1"}
@@ -50,3 +50,18 @@ def test_openai_error_example():
 def test_chat_completion_request_invalid(bad_request):
     with pytest.raises(Exception):
         ChatCompletionRequest(**bad_request)
+
+
+def test_usage_keeps_prompt_cache_stats():
+    resp = ChatCompletionResponse(
+        model="gpt-4",
+        choices=[{"index": 0, "message": {"role": "assistant", "content": "ok"}}],
+        usage={
+            "prompt_tokens": 1200,
+            "completion_tokens": 10,
+            "total_tokens": 1210,
+            "prompt_tokens_details": {"cached_tokens": 1024},
+        },
+    )
+    assert resp.usage.prompt_tokens_details == {"cached_tokens": 1024}
+    assert "cached_tokens" in resp.model_dump_json()
@@ -0,0 +1,121 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import get_llm_adapter, get_response_cache
+from app.models.schemas import ChatCompletionRequest
+from app.services.response_cache import ResponseCache, cache_key
+
+
+def _request(**overrides):
+    data = {
+        "model": "gpt-4",
+        "messages": [{"role": "user", "content": "Classify: fix the bug"}],
+        "temperature": 0.3,
+    }
+    data.update(overrides)
+    return ChatCompletionRequest(**data)
+
+
+def test_cache_key_is_canonical():
+    first = _request(tools=[{"type": "function", "function": {"name": "a", "parameters": {}}}])
+    second = _request(tools=[{"function": {"parameters": {}, "name": "a"}, "type": "function"}])
+    assert cache_key(first) == cache_key(second)
+    assert cache_key(_request(stream=True, user="u1")) == cache_key(_request())
+    assert cache_key(_request(temperature=0.7)) != cache_key(_request())
+    assert cache_key(_request(model="gpt-4o")) != cache_key(_request())
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    await cache.set("a", {"id": "a"})
+    await cache.set("b", {"id": "b"})
+    assert await cache.get("a") == {"id": "a"}
+    await cache.set("c", {"id": "c"})
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == {"id": "a"}
+
+    expired = ResponseCache(ttl=0)
+    await expired.set("a", {"id": "a"})
+    assert await expired.get("a") is None
+
+    stats = await cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    await ResponseCache(disk_path=path).set("key", {"id": "cached"})
+
+    restarted = ResponseCache(disk_path=path)
+    assert await restarted.get("key") == {"id": "cached"}
+    stats = await restarted.get_stats()
+    assert stats["disk_hits"] == 1
+    assert stats["disk_entries"] == 1
+
+
+class CountingAdapter:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, request):
+        self.calls += 1
+        return {
+            "id": f"chatcmpl-{self.calls}",
+            "object": "chat.completion",
+            "created": 1,
+            "model": request.model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": f"answer {self.calls}"},
+                    "finish_reason": "stop",
+                }
+            ],
+        }
+
+
+def _client(adapter, cache):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_llm_adapter] = lambda: adapter
+    app.dependency_overrides[get_response_cache] = lambda: cache
+    return TestClient(app)
+
+
+def test_endpoint_uses_cache_only_on_request():
+    adapter = CountingAdapter()
+    client = _client(adapter, ResponseCache())
+    body = _request().model_dump(exclude_none=True)
+
+    first = client.post("/v1/chat/completions", json=body, headers={"X-LLM-Cache": "use"})
+    second = client.post("/v1/chat/completions", json=body, headers={"X-LLM-Cache": "use"})
+    uncached = client.post("/v1/chat/completions", json=body)
+
+    assert first.headers["X-LLM-Cache"] == "miss"
+    assert second.headers["X-LLM-Cache"] == "hit"
+    assert second.json()["choices"][0]["message"]["content"] == "answer 1"
+    assert "X-LLM-Cache" not in uncached.headers
+    assert adapter.calls == 2
+
+    refreshed = client.post(
+        "/v1/chat/completions", json=body, headers={"X-LLM-Cache": "refresh"}
+    )
+    assert refreshed.json()["choices"][0]["message"]["content"] == "answer 3"
+    after_refresh = client.post("/v1/chat/completions", json=body, headers={"X-LLM-Cache": "use"})
+    assert after_refresh.json()["choices"][0]["message"]["content"] == "answer 3"
+
+    stats = client.get("/v1/cache/stats").json()
+    assert stats["enabled"] is True
+    assert stats["hits"] == 2
+
+
+def test_stats_when_disabled():
+    client = _client(CountingAdapter(), None)
+    assert client.get("/v1/cache/stats").json() == {"enabled": False}
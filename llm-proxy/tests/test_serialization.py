@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.core import serialization
+from app.core.serialization import FastJSONResponse
+from app.models.schemas import ChatCompletionChunk, ChoiceDelta, DeltaMessage
+from app.services.chunk_frames import DONE_FRAME, ChunkFrameEncoder
+
+DOCUMENT = {
+    "text": 'Привет, "мир" 👋\n\t\\',
+    "number": 42,
+    "float": 1.5,
+    "flag": True,
+    "none": None,
+    "nested": {"list": [1, "two", {"three": 3}]},
+}
+
+
+@pytest.fixture(params=serialization.available_backends())
+def backend(request):
+    serialization.set_backend(request.param)
+    yield request.param
+    serialization.set_backend()
+
+
+def test_backends_produce_identical_json(backend):
+    expected = json.dumps(DOCUMENT, ensure_ascii=False, separators=(",", ":"))
+
+    assert serialization.dumps(DOCUMENT) == expected
+    assert serialization.dumpb(DOCUMENT) == expected.encode("utf-8")
+    assert serialization.loads(expected) == DOCUMENT
+    assert serialization.loads(expected.encode("utf-8")) == DOCUMENT
+
+
+def test_invalid_json_raises_json_decode_error(backend):
+    with pytest.raises(json.JSONDecodeError):
+        serialization.loads('{"broken": ')
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        serialization.set_backend("simdjson")
+
+
+def _chunk(delta, finish_reason=None):
+    return ChatCompletionChunk(
+        id="chatcmpl-1",
+        created=1700000000,
+        model="gpt-4",
+        choices=[ChoiceDelta(index=0, delta=delta, finish_reason=finish_reason)],
+    )
+
+
+@pytest.mark.parametrize("token", ["Hello", ' "quoted"\n', "Привет 👋", "\x00"])
+def test_chunk_frames_match_pydantic_models(backend, token):
+    frames = ChunkFrameEncoder("chatcmpl-1", 1700000000, "gpt-4")
+
+    def frame(chunk):
+        return f"data: {chunk.model_dump_json()}\n\n".encode("utf-8")
+
+    assert frames.content(token) == frame(_chunk(DeltaMessage(content=token)))
+    assert frames.role() == frame(_chunk(DeltaMessage(role="assistant")))
+    assert frames.finish("stop") == frame(_chunk(DeltaMessage(), "stop"))
+    tool_calls = [{"index": 0, "function": {"arguments": '{"a": 1}'}}]
+    assert frames.tool_calls(tool_calls) == frame(_chunk(DeltaMessage(tool_calls=tool_calls)))
+    assert DONE_FRAME == b"data: [DONE]\n\n"
+
+
+@pytest.mark.asyncio
+async def test_fast_json_response_matches_default_rendering(backend):
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/doc")
+    async def doc():
+        return DOCUMENT
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/doc")
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == serialization.dumpb(DOCUMENT)
+    assert response.json() == DOCUMENT
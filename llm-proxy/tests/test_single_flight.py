@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.api.v1.endpoints import router
+from app.core.dependencies import get_llm_adapter, get_response_cache, get_single_flight
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"id": "shared"}
+
+    results = await asyncio.gather(*(flight.run("key", upstream) for _ in range(5)))
+
+    assert results == [{"id": "shared"}] * 5
+    assert calls == 1
+    assert flight.get_stats()["coalesced"] == 4
+    assert flight.get_stats()["in_flight"] == 0
+
+    await flight.run("key", upstream)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_not_remembered():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        flight.run("key", failing), flight.run("key", failing), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.get_stats()["calls"] == 1
+    assert flight.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_call_survives_one_waiter_cancel_and_stops_without_waiters():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        started.set()
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    first = asyncio.ensure_future(flight.run("key", upstream))
+    second = asyncio.ensure_future(flight.run("key", upstream))
+    await started.wait()
+    first.cancel()
+    assert await second == "done"
+    assert not cancelled.is_set()
+
+    lonely = asyncio.ensure_future(flight.run("other", upstream))
+    await asyncio.sleep(0.01)
+    lonely.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
+
+
+def _source(tokens, delay=0.01, log=None):
+    async def open_stream():
+        async def gen():
+            for token in tokens:
+                await asyncio.sleep(delay)
+                if log is not None:
+                    log.append(token)
+                yield token
+
+        return gen()
+
+    return open_stream
+
+
+@pytest.mark.asyncio
+async def test_late_joiner_replays_emitted_tokens():
+    flight = SingleFlight()
+    log = []
+    factory = _source(["a", "b", "c", "d"], log=log)
+
+    first = await flight.stream("key", factory)
+    received_first = [await first.__anext__(), await first.__anext__()]
+    second = await flight.stream("key", factory)
+
+    rest_first, all_second = await asyncio.gather(_collect(first), _collect(second))
+
+    assert received_first + rest_first == ["a", "b", "c", "d"]
+    assert all_second == ["a", "b", "c", "d"]
+    assert log == ["a", "b", "c", "d"]
+    assert flight.get_stats()["stream_joins"] == 1
+    assert flight.get_stats()["in_flight_streams"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_open_error_is_raised():
+    flight = SingleFlight()
+
+    async def failing():
+        raise RuntimeError("cannot open")
+
+    with pytest.raises(RuntimeError, match="cannot open"):
+        await flight.stream("key", failing)
+    assert flight.get_stats()["in_flight_streams"] == 0
+
+
+async def _collect(iterator):
+    return [token async for token in iterator]
+
+
+class SlowAdapter:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, request):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if request.stream:
+            async def gen():
+                for token in ["Hello", " world"]:
+                    yield token
+
+            return gen()
+        return {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 1,
+            "model": request.model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "answer"},
+                    "finish_reason": "stop",
+                }
+            ],
+        }
+
+
+def _app(adapter):
+    app = FastAPI()
+    app.include_router(router)
+    flight = SingleFlight()
+    app.dependency_overrides[get_llm_adapter] = lambda: adapter
+    app.dependency_overrides[get_response_cache] = lambda: None
+    app.dependency_overrides[get_single_flight] = lambda: flight
+    return app
+
+
+BODY = {"model": "gpt-4", "messages": [{"role": "user", "content": "Hi"}]}
+
+
+@pytest.mark.asyncio
+async def test_endpoint_coalesces_identical_requests():
+    adapter = SlowAdapter()
+    transport = ASGITransport(app=_app(adapter))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(
+            *(client.post("/v1/chat/completions", json=BODY) for _ in range(3))
+        )
+        other = await client.post(
+            "/v1/chat/completions",
+            json={**BODY, "messages": [{"role": "user", "content": "Bye"}]},
+        )
+        stats = (await client.get("/v1/coalescing/stats")).json()
+
+    assert [r.json()["choices"][0]["message"]["content"] for r in responses] == ["answer"] * 3
+    assert other.status_code == 200
+    assert adapter.calls == 2
+    assert stats["enabled"] is True
+    assert stats["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_endpoint_coalesces_streams():
+    adapter = SlowAdapter()
+    transport = ASGITransport(app=_app(adapter))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(
+            *(client.post("/v1/chat/completions", json={**BODY, "stream": True}) for _ in range(2))
+        )
+
+    for response in responses:
+        assert '"content":"Hello"' in response.text
+        assert "[DONE]" in response.text
+    assert adapter.calls == 1